@@ -0,0 +1,67 @@
+"""
+ベンチマーク：CPU処理を模したリクエストのバーストに対する遅延の比較（流入制御の有無）。
+"""
+
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from faceapi.core.admission import AdmissionController, AdmissionRejected
+
+WORK_SECONDS = 0.02
+WORKERS = 4
+BURST = 400
+
+
+def work():
+    end = time.perf_counter() + WORK_SECONDS
+    while time.perf_counter() < end:
+        pass
+
+
+async def run(controller: Optional[AdmissionController]):
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(WORKERS)
+    latencies, rejected = [], 0
+
+    async def request(i: int):
+        nonlocal rejected
+        start = time.perf_counter()
+        if controller is not None:
+            try:
+                await controller.acquire(f"10.0.{i % 50}.1")
+            except AdmissionRejected:
+                rejected += 1
+                return
+        try:
+            await loop.run_in_executor(executor, work)
+        finally:
+            if controller is not None:
+                controller.release()
+        latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(request(i) for i in range(BURST)))
+    executor.shutdown()
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    return statistics.median(latencies), p99, rejected
+
+
+async def benchmark():
+    for name, controller in (
+        ("制御なし", None),
+        ("流入制御", AdmissionController(
+            rate_per_ip=5, burst_per_ip=10, max_in_flight=WORKERS, max_queue=16, queue_timeout=1.0
+        )),
+    ):
+        median, p99, rejected = await run(controller)
+        print(
+            f"{name}: 中央値 {median * 1e3:7.1f} ms, p99 {p99 * 1e3:7.1f} ms, "
+            f"拒否 {rejected}/{BURST}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(benchmark())
@@ -0,0 +1,35 @@
+"""
+基准测试：逐个 update_user() 与一次 bulk_update() 停用所有用户的对比。
+"""
+
+import asyncio
+import time
+
+from loguru import logger
+
+from faceapi.db.memory_managers import MemorySqlManager
+
+
+async def benchmark(user_count: int = 20_000):
+    manager = MemorySqlManager()
+    for i in range(user_count):
+        await manager.create_user(username=f"user{i}", email=f"user{i}@example.com")
+    user_ids = list(manager.users)
+
+    start = time.perf_counter()
+    for user_id in user_ids:
+        await manager.update_user(user_id, is_active=False)
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await manager.bulk_update(user_ids, is_active=True)
+    bulk = time.perf_counter() - start
+    assert await manager.count_users(is_active=True) == user_count
+
+    print(f"update_user() x {user_count}: {single * 1e3:10.2f} ms")
+    print(f"bulk_update():         {bulk * 1e3:10.2f} ms")
+
+
+if __name__ == "__main__":
+    logger.remove()
+    asyncio.run(benchmark())
@@ -0,0 +1,41 @@
+"""
+基准测试：旧的 tolist() + JSON 列表往返与 float32 字节往返的对比。
+"""
+
+import json
+import time
+
+import numpy as np
+
+from faceapi.db.embedding_codec import as_embedding, decode_embedding, encode_embedding
+
+EMB_DIM = 512
+ROUNDS = 20_000
+
+
+def bench(label, func):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        func()
+    elapsed = (time.perf_counter() - start) / ROUNDS * 1e6
+    print(f"{label:<36}{elapsed:8.2f} us/次")
+
+
+def main():
+    rng = np.random.default_rng(0)
+    feature = rng.standard_normal((1, EMB_DIM), dtype=np.float32)
+
+    legacy = json.dumps(feature[0].tolist())
+    encoded = encode_embedding(feature[0])
+    bench("tolist() + np.array()", lambda: np.array(feature[0].tolist()))
+    bench("as_embedding(ndarray)", lambda: as_embedding(feature[0]))
+    bench("JSON 列表编码", lambda: json.dumps(feature[0].tolist()))
+    bench("float32 字节编码", lambda: encode_embedding(feature[0]))
+    bench("JSON 列表解码", lambda: decode_embedding(legacy))
+    bench("float32 字节解码", lambda: decode_embedding(encoded))
+    print(f"存储大小: JSON {len(legacy)} 字节, float32 {len(encoded)} 字节")
+    assert np.array_equal(decode_embedding(legacy), decode_embedding(encoded))
+
+
+if __name__ == "__main__":
+    main()
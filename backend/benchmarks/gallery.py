@@ -0,0 +1,64 @@
+"""
+基准测试：导出并导入 50000 个用户（导出的临时内存与人脸库大小无关）。
+"""
+
+import asyncio
+import time
+import tracemalloc
+
+import numpy as np
+from loguru import logger
+
+from faceapi.db.gallery import encode_chunk, encode_end, encode_header, read_gallery
+from faceapi.db.memory_managers import MemorySqlManager
+
+USER_COUNT = 50_000
+EMB_DIM = 512
+CHUNK_SIZE = 1000
+
+
+async def benchmark():
+    rng = np.random.default_rng(0)
+    source = MemorySqlManager()
+    await source.bulk_create_users([
+        {
+            "username": f"user{i}", "email": f"user{i}@example.com",
+            "hashed_password": "x" * 77,
+            "embedding": rng.standard_normal(EMB_DIM, dtype=np.float32) if i % 2 else None,
+        }
+        for i in range(USER_COUNT)
+    ])
+
+    async def export():
+        yield encode_header(EMB_DIM)
+        async for chunk in source.iter_user_chunks(CHUNK_SIZE):
+            yield encode_chunk(chunk, EMB_DIM)
+        yield encode_end()
+
+    start = time.perf_counter()
+    size = 0
+    async for data in export():
+        size += len(data)
+    exported = time.perf_counter() - start
+
+    target = MemorySqlManager()
+    start = time.perf_counter()
+    async for chunk in read_gallery(export()):
+        await target.bulk_create_users([dict(record, embedding=embedding) for record, embedding in chunk])
+    imported = time.perf_counter() - start
+    assert len(target.users) == USER_COUNT and len(target._vector_index) == USER_COUNT // 2
+
+    tracemalloc.start()
+    async for _ in read_gallery(export()):
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"导出: {exported * 1e3:.0f} ms ({size / 1e6:.1f} MB)")
+    print(f"导出 + 导入: {imported * 1e3:.0f} ms")
+    print(f"导出 + 解析的峰值临时内存: {peak / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    logger.remove()
+    asyncio.run(benchmark())
@@ -0,0 +1,58 @@
+"""
+基准测试：10 万条记录下 N-gram 索引查询与全表扫描的对比。
+"""
+
+import random
+import string
+import time
+
+from faceapi.db.ngram_index import NgramIndex
+
+USER_COUNT = 100_000
+
+
+def main():
+    random.seed(0)
+    first_names = ["".join(random.choices(string.ascii_lowercase, k=random.randint(4, 8)))
+                   for _ in range(2000)]
+    users = {
+        user_id: {
+            "username": f"{random.choice(first_names)}{user_id}",
+            "email": f"{random.choice(first_names)}.{user_id}@example.com",
+            "full_name": f"{random.choice(first_names).title()} {random.choice(first_names).title()}",
+        }
+        for user_id in range(1, USER_COUNT + 1)
+    }
+
+    start = time.perf_counter()
+    indexes = {field: NgramIndex() for field in ("username", "email", "full_name")}
+    for user_id, user in users.items():
+        for field, index in indexes.items():
+            index.add(user_id, user[field])
+    print(f"索引构建: {time.perf_counter() - start:.2f}s ({USER_COUNT} 条)")
+
+    queries = [
+        ("username", first_names[0][:4]),
+        ("username", "12345"),
+        ("email", first_names[1]),
+        ("email", "example"),
+        ("full_name", first_names[2].title()),
+        ("full_name", "zz"),
+    ]
+    for field, query in queries:
+        start = time.perf_counter()
+        scanned = {user_id for user_id, user in users.items()
+                   if query.lower() in user[field].lower()}
+        scan_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        found = indexes[field].search(query)
+        index_ms = (time.perf_counter() - start) * 1000
+
+        assert found == scanned
+        print(f"{field:>9} {query!r:>12}: {len(found):6d} 条  "
+              f"scan {scan_ms:7.2f}ms  index {index_ms:7.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
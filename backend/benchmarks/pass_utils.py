@@ -0,0 +1,58 @@
+"""
+ベンチマーク：ログインのバースト中にイベントループが止まる時間（同期 vs プロセスプール）。
+"""
+
+import asyncio
+import time
+from typing import Tuple
+
+from faceapi.utils.pass_utils import (
+    hash_password,
+    shutdown_hash_executor,
+    verify_password,
+    verify_password_async,
+)
+
+LOGINS = 16
+PASSWORD = "MySecurePassword123"
+
+
+async def measure_stall(verify, hashed: str) -> Tuple[float, float]:
+    stalls = []
+
+    async def ticker():
+        # 1 ms ごとに起床し、予定より遅れた時間を記録（顔認証など他のリクエストの待ち時間に相当）
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            stalls.append(time.perf_counter() - start - 0.001)
+
+    task = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    await asyncio.gather(*(verify(PASSWORD, hashed) for _ in range(LOGINS)))
+    elapsed = time.perf_counter() - start
+    task.cancel()
+    return elapsed, max(stalls, default=elapsed)
+
+
+async def sync_verify(plain_password: str, hashed_password: str) -> bool:
+    return verify_password(plain_password, hashed_password)
+
+
+async def benchmark():
+    hashed = hash_password(PASSWORD)
+    await verify_password_async(PASSWORD, hashed)  # プロセスの起動を除外
+    for name, verify in (("同期", sync_verify), ("プロセスプール", verify_password_async)):
+        elapsed, stall = await measure_stall(verify, hashed)
+        print(f"{name}: ログイン {LOGINS} 件 {elapsed * 1e3:7.1f} ms、最大停止 {stall * 1e3:7.1f} ms")
+
+
+def main():
+    try:
+        asyncio.run(benchmark())
+    finally:
+        shutdown_hash_executor()
+
+
+if __name__ == "__main__":
+    main()
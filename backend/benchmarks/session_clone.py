@@ -0,0 +1,33 @@
+"""
+基准测试：每个会话重新初始化（计算管理员密码哈希）与从模板复制的对比。
+"""
+
+import asyncio
+import time
+
+from loguru import logger
+
+from faceapi.db.memory_managers import MemorySqlManager
+
+
+async def benchmark(rounds: int = 20):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        manager = MemorySqlManager()
+        await manager.initialize()
+    rebuild = (time.perf_counter() - start) / rounds
+
+    template = MemorySqlManager()
+    await template.initialize()
+    start = time.perf_counter()
+    for _ in range(rounds * 100):
+        template.clone()
+    clone = (time.perf_counter() - start) / (rounds * 100)
+
+    print(f"initialize(): {rebuild * 1e3:10.2f} ms/会话")
+    print(f"clone():      {clone * 1e6:10.2f} us/会话")
+
+
+if __name__ == "__main__":
+    logger.remove()
+    asyncio.run(benchmark())
@@ -0,0 +1,40 @@
+"""
+基准测试：memory_usage() 的估算值与 tracemalloc 实测值的对比（文本长度不同的用户）。
+"""
+
+import asyncio
+import random
+import string
+import tracemalloc
+
+import numpy as np
+from loguru import logger
+
+from faceapi.db.memory_managers import MemorySqlManager
+
+
+async def benchmark(user_count: int = 20_000, emb_dim: int = 512):
+    for name_length in (8, 24, 48):
+        rng = np.random.default_rng(0)
+        tracemalloc.start()
+        baseline, _ = tracemalloc.get_traced_memory()
+        manager = MemorySqlManager()
+        for i in range(user_count):
+            name = ''.join(random.choices(string.ascii_lowercase, k=name_length))
+            await manager.create_user(
+                username=f"{name}{i}", email=f"{name}{i}@example.com", full_name=name.title(),
+                hashed_password="x" * 77,
+                embedding=rng.standard_normal(emb_dim, dtype=np.float32) if i % 2 else None,
+            )
+        measured = tracemalloc.get_traced_memory()[0] - baseline
+        tracemalloc.stop()
+        estimated = sum(manager.memory_usage().values())
+        print(
+            f"文本 {name_length:2d} 字符: 估算 {estimated / 1e6:7.1f} MB, "
+            f"实测 {measured / 1e6:7.1f} MB ({estimated / measured:.0%})"
+        )
+
+
+if __name__ == "__main__":
+    logger.remove()
+    asyncio.run(benchmark())
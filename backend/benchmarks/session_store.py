@@ -0,0 +1,78 @@
+"""
+基准测试：多个工作进程共享会话时的读取延迟和写入吞吐。
+"""
+
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+
+from loguru import logger
+
+from faceapi.db.memory_managers import MemorySqlManager
+from faceapi.db.session_store import SessionJournal, SharedSessionStore
+
+WRITES = 2000
+READS = 20000
+
+
+def worker(path: str, ip_address: str, queue):
+    """在独立的进程中写入自己的会话，并检查另一个会话的更新"""
+    logger.remove()
+    store = SharedSessionStore(path)
+    session = store.get(ip_address)
+    manager = MemorySqlManager()
+    manager.attach_journal(SessionJournal(store, session, 0))
+
+    async def write():
+        for i in range(WRITES):
+            await manager.create_user(
+                username=f"{ip_address}-{i}", email=f"{i}@{ip_address}", hashed_password="x",
+            )
+
+    start = time.perf_counter()
+    asyncio.run(write())
+    written = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(READS):
+        store.data_version()
+    checked = time.perf_counter() - start
+    queue.put((written, checked))
+
+
+def main():
+    for workers in (1, 2, 4):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "sessions.sqlite3")
+            store = SharedSessionStore(path)
+            for n in range(workers):
+                store.create(f"10.0.0.{n}", time.time(), time.time() + 3600)
+            queue = multiprocessing.Queue()
+            processes = [
+                multiprocessing.Process(target=worker, args=(path, f"10.0.0.{n}", queue))
+                for n in range(workers)
+            ]
+            start = time.perf_counter()
+            for process in processes:
+                process.start()
+            results = [queue.get() for _ in processes]
+            for process in processes:
+                process.join()
+            elapsed = time.perf_counter() - start
+            check_us = max(checked for _, checked in results) / READS * 1e6
+            print(f"{workers} 个进程: 写入 {workers * WRITES / elapsed:8.0f} 次/秒, "
+                  f"读缓存有效性检查 {check_us:.1f} µs/次")
+            # 其他进程的修改可以完整地重放
+            for n in range(workers):
+                _, _, log = store.load(f"10.0.0.{n}")
+                replica = MemorySqlManager()
+                replica.replay((record, embedding) for _, record, embedding in log)
+                assert len(replica.users) == WRITES
+            store.close()
+
+
+if __name__ == "__main__":
+    logger.remove()
+    main()
@@ -0,0 +1,55 @@
+"""
+基准测试：10000 个用户的快照写入与恢复。
+"""
+
+import asyncio
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+
+from faceapi.db.memory_managers import MemorySqlManager
+from faceapi.db.snapshot import SnapshotStore
+
+USER_COUNT = 10_000
+EMB_DIM = 512
+
+
+async def build() -> MemorySqlManager:
+    rng = np.random.default_rng(0)
+    manager = MemorySqlManager()
+    for i in range(USER_COUNT):
+        await manager.create_user(
+            username=f"user{i}", email=f"user{i}@example.com", full_name=f"User {i}",
+            hashed_password="x" * 77,
+            embedding=rng.standard_normal(EMB_DIM, dtype=np.float32),
+        )
+    return manager
+
+
+def main():
+    source = asyncio.run(build())
+    root = Path(tempfile.mkdtemp())
+    store = SnapshotStore(str(root))
+    try:
+        start = time.perf_counter()
+        data = source.snapshot()
+        captured = time.perf_counter()
+        store.save("127.0.0.1", data)
+        saved = time.perf_counter()
+        restored = [MemorySqlManager.from_snapshot(d) for _, d in store.load_all()]
+        loaded = time.perf_counter()
+        assert len(restored[0].users) == USER_COUNT and len(restored[0]._vector_index) == USER_COUNT
+        size = sum(p.stat().st_size for p in root.iterdir())
+        print(f"捕获: {(captured - start) * 1e3:.1f} ms, 写入: {(saved - captured) * 1e3:.1f} ms, "
+              f"恢复: {(loaded - saved) * 1e3:.1f} ms, 大小: {size / 1e6:.1f} MB")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    logger.remove()
+    main()
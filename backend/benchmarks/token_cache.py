@@ -0,0 +1,34 @@
+"""
+ベンチマーク：リクエストごとの jwt.decode() とキャッシュのヒットの比較。
+"""
+
+import time
+
+import jwt
+
+from faceapi.utils.token_cache import VerifiedTokenCache
+
+ROUNDS = 100_000
+SECRET = "0" * 64
+
+
+def main():
+    token = jwt.encode({"ip": "127.0.0.1", "exp": int(time.time()) + 300}, SECRET, algorithm="HS256")
+
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        jwt.decode(token, SECRET, algorithms=["HS256"])
+    decoded = (time.perf_counter() - start) / ROUNDS
+
+    cache = VerifiedTokenCache(maxsize=1000)
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        cache.decode("session", token, SECRET, "HS256")
+    cached = (time.perf_counter() - start) / ROUNDS
+
+    print(f"jwt.decode():          {decoded * 1e6:8.2f} us/リクエスト")
+    print(f"VerifiedTokenCache:    {cached * 1e6:8.2f} us/リクエスト (ヒット {cache.hits}, ミス {cache.misses})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+内存基准测试：旧的 dict 存储（含列表形式的嵌入向量）与 UserRecord + 向量索引的对比。
+"""
+
+import gc
+import time
+import tracemalloc
+from typing import Any, Dict
+
+import numpy as np
+
+from faceapi.db.user_record import UserRecord
+from faceapi.db.vector_index import VectorIndex
+
+USER_COUNT = 10_000
+EMB_DIM = 512
+
+embeddings = np.random.default_rng(0).standard_normal((USER_COUNT, EMB_DIM), dtype=np.float32)
+
+
+def user_values(user_id: int) -> Dict[str, Any]:
+    now = time.time()
+    return {
+        'id': user_id,
+        'username': f"user{user_id}",
+        'email': f"user{user_id}@example.com",
+        'full_name': f"User {user_id}",
+        'hashed_password': "$5$rounds=535000$" + "x" * 59,
+        'is_active': True,
+        'is_admin': False,
+        'head_pic': None,
+        'created_at': now,
+        'updated_at': now,
+    }
+
+
+def build_dicts():
+    users = {}
+    for user_id in range(1, USER_COUNT + 1):
+        values = user_values(user_id)
+        values['embedding'] = embeddings[user_id - 1].tolist()
+        users[user_id] = values
+    return users
+
+
+def build_records():
+    vectors = VectorIndex()
+    users = {}
+    for user_id in range(1, USER_COUNT + 1):
+        users[user_id] = UserRecord(vectors, **user_values(user_id))
+        vectors.upsert(user_id, embeddings[user_id - 1])
+    return users, vectors
+
+
+def build_scalar_dicts():
+    return {user_id: user_values(user_id) for user_id in range(1, USER_COUNT + 1)}
+
+
+def build_scalar_records():
+    return {user_id: UserRecord(**user_values(user_id)) for user_id in range(1, USER_COUNT + 1)}
+
+
+def measure(builder):
+    gc.collect()
+    tracemalloc.start()
+    result = builder()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size / USER_COUNT
+
+
+def main():
+    before = measure(build_dicts)
+    after = measure(build_records)
+    print(f"dict + list 嵌入向量:        {before:10.0f} 字节/用户")
+    print(f"UserRecord + 向量索引:       {after:10.0f} 字节/用户")
+    print(f"减少: {(1 - after / before) * 100:.1f}%")
+    print(f"仅标量字段: dict {measure(build_scalar_dicts):.0f} 字节/用户, "
+          f"UserRecord {measure(build_scalar_records):.0f} 字节/用户")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,7 @@ import argparse
 import asyncio
 import os
 import sys
+from contextlib import nullcontext
 from pathlib import Path
 
 # 添加项目根目录到 Python 路径
@@ -32,10 +33,12 @@ def dev(args):
     )
 
 
-def prod():
+def prod(args):
     """生产模式启动"""
     print("🚀 启动生产服务器...")
     os.environ.setdefault("USE_MEMORY_DB", "false")  # 生产环境建议使用真实数据库
+    # 多个工作进程通过共享的会话存储看到同一组会话
+    os.environ.setdefault("SESSION_STORE_PATH", "data/sessions.sqlite3")
     
     uvicorn.run(
         "faceapi.main:app",
@@ -47,13 +50,87 @@ def prod():
     )
 
 
+def import_users(args):
+    """从清单和人脸图片归档批量导入用户（写入持久化数据库）"""
+    if not args.manifest:
+        print("❌ 请指定用户清单文件 (.csv / .jsonl)")
+        sys.exit(2)
+    os.environ.setdefault("USE_MEMORY_DB", "false")  # 内存数据库随进程结束而丢失
+
+    from faceapi.core import _BLOB_STORE_, _CONFIG_
+    from faceapi.db import database_lifespan, get_persistent_sql_client
+    from faceapi.services.bulk_import import (
+        BulkImporter,
+        detect_manifest_format,
+        iter_manifest,
+        open_image_archive,
+    )
+    from faceapi.utils.pass_utils import shutdown_hash_executor
+
+    if _CONFIG_.USE_MEMORY_DB:
+        print("❌ 批量导入需要持久化数据库，请设置 USE_MEMORY_DB=false")
+        sys.exit(2)
+
+    async def run():
+        async with database_lifespan():
+            sql_instance = await get_persistent_sql_client(_BLOB_STORE_)
+            with open(args.manifest, "rb") as manifest, \
+                    (open(args.images, "rb") if args.images else nullcontext()) as images:
+                archive = open_image_archive(images) if images else None
+                importer = BulkImporter(sql_instance, archive, batch_size=args.batch_size)
+                rows = iter_manifest(manifest, detect_manifest_format(args.manifest))
+                async for result in importer.run(rows):
+                    if not result.finished:
+                        print(f"⏳ 已处理 {result.processed_count} 行: "
+                              f"创建 {result.created_count}, 人脸 {result.face_count}, "
+                              f"失败 {result.failed_count}")
+            return result
+
+    try:
+        result = asyncio.run(run())
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+    finally:
+        shutdown_hash_executor()
+
+    for error in result.errors:
+        print(f"  第 {error.row} 行 ({error.username or '-'}): {error.error}")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            f.write(result.model_dump_json(indent=2))
+        print(f"📝 已写入导入报告: {args.report}")
+    print(f"✅ 导入完成: 创建 {result.created_count} 个用户 "
+          f"(人脸 {result.face_count}), 失败 {result.failed_count} 行")
+    sys.exit(1 if result.failed_count else 0)
+
+
 def main():
     """主命令行接口"""
     parser = argparse.ArgumentParser(description="Face Recognition System CLI")
     parser.add_argument(
         "command",
-        choices=["dev", "prod", "serve"],
-        help="运行命令: dev(开发模式), prod(生产模式), serve(默认开发模式)"
+        choices=["dev", "prod", "serve", "import"],
+        help="运行命令: dev(开发模式), prod(生产模式), serve(默认开发模式), import(批量导入用户)"
+    )
+    parser.add_argument(
+        "manifest",
+        nargs="?",
+        help="import: 用户清单文件 (.csv / .jsonl)"
+    )
+    parser.add_argument(
+        "--images",
+        help="import: 人脸图片的 ZIP 归档（清单的 image 列为归档内的路径）"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=None,
+        help="import: 每批处理的行数 (默认: IMPORT_BATCH_SIZE)"
+    )
+    parser.add_argument(
+        "--report",
+        help="import: 将导入结果（含每行错误）写入 JSON 文件"
     )
     parser.add_argument(
         "--port",
@@ -97,6 +174,8 @@ def main():
         dev(args)
     elif args.command == "prod":
         prod(args)
+    elif args.command == "import":
+        import_users(args)
 
 
 if __name__ == "__main__":
@@ -13,12 +13,68 @@ _CONFIG_ = Config()
 logger.info("設定が読み込まれました")
 logger.info(_CONFIG_)
 
+from ..db.blob_store import BlobStore
+
+_BLOB_STORE_ = BlobStore(
+    _CONFIG_.HEAD_PIC_STORE_DIR,
+    thumbnail_size=_CONFIG_.HEAD_PIC_THUMBNAIL_SIZE,
+    # 共有セッションストアを使用する場合は複数のワーカープロセスが同じディレクトリを使う
+    shared=bool(_CONFIG_.SESSION_STORE_PATH),
+)
+
+from ..db.session_store import SharedSessionStore
+
+# 複数のワーカープロセスでセッションを共有する場合のみ使用する
+_SESSION_STORE_ = (
+    SharedSessionStore(_CONFIG_.SESSION_STORE_PATH)
+    if _CONFIG_.SESSION_STORE_PATH
+    else None
+)
+
+from ..db.snapshot import SnapshotStore
+
+# インメモリデータベースを使用する場合のみセッションのスナップショットを保存する
+# （共有セッションストアを使用する場合はストアに保存される）
+_SNAPSHOT_STORE_ = (
+    SnapshotStore(_CONFIG_.SNAPSHOT_DIR)
+    if _CONFIG_.USE_MEMORY_DB and _CONFIG_.SNAPSHOT_DIR and _SESSION_STORE_ is None
+    else None
+)
+
 from .session import SessionManager
 
 _SESSION_MANAGER_ = SessionManager()
 
+import os
+from .admission import AdmissionController
+
+# 顔認識パイプラインの流入制御（ワーカーごと）
+_ADMISSION_ = AdmissionController(
+    rate_per_ip=_CONFIG_.ADMISSION_RATE_PER_IP,
+    burst_per_ip=_CONFIG_.ADMISSION_BURST_PER_IP,
+    max_in_flight=_CONFIG_.ADMISSION_MAX_IN_FLIGHT or os.cpu_count() or 1,
+    max_queue=_CONFIG_.ADMISSION_MAX_QUEUE,
+    queue_timeout=_CONFIG_.ADMISSION_QUEUE_TIMEOUT,
+    trusted_proxies=_CONFIG_.ADMISSION_TRUSTED_PROXIES,
+)
+
+# 一括インポートの流入制御（顔認識パイプラインとは別の処理枠を使い、待機させずに拒否する）
+_IMPORT_ADMISSION_ = AdmissionController(
+    rate_per_ip=0,
+    burst_per_ip=1,
+    max_in_flight=_CONFIG_.IMPORT_MAX_CONCURRENT,
+    max_queue=0,
+    queue_timeout=_CONFIG_.ADMISSION_QUEUE_TIMEOUT,
+    trusted_proxies=_CONFIG_.ADMISSION_TRUSTED_PROXIES,
+)
+
 
 __ALL__ = [
     "_CONFIG_",
+    "_BLOB_STORE_",
+    "_SESSION_STORE_",
+    "_SNAPSHOT_STORE_",
     "_SESSION_MANAGER_",
+    "_ADMISSION_",
+    "_IMPORT_ADMISSION_",
 ]
@@ -0,0 +1,219 @@
+"""
+顔認識パイプラインの流入制御モジュール。
+
+IPアドレスごとのトークンバケットでリクエストの頻度を制限し、
+ワーカー全体で同時に処理する顔認識リクエストの数を制限します。
+上限に達したリクエストは有限の待ち行列で待機し、
+待ち行列が満杯の場合や待ち時間を超えた場合は処理を開始せずに拒否します。
+"""
+
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+class TokenBucketLimiter:
+    """
+    IPアドレスごとのトークンバケット。
+
+    各バケットは毎秒 rate 個のトークンが最大 burst 個まで補充され、
+    リクエストごとに1個消費します。バケットの数は max_keys 個までで、
+    超えた場合は最も長く使われていないバケットを削除します
+    （削除されたIPアドレスは満杯のバケットから再開します）。
+    """
+
+    def __init__(self, rate: float, burst: int, max_keys: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        # {IPアドレス: (トークン数, 最終更新時刻)}
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def acquire(self, key: str, now: Optional[float] = None) -> float:
+        """
+        トークンを1個消費する。
+
+        引数:
+            key: IPアドレス
+            now: 現在時刻（省略時は time.monotonic()）
+
+        戻り値:
+            消費できた場合は 0、できなかった場合は次のトークンまでの秒数
+        """
+        if now is None:
+            now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens >= 1:
+            tokens -= 1
+            wait = 0.0
+        else:
+            wait = (1 - tokens) / self.rate
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class AdmissionRejected(Exception):
+    """流入制御で拒否されたリクエスト"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    顔認識パイプラインの流入制御。
+
+    同時に処理するリクエストを max_in_flight 件までに制限し、
+    それを超えたリクエストは max_queue 件まで先着順に待機します。
+    頻度制限はクライアントの接続元アドレスごとに行い、転送ヘッダーは
+    trusted_proxies に含まれるプロキシからの接続でのみ参照します。
+    """
+
+    def __init__(
+        self,
+        rate_per_ip: float,
+        burst_per_ip: int,
+        max_in_flight: int,
+        max_queue: int,
+        queue_timeout: float,
+        trusted_proxies: Iterable[str] = (),
+    ):
+        self.limiter = TokenBucketLimiter(rate_per_ip, burst_per_ip) if rate_per_ip > 0 else None
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.trusted_proxies = frozenset(trusted_proxies)
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0
+        self.waiting = 0
+        # 累計の統計
+        self.admitted = 0
+        self.rate_limited = 0
+        self.shed = 0  # 待ち行列が満杯のため拒否
+        self.timed_out = 0  # 待ち時間を超えたため拒否
+
+    def client_address(self, scope: Scope) -> str:
+        """
+        頻度制限に使うクライアントのアドレス（HTTP / WebSocket の scope から取得）。
+
+        信頼するプロキシからの接続では、プロキシが追加した X-Forwarded-For の
+        最後のアドレス（無い場合は X-Real-IP）を使います。
+        """
+        client = scope.get("client")
+        host = client[0] if client else "unknown"
+        if host in self.trusted_proxies:
+            headers = Headers(scope=scope)
+            forwarded_for = headers.get("x-forwarded-for")
+            if forwarded_for:
+                return forwarded_for.split(",")[-1].strip()
+            real_ip = headers.get("x-real-ip")
+            if real_ip:
+                return real_ip.strip()
+        return host
+
+    async def acquire(self, ip_address: str):
+        """
+        処理枠を1つ確保する（確保できるまで待ち行列で待機）。
+
+        例外:
+            AdmissionRejected: IPアドレスの頻度制限（429）、
+                または待ち行列が満杯か待ち時間を超えた場合（503）
+        """
+        if self.limiter is not None:
+            wait = self.limiter.acquire(ip_address)
+            if wait > 0:
+                self.rate_limited += 1
+                raise AdmissionRejected(429, "Too many requests from this client", wait)
+
+        if self.in_flight < self.max_in_flight and not self.waiting:
+            # 空きがあり、待機しているリクエストも無い
+            await self._slots.acquire()
+        else:
+            if self.waiting >= self.max_queue:
+                self.shed += 1
+                raise AdmissionRejected(503, "Server is busy", self.queue_timeout)
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.timed_out += 1
+                raise AdmissionRejected(503, "Server is busy", self.queue_timeout) from None
+            finally:
+                self.waiting -= 1
+        self.in_flight += 1
+        self.admitted += 1
+
+    def release(self):
+        """確保した処理枠を解放する"""
+        self.in_flight -= 1
+        self._slots.release()
+
+    def metrics(self) -> Dict[str, float]:
+        """現在の使用状況と累計の統計"""
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "waiting": self.waiting,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rate_limited": self.rate_limited,
+            "shed": self.shed,
+            "timed_out": self.timed_out,
+            "tracked_clients": len(self.limiter) if self.limiter is not None else 0,
+        }
+
+
+class AdmissionMiddleware:
+    """
+    顔認識パイプラインのリクエストに流入制御を適用するASGIミドルウェア。
+
+    paths のいずれかで始まるパスへの POST / PUT リクエストのみが対象で、
+    拒否したリクエストには Retry-After ヘッダー付きの 429 / 503 を返します。
+    レスポンスの送信が終わるまで（ストリーミングを含む）処理枠を保持します。
+    """
+
+    METHODS = ("POST", "PUT")
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController, paths: Iterable[str]):
+        self.app = app
+        self.controller = controller
+        self.paths = tuple(paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in self.METHODS
+            or not scope["path"].startswith(self.paths)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self.controller.acquire(self.controller.client_address(scope))
+        except AdmissionRejected as e:
+            response = JSONResponse(
+                {"detail": e.detail},
+                status_code=e.status_code,
+                headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release()
@@ -52,11 +52,129 @@ class Config(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = Field(
         5, description="アクセストークンの有効期限（分）"
     )
+    TOKEN_CACHE_SIZE: int = Field(
+        int(os.getenv("TOKEN_CACHE_SIZE", "10000")),
+        description="検証済みトークン（セッション・アクセス）をキャッシュする最大件数（0 で無効）",
+    )
 
     # パスワードハッシュ設定
     PASSWORD_HASH_ALGORITHM: str = Field(
         os.getenv("PASSWORD_HASH_ALGORITHM", "sha256_crypt"),
-        description="パスワードハッシュのアルゴリズム",
+        description="パスワードハッシュのアルゴリズム（passlib のスキーム名、古いハッシュはログイン時に再ハッシュ）",
+    )
+    PASSWORD_HASH_ROUNDS: int = Field(
+        int(os.getenv("PASSWORD_HASH_ROUNDS", "0")),
+        description="パスワードハッシュのラウンド数（0 でスキームのデフォルト、少ないハッシュはログイン時に再ハッシュ）",
+    )
+    PASSWORD_HASH_WORKERS: int = Field(
+        int(os.getenv("PASSWORD_HASH_WORKERS", "0")),
+        description="パスワードのハッシュ化・検証を同時に実行するプロセス数の上限（0 でCPU数と 4 の小さい方）",
+    )
+    PASSWORD_HASH_MAX_QUEUE: int = Field(
+        int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "32")),
+        description="プロセスの空きを待機できるパスワードのハッシュ化・検証の最大数（超過時は 503 を返す）",
+    )
+
+    # アップロード設定
+    MAX_UPLOAD_SIZE: int = Field(
+        int(os.getenv("MAX_UPLOAD_SIZE", str(10 * 1024 * 1024))),
+        description="アップロード画像の最大サイズ（バイト）",
+    )
+    UPLOAD_CHUNK_SIZE: int = Field(
+        int(os.getenv("UPLOAD_CHUNK_SIZE", "65536")),
+        description="アップロード読み込み時のチャンクサイズ（バイト）",
+    )
+    UPLOAD_BUFFER_POOL_SIZE: int = Field(
+        int(os.getenv("UPLOAD_BUFFER_POOL_SIZE", "8")),
+        description="再利用するアップロードバッファの最大数",
+    )
+
+    # フレーム重複判定設定
+    FRAME_DEDUP_ENABLED: bool = Field(
+        os.getenv("FRAME_DEDUP_ENABLED", "true").lower() == "true",
+        description="ストリーミング（/face/ws）のほぼ同一のフレームで前回の検出・推論結果を再利用するかどうか",
+    )
+    FRAME_DEDUP_MAX_DISTANCE: int = Field(
+        int(os.getenv("FRAME_DEDUP_MAX_DISTANCE", "4")),
+        description="同一フレームとみなすハッシュのハミング距離の上限",
+    )
+    FRAME_DEDUP_TTL: float = Field(
+        float(os.getenv("FRAME_DEDUP_TTL", "2.0")),
+        description="前回の結果を再利用できる時間（秒）",
+    )
+
+    # バッチ認識設定
+    FACE_BATCH_MAX_SIZE: int = Field(
+        int(os.getenv("FACE_BATCH_MAX_SIZE", "256")),
+        description="バッチ認識で1回に受け付ける画像の最大数",
+    )
+    FACE_BATCH_MAX_BYTES: int = Field(
+        int(os.getenv("FACE_BATCH_MAX_BYTES", str(64 * 1024 * 1024))),
+        description="バッチ認識のリクエストボディの最大サイズ（バイト、各画像は MAX_UPLOAD_SIZE まで）",
+    )
+
+    # 一括インポート設定
+    IMPORT_BATCH_SIZE: int = Field(
+        int(os.getenv("IMPORT_BATCH_SIZE", "256")),
+        description="一括インポートで1回に処理する行数（推論と登録の単位）",
+    )
+    IMPORT_MAX_CONCURRENT: int = Field(
+        int(os.getenv("IMPORT_MAX_CONCURRENT", "1")),
+        description="ワーカーごとに同時に実行する一括インポートの最大数（超過時は 503 を返す）",
+    )
+    IMPORT_HASH_WORKERS: int = Field(
+        int(os.getenv("IMPORT_HASH_WORKERS", "0")),
+        description="一括インポートが共有のプロセスプールで同時にハッシュ化するパスワード数"
+        "（0 でパスワードハッシュのプロセス数）",
+    )
+    GALLERY_CHUNK_SIZE: int = Field(
+        int(os.getenv("GALLERY_CHUNK_SIZE", "1000")),
+        description="ギャラリーのエクスポートで1チャンクに含めるユーザー数",
+    )
+
+    # 流入制御設定
+    ADMISSION_CONTROL_ENABLED: bool = Field(
+        os.getenv("ADMISSION_CONTROL_ENABLED", "true").lower() == "true",
+        description="顔認識パイプラインへのリクエストに流入制御を適用するかどうか",
+    )
+    ADMISSION_RATE_PER_IP: float = Field(
+        float(os.getenv("ADMISSION_RATE_PER_IP", "5.0")),
+        description="IPアドレスごとに許可する顔認識リクエストの平均レート（毎秒、0 で無制限）",
+    )
+    ADMISSION_BURST_PER_IP: int = Field(
+        int(os.getenv("ADMISSION_BURST_PER_IP", "10")),
+        description="IPアドレスごとに連続して許可する顔認識リクエストの最大数",
+    )
+    ADMISSION_MAX_IN_FLIGHT: int = Field(
+        int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "0")),
+        description="ワーカーごとに同時に処理する顔認識リクエストの最大数（0 でCPU数）",
+    )
+    ADMISSION_MAX_QUEUE: int = Field(
+        int(os.getenv("ADMISSION_MAX_QUEUE", "32")),
+        description="処理を待機できる顔認識リクエストの最大数（超過時は 503 を返す）",
+    )
+    ADMISSION_QUEUE_TIMEOUT: float = Field(
+        float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "5.0")),
+        description="顔認識リクエストが処理を待機できる時間（秒、超過時は 503 を返す）",
+    )
+    ADMISSION_TRUSTED_PROXIES: list[str] = Field(
+        os.getenv("ADMISSION_TRUSTED_PROXIES", []),
+        description="X-Forwarded-For / X-Real-IP を信頼するリバースプロキシのIPアドレスリスト"
+        "（それ以外の接続では接続元アドレスで頻度を制限）",
+    )
+
+    # 顔画像ストア設定
+    HEAD_PIC_STORE_DIR: str = Field(
+        os.getenv("HEAD_PIC_STORE_DIR", "data/head_pics"),
+        description="顔画像（原本とサムネイル）を保存するディレクトリ",
+    )
+    HEAD_PIC_THUMBNAIL_SIZE: int = Field(
+        int(os.getenv("HEAD_PIC_THUMBNAIL_SIZE", "128")),
+        description="サムネイルの長辺の最大ピクセル数",
+    )
+    HEAD_PIC_CACHE_MAX_AGE: int = Field(
+        int(os.getenv("HEAD_PIC_CACHE_MAX_AGE", str(365 * 24 * 3600))),
+        description="顔画像レスポンスのキャッシュ有効期間（秒）",
     )
 
     # 顔認識設定
@@ -103,7 +221,28 @@ class Config(BaseSettings):
 
     # 演示模式设置
     USE_MEMORY_DB: bool = Field(
-        True, description="使用内存数据库进行演示（不连接实际数据库）"
+        os.getenv("USE_MEMORY_DB", "true").lower() == "true",
+        description="使用内存数据库进行演示（不连接实际数据库）",
+    )
+    DATABASE_URL: str = Field(
+        os.getenv("DATABASE_URL", "sqlite://data/faceapi.sqlite3"),
+        description="USE_MEMORY_DB が無効な場合に使用するデータベースのURL",
+    )
+    SNAPSHOT_DIR: str = Field(
+        os.getenv("SNAPSHOT_DIR", "data/snapshots"),
+        description="インメモリデータベースのスナップショットを保存するディレクトリ（空文字列で無効）",
+    )
+    SNAPSHOT_INTERVAL_SECONDS: int = Field(
+        int(os.getenv("SNAPSHOT_INTERVAL_SECONDS", "60")),
+        description="スナップショットを定期的に保存する間隔（秒、0 でシャットダウン時のみ）",
+    )
+    ENABLE_WAL: bool = Field(
+        os.getenv("ENABLE_WAL", "true").lower() == "true",
+        description="スナップショット間の変更を先行書き込みログに記録するかどうか",
+    )
+    WAL_COMMIT_DELAY_MS: int = Field(
+        int(os.getenv("WAL_COMMIT_DELAY_MS", "0")),
+        description="グループコミットでより多くの変更をまとめるための待ち時間（ミリ秒）",
     )
     STATIC_ROOT: str = Field(
         os.getenv("STATIC_ROOT", "frontend/dist"), description="静的ファイルルート"
@@ -121,6 +260,22 @@ class Config(BaseSettings):
     ENABLE_SESSION_MANAGEMENT: bool = Field(
         True, description="启用会话管理功能"
     )
+    SESSION_SWEEP_INTERVAL_SECONDS: float = Field(
+        float(os.getenv("SESSION_SWEEP_INTERVAL_SECONDS", "30")),
+        description="期限切れセッションを回収するバックグラウンドタスクの実行間隔（秒、0 で無効）",
+    )
+    SESSION_MEMORY_BUDGET: int = Field(
+        int(os.getenv("SESSION_MEMORY_BUDGET", str(512 * 1024 * 1024))),
+        description="ワーカーごとにインメモリセッションが使用できるメモリの上限（バイト、超過時は最も長く使われていないセッションを破棄）",
+    )
+    SESSION_STORE_PATH: str = Field(
+        os.getenv("SESSION_STORE_PATH", ""),
+        description="複数のワーカープロセスで共有するセッションストア（SQLite）のパス（空文字列でプロセス内のみ）",
+    )
+    SESSION_STORE_COMPACT_RECORDS: int = Field(
+        int(os.getenv("SESSION_STORE_COMPACT_RECORDS", "1000")),
+        description="共有セッションストアの変更ログがこの件数を超えたらスナップショットに圧縮する",
+    )
 
     # class Config:
     #     """環境ファイル設定を定義するPydantic設定クラス。"""
@@ -4,24 +4,40 @@
 此模块提供基于 IP 地址的会话管理功能，
 每个 IP 地址只能有一个活跃的 sessionId，
 并为每个会话维护独立的 SQL 数据库实例。
+
+配置了共享会话存储（SESSION_STORE_PATH）时，会话和内存会话数据库保存在各工作进程共用的
+SQLite 文件中，进程内只保留所访问会话的副本作为读缓存。
+
+内存中的会话按估算的内存占用（用户记录、嵌入向量和索引）计入全局预算
+（SESSION_MEMORY_BUDGET），超出预算时按最近最少使用的顺序驱逐会话。
+配置了快照目录时，被驱逐的会话转存到其快照和预写日志中，下次访问时再恢复到内存；
+快照只在会话过期或被删除时删除。
+
+过期的会话由后台清理任务（run_sweeper_loop）定期删除，
+空闲期间也能及时释放其 SQL 实例、嵌入向量、快照和头像。
 """
 
+import asyncio
 import time
-from typing import Dict, Optional, Union
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 from dataclasses import dataclass
 from datetime import datetime
 from loguru import logger
 
-# 使用 TTLCache 替代手动会话管理
+# 使用 TLRUCache 替代手动会话管理
 try:
-    from cachetools import TTLCache
+    from cachetools import Cache, TLRUCache
     CACHE_AVAILABLE = True
 except ImportError:
     CACHE_AVAILABLE = False
     logger.warning("cachetools not available, using fallback session management")
 
-from ..core import _CONFIG_
-from ..db.memory_managers import MemorySqlManager
+from ..core import _BLOB_STORE_, _CONFIG_, _SESSION_STORE_, _SNAPSHOT_STORE_
+from ..db import MemorySqlManager, SqlManager, create_sql_manager
+from ..db.session_store import SessionJournal, SessionRow, pack_snapshot
+
+# 每个会话的固定内存开销（会话信息、空的管理器和索引等，由 clone() 实测）
+SESSION_BASE_BYTES = 8 * 1024
 
 
 @dataclass
@@ -31,7 +47,10 @@ class SessionInfo:
     ip_address: str
     created_at: float
     expires_at: float
-    sql_instance: MemorySqlManager  # 改用强引用
+    sql_instance: SqlManager  # 改用强引用
+    frame_filter: Optional[Any] = None  # 帧相似度过滤器（首次使用时创建）
+    memory_bytes: int = 0  # 估算的内存占用（字节）
+    measured_revision: int = -1  # 估算内存占用时的数据库修订号
 
     @property
     def is_expired(self) -> bool:
@@ -55,6 +74,120 @@ class SessionInfo:
         }
 
 
+def _measure_session(session_info: SessionInfo) -> int:
+    """估算会话的内存占用并记录在会话信息中（持久化模式下的共享管理器不计入）"""
+    sql_instance = session_info.sql_instance
+    size = SESSION_BASE_BYTES
+    if isinstance(sql_instance, MemorySqlManager):
+        size += sum(sql_instance.memory_usage().values())
+        session_info.measured_revision = sql_instance.revision
+    session_info.memory_bytes = size
+    return size
+
+
+if CACHE_AVAILABLE:
+    class SessionCache(TLRUCache):
+        """
+        按内存占用计算容量的会话缓存。
+
+        会话在 expires_at 到达时过期；总内存占用超出预算时驱逐最近最少使用的会话。
+        过期和驱逐的会话都会通知 on_remove(IP 地址, 会话信息, 是否为驱逐)。
+        """
+
+        def __init__(self, budget: int, on_remove: Callable[[str, SessionInfo, bool], None]):
+            super().__init__(
+                maxsize=budget,
+                ttu=lambda _ip, session_info, _now: session_info.expires_at,
+                timer=time.time,
+                getsizeof=_measure_session,
+            )
+            self._on_remove = on_remove
+            self.evictions = 0  # 因超出内存预算而驱逐的会话数
+            self.expirations = 0  # 过期的会话数
+
+        def popitem(self):
+            """驱逐最近最少使用的会话"""
+            ip_address, session_info = super().popitem()
+            self.evictions += 1
+            self._on_remove(ip_address, session_info, True)
+            return ip_address, session_info
+
+        def expire(self, time=None):
+            """删除过期的会话"""
+            expired = super().expire(time)
+            self.expirations += len(expired)
+            for ip_address, session_info in expired:
+                self._on_remove(ip_address, session_info, False)
+            return expired
+
+        def peek_items(self):
+            """列出未过期的会话（不改变使用顺序）"""
+            return [(ip_address, Cache.__getitem__(self, ip_address)) for ip_address in self]
+
+
+def _load_snapshots():
+    """
+    读取所有快照并恢复为 SQL 管理器，再重放之后的预写日志（在线程中执行）。
+
+    Returns:
+        [(IP 地址, SQL 管理器, 重放的日志记录数), ...]
+    """
+    restored = []
+    for ip_address, data in _SNAPSHOT_STORE_.load_all():
+        sql_instance = MemorySqlManager.from_snapshot(data, blob_store=_BLOB_STORE_)
+        replayed = sql_instance.replay(_SNAPSHOT_STORE_.read_wal(ip_address, data.wal_segment))
+        restored.append((ip_address, sql_instance, replayed))
+    return restored
+
+
+def _load_spilled(ip_address: str) -> Optional[Tuple[MemorySqlManager, int]]:
+    """
+    从快照和之后的预写日志恢复被驱逐的会话（在线程中执行）。
+
+    Returns:
+        (SQL 管理器, 重放的日志记录数)，没有快照时为 None
+    """
+    data = _SNAPSHOT_STORE_.load_key(ip_address)
+    if data is None:
+        return None
+    sql_instance = MemorySqlManager.from_snapshot(data, blob_store=_BLOB_STORE_)
+    replayed = sql_instance.replay(_SNAPSHOT_STORE_.read_wal(ip_address, data.wal_segment))
+    return sql_instance, replayed
+
+
+def _build_replica(session: SessionRow, snapshot, log) -> MemorySqlManager:
+    """
+    由共享存储中的快照和之后的日志构建本进程的会话副本（在线程中执行）。
+
+    Args:
+        session: 共享存储中的会话
+        snapshot: 会话数据库的快照
+        log: 快照之后的日志 [(序号, 操作内容, 嵌入向量字节), ...]
+    """
+    sql_instance = MemorySqlManager.from_snapshot(snapshot, blob_store=_BLOB_STORE_)
+    sql_instance.replay((record, embedding) for _, record, embedding in log)
+    seq = log[-1][0] if log else session.snapshot_seq
+    sql_instance.attach_journal(SessionJournal(_SESSION_STORE_, session, seq))
+    return sql_instance
+
+
+def _journal_of(sql_instance: SqlManager) -> Optional[SessionJournal]:
+    """会话副本在共享存储中的日志（持久化模式下为 None）"""
+    return sql_instance.journal if isinstance(sql_instance, MemorySqlManager) else None
+
+
+def _use_wal() -> bool:
+    """是否为内存会话记录预写日志"""
+    return _SNAPSHOT_STORE_ is not None and _CONFIG_.ENABLE_WAL
+
+
+def _open_wal(ip_address: str):
+    """打开会话的预写日志"""
+    return _SNAPSHOT_STORE_.open_wal(
+        ip_address, commit_delay=_CONFIG_.WAL_COMMIT_DELAY_MS / 1000
+    )
+
+
 class SessionManager:
     """
     会话管理器类。
@@ -65,18 +198,39 @@ class SessionManager:
 
     def __init__(self):
         """初始化会话管理器"""
+        # 各会话最后写入快照时的数据库修订号 {ip_address: revision}
+        self._snapshot_revisions: Dict[str, int] = {}
+        # 共享会话存储：各会话的副本最后确认时的存储版本号 {ip_address: data_version}
+        self._verified_versions: Dict[str, int] = {}
+        # 因超出内存预算而转存到快照的会话 {ip_address: (created_at, expires_at)}
+        self._spilled: Dict[str, Tuple[float, float]] = {}
+        # 正在写入快照的被驱逐会话 {ip_address: 写入任务}
+        self._spilling: Dict[str, asyncio.Task] = {}
+        self._restore_lock = asyncio.Lock()
+        self._restored = 0  # 从快照恢复的被驱逐会话数（累计）
+        # 后台清理任务的统计
+        self._sweep_stats = {
+            "runs": 0,
+            "expired_sessions": 0,  # 删除的过期会话数（累计）
+            "released_bytes": 0,  # 释放的会话估算内存占用（累计）
+            "released_blobs": 0,  # 不再被引用的头像数（累计）
+            "last_run_at": None,
+            "last_duration_ms": 0.0,
+            "max_duration_ms": 0.0,
+        }
         if CACHE_AVAILABLE:
-            # 使用 TTLCache 自动管理过期
-            cache_ttl = _CONFIG_.SESSION_ID_EXPIRE_SECONDS
-            # 设置合理的缓存大小限制
-            cache_maxsize = 1000  
-            self._sessions = TTLCache(maxsize=cache_maxsize, ttl=cache_ttl)
-            self._sql_instances = TTLCache(maxsize=cache_maxsize, ttl=cache_ttl)
-            logger.info(f"TTLCacheを使用してセッションを管理、TTL: {cache_ttl}秒、最大容量: {cache_maxsize}")
+            # 使用 TLRUCache 自动管理过期，容量按会话的内存占用计算
+            memory_budget = _CONFIG_.SESSION_MEMORY_BUDGET
+            self._sessions = SessionCache(memory_budget, self._on_session_removed)
+            self._sql_instances: Dict[str, SqlManager] = {}
+            logger.info(
+                f"TLRUCacheを使用してセッションを管理、TTL: {_CONFIG_.SESSION_ID_EXPIRE_SECONDS}秒、"
+                f"メモリ予算: {memory_budget / 1024 / 1024:.0f} MiB"
+            )
         else:
             # 回退到手动管理
             self._sessions: Dict[str, SessionInfo] = {}
-            self._sql_instances: Dict[str, MemorySqlManager] = {}
+            self._sql_instances: Dict[str, SqlManager] = {}
             self._cleanup_interval = 60
             self._last_cleanup = time.time()
             logger.info("手動セッション管理を使用")
@@ -93,9 +247,15 @@ class SessionManager:
         Returns:
             SessionInfo 或 None
         """
+        if _SESSION_STORE_ is not None:
+            return await self._create_shared_session(ip_address)
+
         if CACHE_AVAILABLE:
-            # TTLCache 会自动处理过期，只需检查是否存在
-            if ip_address in self._sessions:
+            # 先删除过期的会话（包括该 IP 之前的会话及其快照）
+            self._sessions.expire()
+            self._expire_spilled_sessions()
+            # TLRUCache 会自动处理过期，只需检查是否存在（包括转存到快照的会话）
+            if ip_address in self._sessions or ip_address in self._spilled:
                 logger.info(f"IP {ip_address} には既にアクティブなセッションがあります")
                 return None
         else:
@@ -106,12 +266,16 @@ class SessionManager:
                 return None
             await self._cleanup_expired_sessions()
 
-        # 创建新的 SQL 实例
-        sql_instance = MemorySqlManager()
-        await sql_instance.initialize()
+        # 获取 SQL 实例（内存模式下每个会话独立，持久化模式下共享）
+        sql_instance = await create_sql_manager(blob_store=_BLOB_STORE_)
+        if _use_wal() and isinstance(sql_instance, MemorySqlManager):
+            # 先写入初始快照，之后的修改记录在预写日志中
+            _SNAPSHOT_STORE_.remove(ip_address)
+            sql_instance.attach_wal(_open_wal(ip_address))
+            await self._save_snapshot(ip_address, sql_instance)
 
         if CACHE_AVAILABLE:
-            # TTLCache 方式：创建会话信息对象
+            # TLRUCache 方式：创建会话信息对象
             now = time.time()
             expires_at = now + _CONFIG_.SESSION_ID_EXPIRE_SECONDS
             session_info = SessionInfo(
@@ -120,9 +284,10 @@ class SessionManager:
                 expires_at=expires_at,
                 sql_instance=sql_instance,
             )
-            self._sessions[ip_address] = session_info
             self._sql_instances[ip_address] = sql_instance
-            logger.info(f"IP {ip_address} の新規セッションを作成 (TTLCacheモード)")
+            if not self._store_session(ip_address, session_info):
+                return None
+            logger.info(f"IP {ip_address} の新規セッションを作成 (TLRUCacheモード)")
         else:
             # 手动管理方式
             now = time.time()
@@ -133,8 +298,8 @@ class SessionManager:
                 expires_at=expires_at,
                 sql_instance=sql_instance,
             )
-            self._sessions[ip_address] = session_info
             self._sql_instances[ip_address] = sql_instance
+            self._store_session(ip_address, session_info)
             logger.info(f"IP {ip_address} の新規セッションを作成 (手動管理モード)")
 
         return self._sessions[ip_address] if CACHE_AVAILABLE else session_info
@@ -149,9 +314,12 @@ class SessionManager:
         Returns:
             SessionInfo 或 None
         """
+        if _SESSION_STORE_ is not None:
+            return await self._get_shared_session(ip_address)
+
         if CACHE_AVAILABLE:
-            # TTLCache 模式下存储的是SessionInfo对象
-            return self._sessions.get(ip_address)
+            # TLRUCache 模式下存储的是SessionInfo对象
+            return await self._get_cached_session(ip_address)
         else:
             # 手动管理方式
             session_info = self._sessions.get(ip_address)
@@ -164,7 +332,7 @@ class SessionManager:
             
             return session_info
 
-    async def get_sql_instance(self, ip_address: str) -> Optional[MemorySqlManager]:
+    async def get_sql_instance(self, ip_address: str) -> Optional[SqlManager]:
         """
         根据 IP 地址获取对应的 SQL 实例。
 
@@ -172,11 +340,15 @@ class SessionManager:
             ip_address: 客户端 IP 地址
 
         Returns:
-            MemorySqlManager 实例或 None
+            SQL 管理器实例或 None
         """
+        if _SESSION_STORE_ is not None:
+            session_info = await self._get_shared_session(ip_address)
+            return session_info.sql_instance if session_info else None
+
         if CACHE_AVAILABLE:
-            # TTLCache 模式下，从SessionInfo中获取SQL实例
-            session_info = self._sessions.get(ip_address)
+            # TLRUCache 模式下，从SessionInfo中获取SQL实例
+            session_info = await self._get_cached_session(ip_address)
             if not session_info:
                 return None
             return session_info.sql_instance
@@ -197,13 +369,27 @@ class SessionManager:
         Returns:
             bool: 是否删除成功
         """
+        if _SESSION_STORE_ is not None:
+            self._drop_local_session(ip_address)
+            deleted = await _SESSION_STORE_.run(_SESSION_STORE_.delete, ip_address)
+            if deleted:
+                logger.info(f"セッションを削除: IP {ip_address} (共有ストア)")
+            return deleted
+
         if CACHE_AVAILABLE:
-            # TTLCache 方式：直接删除
+            # TLRUCache 方式：直接删除
             session_existed = ip_address in self._sessions
-            self._sessions.pop(ip_address, None)
+            session_info = self._sessions.pop(ip_address, None)
             self._sql_instances.pop(ip_address, None)
             if session_existed:
-                logger.info(f"セッションを削除: IP {ip_address} (TTLCacheモード)")
+                self._remove_snapshot(ip_address, session_info.sql_instance)
+            elif self._spilled.pop(ip_address, None) is not None:
+                # 转存到快照的会话：等待写入结束后删除快照
+                await self._wait_for_spills(ip_address)
+                self._remove_snapshot(ip_address)
+                session_existed = True
+            if session_existed:
+                logger.info(f"セッションを削除: IP {ip_address} (TLRUCacheモード)")
             return session_existed
         else:
             # 手动管理方式
@@ -213,17 +399,24 @@ class SessionManager:
             
             del self._sql_instances[ip_address]
             del self._sessions[ip_address]
+            self._remove_snapshot(ip_address, session_info.sql_instance)
             logger.info(f"セッションを削除: IP {ip_address} (手動管理モード)")
             return True
 
     async def cleanup_all_sessions(self):
         """清理所有会话"""
         if CACHE_AVAILABLE:
-            # TTLCache 方式：清空缓存
-            count = len(self._sessions)
+            # TLRUCache 方式：清空缓存
+            count = len(self._sessions) + len(self._spilled)
             self._sessions.clear()
+            self._spilled.clear()
+            await self._wait_for_spills()
             self._sql_instances.clear()
-            logger.info(f"すべてのセッションをクリーンアップ ({count} 件) (TTLCacheモード)")
+            self._snapshot_revisions.clear()
+            self._verified_versions.clear()
+            if _SNAPSHOT_STORE_ is not None:
+                _SNAPSHOT_STORE_.prune()
+            logger.info(f"すべてのセッションをクリーンアップ ({count} 件) (TLRUCacheモード)")
         else:
             # 手动管理方式
             ip_addresses = list(self._sessions.keys())
@@ -231,33 +424,563 @@ class SessionManager:
                 await self.delete_session(ip_address)
             logger.info("すべてのセッションをクリーンアップ (手動管理モード)")
 
+    def _store_session(self, ip_address: str, session_info: SessionInfo) -> bool:
+        """
+        将会话加入缓存，超出内存预算时驱逐最近最少使用的其他会话。
+
+        Returns:
+            bool: 会话单独就超出整个预算而无法加入时为 False
+        """
+        if not CACHE_AVAILABLE:
+            # 手动管理模式只估算内存占用，不驱逐会话
+            _measure_session(session_info)
+            self._sessions[ip_address] = session_info
+            return True
+        try:
+            self._sessions[ip_address] = session_info
+        except ValueError:
+            # 会话单独超出预算：连同缓存中的旧条目一起删除
+            self._sessions.pop(ip_address, None)
+            self._sessions.evictions += 1
+            # 无法再次加入缓存，因此不转存到快照
+            self._on_session_removed(ip_address, session_info, True, spill=False)
+            return False
+        return True
+
+    def _session_items(self):
+        """列出缓存的会话（不改变 TLRUCache 中的使用顺序）"""
+        if CACHE_AVAILABLE:
+            return self._sessions.peek_items()
+        return list(self._sessions.items())
+
+    def _account(self, ip_address: str, session_info: Optional[SessionInfo]) -> Optional[SessionInfo]:
+        """
+        会话数据库在上次估算后有修改时，重新估算其内存占用（TLRUCache 模式）。
+
+        访问会话时调用，因此请求中的修改在下一次访问会话时计入。
+
+        Returns:
+            会话信息（因超出预算被驱逐时为 None）
+        """
+        if session_info is None or not CACHE_AVAILABLE:
+            return session_info
+        sql_instance = session_info.sql_instance
+        if not isinstance(sql_instance, MemorySqlManager) \
+                or session_info.measured_revision == sql_instance.revision:
+            return session_info
+        # 重新加入时会话成为最近使用的会话，因此只会驱逐其他会话
+        return session_info if self._store_session(ip_address, session_info) else None
+
+    def _on_session_removed(
+        self, ip_address: str, session_info: SessionInfo, evicted: bool, spill: bool = True
+    ):
+        """
+        会话过期或被驱逐时释放其 SQL 实例（共享存储中的会话不受影响）。
+
+        过期的会话同时删除快照；被驱逐的会话在可能时转存到快照，否则同样删除快照。
+        """
+        spilled = False
+        if self._sql_instances.get(ip_address) is session_info.sql_instance:
+            self._sql_instances.pop(ip_address, None)
+            self._verified_versions.pop(ip_address, None)
+            if _SESSION_STORE_ is None:
+                spilled = evicted and spill and self._spill_session(ip_address, session_info)
+                if not spilled:
+                    self._remove_snapshot(ip_address, session_info.sql_instance)
+        if evicted and spilled:
+            logger.info(
+                f"メモリ予算を超えたためセッションをスナップショットに退避: IP {ip_address} "
+                f"({session_info.memory_bytes} バイト)"
+            )
+        elif evicted:
+            logger.warning(
+                f"メモリ予算を超えたためセッションを破棄: IP {ip_address} "
+                f"({session_info.memory_bytes} バイト)"
+            )
+
+    def _spill_session(self, ip_address: str, session_info: SessionInfo) -> bool:
+        """
+        将被驱逐的会话转存到快照（写入在后台任务中进行）。
+
+        Returns:
+            bool: 没有快照存储、会话不是内存会话或已过期时为 False
+        """
+        sql_instance = session_info.sql_instance
+        if _SNAPSHOT_STORE_ is None or not isinstance(sql_instance, MemorySqlManager) \
+                or session_info.is_expired:
+            return False
+        self._spilled[ip_address] = (session_info.created_at, session_info.expires_at)
+        self._spilling[ip_address] = asyncio.ensure_future(
+            self._write_spill(ip_address, sql_instance)
+        )
+        return True
+
+    async def _write_spill(self, ip_address: str, sql_instance: MemorySqlManager):
+        """将被驱逐会话的修改写入磁盘并关闭其预写日志"""
+        try:
+            wal = sql_instance.wal
+            if wal is not None:
+                # 快照之后的修改已记录在预写日志中，只需等待落盘
+                await wal.sync()
+                wal.close()
+                sql_instance.attach_wal(None)
+            elif self._snapshot_revisions.get(ip_address) != sql_instance.revision:
+                await self._save_snapshot(ip_address, sql_instance)
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error(f"セッションのスナップショットへの退避に失敗しました: IP {ip_address}: {e}")
+        finally:
+            self._snapshot_revisions.pop(ip_address, None)
+            self._spilling.pop(ip_address, None)
+
+    async def _wait_for_spills(self, ip_address: Optional[str] = None):
+        """等待被驱逐会话的快照写入结束（默认等待所有会话）"""
+        if ip_address is not None:
+            tasks = [self._spilling[ip_address]] if ip_address in self._spilling else []
+        else:
+            tasks = list(self._spilling.values())
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _get_cached_session(self, ip_address: str) -> Optional[SessionInfo]:
+        """从缓存获取会话，被驱逐到快照的会话在此时恢复（TLRUCache 模式）"""
+        session_info = self._sessions.get(ip_address)
+        if session_info is None and ip_address in self._spilled:
+            session_info = await self._restore_spilled_session(ip_address)
+        return self._account(ip_address, session_info)
+
+    async def _restore_spilled_session(self, ip_address: str) -> Optional[SessionInfo]:
+        """
+        从快照和预写日志恢复被驱逐的会话，保留其原有的有效期。
+
+        Returns:
+            会话信息（会话已过期、已被删除或无法恢复时为 None）
+        """
+        async with self._restore_lock:
+            # 等待锁期间可能已被其他请求恢复或删除
+            session_info = self._sessions.get(ip_address)
+            if session_info is not None:
+                return session_info
+            spilled = self._spilled.get(ip_address)
+            if spilled is None:
+                return None
+            await self._wait_for_spills(ip_address)
+            created_at, expires_at = spilled
+            if expires_at <= time.time():
+                self._expire_spilled_sessions()
+                return None
+            try:
+                loaded = await asyncio.to_thread(_load_spilled, ip_address)
+            except (OSError, ValueError, KeyError) as e:
+                loaded = None
+                logger.error(f"退避したセッションを復元できません: IP {ip_address}: {e}")
+            if self._spilled.pop(ip_address, None) is None or loaded is None:
+                # 恢复期间会话已被删除，或快照无法读取
+                return None
+            sql_instance, replayed = loaded
+            if _use_wal():
+                sql_instance.attach_wal(_open_wal(ip_address))
+            session_info = SessionInfo(
+                ip_address=ip_address,
+                created_at=created_at,
+                expires_at=expires_at,
+                sql_instance=sql_instance,
+            )
+            self._sql_instances[ip_address] = sql_instance
+            if not self._store_session(ip_address, session_info):
+                return None
+            if replayed:
+                # 将重放的预写日志压缩到新的快照中
+                await self._save_snapshot(ip_address, sql_instance)
+            else:
+                self._snapshot_revisions[ip_address] = sql_instance.revision
+            self._restored += 1
+            logger.info(f"スナップショットからセッションを復元: IP {ip_address} (ログ {replayed} 件を再生)")
+            return session_info
+
+    def _expire_spilled_sessions(self) -> int:
+        """
+        删除已过期的被驱逐会话的快照和预写日志（仍在写入快照的会话留到下次）。
+
+        Returns:
+            删除的会话数
+        """
+        now = time.time()
+        expired = [
+            ip_address
+            for ip_address, (_, expires_at) in self._spilled.items()
+            if expires_at <= now and ip_address not in self._spilling
+        ]
+        for ip_address in expired:
+            del self._spilled[ip_address]
+            self._remove_snapshot(ip_address)
+        return len(expired)
+
+    async def enforce_memory_budget(self) -> int:
+        """
+        重新估算所有会话的内存占用，删除过期的会话并驱逐超出预算的会话。
+
+        Returns:
+            驱逐的会话数
+        """
+        if not CACHE_AVAILABLE:
+            return 0
+        evictions = self._sessions.evictions
+        self._sessions.expire()
+        for ip_address, session_info in self._session_items():
+            if ip_address in self._sessions:  # 可能已被之前的会话驱逐
+                self._account(ip_address, session_info)
+        return self._sessions.evictions - evictions
+
+    async def _create_shared_session(self, ip_address: str) -> Optional[SessionInfo]:
+        """在共享会话存储中创建会话（该 IP 已有未过期的会话时返回 None）"""
+        sql_instance = await create_sql_manager(blob_store=_BLOB_STORE_)
+        now = time.time()
+        expires_at = now + _CONFIG_.SESSION_ID_EXPIRE_SECONDS
+        is_memory = isinstance(sql_instance, MemorySqlManager)
+        snapshot = pack_snapshot(sql_instance.snapshot()) if is_memory else None
+        if not await _SESSION_STORE_.run(_SESSION_STORE_.create, ip_address, now, expires_at, snapshot):
+            logger.info(f"IP {ip_address} には既にアクティブなセッションがあります")
+            return None
+        if is_memory:
+            session = SessionRow(ip_address, now, expires_at, 0)
+            sql_instance.attach_journal(SessionJournal(_SESSION_STORE_, session, 0))
+
+        session_info = SessionInfo(
+            ip_address=ip_address,
+            created_at=now,
+            expires_at=expires_at,
+            sql_instance=sql_instance,
+        )
+        self._sql_instances[ip_address] = sql_instance
+        self._verified_versions[ip_address] = await _SESSION_STORE_.run(_SESSION_STORE_.data_version)
+        self._store_session(ip_address, session_info)
+        logger.info(f"IP {ip_address} の新規セッションを作成 (共有ストアモード)")
+        return session_info
+
+    async def _get_shared_session(self, ip_address: str) -> Optional[SessionInfo]:
+        """
+        从共享会话存储获取会话，本进程中的副本作为读缓存。
+
+        其他进程没有提交任何修改时直接返回缓存的会话；否则确认会话仍然存在，
+        并将其他进程的修改应用到副本（副本无法追上时从存储重新构建）。
+        """
+        version = await _SESSION_STORE_.run(_SESSION_STORE_.data_version)
+        session_info = self._sessions.get(ip_address)
+        if session_info is not None and not session_info.is_expired:
+            journal = _journal_of(session_info.sql_instance)
+            if journal is None or not journal.stale:
+                if self._verified_versions.get(ip_address) == version:
+                    return self._account(ip_address, session_info)
+                session = await _SESSION_STORE_.run(_SESSION_STORE_.get, ip_address)
+                if (session is not None and session.created_at == session_info.created_at
+                        and (journal is None or await journal.refresh(session_info.sql_instance))):
+                    self._verified_versions[ip_address] = version
+                    return self._account(ip_address, session_info)
+
+        # 本进程中没有可用的副本：从存储读取
+        self._drop_local_session(ip_address)
+        loaded = await _SESSION_STORE_.run(_SESSION_STORE_.load, ip_address)
+        if loaded is None:
+            return None
+        session, snapshot, log = loaded
+        if session.expires_at <= time.time():
+            return None
+        if snapshot is None:
+            # 持久化模式：所有会话共享持久化管理器
+            sql_instance = await create_sql_manager(blob_store=_BLOB_STORE_)
+        else:
+            sql_instance = await asyncio.to_thread(_build_replica, session, snapshot, log)
+        session_info = SessionInfo(
+            ip_address=ip_address,
+            created_at=session.created_at,
+            expires_at=session.expires_at,
+            sql_instance=sql_instance,
+        )
+        self._sql_instances[ip_address] = sql_instance
+        self._verified_versions[ip_address] = version
+        return session_info if self._store_session(ip_address, session_info) else None
+
+    def _drop_local_session(self, ip_address: str):
+        """丢弃本进程中的会话副本（共享存储中的会话不受影响）"""
+        self._sessions.pop(ip_address, None)
+        self._sql_instances.pop(ip_address, None)
+        self._verified_versions.pop(ip_address, None)
+
+    async def _compact_shared_sessions(self) -> int:
+        """
+        删除共享存储中过期的会话，并将日志较长的会话副本写入快照（压缩日志）。
+
+        Returns:
+            写入的快照数
+        """
+        await _SESSION_STORE_.run(_SESSION_STORE_.delete_expired, time.time())
+        compacted = 0
+        for ip_address, session_info in self._session_items():
+            sql_instance = session_info.sql_instance
+            journal = _journal_of(sql_instance)
+            if journal is None or session_info.is_expired or not await journal.refresh(sql_instance):
+                continue
+            if journal.seq - journal.session.snapshot_seq < _CONFIG_.SESSION_STORE_COMPACT_RECORDS:
+                continue
+            # 在事件循环上捕获日志序号对应的状态，编码在线程中进行
+            seq = journal.seq
+            snapshot = await asyncio.to_thread(pack_snapshot, sql_instance.snapshot())
+            if await _SESSION_STORE_.run(
+                _SESSION_STORE_.save_snapshot, ip_address, session_info.created_at, seq, snapshot
+            ):
+                compacted += 1
+                journal.session = journal.session._replace(snapshot_seq=seq)
+            else:
+                # 其他进程已写入更新的快照
+                current = await _SESSION_STORE_.run(_SESSION_STORE_.get, ip_address)
+                if current is not None:
+                    journal.session = journal.session._replace(snapshot_seq=current.snapshot_seq)
+        # 不再缓存的会话不需要记录版本号
+        self._verified_versions = {
+            ip_address: version
+            for ip_address, version in self._verified_versions.items()
+            if ip_address in self._sessions
+        }
+        if compacted:
+            logger.info(f"共有ストアのスナップショットを保存: {compacted} 件")
+        return compacted
+
+    def _remove_snapshot(self, ip_address: str, sql_instance: Optional[SqlManager] = None):
+        """删除会话的快照和预写日志"""
+        self._snapshot_revisions.pop(ip_address, None)
+        if isinstance(sql_instance, MemorySqlManager) and sql_instance.wal is not None:
+            sql_instance.wal.close()
+            sql_instance.attach_wal(None)
+        if _SNAPSHOT_STORE_ is not None:
+            _SNAPSHOT_STORE_.remove(ip_address)
+
+    async def _save_snapshot(self, ip_address: str, sql_instance: MemorySqlManager):
+        """写入一个会话的快照，并删除快照已包含的预写日志段（压缩）"""
+        revision = sql_instance.revision
+        # 在事件循环上捕获状态（同时切换日志段），文件写入在线程中进行
+        data = sql_instance.snapshot()
+        await asyncio.to_thread(_SNAPSHOT_STORE_.save, ip_address, data)
+        if sql_instance.wal is not None:
+            await asyncio.to_thread(sql_instance.wal.discard_before, data.wal_segment)
+        self._snapshot_revisions[ip_address] = revision
+
+    async def save_snapshots(self) -> int:
+        """
+        将有修改的内存会话数据库写入快照，并删除已结束会话的快照。
+
+        Returns:
+            写入的快照数
+        """
+        # 不为超出内存预算的会话写入快照
+        await self.enforce_memory_budget()
+        if _SESSION_STORE_ is not None:
+            return await self._compact_shared_sessions()
+        if _SNAPSHOT_STORE_ is None:
+            return 0
+        # 被驱逐的会话保留其快照
+        await self._wait_for_spills()
+        self._expire_spilled_sessions()
+        active = set(self._spilled)
+        pending = []
+        for ip_address, session_info in self._session_items():
+            sql_instance = session_info.sql_instance
+            if session_info.is_expired or not isinstance(sql_instance, MemorySqlManager):
+                continue
+            active.add(ip_address)
+            if self._snapshot_revisions.get(ip_address) != sql_instance.revision:
+                pending.append((ip_address, sql_instance))
+
+        for ip_address, sql_instance in pending:
+            await self._save_snapshot(ip_address, sql_instance)
+        # 过期的会话不再保留快照
+        self._snapshot_revisions = {
+            ip_address: revision
+            for ip_address, revision in self._snapshot_revisions.items()
+            if ip_address in active
+        }
+        await asyncio.to_thread(_SNAPSHOT_STORE_.prune, active)
+        if pending:
+            logger.info(f"スナップショットを保存: {len(pending)} 件")
+        return len(pending)
+
+    async def restore_snapshots(self) -> int:
+        """
+        从快照和预写日志恢复内存会话（启动时调用，需在清理未引用的头像之前执行）。
+
+        恢复的会话重新开始计算有效期。重放了预写日志的会话随即写入新的快照（压缩）。
+
+        Returns:
+            恢复的会话数
+        """
+        if _SNAPSHOT_STORE_ is None:
+            return 0
+        restored = await asyncio.to_thread(_load_snapshots)
+        now = time.time()
+        replayed_total = 0
+        for ip_address, sql_instance, replayed in restored:
+            session_info = SessionInfo(
+                ip_address=ip_address,
+                created_at=now,
+                expires_at=now + _CONFIG_.SESSION_ID_EXPIRE_SECONDS,
+                sql_instance=sql_instance,
+            )
+            self._sql_instances[ip_address] = sql_instance
+            if not self._store_session(ip_address, session_info):
+                continue
+            if _use_wal():
+                sql_instance.attach_wal(_open_wal(ip_address))
+            if replayed:
+                replayed_total += replayed
+            else:
+                self._snapshot_revisions[ip_address] = sql_instance.revision
+        if restored:
+            logger.info(
+                f"スナップショットからセッションを復元: {len(restored)} 件 "
+                f"(先行書き込みログ {replayed_total} 件を再生)"
+            )
+        if replayed_total:
+            await self.save_snapshots()
+        return len(restored)
+
+    async def run_snapshot_loop(self, interval: int):
+        """
+        定期写入快照（作为后台任务运行，直到被取消）。
+
+        Args:
+            interval: 写入间隔（秒）
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.save_snapshots()
+            except Exception as e:  # pylint: disable=broad-except
+                logger.error(f"スナップショットの保存に失敗しました: {e}")
+
+    def _expire_local_sessions(self) -> List[Tuple[str, SessionInfo]]:
+        """
+        立即删除本进程中过期的会话，并释放其 SQL 实例、快照和预写日志。
+
+        使用共享会话存储时只丢弃本进程中的副本。
+
+        Returns:
+            删除的会话列表 [(IP 地址, 会话信息)]
+        """
+        if CACHE_AVAILABLE:
+            # TLRUCache 在写入时才删除过期的会话，这里立即删除（通过回调释放资源）
+            return self._sessions.expire()
+
+        expired = [
+            (ip_address, session_info)
+            for ip_address, session_info in self._sessions.items()
+            if session_info.is_expired
+        ]
+        for ip_address, session_info in expired:
+            if _SESSION_STORE_ is not None:
+                self._drop_local_session(ip_address)
+            else:
+                del self._sessions[ip_address]
+                self._sql_instances.pop(ip_address, None)
+                self._remove_snapshot(ip_address, session_info.sql_instance)
+        return expired
+
     async def _cleanup_expired_sessions(self):
-        """清理过期会话（仅在手动管理模式下使用）"""
+        """清理过期会话（仅在手动管理模式和共享会话存储中使用）"""
+        if _SESSION_STORE_ is not None:
+            removed = await _SESSION_STORE_.run(_SESSION_STORE_.delete_expired, time.time())
+            self._expire_local_sessions()
+            if removed:
+                logger.info(f"期限切れセッション {removed} 件をクリーンアップ (共有ストア)")
+            return
+
         if CACHE_AVAILABLE:
-            # TTLCache 自动处理，无需手动清理
+            self._expire_local_sessions()
             return
-            
+
         current_time = time.time()
         if current_time - self._last_cleanup < self._cleanup_interval:
             return
 
-        expired_sessions = []
-        for ip_address, session_info in self._sessions.items():
-            if session_info.is_expired:
-                expired_sessions.append(ip_address)
-
+        expired_sessions = self._expire_local_sessions()
         if expired_sessions:
             logger.info(f"期限切れセッション {len(expired_sessions)} 件をクリーンアップ")
-            for ip_address in expired_sessions:
-                await self.delete_session(ip_address)
 
         self._last_cleanup = current_time
 
-    def get_active_session_count(self) -> int:
+    async def sweep_expired_sessions(self) -> Dict:
+        """
+        删除过期的会话并释放其资源（由后台清理任务定期调用）。
+
+        释放会话的 SQL 实例（用户记录、嵌入向量和索引）、快照和预写日志；
+        管理器被回收时释放其持有的头像引用，不再被引用的头像文件随即删除。
+
+        Returns:
+            本次清理的统计
+        """
+        started = time.perf_counter()
+        referenced_blobs = len(_BLOB_STORE_)
+        expired = self._expire_local_sessions()
+        expired_count = len(expired) + self._expire_spilled_sessions()
+        released_bytes = sum(session_info.memory_bytes for _, session_info in expired)
+        # 不再持有会话，使其管理器被回收（同时释放头像引用）
+        del expired
+        # 共享存储中的过期会话（包括其他进程的会话）
+        shared_expired = (
+            await _SESSION_STORE_.run(_SESSION_STORE_.delete_expired, time.time())
+            if _SESSION_STORE_ is not None else 0
+        )
+        if not CACHE_AVAILABLE:
+            self._last_cleanup = time.time()
+        result = {
+            "expired_sessions": expired_count,
+            "shared_expired_sessions": shared_expired,
+            "released_bytes": released_bytes,
+            "released_blobs": max(0, referenced_blobs - len(_BLOB_STORE_)),
+            "duration_ms": (time.perf_counter() - started) * 1000,
+        }
+
+        stats = self._sweep_stats
+        stats["runs"] += 1
+        stats["expired_sessions"] += result["expired_sessions"]
+        stats["released_bytes"] += result["released_bytes"]
+        stats["released_blobs"] += result["released_blobs"]
+        stats["last_run_at"] = datetime.now().isoformat()
+        stats["last_duration_ms"] = result["duration_ms"]
+        stats["max_duration_ms"] = max(stats["max_duration_ms"], result["duration_ms"])
+
+        if expired_count or shared_expired:
+            logger.info(
+                f"期限切れセッションを回収: {expired_count} 件 "
+                f"(共有ストア {shared_expired} 件、{result['released_bytes'] / 1024:.1f} KiB、"
+                f"顔画像 {result['released_blobs']} 件、{result['duration_ms']:.2f} ms)"
+            )
+        return result
+
+    async def run_sweeper_loop(self, interval: float):
+        """
+        定期删除过期的会话（作为后台任务运行，直到被取消）。
+
+        Args:
+            interval: 清理间隔（秒）
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sweep_expired_sessions()
+            except Exception as e:  # pylint: disable=broad-except
+                logger.error(f"期限切れセッションの回収に失敗しました: {e}")
+
+    def get_sweep_summary(self) -> Dict:
+        """获取后台清理任务的统计"""
+        return dict(self._sweep_stats)
+
+    async def get_active_session_count(self) -> int:
         """获取活跃会话数量"""
+        if _SESSION_STORE_ is not None:
+            return await _SESSION_STORE_.run(_SESSION_STORE_.count_active, time.time())
         if CACHE_AVAILABLE:
-            # TTLCache 中的都是活跃会话
-            return len(self._sessions)
+            # TLRUCache 中的都是活跃会话（另加转存到快照的会话）
+            self._expire_spilled_sessions()
+            return len(self._sessions) + len(self._spilled)
         else:
             # 手动计算活跃会话
             active_count = 0
@@ -266,16 +989,49 @@ class SessionManager:
                     active_count += 1
             return active_count
 
-    def get_sessions_summary(self) -> Dict:
+    def get_memory_summary(self) -> Dict:
+        """获取本进程中会话的内存占用和驱逐统计"""
+        if not CACHE_AVAILABLE:
+            return {
+                "resident_bytes": sum(info.memory_bytes for info in self._sessions.values()),
+                "memory_budget": None,
+                "evictions": 0,
+                "expirations": 0,
+                "spilled_sessions": 0,
+                "restored_sessions": 0,
+            }
+        return {
+            "resident_bytes": self._sessions.currsize,  # 缓存会话的估算内存占用合计
+            "memory_budget": self._sessions.maxsize,
+            "evictions": self._sessions.evictions,  # 因超出内存预算而驱逐的会话数（累计）
+            "expirations": self._sessions.expirations,  # 过期删除的会话数（累计）
+            "spilled_sessions": len(self._spilled),  # 当前转存在快照中的会话数
+            "restored_sessions": self._restored,  # 从快照恢复的被驱逐会话数（累计）
+        }
+
+    async def get_sessions_summary(self) -> Dict:
         """获取会话摘要信息"""
+        if _SESSION_STORE_ is not None:
+            active_sessions = await _SESSION_STORE_.run(_SESSION_STORE_.count_active, time.time())
+            return {
+                "total_sessions": active_sessions,
+                "active_sessions": active_sessions,
+                "expired_sessions": 0,
+                "unique_ips": active_sessions,
+                "local_replicas": len(self._sessions),  # 本进程中缓存的会话副本数
+                "memory": self.get_memory_summary(),
+                "mode": "SharedStore",
+            }
         if CACHE_AVAILABLE:
-            total_sessions = len(self._sessions)
+            self._expire_spilled_sessions()
+            total_sessions = len(self._sessions) + len(self._spilled)
             return {
                 "total_sessions": total_sessions,
-                "active_sessions": total_sessions,  # TTLCache中都是活跃的
+                "active_sessions": total_sessions,  # TLRUCache中都是活跃的
                 "expired_sessions": 0,
                 "unique_ips": total_sessions,
-                "mode": "TTLCache",
+                "memory": self.get_memory_summary(),
+                "mode": "TLRUCache",
             }
         else:
             active_count = 0
@@ -295,5 +1051,6 @@ class SessionManager:
                 "expired_sessions": expired_count,
                 "unique_ips": len(unique_ips),
                 "cleanup_interval": self._cleanup_interval,
+                "memory": self.get_memory_summary(),
                 "mode": "Manual",
             }
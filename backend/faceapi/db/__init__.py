@@ -5,11 +5,38 @@
 SQLデータベースの両方のデータベース接続を初期化および管理します。
 """
 
+from .blob_store import BlobStore
+from .embedding_codec import as_embedding, decode_embedding, encode_embedding
+from .connection import (
+    SqlManager,
+    create_sql_manager,
+    database_lifespan,
+    get_memory_sql_template,
+    get_persistent_sql_client,
+    is_using_memory_manager,
+    is_using_memory_sql,
+)
+from .snapshot import SnapshotData, SnapshotStore
 from .memory_managers import (
     MemorySqlManager,
 )
+from .tortoise_manager import TortoiseSqlManager
 
 
 __ALL__ = [
+    "BlobStore",
+    "as_embedding",
+    "encode_embedding",
+    "decode_embedding",
     "MemorySqlManager",
+    "TortoiseSqlManager",
+    "SnapshotStore",
+    "SnapshotData",
+    "SqlManager",
+    "create_sql_manager",
+    "get_persistent_sql_client",
+    "get_memory_sql_template",
+    "database_lifespan",
+    "is_using_memory_manager",
+    "is_using_memory_sql",
 ]
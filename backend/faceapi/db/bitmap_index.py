@@ -0,0 +1,129 @@
+"""
+内存位图索引模块。
+
+此模块为布尔属性（如 is_active、is_admin）维护按用户 ID 下标的位图，
+多个条件的组合、计数和取 ID 列表都可以通过向量化运算完成，
+无需遍历用户记录。
+"""
+
+import copy
+from typing import Iterable, Optional
+
+import numpy as np
+
+
+class BitmapIndex:
+    """
+    按 ID 下标的布尔位图索引。
+
+    除了各字段的位图外，还维护一个记录 ID 是否存在的 alive 位图。
+    """
+
+    def __init__(self, fields: Iterable[str], initial_capacity: int = 1024):
+        """
+        初始化位图索引。
+
+        Args:
+            fields: 要索引的布尔字段名
+            initial_capacity: 初始预留的 ID 数
+        """
+        self.fields = tuple(fields)
+        self._capacity = initial_capacity
+        self._upper = 0  # 已使用的最大 ID + 1
+        self._alive = np.zeros(initial_capacity, dtype=bool)
+        self._bits = {name: np.zeros(initial_capacity, dtype=bool) for name in self.fields}
+
+    def _ensure_capacity(self, item_id: int):
+        """确保位图可以容纳 item_id"""
+        if item_id < self._capacity:
+            return
+        new_capacity = max(item_id + 1, self._capacity * 2)
+        alive = np.zeros(new_capacity, dtype=bool)
+        alive[: self._capacity] = self._alive
+        self._alive = alive
+        for name, old in self._bits.items():
+            bits = np.zeros(new_capacity, dtype=bool)
+            bits[: self._capacity] = old
+            self._bits[name] = bits
+        self._capacity = new_capacity
+
+    @property
+    def nbytes(self) -> int:
+        """位图占用的字节数"""
+        return self._alive.nbytes + sum(bits.nbytes for bits in self._bits.values())
+
+    def copy(self) -> "BitmapIndex":
+        """返回独立的副本"""
+        clone = copy.copy(self)
+        clone._alive = self._alive.copy()
+        clone._bits = {name: bits.copy() for name, bits in self._bits.items()}
+        return clone
+
+    def set(self, item_id: int, **values: bool):
+        """
+        标记 ID 存在并设置各字段的值。
+
+        Args:
+            item_id: 记录 ID
+            **values: 字段名到布尔值的映射（未给出的字段保持不变）
+        """
+        self._ensure_capacity(item_id)
+        self._alive[item_id] = True
+        for name, value in values.items():
+            self._bits[name][item_id] = bool(value)
+        self._upper = max(self._upper, item_id + 1)
+
+    def set_many(self, item_ids: Iterable[int], **values: bool):
+        """
+        对多个 ID 一次性设置字段的值（向量化，等价于对每个 ID 调用 set()）。
+
+        Args:
+            item_ids: 记录 ID
+            **values: 字段名到布尔值的映射（未给出的字段保持不变）
+        """
+        ids = np.fromiter(item_ids, dtype=np.int64)
+        if len(ids) == 0:
+            return
+        upper = int(ids.max())
+        self._ensure_capacity(upper)
+        self._alive[ids] = True
+        for name, value in values.items():
+            self._bits[name][ids] = bool(value)
+        self._upper = max(self._upper, upper + 1)
+
+    def clear(self, item_id: int):
+        """移除 ID（所有位清零）"""
+        if item_id >= self._capacity:
+            return
+        self._alive[item_id] = False
+        for bits in self._bits.values():
+            bits[item_id] = False
+
+    def mask(self, **conditions: Optional[bool]) -> np.ndarray:
+        """
+        计算满足所有条件的位图。
+
+        Args:
+            **conditions: 字段名到期望值的映射（None 表示不限制）
+
+        Returns:
+            长度为 (最大 ID + 1) 的布尔数组
+        """
+        mask = self._alive[: self._upper].copy()
+        for name, value in conditions.items():
+            if value is None:
+                continue
+            bits = self._bits[name][: self._upper]
+            if value:
+                mask &= bits
+            else:
+                mask &= ~bits
+        return mask
+
+    def count(self, **conditions: Optional[bool]) -> int:
+        """统计满足条件的 ID 数"""
+        return int(np.count_nonzero(self.mask(**conditions)))
+
+    def ids(self, **conditions: Optional[bool]) -> np.ndarray:
+        """返回满足条件的 ID（升序）"""
+        return np.flatnonzero(self.mask(**conditions))
@@ -0,0 +1,231 @@
+"""
+内容寻址的头像存储模块。
+
+此模块将用户头像以文件形式保存在本地目录中，文件名为内容的 SHA-256 摘要，
+同时生成一张缩略图。用户记录中只保存摘要（引用），
+相同的图片只保存一份，并通过引用计数在不再被使用时删除。
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Set
+
+import cv2
+import numpy as np
+from loguru import logger
+
+# 摘要格式（用于校验外部传入的引用，防止路径穿越）
+DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+THUMBNAIL_SUFFIX = ".thumb.jpg"
+
+# 文件头魔数到媒体类型的映射
+_MAGIC_MEDIA_TYPES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+)
+
+
+def sniff_media_type(head: bytes) -> str:
+    """根据文件头判断图片的媒体类型"""
+    for magic, media_type in _MAGIC_MEDIA_TYPES:
+        if head.startswith(magic):
+            return media_type
+    return "application/octet-stream"
+
+
+def is_valid_digest(digest: str) -> bool:
+    """判断字符串是否为合法的摘要"""
+    return bool(DIGEST_PATTERN.match(digest))
+
+
+class BlobStore:
+    """
+    内容寻址的头像存储。
+
+    put() 保存原始字节和缩略图并返回摘要，同时为调用方持有一个引用；
+    引用计数降为 0 时删除对应的文件。引用计数只保存在内存中。
+
+    多个进程共用同一目录时（shared），引用计数只反映本进程的持有者，
+    release() 不删除文件，未引用的文件由启动时的 sweep() 清理。
+    """
+
+    def __init__(self, root: str, thumbnail_size: int = 128, shared: bool = False):
+        """
+        初始化头像存储。
+
+        Args:
+            root: 存储目录
+            thumbnail_size: 缩略图长边的最大像素数
+            shared: 目录是否由多个进程共用
+        """
+        self.root = Path(root)
+        self.thumbnail_size = thumbnail_size
+        self.shared = shared
+        self._refs: Dict[str, int] = {}  # {digest: 引用数}
+        self._lock = threading.Lock()
+
+    def path(self, digest: str, thumbnail: bool = False) -> Path:
+        """返回摘要对应的文件路径（不检查是否存在）"""
+        name = digest + THUMBNAIL_SUFFIX if thumbnail else digest
+        return self.root / digest[:2] / name
+
+    def _write_atomic(self, path: Path, data: bytes):
+        """写入临时文件后重命名，避免读到写了一半的文件"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def _make_thumbnail(self, data: bytes, image: Optional[np.ndarray]) -> bytes:
+        """生成 JPEG 缩略图"""
+        if image is None:
+            # pylint: disable=no-member
+            image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+            # pylint: enable=no-member
+            if image is None:
+                raise ValueError("Invalid image data")
+        height, width = image.shape[:2]
+        scale = self.thumbnail_size / max(height, width)
+        # pylint: disable=no-member
+        if scale < 1:
+            image = cv2.resize(
+                image,
+                (max(1, round(width * scale)), max(1, round(height * scale))),
+                interpolation=cv2.INTER_AREA,
+            )
+        ok, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 85])
+        # pylint: enable=no-member
+        if not ok:
+            raise ValueError("Failed to encode thumbnail")
+        return buffer.tobytes()
+
+    def put(self, data: bytes, image: Optional[np.ndarray] = None) -> str:
+        """
+        保存图片并为调用方持有一个引用。
+
+        调用方将摘要交给其他持有者（incref）后，应调用 release() 释放此引用。
+
+        Args:
+            data: 图片的原始字节
+            image: 已解码的图片（提供时可省去生成缩略图前的解码）
+
+        Returns:
+            图片内容的 SHA-256 摘要
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        # 先增加引用，之后其他线程的 release() 不会删除该文件
+        with self._lock:
+            self._refs[digest] = self._refs.get(digest, 0) + 1
+        try:
+            original = self.path(digest)
+            if not original.exists():
+                self._write_atomic(original, data)
+            thumbnail = self.path(digest, thumbnail=True)
+            if not thumbnail.exists():
+                self._write_atomic(thumbnail, self._make_thumbnail(data, image))
+        except BaseException:
+            self.release(digest)
+            raise
+        return digest
+
+    def incref(self, digest: str, count: int = 1):
+        """增加摘要的引用数"""
+        with self._lock:
+            self._refs[digest] = self._refs.get(digest, 0) + count
+
+    def release(self, digest: str, count: int = 1):
+        """减少摘要的引用数，降为 0 时删除文件（shared 时保留文件）"""
+        with self._lock:
+            remaining = self._refs.get(digest, 0) - count
+            if remaining > 0:
+                self._refs[digest] = remaining
+                return
+            self._refs.pop(digest, None)
+            if self.shared:
+                # 其他进程可能仍在引用
+                return
+            for path in (self.path(digest), self.path(digest, thumbnail=True)):
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+
+    def __len__(self) -> int:
+        """返回当前被引用的图片数"""
+        return len(self._refs)
+
+    def refcount(self, digest: str) -> int:
+        """返回摘要当前的引用数"""
+        return self._refs.get(digest, 0)
+
+    def locate(self, digest: str, thumbnail: bool = False) -> Optional[Path]:
+        """
+        获取图片文件路径。
+
+        Args:
+            digest: 图片摘要
+            thumbnail: 是否返回缩略图
+
+        Returns:
+            存在时返回文件路径，否则返回 None
+        """
+        if not is_valid_digest(digest):
+            return None
+        path = self.path(digest, thumbnail)
+        return path if path.is_file() else None
+
+    def media_type(self, digest: str, thumbnail: bool = False) -> str:
+        """返回图片的媒体类型（缩略图总是 JPEG）"""
+        if thumbnail:
+            return "image/jpeg"
+        with open(self.path(digest), "rb") as f:
+            return sniff_media_type(f.read(16))
+
+    def sweep(self, keep: Optional[Set[str]] = None, min_age: float = 0.0) -> int:
+        """
+        删除没有任何引用的文件（启动时清理上次运行遗留的文件）。
+
+        Args:
+            keep: 本进程之外仍被引用的摘要（如其他工作进程的会话引用的头像）
+            min_age: 只删除修改时间早于该秒数的文件（其他进程可能刚写入、尚未登记引用）
+
+        Returns:
+            删除的图片数
+        """
+        if not self.root.is_dir():
+            return 0
+        keep = keep or set()
+        cutoff = time.time() - min_age
+        removed = set()
+        with self._lock:
+            for path in self.root.glob("*/*"):
+                try:
+                    if min_age and path.stat().st_mtime > cutoff:
+                        continue
+                    if path.suffix == ".tmp":
+                        # 写入中断遗留的临时文件
+                        path.unlink()
+                        continue
+                    digest = path.name[:64]
+                    if self._refs.get(digest) or digest in keep or not is_valid_digest(digest):
+                        continue
+                    path.unlink()
+                except FileNotFoundError:
+                    # 其他进程同时清理
+                    continue
+                removed.add(digest)
+        if removed:
+            logger.info(f"清理未引用的头像: {len(removed)} 张")
+        return len(removed)
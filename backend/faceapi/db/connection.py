@@ -0,0 +1,138 @@
+"""
+数据库后端选择与连接管理模块。
+
+此模块根据配置（USE_MEMORY_DB）选择内存或持久化（Tortoise ORM）后端，
+并负责在应用生命周期中初始化和关闭 Tortoise 连接。
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Dict, Optional, Union
+
+from fastapi import FastAPI
+from loguru import logger
+from tortoise.contrib.fastapi import RegisterTortoise
+
+from .blob_store import BlobStore
+from .memory_managers import MemorySqlManager
+from .tortoise_manager import TortoiseSqlManager
+
+SqlManager = Union[MemorySqlManager, TortoiseSqlManager]
+
+# 持久化后端的共享实例（所有会话共用）
+_PERSISTENT_SQL_MANAGER: Optional[TortoiseSqlManager] = None
+
+# 内存后端的会话模板（已创建默认管理员，新会话从它复制）
+_MEMORY_SQL_TEMPLATE: Optional[MemorySqlManager] = None
+_MEMORY_SQL_TEMPLATE_LOCK = asyncio.Lock()
+
+
+def is_using_memory_sql() -> bool:
+    """是否使用内存 SQL 管理器"""
+    from ..core import _CONFIG_
+    return _CONFIG_.USE_MEMORY_DB
+
+
+def is_using_memory_manager() -> bool:
+    """是否使用内存管理器（SQL 与向量搜索均在内存中）"""
+    return is_using_memory_sql()
+
+
+def get_tortoise_config(db_url: str) -> Dict:
+    """
+    生成 Tortoise ORM 的配置。
+
+    Args:
+        db_url: 数据库连接 URL（如 sqlite://data/faceapi.sqlite3）
+
+    Returns:
+        Tortoise.init() 使用的配置字典
+    """
+    return {
+        "connections": {"default": db_url},
+        "apps": {
+            "models": {
+                "models": ["faceapi.models"],
+                "default_connection": "default",
+            }
+        },
+    }
+
+
+@asynccontextmanager
+async def database_lifespan(app: Optional[FastAPI] = None) -> AsyncIterator[None]:
+    """
+    持久化数据库连接的生命周期管理。
+
+    在应用的 lifespan 中使用：进入时初始化 Tortoise 连接并创建表和索引，
+    退出时关闭连接。使用内存数据库时只预先构建会话模板。
+
+    Args:
+        app: FastAPI 应用实例
+    """
+    global _PERSISTENT_SQL_MANAGER
+    if is_using_memory_sql():
+        # 在启动时完成模板的构建（计算默认管理员的密码哈希），避免第一个会话等待
+        await get_memory_sql_template()
+        yield
+        return
+    from ..core import _CONFIG_
+
+    db_url = _CONFIG_.DATABASE_URL
+    if db_url.startswith("sqlite://") and db_url != "sqlite://:memory:":
+        Path(db_url[len("sqlite://"):]).parent.mkdir(parents=True, exist_ok=True)
+
+    # 表和索引不存在时创建（generate_schemas 只创建缺少的表）
+    async with RegisterTortoise(app, config=get_tortoise_config(db_url), generate_schemas=True):
+        logger.info(f"数据库连接已初始化: {db_url.split('://')[0]}")
+        try:
+            yield
+        finally:
+            _PERSISTENT_SQL_MANAGER = None
+            logger.info("数据库连接已关闭")
+
+
+async def get_persistent_sql_client(blob_store: Optional[BlobStore] = None) -> TortoiseSqlManager:
+    """获取持久化 SQL 管理器的共享实例"""
+    global _PERSISTENT_SQL_MANAGER
+    if _PERSISTENT_SQL_MANAGER is None:
+        _PERSISTENT_SQL_MANAGER = TortoiseSqlManager(blob_store=blob_store)
+    await _PERSISTENT_SQL_MANAGER.initialize()
+    return _PERSISTENT_SQL_MANAGER
+
+
+async def get_memory_sql_template() -> MemorySqlManager:
+    """
+    获取内存后端的会话模板（首次调用时构建）。
+
+    模板只构建一次，默认管理员的密码哈希也只计算一次。
+    模板本身不持有头像存储，不应直接作为会话数据库使用。
+    """
+    global _MEMORY_SQL_TEMPLATE
+    if _MEMORY_SQL_TEMPLATE is None:
+        async with _MEMORY_SQL_TEMPLATE_LOCK:
+            if _MEMORY_SQL_TEMPLATE is None:
+                template = MemorySqlManager()
+                await template.initialize()
+                _MEMORY_SQL_TEMPLATE = template
+    return _MEMORY_SQL_TEMPLATE
+
+
+async def create_sql_manager(blob_store: Optional[BlobStore] = None) -> SqlManager:
+    """
+    为新会话获取 SQL 管理器。
+
+    使用内存数据库时每个会话得到从模板复制的独立 MemorySqlManager，
+    否则所有会话共享同一个持久化管理器。
+
+    Args:
+        blob_store: 保存头像的存储
+
+    Returns:
+        已初始化的 SQL 管理器
+    """
+    if is_using_memory_sql():
+        template = await get_memory_sql_template()
+        return template.clone(blob_store=blob_store)
+    return await get_persistent_sql_client(blob_store)
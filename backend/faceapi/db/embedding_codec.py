@@ -0,0 +1,87 @@
+"""
+人脸嵌入向量的编解码模块。
+
+此模块统一嵌入向量在推理、存储管理器、持久化层和导出之间的表示：
+内存中为一维 float32 numpy 数组，持久化时为其原始字节（小端 float32）。
+解码时兼容旧版本以 JSON 列表形式保存的数据。
+"""
+
+import json
+from typing import Any, Optional
+
+import numpy as np
+
+# 嵌入向量的数据类型（持久化字节固定为小端 float32）
+EMBEDDING_DTYPE = np.dtype('<f4')
+
+
+def is_legacy_embedding(data: Any) -> bool:
+    """
+    判断持久化的数据是否为旧格式（JSON 列表）。
+
+    float32 字节的最后一个字节是最大值的符号和指数的高位，
+    以 ']' (0x5d) 结尾意味着数值约为 1e17，归一化的嵌入向量不会出现这种情况，
+    因此以 '[' 开头、']' 结尾的字节串可以判定为 JSON。
+    """
+    if isinstance(data, (list, tuple, str)):
+        return True
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = bytes(data[:1]) + bytes(data[-1:])
+        return data == b'[]'
+    return False
+
+
+def as_embedding(value: Any) -> Optional[np.ndarray]:
+    """
+    将任意表示的嵌入向量转换为一维 float32 数组。
+
+    已是 float32 数组时不复制（返回视图），字节串通过 np.frombuffer 零拷贝读取。
+
+    Args:
+        value: numpy 数组、float32 字节串、列表或 JSON 字符串
+
+    Returns:
+        一维 float32 数组，value 为 None 时返回 None
+    """
+    if value is None:
+        return None
+    if isinstance(value, np.ndarray):
+        return value.astype(EMBEDDING_DTYPE, copy=False).reshape(-1)
+    if is_legacy_embedding(value):
+        if isinstance(value, (str, bytes, bytearray, memoryview)):
+            value = json.loads(bytes(value) if isinstance(value, memoryview) else value)
+        return np.asarray(value, dtype=EMBEDDING_DTYPE).reshape(-1)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        if len(value) % EMBEDDING_DTYPE.itemsize:
+            raise ValueError(f"Invalid embedding data length: {len(value)}")
+        return np.frombuffer(value, dtype=EMBEDDING_DTYPE)
+    raise TypeError(f"Unsupported embedding type: {type(value).__name__}")
+
+
+def encode_embedding(value: Any) -> Optional[bytes]:
+    """
+    将嵌入向量编码为持久化用的 float32 字节串。
+
+    Args:
+        value: as_embedding() 接受的任意表示
+
+    Returns:
+        float32 字节串，value 为 None 时返回 None
+    """
+    embedding = as_embedding(value)
+    if embedding is None:
+        return None
+    return embedding.tobytes()
+
+
+def decode_embedding(data: Any) -> Optional[np.ndarray]:
+    """
+    将持久化的数据解码为嵌入向量（兼容旧的 JSON 列表格式）。
+
+    Args:
+        data: float32 字节串或旧格式的 JSON 列表/字符串
+
+    Returns:
+        一维 float32 数组（字节串输入时为只读视图），data 为 None 时返回 None
+    """
+    return as_embedding(data)
@@ -0,0 +1,218 @@
+"""
+人脸库（用户与嵌入向量）的导出格式模块。
+
+此模块定义在实例或会话之间迁移人脸库使用的流式格式，
+导出和导入都只需按块处理，内存占用与人脸库大小无关：
+
+    {"format": "faceapi-gallery", "version": 1, "dim": 512, "dtype": "<f4"}\\n   文件头
+    {"users": k, "embeddings": m}\\n                                           块头
+    k 行 NDJSON 用户记录（"embedding" 为 true 时该用户在本块的向量段中有一行）
+    m * dim * 4 字节的 float32 嵌入向量（按记录顺序）
+    ...                                                                      后续的块
+    {"users": 0, "embeddings": 0}\\n                                           结束标记
+
+结束标记用于检测被截断的流。
+"""
+
+import json
+from datetime import datetime
+from operator import itemgetter
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .embedding_codec import EMBEDDING_DTYPE, as_embedding
+
+GALLERY_FORMAT = "faceapi-gallery"
+GALLERY_FORMAT_VERSION = 1
+
+# 导出的用户字段（不含嵌入向量）
+GALLERY_FIELDS = (
+    'id',
+    'username',
+    'email',
+    'full_name',
+    'hashed_password',
+    'is_active',
+    'is_admin',
+    'head_pic',
+    'created_at',
+    'updated_at',
+)
+
+# 同时适用于 dict 和 UserRecord 的字段读取
+_get_fields = itemgetter(*GALLERY_FIELDS)
+
+# 文件头和块头的最大长度（防止读取异常输入时无限缓冲）
+MAX_LINE_SIZE = 1024 * 1024
+
+GalleryChunk = List[Tuple[Dict[str, Any], Optional[np.ndarray]]]
+
+
+def _json_line(value: Dict[str, Any]) -> bytes:
+    """编码一行 JSON"""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+def _timestamp(value: Any) -> Any:
+    """将时间戳（datetime 或 UNIX 时间）统一为 ISO 8601 字符串"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value).astimezone().isoformat()
+    return value
+
+
+def encode_header(dim: int) -> bytes:
+    """编码文件头"""
+    return _json_line({
+        "format": GALLERY_FORMAT,
+        "version": GALLERY_FORMAT_VERSION,
+        "dim": dim,
+        "dtype": EMBEDDING_DTYPE.str,
+    })
+
+
+def encode_chunk(chunk: GalleryChunk, dim: int) -> bytes:
+    """
+    编码一个块。
+
+    Args:
+        chunk: [(用户记录, 嵌入向量或 None), ...]
+        dim: 嵌入向量的维度
+
+    Returns:
+        块头、NDJSON 记录和 float32 向量段
+    """
+    lines = []
+    vectors = []
+    for user, embedding in chunk:
+        record = dict(zip(GALLERY_FIELDS, _get_fields(user)))
+        record['created_at'] = _timestamp(record['created_at'])
+        record['updated_at'] = _timestamp(record['updated_at'])
+        record['embedding'] = embedding is not None
+        lines.append(_json_line(record))
+        if embedding is not None:
+            vectors.append(as_embedding(embedding))
+    matrix = np.stack(vectors) if vectors else np.zeros((0, dim), dtype=EMBEDDING_DTYPE)
+    if matrix.shape[1] != dim:
+        raise ValueError(f"Embedding dimension {matrix.shape[1]} does not match {dim}")
+    header = _json_line({"users": len(lines), "embeddings": len(vectors)})
+    return header + b"".join(lines) + matrix.astype(EMBEDDING_DTYPE, copy=False).tobytes()
+
+
+def encode_end() -> bytes:
+    """编码结束标记"""
+    return _json_line({"users": 0, "embeddings": 0})
+
+
+class _ByteReader:
+    """在字节块的异步迭代器上按行或按长度读取"""
+
+    def __init__(self, chunks: AsyncIterator[bytes]):
+        self._chunks = chunks.__aiter__()
+        self._buffer = bytearray()
+        self._eof = False
+
+    async def _fill(self) -> bool:
+        """读取下一个字节块，流结束时返回 False"""
+        if self._eof:
+            return False
+        try:
+            self._buffer += await self._chunks.__anext__()
+        except StopAsyncIteration:
+            self._eof = True
+            return False
+        return True
+
+    async def readline(self, limit: int) -> bytes:
+        """读取一行（不含换行符），流结束时返回已读取的内容"""
+        start = 0
+        while True:
+            end = self._buffer.find(b"\n", start)
+            if end >= 0:
+                line = bytes(self._buffer[:end])
+                del self._buffer[:end + 1]
+                return line
+            if len(self._buffer) > limit:
+                raise ValueError("Gallery line is too long")
+            start = len(self._buffer)
+            if not await self._fill():
+                line = bytes(self._buffer)
+                self._buffer.clear()
+                return line
+
+    async def readexactly(self, size: int) -> bytes:
+        """读取 size 字节"""
+        while len(self._buffer) < size:
+            if not await self._fill():
+                raise ValueError("Truncated gallery bundle")
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+
+def _parse_line(line: bytes, what: str) -> Dict[str, Any]:
+    """解析一行 JSON 对象"""
+    try:
+        value = json.loads(line)
+    except ValueError as e:
+        raise ValueError(f"Invalid gallery {what}") from e
+    if not isinstance(value, dict):
+        raise ValueError(f"Invalid gallery {what}")
+    return value
+
+
+async def read_gallery(chunks: AsyncIterator[bytes],
+                       expected_dim: Optional[int] = None) -> AsyncIterator[GalleryChunk]:
+    """
+    从字节流中按块读取人脸库。
+
+    Args:
+        chunks: 字节块的异步迭代器（如请求体）
+        expected_dim: 要求的嵌入向量维度（为 None 时接受任意维度）
+
+    Yields:
+        [(用户记录, 嵌入向量或 None), ...]，嵌入向量为 float32 数组
+
+    Raises:
+        ValueError: 格式不受支持、维度不一致、数据损坏或流被截断
+    """
+    reader = _ByteReader(chunks)
+    header = _parse_line(await reader.readline(MAX_LINE_SIZE), "header")
+    if header.get("format") != GALLERY_FORMAT or header.get("version") != GALLERY_FORMAT_VERSION:
+        raise ValueError("Unsupported gallery format")
+    if header.get("dtype", EMBEDDING_DTYPE.str) != EMBEDDING_DTYPE.str:
+        raise ValueError(f"Unsupported embedding dtype: {header.get('dtype')}")
+    dim = header.get("dim")
+    if not isinstance(dim, int) or dim <= 0:
+        raise ValueError("Invalid embedding dimension")
+    if expected_dim is not None and dim != expected_dim:
+        raise ValueError(f"Embedding dimension {dim} does not match {expected_dim}")
+
+    while True:
+        line = await reader.readline(MAX_LINE_SIZE)
+        if not line:
+            raise ValueError("Truncated gallery bundle")
+        counts = _parse_line(line, "chunk header")
+        user_count, embedding_count = counts.get("users"), counts.get("embeddings")
+        if not isinstance(user_count, int) or not isinstance(embedding_count, int) \
+                or not 0 <= embedding_count <= user_count:
+            raise ValueError("Invalid gallery chunk header")
+        if user_count == 0:
+            return
+
+        records = [
+            _parse_line(await reader.readline(MAX_LINE_SIZE), "record")
+            for _ in range(user_count)
+        ]
+        if sum(bool(record.get("embedding")) for record in records) != embedding_count:
+            raise ValueError("Gallery chunk embedding count mismatch")
+        data = await reader.readexactly(embedding_count * dim * EMBEDDING_DTYPE.itemsize)
+        matrix = np.frombuffer(data, dtype=EMBEDDING_DTYPE).reshape(embedding_count, dim)
+
+        rows = iter(matrix)
+        yield [
+            (record, next(rows) if record.pop("embedding", False) else None)
+            for record in records
+        ]
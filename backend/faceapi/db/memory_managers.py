@@ -9,10 +9,55 @@
 import base64
 import json
 import time
-from typing import Any, Dict, List, Optional, Union
+import weakref
+from contextlib import asynccontextmanager
+from itertools import count, islice
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple, Union
 from loguru import logger
 import numpy as np
 
+from .bitmap_index import BitmapIndex
+from .blob_store import BlobStore
+from .embedding_codec import decode_embedding, encode_embedding
+from .ngram_index import NgramIndex
+from .snapshot import SnapshotData
+from .user_record import USER_FIELDS, UserRecord
+from .vector_index import VectorIndex, to_search_results
+from .wal import WriteAheadLog
+
+# 变更时需要重建索引的字段
+INDEXED_FIELDS = {'username', 'email', 'full_name', 'is_active', 'is_admin', 'head_pic'}
+
+# 支持子串查询的文本字段
+TEXT_SEARCH_FIELDS = ('username', 'email', 'full_name')
+
+# 变更时需要重建唯一索引或子串索引的字段（其余索引字段只需更新位图）
+TEXT_INDEXED_FIELDS = {'username', 'email', 'full_name'}
+
+
+# 内存占用的估算参数（由 benchmark_memory() 测得的近似值）：
+# 每个用户的固定开销（记录对象、密码哈希、用户表和唯一索引的条目）
+USER_BASE_BYTES = 800
+# 文本字段每个字符的开销（字符串本身、子串索引中的小写副本和倒排表条目）
+TEXT_CHAR_BYTES = 70
+
+
+def estimate_user_bytes(user) -> int:
+    """估算一个用户记录及其索引条目占用的内存（不含嵌入向量）"""
+    text_chars = sum(len(user[field] or '') for field in TEXT_SEARCH_FIELDS)
+    return USER_BASE_BYTES + text_chars * TEXT_CHAR_BYTES
+
+
+# 所有管理器共用的修订号序列（不同管理器的修订号不会重复）
+_REVISIONS = count(1)
+
+
+def _release_blob_refs(blob_store: BlobStore, refs: Dict[str, int]):
+    """释放管理器持有的所有头像引用（管理器被回收时调用）"""
+    for digest, count in refs.items():
+        blob_store.release(digest, count)
+    refs.clear()
+
 
 class MemorySqlManager:
     """
@@ -22,10 +67,33 @@ class MemorySqlManager:
     支持用户创建、查询、更新和删除操作。
     """
     
-    def __init__(self):
-        """初始化内存 SQL 管理器"""
-        self.users = {}  # 用户存储 {user_id: user_data}
+    def __init__(self, blob_store: Optional[BlobStore] = None):
+        """
+        初始化内存 SQL 管理器
+
+        Args:
+            blob_store: 保存头像的存储（提供时 head_pic 为其中的图片摘要，并维护引用计数）
+        """
+        self.users: Dict[int, UserRecord] = {}  # 用户存储 {user_id: UserRecord}
         self.next_id = 1
+        self._username_index: Dict[str, int] = {}  # 用户名唯一索引 {username: user_id}
+        self._email_index: Dict[str, int] = {}  # 邮箱唯一索引 {小写邮箱: user_id}
+        # 布尔属性位图索引（has_face 表示 head_pic 非空）
+        self._attr_index = BitmapIndex(('is_active', 'is_admin', 'has_face'))
+        # 文本字段的 trigram 子串索引
+        self._text_index = {field: NgramIndex() for field in TEXT_SEARCH_FIELDS}
+        self._vector_index = VectorIndex()  # 人脸嵌入向量索引
+        self._record_bytes = 0  # 用户记录及其索引条目的估算内存占用（随索引的增删维护）
+        self._blob_store = blob_store
+        self._blob_refs: Dict[str, int] = {}  # 本管理器持有的头像引用 {digest: 引用数}
+        if blob_store is not None:
+            # 会话被删除或过期后管理器被回收时，释放其持有的头像
+            finalizer = weakref.finalize(self, _release_blob_refs, blob_store, self._blob_refs)
+            # 进程退出时不释放：快照仍引用这些头像，未被引用的会在下次启动时清理
+            finalizer.atexit = False
+        self.revision = next(_REVISIONS)  # 每次修改数据时更新（用于判断是否需要写快照）
+        self._wal: Optional[WriteAheadLog] = None  # 修改的预写日志（需要持久化时设置）
+        self._journal = None  # 多进程共享会话时的修改日志（SessionJournal）
         self._initialized = False
         
     async def initialize(self):
@@ -38,7 +106,7 @@ class MemorySqlManager:
             
     async def _create_default_admin(self):
         """创建默认管理员用户"""
-        from ..utils.pass_utils import hash_password
+        from ..utils.pass_utils import hash_password_async
         from ..core import _CONFIG_
         
         # 检查是否已存在管理员用户
@@ -46,7 +114,7 @@ class MemorySqlManager:
         if not existing_admin:
             # 使用配置中的密码，如果没有则使用默认值
             admin_password = getattr(_CONFIG_, 'ADMIN_PASSWORD', 'admin')
-            hashed_password = hash_password(admin_password)
+            hashed_password = await hash_password_async(admin_password)
             admin_user = await self.create_user(
                 username="admin",
                 email=getattr(_CONFIG_, 'ADMIN_EMAIL', 'admin@example.com'),
@@ -57,58 +125,503 @@ class MemorySqlManager:
             )
             logger.info(f"创建默认管理员用户: {admin_user['username']} (ID: {admin_user['id']})")
             
+    def clone(self, blob_store: Optional[BlobStore] = None) -> "MemorySqlManager":
+        """
+        复制出一个独立的管理器（用于从预先构建的模板创建会话数据库）。
+
+        用户记录和各索引都被复制，之后两者的修改互不影响；
+        默认管理员的密码哈希等已计算好的数据直接沿用，无需重新初始化。
+
+        Args:
+            blob_store: 副本使用的头像存储
+
+        Returns:
+            已初始化的管理器副本
+        """
+        clone = MemorySqlManager(blob_store=blob_store)
+        clone._vector_index = self._vector_index.copy()
+        clone.users = {
+            user_id: user.copy(clone._vector_index) for user_id, user in self.users.items()
+        }
+        clone.next_id = self.next_id
+        clone._username_index = dict(self._username_index)
+        clone._email_index = dict(self._email_index)
+        clone._attr_index = self._attr_index.copy()
+        clone._text_index = {field: index.copy() for field, index in self._text_index.items()}
+        clone._record_bytes = self._record_bytes
+        for user in clone.users.values():
+            clone._retain_head_pic(user.head_pic)
+        clone._initialized = self._initialized
+        return clone
+
+    def memory_usage(self) -> Dict[str, int]:
+        """
+        估算本管理器占用的内存（O(1)，用于会话的内存预算）。
+
+        头像保存在头像存储（磁盘）中，记录中只有摘要，因此不单独计算。
+
+        Returns:
+            {"records": 用户记录和文本索引, "embeddings": 向量索引, "indexes": 位图索引}（字节）
+        """
+        return {
+            "records": self._record_bytes,
+            "embeddings": self._vector_index.nbytes,
+            "indexes": self._attr_index.nbytes,
+        }
+
+    @property
+    def wal(self) -> Optional[WriteAheadLog]:
+        """当前使用的预写日志"""
+        return self._wal
+
+    def attach_wal(self, wal: Optional[WriteAheadLog]):
+        """设置预写日志，之后的所有修改都会写入日志"""
+        self._wal = wal
+
+    @property
+    def journal(self):
+        """共享会话存储中的修改日志"""
+        return self._journal
+
+    def attach_journal(self, journal):
+        """
+        设置共享会话存储中的修改日志（SessionJournal）。
+
+        之后的每次修改都在共享存储的写锁内进行：先应用其他进程的修改，再检查并应用本次修改。
+        """
+        self._journal = journal
+
+    @asynccontextmanager
+    async def _transaction(self):
+        """一次修改（检查、应用和记录日志）的范围，设置了共享日志时在其写锁内进行"""
+        journal = self._journal
+        if journal is None:
+            yield
+            return
+        await journal.begin(self)
+        try:
+            yield
+        except BaseException:
+            journal.rollback()
+            raise
+        await journal.commit()
+
+    def _log(self, record: Dict, embedding=None):
+        """将一次修改追加到预写日志（未设置日志时不做任何事）"""
+        if self._wal is None and self._journal is None:
+            return
+        data = encode_embedding(embedding)
+        if self._wal is not None:
+            self._wal.append(record, data)
+        if self._journal is not None:
+            self._journal.append(record, data)
+
+    async def _commit(self):
+        """等待本次修改写入预写日志（并发的修改共用一次 fsync）"""
+        if self._wal is not None:
+            await self._wal.sync()
+
+    def replay(self, records) -> int:
+        """
+        在当前状态上重放预写日志的记录。
+
+        Args:
+            records: (操作内容, 嵌入向量字节) 的可迭代对象
+
+        Returns:
+            重放的记录数
+        """
+        # 重放的记录已在日志中，不再重复记录
+        wal, journal = self._wal, self._journal
+        self._wal = self._journal = None
+        try:
+            return self._replay(records)
+        finally:
+            self._wal, self._journal = wal, journal
+
+    def _replay(self, records) -> int:
+        """按顺序应用日志记录"""
+        count = 0
+        for record, embedding in records:
+            op = record['op']
+            if op == 'create':
+                # 写入失败后重试的记录可能在日志中出现两次，已存在的用户不再加入
+                if record['user']['id'] not in self.users:
+                    user = UserRecord(self._vector_index, **record['user'])
+                    self._insert_user(user, decode_embedding(embedding))
+                self.next_id = max(self.next_id, record['user']['id'] + 1)
+            elif op == 'update' and record['id'] in self.users:
+                update_data = dict(record['data'])
+                if 'embedding' in record:
+                    update_data['embedding'] = decode_embedding(embedding)
+                self._apply_update(record['id'], update_data, record['now'])
+            elif op == 'delete' and record['id'] in self.users:
+                self._remove_user(record['id'])
+            elif op == 'bulk_update':
+                update_data = dict(record['data'])
+                if record.get('embedding'):
+                    update_data['embedding'] = None
+                user_ids = [user_id for user_id in record['ids'] if user_id in self.users]
+                self._bulk_apply(user_ids, update_data, record['now'])
+            elif op == 'bulk_delete':
+                self._bulk_remove([user_id for user_id in record['ids'] if user_id in self.users])
+            count += 1
+        return count
+
+    def snapshot(self) -> SnapshotData:
+        """
+        捕获当前状态（用于写入快照）。
+
+        设置了预写日志时同时开始新的日志段，快照写入完成后可删除之前的段。
+
+        Returns:
+            快照内容（与之后的修改互不影响）
+        """
+        ids, matrix = self._vector_index.to_arrays()
+        records = [
+            {field: getattr(user, field) for field in USER_FIELDS}
+            for user in self.users.values()
+        ]
+        wal_segment = self._wal.rotate() if self._wal is not None else 0
+        return SnapshotData(self.next_id, records, ids, matrix, wal_segment)
+
+    @classmethod
+    def from_snapshot(cls, data: SnapshotData,
+                      blob_store: Optional[BlobStore] = None) -> "MemorySqlManager":
+        """
+        由快照恢复管理器。
+
+        嵌入向量矩阵直接作为向量索引使用（不复制），并为记录中的头像重新持有引用。
+
+        Args:
+            data: 快照内容
+            blob_store: 保存头像的存储
+
+        Returns:
+            已初始化的管理器
+        """
+        manager = cls(blob_store=blob_store)
+        manager._vector_index = VectorIndex.from_arrays(data.ids, data.matrix)
+        for values in data.records:
+            # 忽略旧版本快照中已不存在的字段
+            user = UserRecord(
+                manager._vector_index,
+                **{field: value for field, value in values.items() if field in USER_FIELDS},
+            )
+            manager.users[user.id] = user
+            manager._index_user(user)
+            manager._retain_head_pic(user.head_pic)
+        manager.next_id = data.next_id
+        manager._initialized = True
+        return manager
+
+    @staticmethod
+    def _normalize_email(email: Optional[str]) -> Optional[str]:
+        """规范化邮箱（邮箱不区分大小写）"""
+        return email.strip().lower() if email is not None else None
+
+    def _check_unique(self, user_id: Optional[int], username: Optional[str] = None,
+                      email: Optional[str] = None):
+        """
+        检查用户名和邮箱是否被其他用户占用。
+
+        Args:
+            user_id: 当前用户ID（新建时为 None）
+            username: 要检查的用户名
+            email: 要检查的邮箱
+
+        Raises:
+            ValueError: 用户名或邮箱已被其他用户使用
+        """
+        if username is not None:
+            owner = self._username_index.get(username)
+            if owner is not None and owner != user_id:
+                raise ValueError("Username already taken")
+        if email is not None:
+            owner = self._email_index.get(self._normalize_email(email))
+            if owner is not None and owner != user_id:
+                raise ValueError("Email already registered")
+
+    def _index_user(self, user: Dict):
+        """将用户加入所有索引"""
+        user_id = user['id']
+        self._username_index[user['username']] = user_id
+        if user['email'] is not None:
+            self._email_index[self._normalize_email(user['email'])] = user_id
+        self._attr_index.set(
+            user_id,
+            is_active=user['is_active'],
+            is_admin=user['is_admin'],
+            has_face=user['head_pic'] is not None,
+        )
+        for field, index in self._text_index.items():
+            index.add(user_id, user.get(field))
+        self._record_bytes += estimate_user_bytes(user)
+
+    def _unindex_user(self, user: Dict):
+        """将用户从所有索引中移除"""
+        user_id = user['id']
+        self._username_index.pop(user['username'], None)
+        if user['email'] is not None:
+            self._email_index.pop(self._normalize_email(user['email']), None)
+        self._attr_index.clear(user_id)
+        for index in self._text_index.values():
+            index.remove(user_id)
+        self._record_bytes -= estimate_user_bytes(user)
+
+    def _retain_head_pic(self, digest: Optional[str]):
+        """为头像增加一个引用"""
+        if self._blob_store is None or digest is None:
+            return
+        self._blob_store.incref(digest)
+        self._blob_refs[digest] = self._blob_refs.get(digest, 0) + 1
+
+    def _release_head_pic(self, digest: Optional[str]):
+        """释放头像的一个引用"""
+        if self._blob_store is None or digest is None:
+            return
+        remaining = self._blob_refs.get(digest, 0) - 1
+        if remaining < 0:
+            return
+        if remaining:
+            self._blob_refs[digest] = remaining
+        else:
+            del self._blob_refs[digest]
+        self._blob_store.release(digest)
+
+    def _apply_update(self, user_id: int, update_data: Dict, now: float):
+        """
+        对单个用户应用更新并维护所有索引（调用前需已完成唯一性检查）。
+
+        Args:
+            user_id: 用户ID
+            update_data: 要更新的字段
+            now: 更新时间戳
+        """
+        user = self.users[user_id]
+        self.revision = next(_REVISIONS)
+        fields = {key: value for key, value in update_data.items() if key != 'embedding'}
+        old_head_pic = user['head_pic']
+        head_pic_changed = 'head_pic' in fields and fields['head_pic'] != old_head_pic
+        if head_pic_changed:
+            # 先持有新头像再释放旧头像
+            self._retain_head_pic(fields['head_pic'])
+        reindex = not INDEXED_FIELDS.isdisjoint(fields)
+        if reindex:
+            self._unindex_user(user)
+        user.update(fields)
+        user['updated_at'] = now
+        if reindex:
+            self._index_user(user)
+        # 嵌入向量只保存在向量索引中
+        if head_pic_changed:
+            self._release_head_pic(old_head_pic)
+        if 'embedding' in update_data:
+            self._sync_vector_index(user_id, update_data['embedding'])
+
+        record = {'op': 'update', 'id': user_id, 'now': now, 'data': fields}
+        if 'embedding' in update_data:
+            record['embedding'] = update_data['embedding'] is not None
+        self._log(record, update_data.get('embedding'))
+
+    def _remove_user(self, user_id: int, log: bool = True):
+        """删除单个用户并维护所有索引"""
+        user = self.users.pop(user_id)
+        self.revision = next(_REVISIONS)
+        if log:
+            self._log({'op': 'delete', 'id': user_id})
+        self._unindex_user(user)
+        self._release_head_pic(user['head_pic'])
+        self._vector_index.remove(user_id)
+
+    def _bulk_apply(self, user_ids: List[int], update_data: Dict, now: float):
+        """
+        对多个用户应用相同的更新（调用前需已完成唯一性检查，用户均需存在）。
+
+        所有用户使用同一个时间戳；只涉及位图字段时一次性向量化更新位图，
+        预写日志只记录一条。
+
+        Args:
+            user_ids: 用户ID列表（不重复）
+            update_data: 要更新的字段（embedding 只能为 None）
+            now: 更新时间戳
+        """
+        fields = {key: value for key, value in update_data.items() if key != 'embedding'}
+        unknown = [key for key in fields if key not in USER_FIELDS]
+        if unknown:
+            raise KeyError(f"Unknown user field(s): {', '.join(unknown)}")
+        if update_data.get('embedding') is not None:
+            raise ValueError("Bulk updates can only clear face embeddings")
+        if not user_ids:
+            return
+        self.revision = next(_REVISIONS)
+
+        reindex_text = not TEXT_INDEXED_FIELDS.isdisjoint(fields)
+        set_head_pic = 'head_pic' in fields
+        new_head_pic = fields.get('head_pic')
+        for user_id in user_ids:
+            user = self.users[user_id]
+            old_head_pic = user.head_pic
+            if reindex_text:
+                self._unindex_user(user)
+            if set_head_pic and new_head_pic != old_head_pic:
+                self._retain_head_pic(new_head_pic)
+                self._release_head_pic(old_head_pic)
+            user.update(fields)
+            user.updated_at = now
+            if reindex_text:
+                self._index_user(user)
+
+        if not reindex_text:
+            bits = {name: fields[name] for name in ('is_active', 'is_admin') if name in fields}
+            if set_head_pic:
+                bits['has_face'] = new_head_pic is not None
+            if bits:
+                self._attr_index.set_many(user_ids, **bits)
+        if 'embedding' in update_data:
+            for user_id in user_ids:
+                self._vector_index.remove(user_id)
+
+        self._log({
+            'op': 'bulk_update', 'ids': user_ids, 'now': now, 'data': fields,
+            'embedding': 'embedding' in update_data,
+        })
+
+    def _bulk_remove(self, user_ids: List[int]):
+        """删除多个用户（用户均需存在），预写日志只记录一条"""
+        if not user_ids:
+            return
+        for user_id in user_ids:
+            self._remove_user(user_id, log=False)
+        self._log({'op': 'bulk_delete', 'ids': user_ids})
+
+    def _find_user_ids(self, filters: Dict) -> List[int]:
+        """
+        查找满足所有等值条件的用户ID。
+
+        条件中包含 id、username 或 email 时先通过索引缩小候选范围。
+        """
+        if 'id' in filters:
+            candidates = [filters['id']] if filters['id'] in self.users else []
+        elif 'username' in filters:
+            user_id = self._username_index.get(filters['username'])
+            candidates = [user_id] if user_id is not None else []
+        elif 'email' in filters:
+            user_id = self._email_index.get(self._normalize_email(filters['email']))
+            candidates = [user_id] if user_id is not None else []
+        else:
+            candidates = list(self.users.keys())
+
+        return [
+            user_id for user_id in candidates
+            if all(self.users[user_id].get(key) == value for key, value in filters.items())
+        ]
+
     async def create_user(self, username: str, email: str, full_name: str = None,
                          hashed_password: str = None, is_active: bool = True,
                          is_admin: bool = False, head_pic: str = None, 
-                         embedding: list = None) -> Dict:
+                         embedding: Optional[np.ndarray] = None) -> UserRecord:
         """创建新用户"""
-        # 检查用户名和邮箱是否已存在
-        for user in self.users.values():
-            if user['username'] == username:
-                raise ValueError("Username already taken")
-            if user['email'] == email:
-                raise ValueError("Email already registered")
-                
-        user_id = self.next_id
-        self.next_id += 1
-        
-        user_data = {
-            'id': user_id,
-            'username': username,
-            'email': email,
-            'full_name': full_name,
-            'hashed_password': hashed_password,
-            'is_active': is_active,
-            'is_admin': is_admin,
-            'head_pic': head_pic,
-            'embedding': embedding,
-            'created_at': time.time(),
-            'updated_at': time.time()
-        }
-        
-        self.users[user_id] = user_data
+        async with self._transaction():
+            # 检查用户名和邮箱是否已存在
+            self._check_unique(None, username=username, email=email)
+
+            user_id = self.next_id
+            self.next_id += 1
+
+            now = time.time()
+            user_data = UserRecord(
+                self._vector_index,
+                id=user_id,
+                username=username,
+                email=email,
+                full_name=full_name,
+                hashed_password=hashed_password,
+                is_active=is_active,
+                is_admin=is_admin,
+                head_pic=head_pic,
+                created_at=now,
+                updated_at=now,
+            )
+
+            self._insert_user(user_data, embedding)
+        await self._commit()
         logger.info(f"创建用户: {username} (ID: {user_id})")
         return user_data
+
+    async def bulk_create_users(self, users: List[Dict]) -> List[Optional[UserRecord]]:
+        """
+        批量创建用户（所有用户使用同一个时间戳，预写日志只提交一次）。
+
+        Args:
+            users: 每个用户的字段（与 create_user 的参数相同）
+
+        Returns:
+            与 users 顺序相同的列表，用户名或邮箱已被占用（包括同一批中重复）的用户为 None
+        """
+        now = time.time()
+        created = []
+        async with self._transaction():
+            for fields in users:
+                try:
+                    self._check_unique(None, username=fields['username'], email=fields.get('email'))
+                except ValueError:
+                    created.append(None)
+                    continue
+                user = UserRecord(
+                    self._vector_index,
+                    id=self.next_id,
+                    username=fields['username'],
+                    email=fields.get('email'),
+                    full_name=fields.get('full_name'),
+                    hashed_password=fields.get('hashed_password'),
+                    is_active=fields.get('is_active', True),
+                    is_admin=fields.get('is_admin', False),
+                    head_pic=fields.get('head_pic'),
+                    created_at=now,
+                    updated_at=now,
+                )
+                self.next_id += 1
+                self._insert_user(user, fields.get('embedding'))
+                created.append(user)
+        await self._commit()
+        logger.info(f"批量创建用户: {sum(user is not None for user in created)}/{len(users)}")
+        return created
+
+    def _insert_user(self, user: UserRecord, embedding=None):
+        """加入新用户并维护所有索引"""
+        user_id = user.id
+        self.users[user_id] = user
+        self.revision = next(_REVISIONS)
+        self._log({'op': 'create', 'user': {field: getattr(user, field) for field in USER_FIELDS}},
+                  embedding)
+        self._index_user(user)
+        self._retain_head_pic(user.head_pic)
+        self._sync_vector_index(user_id, embedding)
         
-    async def get_user_by_id(self, user_id: int) -> Optional[Dict]:
+    async def get_user_by_id(self, user_id: int) -> Optional[UserRecord]:
         """根据ID获取用户"""
         return self.users.get(user_id)
         
-    async def get_user_by_username(self, username: str) -> Optional[Dict]:
+    async def get_user_by_username(self, username: str) -> Optional[UserRecord]:
         """根据用户名获取用户"""
-        for user in self.users.values():
-            if user['username'] == username:
-                return user
-        return None
+        user_id = self._username_index.get(username)
+        return self.users.get(user_id) if user_id is not None else None
         
-    async def get_user_by_email(self, email: str) -> Optional[Dict]:
-        """根据邮箱获取用户"""
-        for user in self.users.values():
-            if user['email'] == email:
-                return user
-        return None
+    async def get_user_by_email(self, email: str) -> Optional[UserRecord]:
+        """根据邮箱获取用户（不区分大小写）"""
+        if email is None:
+            return None
+        user_id = self._email_index.get(self._normalize_email(email))
+        return self.users.get(user_id) if user_id is not None else None
         
-    async def get_user(self, *args, **kwargs) -> Optional[Dict]:
+    async def references_head_pic(self, digest: str) -> bool:
+        """是否有用户的头像为该图片"""
+        if self._blob_store is not None:
+            return digest in self._blob_refs
+        return any(user.head_pic == digest for user in self.users.values())
+
+    async def get_user(self, *args, **kwargs) -> Optional[UserRecord]:
         """通用用户查询方法"""
         if 'id' in kwargs:
             return await self.get_user_by_id(kwargs['id'])
@@ -118,7 +631,7 @@ class MemorySqlManager:
             return await self.get_user_by_email(kwargs['email'])
         return None
         
-    async def get_or_none(self, *args, **kwargs) -> Optional[Dict]:
+    async def get_or_none(self, *args, **kwargs) -> Optional[UserRecord]:
         """获取用户或返回None"""
         return await self.get_user(*args, **kwargs)
         
@@ -131,122 +644,264 @@ class MemorySqlManager:
                 
             async def update(self, **update_data):
                 """更新匹配的用户"""
-                updated_count = 0
-                for user_id, user in self.manager.users.items():
-                    match = True
-                    for key, value in self.filters.items():
-                        if user.get(key) != value:
-                            match = False
-                            break
-                    if match:
-                        user.update(update_data)
-                        user['updated_at'] = time.time()
-                        updated_count += 1
-                return updated_count
+                async with self.manager._transaction():
+                    user_ids = self.manager._find_user_ids(self.filters)
+                    # 先完成全部唯一性检查，保证要么全部更新要么全部不更新
+                    if len(user_ids) > 1 and ('username' in update_data or 'email' in update_data):
+                        raise ValueError("Username or email would become duplicated")
+                    for user_id in user_ids:
+                        self.manager._check_unique(
+                            user_id, update_data.get('username'), update_data.get('email')
+                        )
+                    now = time.time()
+                    for user_id in user_ids:
+                        self.manager._apply_update(user_id, update_data, now)
+                await self.manager._commit()
+                return len(user_ids)
                 
             async def delete(self):
                 """删除匹配的用户"""
-                to_delete = []
-                for user_id, user in self.manager.users.items():
-                    match = True
-                    for key, value in self.filters.items():
-                        if user.get(key) != value:
-                            match = False
-                            break
-                    if match:
-                        to_delete.append(user_id)
-                        
-                for user_id in to_delete:
-                    del self.manager.users[user_id]
+                async with self.manager._transaction():
+                    to_delete = self.manager._find_user_ids(self.filters)
+                    for user_id in to_delete:
+                        self.manager._remove_user(user_id)
+                await self.manager._commit()
                 return len(to_delete)
                 
         return FilterResult(self, kwargs)
         
     async def update_user(self, user_id: int, **update_data) -> bool:
         """更新用户信息"""
-        if user_id in self.users:
-            self.users[user_id].update(update_data)
-            self.users[user_id]['updated_at'] = time.time()
-            return True
-        return False
+        async with self._transaction():
+            if user_id not in self.users:
+                return False
+            self._check_unique(user_id, update_data.get('username'), update_data.get('email'))
+            self._apply_update(user_id, update_data, time.time())
+        await self._commit()
+        return True
         
     async def delete_user(self, user_id: int) -> bool:
         """删除用户"""
-        if user_id in self.users:
-            del self.users[user_id]
-            return True
-        return False
+        async with self._transaction():
+            if user_id not in self.users:
+                return False
+            self._remove_user(user_id)
+        await self._commit()
+        return True
         
-    async def list_users(self) -> List[Dict]:
+    async def bulk_update(self, user_ids: Iterable[int], **update_data) -> Dict[int, bool]:
+        """
+        对多个用户应用相同的更新。
+
+        所有用户使用同一个时间戳，索引一次性维护，预写日志只提交一次。
+
+        Args:
+            user_ids: 用户ID（重复的 ID 只处理一次）
+            **update_data: 要更新的字段（embedding 只能为 None）
+
+        Returns:
+            {用户ID: 是否已更新}（不存在的用户为 False）
+
+        Raises:
+            ValueError: 对多个用户设置用户名或邮箱、用户名或邮箱已被占用，或设置非空的嵌入向量
+        """
+        async with self._transaction():
+            outcomes = {user_id: user_id in self.users for user_id in user_ids}
+            found = [user_id for user_id, exists in outcomes.items() if exists]
+            if len(found) > 1 and ('username' in update_data or 'email' in update_data):
+                raise ValueError("Username or email would become duplicated")
+            if len(found) == 1:
+                self._check_unique(found[0], update_data.get('username'), update_data.get('email'))
+            self._bulk_apply(found, update_data, time.time())
+        await self._commit()
+        return outcomes
+
+    async def bulk_delete(self, user_ids: Iterable[int]) -> Dict[int, bool]:
+        """
+        删除多个用户（预写日志只提交一次）。
+
+        Args:
+            user_ids: 用户ID（重复的 ID 只处理一次）
+
+        Returns:
+            {用户ID: 是否已删除}（不存在的用户为 False）
+        """
+        async with self._transaction():
+            outcomes = {user_id: user_id in self.users for user_id in user_ids}
+            self._bulk_remove([user_id for user_id, exists in outcomes.items() if exists])
+        await self._commit()
+        return outcomes
+
+    async def list_users(self) -> List[UserRecord]:
         """列出所有用户"""
         return list(self.users.values())
+
+    async def iter_user_chunks(
+        self, chunk_size: int = 1000
+    ) -> AsyncIterator[List[Tuple[UserRecord, Optional[np.ndarray]]]]:
+        """
+        按块遍历所有用户及其嵌入向量（用于导出）。
+
+        开始时只复制用户 ID（int64 数组），每块的记录和向量在产出时读取，
+        遍历期间被删除的用户会被跳过。
+
+        Args:
+            chunk_size: 每块的用户数
+
+        Yields:
+            [(用户记录, 嵌入向量或 None), ...]
+        """
+        user_ids = np.fromiter(self.users.keys(), dtype=np.int64, count=len(self.users))
+        for start in range(0, len(user_ids), chunk_size):
+            chunk = []
+            for user_id in user_ids[start:start + chunk_size].tolist():
+                user = self.users.get(user_id)
+                if user is not None:
+                    chunk.append((user, self._vector_index.get(user_id)))
+            if chunk:
+                yield chunk
         
-    async def count_users(self) -> int:
-        """统计用户数量"""
-        return len(self.users)
+    async def count_users(self, is_active: Optional[bool] = None,
+                          is_admin: Optional[bool] = None,
+                          has_face: Optional[bool] = None) -> int:
+        """统计用户数量（可按属性过滤，不构造用户列表）"""
+        _, count = await self.query_users(
+            is_active=is_active, is_admin=is_admin, has_face=has_face, limit=0
+        )
+        return count
+
+    async def query_users(self, is_active: Optional[bool] = None,
+                          is_admin: Optional[bool] = None,
+                          has_face: Optional[bool] = None,
+                          contains: Optional[Dict[str, str]] = None,
+                          predicate: Optional[Callable[[UserRecord], bool]] = None,
+                          order_by: str = 'id', descending: bool = False,
+                          offset: int = 0, limit: Optional[int] = None) -> Tuple[List[UserRecord], int]:
+        """
+        按属性索引查询用户，支持排序、分页和计数。
+
+        Args:
+            is_active: 按激活状态过滤
+            is_admin: 按管理员状态过滤
+            has_face: 按是否已设置人脸（head_pic 非空）过滤
+            contains: 文本字段的子串条件 {字段名: 子串}（大小写不敏感）
+            predicate: 额外的逐行过滤函数（仅对索引筛选后的候选执行）
+            order_by: 排序字段（'id' 时无需排序）
+            descending: 是否降序
+            offset: 跳过的记录数
+            limit: 返回的最大记录数（None 表示不限，0 表示只计数）
+
+        Returns:
+            (当前页的用户列表, 满足条件的总数)
+        """
+        end = None if limit is None else offset + limit
+        text_ids = None
+        if contains:
+            # 先查较长的子串，候选更少；短子串的回退扫描只在已有候选中进行
+            for field, value in sorted(contains.items(), key=lambda item: -len(item[1])):
+                matched = self._text_index[field].search(value, text_ids)
+                text_ids = matched if text_ids is None else text_ids & matched
+                if not text_ids:
+                    break
+
+        filtered = text_ids is not None or not (
+            is_active is None and is_admin is None and has_face is None
+        )
+
+        # 属性条件由位图一次算出，无逐行过滤时总数可以直接得到
+        ids = None
+        if filtered:
+            mask = self._attr_index.mask(is_active=is_active, is_admin=is_admin, has_face=has_face)
+            if text_ids is None:
+                ids = np.flatnonzero(mask)
+            else:
+                ids = np.fromiter(text_ids, dtype=np.int64, count=len(text_ids))
+                ids.sort()
+                ids = ids[mask[ids]]
+        count = len(ids) if filtered else len(self.users)
+
+        if predicate is None and end is not None and end <= offset:
+            return [], count
+
+        if order_by == 'id':
+            if not filtered:
+                # 用户按ID递增插入，字典顺序即ID顺序
+                ordered_ids = reversed(self.users) if descending else iter(self.users)
+            else:
+                if descending:
+                    ids = ids[::-1]
+                if predicate is None:
+                    return [self.users[int(user_id)] for user_id in ids[offset:end]], count
+                ordered_ids = (int(user_id) for user_id in ids)
+            rows = (self.users[user_id] for user_id in ordered_ids)
+        else:
+            pool = self.users.values() if not filtered else (self.users[int(i)] for i in ids)
+            rows = iter(sorted(pool, key=lambda user: (user.get(order_by) is None, user.get(order_by)),
+                               reverse=descending))
+
+        if predicate is None:
+            return list(islice(rows, offset, end)), count
+
+        # 有逐行过滤时需要遍历全部候选来计数
+        page = []
+        count = 0
+        for user in rows:
+            if not predicate(user):
+                continue
+            if count >= offset and (end is None or count < end):
+                page.append(user)
+            count += 1
+        return page, count
         
-    async def search_face_embeddings(self, query_vector: List[float], 
+    def _sync_vector_index(self, user_id: int, embedding):
+        """将用户的嵌入向量同步到向量索引"""
+        if embedding is None:
+            self._vector_index.remove(user_id)
+        else:
+            self._vector_index.upsert(user_id, embedding)
+
+    async def search_face_embeddings(self, query_vector: np.ndarray,
                                    limit: int = 1, threshold: float = 0.3) -> List[Dict]:
         """在用户嵌入向量中搜索相似的人脸特征"""
-        results = []
-        
-        for user_id, user_data in self.users.items():
-            # logger.debug(user_data)
-            if user_data.get('embedding') is not None:
-                similarity = self._cosine_similarity(query_vector, user_data['embedding'])
-                logger.debug(f"Similarity for user {user_id}: {similarity}")
-                if similarity >= threshold:
-                    results.append({
-                        'entity': {
-                            'user_id': user_id
-                        },
-                        'distance': 1 - similarity,  # 转换为距离
-                        'id': user_id
-                    })
-        
-        # 按相似度排序并限制结果数量
-        results.sort(key=lambda x: x['distance'])
-        return [results[:limit]] if results else [[]]
+        matches = self._vector_index.search(query_vector, limit=limit, threshold=threshold)[0]
+        return to_search_results(matches, limit)
+
+    async def search_face_embeddings_batch(self, query_vectors,
+                                           limit: int = 1, threshold: float = 0.3) -> List[List[Dict]]:
+        """
+        批量搜索相似的人脸特征。
+
+        Args:
+            query_vectors: 查询向量矩阵 (N, dim)
+            limit: 每个查询返回的最大结果数
+            threshold: 余弦相似度阈值
+
+        Returns:
+            每个查询对应一个与 search_face_embeddings 相同格式的结果
+        """
+        if len(query_vectors) == 0:
+            return []
+        matches = self._vector_index.search(query_vectors, limit=limit, threshold=threshold)
+        return [to_search_results(m, limit) for m in matches]
         
-    async def upsert_face_embedding(self, user_id: int, feature_vector: List[float]) -> Dict:
+    async def upsert_face_embedding(self, user_id: int, feature_vector: np.ndarray) -> Dict:
         """插入或更新用户的人脸嵌入向量"""
-        if user_id in self.users:
-            self.users[user_id]['embedding'] = feature_vector
-            self.users[user_id]['updated_at'] = time.time()
-            return {"insertedIds": [user_id]}
-        else:
-            raise ValueError(f"User with id {user_id} not found")
+        async with self._transaction():
+            if user_id not in self.users:
+                raise ValueError(f"User with id {user_id} not found")
+            self._apply_update(user_id, {'embedding': feature_vector}, time.time())
+        await self._commit()
+        return {"insertedIds": [user_id]}
             
     async def delete_face_embedding(self, user_id: int) -> Dict:
         """删除用户的人脸嵌入向量"""
-        if user_id in self.users:
-            self.users[user_id]['embedding'] = None
-            self.users[user_id]['head_pic'] = None
-            self.users[user_id]['updated_at'] = time.time()
-            return {"deleted_count": 1}
-        else:
-            return {"deleted_count": 0}
+        async with self._transaction():
+            if user_id not in self.users:
+                return {"deleted_count": 0}
+            self._apply_update(user_id, {'embedding': None, 'head_pic': None}, time.time())
+        await self._commit()
+        return {"deleted_count": 1}
             
-    def _cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
-        """计算两个向量的余弦相似度"""        
-        # 转换为numpy数组
-        v1 = np.array(vec1)
-        v2 = np.array(vec2)
-        
-        # 计算点积
-        dot_product = np.dot(v1, v2)
-        
-        # 计算向量的模长
-        norm1 = np.linalg.norm(v1)
-        norm2 = np.linalg.norm(v2)
-        
-        # 避免除零错误
-        if norm1 == 0 or norm2 == 0:
-            return 0.0
-            
-        # 计算余弦相似度
-        return float(dot_product / (norm1 * norm2))
-        
     def get_user_model_mock(self):
         """获取用户模型的模拟对象（用于兼容现有代码）"""
         class UserModelMock:
@@ -343,4 +998,4 @@ MEMORY_MILVUS_MANAGER = MemoryMilvusManager()
 #     for user in all_users:
 #         print(f"- {user['username']} ({'管理员' if user['is_admin'] else '普通用户'})")
         
-#     return admin_user is not None
\ No newline at end of file
+#     return admin_user is not None
@@ -0,0 +1,120 @@
+"""
+内存 N-gram 子串索引模块。
+
+此模块为文本字段维护 trigram（3-gram）倒排表，
+大小写不敏感的子串查询只需对查询串的各个 gram 的倒排表求交集，
+再对少量候选做一次子串校验，无需遍历所有记录。
+"""
+
+from typing import Dict, Iterable, Optional, Set
+
+
+class NgramIndex:
+    """
+    大小写不敏感的 N-gram 子串索引。
+
+    每个 ID 对应一段文本，索引保存 gram 到 ID 集合的倒排表，
+    以及 ID 到小写文本的映射（用于候选校验和短查询回退扫描）。
+    """
+
+    def __init__(self, n: int = 3):
+        """
+        初始化 N-gram 索引。
+
+        Args:
+            n: gram 长度
+        """
+        self.n = n
+        self._postings: Dict[str, Set[int]] = {}  # {gram: {item_id, ...}}
+        self._texts: Dict[int, str] = {}  # {item_id: 小写文本}
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def _grams(self, text: str) -> Set[str]:
+        """返回文本中所有不重复的 gram"""
+        return {text[i:i + self.n] for i in range(len(text) - self.n + 1)}
+
+    def copy(self) -> "NgramIndex":
+        """返回独立的副本"""
+        clone = NgramIndex(self.n)
+        clone._postings = {gram: set(ids) for gram, ids in self._postings.items()}
+        clone._texts = dict(self._texts)
+        return clone
+
+    def add(self, item_id: int, text: Optional[str]):
+        """
+        添加或替换 ID 对应的文本。
+
+        Args:
+            item_id: 记录 ID
+            text: 文本（为 None 时仅移除旧文本）
+        """
+        self.remove(item_id)
+        if text is None:
+            return
+        text = text.lower()
+        self._texts[item_id] = text
+        for gram in self._grams(text):
+            self._postings.setdefault(gram, set()).add(item_id)
+
+    def remove(self, item_id: int) -> bool:
+        """
+        移除 ID 对应的文本。
+
+        Returns:
+            bool: 是否存在并被移除
+        """
+        text = self._texts.pop(item_id, None)
+        if text is None:
+            return False
+        for gram in self._grams(text):
+            postings = self._postings.get(gram)
+            if postings is None:
+                continue
+            postings.discard(item_id)
+            if not postings:
+                del self._postings[gram]
+        return True
+
+    def clear(self):
+        """清空索引"""
+        self._postings.clear()
+        self._texts.clear()
+
+    def search(self, query: str, candidates: Optional[Iterable[int]] = None) -> Set[int]:
+        """
+        查找文本中包含 query 的所有 ID（大小写不敏感）。
+
+        Args:
+            query: 子串
+            candidates: 可选的候选 ID 范围（仅用于短查询的回退扫描）
+
+        Returns:
+            匹配的 ID 集合
+        """
+        query = query.lower()
+        if len(query) < self.n:
+            # 查询串短于 gram 长度时无法使用倒排表，回退到扫描
+            ids = self._texts.keys() if candidates is None else candidates
+            texts = self._texts
+            return {
+                item_id for item_id in ids
+                if item_id in texts and query in texts[item_id]
+            }
+
+        postings = []
+        for gram in self._grams(query):
+            ids = self._postings.get(gram)
+            if not ids:
+                return set()
+            postings.append(ids)
+
+        # 从最短的倒排表开始求交集，中间结果不会超过它
+        postings.sort(key=len)
+        matched = postings[0].intersection(*postings[1:])
+        if len(query) == self.n:
+            return matched
+        # 各 gram 都出现不代表它们连续出现，需要逐个校验
+        texts = self._texts
+        return {item_id for item_id in matched if query in texts[item_id]}
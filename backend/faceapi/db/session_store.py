@@ -0,0 +1,489 @@
+"""
+多进程共享的会话存储模块。
+
+uvicorn 以多个工作进程运行时，进程内的会话管理器互相不可见。
+此模块把会话表和内存会话数据库的修改保存在同一个 SQLite 文件（WAL 模式）中，
+各工作进程共享：
+
+- sessions: 会话（IP 地址、创建和过期时间）以及内存会话数据库的最近一次快照
+- session_log: 快照之后的修改日志（记录格式与预写日志相同，按会话内的序号排列）
+
+每个工作进程在内存中保留所访问会话的副本（MemorySqlManager）作为读缓存：
+读取前通过 PRAGMA data_version 判断其他进程是否有写入，只在有写入时读入新的日志记录。
+修改在 SQLite 的写锁（BEGIN IMMEDIATE）内进行：先读入其他进程的修改，
+再检查并应用本次修改、追加日志后提交，因此各副本按相同顺序应用所有修改。
+
+SQLite 的操作（包括等待其他进程释放写锁）都在每个进程的专用线程中执行，
+不阻塞事件循环；同一进程内的操作由 asyncio 锁串行化。
+"""
+
+import asyncio
+import functools
+import json
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple, TypeVar
+
+import numpy as np
+
+from .snapshot import SnapshotData
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    ip TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    snapshot_seq INTEGER NOT NULL DEFAULT 0,
+    snapshot TEXT,
+    matrix BLOB
+);
+CREATE TABLE IF NOT EXISTS session_log (
+    ip TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    record TEXT NOT NULL,
+    embedding BLOB,
+    PRIMARY KEY (ip, seq)
+) WITHOUT ROWID;
+"""
+
+LogRecord = Tuple[Dict[str, Any], Optional[bytes]]
+PackedSnapshot = Tuple[str, bytes]
+T = TypeVar("T")
+
+
+class SessionRow(NamedTuple):
+    """共享存储中的一个会话"""
+
+    ip_address: str
+    created_at: float
+    expires_at: float
+    snapshot_seq: int  # 快照包含的最后一条日志的序号
+
+
+def pack_snapshot(data: SnapshotData) -> PackedSnapshot:
+    """将快照编码为 (JSON, float32 矩阵字节)（可在线程中执行）"""
+    fields = list(data.records[0].keys()) if data.records else []
+    matrix = np.ascontiguousarray(data.matrix, dtype=np.float32)
+    manifest = {
+        "next_id": data.next_id,
+        "ids": np.asarray(data.ids, dtype=np.int64).tolist(),
+        "dim": matrix.shape[1] if matrix.ndim == 2 else 0,
+        "fields": fields,
+        "records": [[record[field] for field in fields] for record in data.records],
+    }
+    return json.dumps(manifest, ensure_ascii=False, separators=(",", ":")), matrix.tobytes()
+
+
+def unpack_snapshot(snapshot: str, matrix: Optional[bytes]) -> SnapshotData:
+    """解码 pack_snapshot() 的结果（矩阵可写，作为向量索引直接使用）"""
+    manifest = json.loads(snapshot)
+    ids = np.asarray(manifest["ids"], dtype=np.int64)
+    array = np.frombuffer(bytearray(matrix or b""), dtype=np.float32)
+    array = array.reshape(len(ids), manifest["dim"]) if len(ids) else array.reshape(0, manifest["dim"])
+    fields = manifest["fields"]
+    records = [dict(zip(fields, values)) for values in manifest["records"]]
+    return SnapshotData(manifest["next_id"], records, ids, array)
+
+
+class SharedSessionStore:
+    """
+    基于 SQLite（WAL 模式）的会话存储，同一台机器上的所有工作进程共用一个文件。
+
+    每个进程在首次使用时打开自己的连接。同步方法直接访问连接，
+    在事件循环中通过 run() 在专用线程中执行（读取不会被写入阻塞，
+    写入只在其他进程提交期间等待，等待期间不阻塞事件循环）。
+    """
+
+    def __init__(self, path: str, busy_timeout: float = 5.0):
+        """
+        初始化共享会话存储。
+
+        Args:
+            path: SQLite 数据库文件
+            busy_timeout: 等待其他进程释放写锁的最长时间（秒）
+        """
+        self.path = Path(path)
+        self.busy_timeout = busy_timeout
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+        # 同一进程内的操作（包括跨多次调用的写事务）按顺序执行
+        self.io_lock = asyncio.Lock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """当前进程的连接（fork 之后重新打开）"""
+        if self._conn is None or self._pid != os.getpid():
+            with self._lock:
+                if self._conn is None or self._pid != os.getpid():
+                    self.path.parent.mkdir(parents=True, exist_ok=True)
+                    conn = sqlite3.connect(
+                        self.path, timeout=self.busy_timeout,
+                        isolation_level=None, check_same_thread=False,
+                    )
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    # WAL 模式下提交时不 fsync，只在检查点时 fsync（断电时可能丢失最近的提交）
+                    conn.execute("PRAGMA synchronous=NORMAL")
+                    conn.executescript(_SCHEMA)
+                    self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """当前进程中执行 SQLite 操作的专用线程（提交的操作按顺序执行）"""
+        if self._executor is None or self._executor_pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._executor_pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(1, thread_name_prefix="session-store")
+                    self._executor_pid = os.getpid()
+        return self._executor
+
+    async def call(self, func: Callable[..., T], *args) -> T:
+        """在专用线程中执行同步操作（调用方需已持有 io_lock）"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args))
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        """获取 io_lock 后在专用线程中执行同步操作（如 await store.run(store.get, ip)）"""
+        async with self.io_lock:
+            return await self.call(func, *args)
+
+    def close(self):
+        """关闭当前进程的连接"""
+        if self._executor is not None and self._executor_pid == os.getpid():
+            self._executor.shutdown()
+        self._executor = None
+        if self._conn is not None and self._pid == os.getpid():
+            self._conn.close()
+        self._conn = None
+
+    def data_version(self) -> int:
+        """其他连接每次提交后都会变化的版本号（用于判断读缓存是否需要刷新）"""
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def begin(self):
+        """开始写事务（立即获取写锁）"""
+        self.conn.execute("BEGIN IMMEDIATE")
+
+    def commit(self):
+        """提交写事务"""
+        self.conn.execute("COMMIT")
+
+    def rollback(self):
+        """回滚写事务"""
+        if self.conn.in_transaction:
+            self.conn.execute("ROLLBACK")
+
+    def get(self, ip_address: str) -> Optional[SessionRow]:
+        """获取会话（不检查是否过期）"""
+        row = self.conn.execute(
+            "SELECT ip, created_at, expires_at, snapshot_seq FROM sessions WHERE ip = ?",
+            (ip_address,),
+        ).fetchone()
+        return SessionRow(*row) if row else None
+
+    def create(self, ip_address: str, created_at: float, expires_at: float,
+               snapshot: Optional[PackedSnapshot] = None) -> bool:
+        """
+        创建会话（替换该 IP 已过期的会话）。
+
+        Args:
+            ip_address: 客户端 IP 地址
+            created_at: 创建时间戳（同时用于区分同一 IP 先后创建的会话）
+            expires_at: 过期时间戳
+            snapshot: 内存会话数据库的初始状态（pack_snapshot() 的结果，持久化模式下为 None）
+
+        Returns:
+            该 IP 已有未过期的会话时返回 False
+        """
+        packed = snapshot if snapshot is not None else (None, None)
+        self.begin()
+        try:
+            existing = self.get(ip_address)
+            if existing is not None and existing.expires_at > created_at:
+                self.rollback()
+                return False
+            self.conn.execute("DELETE FROM session_log WHERE ip = ?", (ip_address,))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, 0, ?, ?)",
+                (ip_address, created_at, expires_at, *packed),
+            )
+            self.commit()
+        except BaseException:
+            self.rollback()
+            raise
+        return True
+
+    def delete(self, ip_address: str, created_at: Optional[float] = None) -> bool:
+        """
+        删除会话及其日志。
+
+        Args:
+            ip_address: 客户端 IP 地址
+            created_at: 只删除该时间创建的会话（防止删除其他进程刚重新创建的会话）
+
+        Returns:
+            是否删除了会话
+        """
+        self.begin()
+        try:
+            existing = self.get(ip_address)
+            if existing is None or (created_at is not None and existing.created_at != created_at):
+                self.rollback()
+                return False
+            self.conn.execute("DELETE FROM session_log WHERE ip = ?", (ip_address,))
+            self.conn.execute("DELETE FROM sessions WHERE ip = ?", (ip_address,))
+            self.commit()
+        except BaseException:
+            self.rollback()
+            raise
+        return True
+
+    def delete_expired(self, now: float) -> int:
+        """删除所有已过期的会话，返回删除数"""
+        self.begin()
+        try:
+            expired = [ip for ip, in self.conn.execute(
+                "SELECT ip FROM sessions WHERE expires_at <= ?", (now,)
+            )]
+            for ip_address in expired:
+                self.conn.execute("DELETE FROM session_log WHERE ip = ?", (ip_address,))
+            self.conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+            self.commit()
+        except BaseException:
+            self.rollback()
+            raise
+        return len(expired)
+
+    def count_active(self, now: float) -> int:
+        """未过期的会话数"""
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM sessions WHERE expires_at > ?", (now,)
+        ).fetchone()[0]
+
+    def load(self, ip_address: str) -> Optional[Tuple[SessionRow, Optional[SnapshotData], List[LogRecord]]]:
+        """
+        读取会话的快照和之后的全部日志（用于在本进程中构建副本）。
+
+        Returns:
+            (会话, 快照或 None, [(操作内容, 嵌入向量字节), ...])，会话不存在时返回 None
+        """
+        # 在一个读事务中读取，保证快照和日志一致
+        self.conn.execute("BEGIN")
+        try:
+            row = self.conn.execute(
+                "SELECT ip, created_at, expires_at, snapshot_seq, snapshot, matrix "
+                "FROM sessions WHERE ip = ?",
+                (ip_address,),
+            ).fetchone()
+            if row is None:
+                return None
+            session = SessionRow(*row[:4])
+            log = self.read_log(ip_address, session.snapshot_seq)
+        finally:
+            self.conn.execute("COMMIT")
+        snapshot = unpack_snapshot(row[4], row[5]) if row[4] is not None else None
+        return session, snapshot, log
+
+    def read_log(self, ip_address: str, after_seq: int) -> List[Tuple[int, Dict[str, Any], Optional[bytes]]]:
+        """
+        读取序号大于 after_seq 的日志记录。
+
+        Returns:
+            [(序号, 操作内容, 嵌入向量字节或 None), ...]（按序号升序）
+        """
+        return [
+            (seq, json.loads(record), embedding)
+            for seq, record, embedding in self.conn.execute(
+                "SELECT seq, record, embedding FROM session_log "
+                "WHERE ip = ? AND seq > ? ORDER BY seq",
+                (ip_address, after_seq),
+            )
+        ]
+
+    def append_log(self, ip_address: str, first_seq: int, records: Iterable[LogRecord]):
+        """在写事务中追加日志记录，序号从 first_seq 开始连续分配"""
+        self.conn.executemany(
+            "INSERT INTO session_log VALUES (?, ?, ?, ?)",
+            (
+                (ip_address, seq, json.dumps(record, ensure_ascii=False, separators=(",", ":")),
+                 embedding)
+                for seq, (record, embedding) in enumerate(records, start=first_seq)
+            ),
+        )
+
+    def save_snapshot(self, ip_address: str, created_at: float, seq: int,
+                      snapshot: PackedSnapshot) -> bool:
+        """
+        保存包含序号 seq 之前所有日志的快照（压缩）。
+
+        只删除上一个快照已包含的日志，保留一代日志，
+        刚读取过旧快照的其他进程仍可以从日志追上。
+
+        Args:
+            ip_address: 客户端 IP 地址
+            created_at: 会话的创建时间戳
+            seq: 快照包含的最后一条日志的序号
+            snapshot: pack_snapshot() 的结果
+
+        Returns:
+            会话已不存在或已有更新的快照时返回 False
+        """
+        snapshot, matrix = snapshot
+        self.begin()
+        try:
+            existing = self.get(ip_address)
+            if existing is None or existing.created_at != created_at or existing.snapshot_seq >= seq:
+                self.rollback()
+                return False
+            self.conn.execute(
+                "DELETE FROM session_log WHERE ip = ? AND seq <= ?",
+                (ip_address, existing.snapshot_seq),
+            )
+            self.conn.execute(
+                "UPDATE sessions SET snapshot_seq = ?, snapshot = ?, matrix = ? WHERE ip = ?",
+                (seq, snapshot, matrix, ip_address),
+            )
+            self.commit()
+        except BaseException:
+            self.rollback()
+            raise
+        return True
+
+    def referenced_digests(self) -> Set[str]:
+        """
+        所有会话的快照和日志中出现的头像摘要（清理未引用的头像时保留）。
+
+        包括已被后续修改替换的头像，结果可能多于实际引用的头像。
+        """
+        digests = set()
+        for snapshot, in self.conn.execute(
+            "SELECT snapshot FROM sessions WHERE snapshot IS NOT NULL"
+        ):
+            manifest = json.loads(snapshot)
+            if "head_pic" in manifest["fields"]:
+                column = manifest["fields"].index("head_pic")
+                digests.update(values[column] for values in manifest["records"])
+        for record, in self.conn.execute("SELECT record FROM session_log"):
+            record = json.loads(record)
+            fields = record.get('user') or record.get('data') or {}
+            digests.add(fields.get('head_pic'))
+        digests.discard(None)
+        return digests
+
+
+class SessionJournal:
+    """
+    会话在共享存储中的修改日志（挂在本进程的会话副本 MemorySqlManager 上）。
+
+    修改的流程为 begin()（获取写锁并应用其他进程的修改）→ 应用修改并 append()
+    → commit()（写入日志并提交）。从 begin() 到 commit() 或 rollback()
+    持有存储的 io_lock，SQLite 的操作在存储的专用线程中执行。
+    """
+
+    def __init__(self, store: SharedSessionStore, session: SessionRow, seq: int):
+        """
+        初始化会话日志。
+
+        Args:
+            store: 共享会话存储
+            session: 对应的会话
+            seq: 副本已应用的最后一条日志的序号
+        """
+        self.store = store
+        self.session = session
+        self.seq = seq
+        # 副本与共享存储不一致（提交失败或缺少已被压缩的日志），需要重新构建
+        self.stale = False
+        self._buffer: List[LogRecord] = []
+
+    async def refresh(self, manager) -> bool:
+        """
+        将其他进程的修改应用到副本。
+
+        Returns:
+            副本是否仍然可用（False 时需要从共享存储重新构建）
+        """
+        if not self.stale:
+            self._apply(manager, await self.store.run(self.store.read_log, self.session.ip_address, self.seq))
+        return not self.stale
+
+    def _apply(self, manager, rows: List[Tuple[int, Dict[str, Any], Optional[bytes]]]):
+        """应用读取到的日志记录（序号不连续时标记为需要重新构建）"""
+        if not rows:
+            return
+        if rows[0][0] != self.seq + 1:
+            self.stale = True
+            return
+        manager.replay((record, embedding) for _, record, embedding in rows)
+        self.seq = rows[-1][0]
+
+    def _begin(self) -> Optional[List[Tuple[int, Dict[str, Any], Optional[bytes]]]]:
+        """获取写锁并读取其他进程的修改（在专用线程中执行，会话已不存在时返回 None）"""
+        self.store.begin()
+        current = self.store.get(self.session.ip_address)
+        if current is None or current.created_at != self.session.created_at:
+            return None
+        return self.store.read_log(self.session.ip_address, self.seq)
+
+    def _abort(self):
+        """在专用线程中回滚（排在已提交的操作之后，调用方被取消时也会执行）"""
+        self.store.executor.submit(self.store.rollback)
+
+    async def begin(self, manager):
+        """
+        开始一次修改：获取写锁，并应用其他进程的修改。
+
+        Raises:
+            LookupError: 会话已被删除或副本需要重新构建
+        """
+        await self.store.io_lock.acquire()
+        try:
+            rows = await self.store.call(self._begin)
+            if rows is None:
+                self.stale = True
+                raise LookupError(f"Session {self.session.ip_address} no longer exists")
+            self._apply(manager, rows)
+            if self.stale:
+                raise LookupError(f"Session {self.session.ip_address} replica is out of date")
+        except BaseException:
+            self._abort()
+            self.store.io_lock.release()
+            raise
+
+    def append(self, record: Dict[str, Any], embedding: Optional[bytes] = None):
+        """追加一条修改记录（commit() 时写入）"""
+        self._buffer.append((record, embedding))
+
+    def _commit(self, batch: List[LogRecord]):
+        """写入日志并提交（在专用线程中执行）"""
+        if batch:
+            self.store.append_log(self.session.ip_address, self.seq + 1, batch)
+        self.store.commit()
+
+    async def commit(self):
+        """写入本次修改的日志并提交"""
+        batch, self._buffer = self._buffer, []
+        try:
+            await self.store.call(self._commit, batch)
+        except BaseException:
+            # 副本已应用了未能写入的修改
+            self.stale = True
+            self._abort()
+            raise
+        finally:
+            self.store.io_lock.release()
+        self.seq += len(batch)
+
+    def rollback(self):
+        """放弃本次修改（已应用到副本的修改无法撤销，副本需要重新构建）"""
+        if self._buffer:
+            self.stale = True
+            self._buffer = []
+        self._abort()
+        self.store.io_lock.release()
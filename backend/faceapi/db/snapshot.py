@@ -0,0 +1,249 @@
+"""
+内存数据库快照模块。
+
+此模块将 MemorySqlManager 的状态（用户记录、嵌入向量矩阵和头像引用）
+写入磁盘上的紧凑格式，并在启动时快速恢复，
+无需对所有头像重新推理即可重建人脸库。
+
+每个快照由两个文件组成：
+- <name>.json: 格式版本、会话键、next_id、嵌入向量对应的 ID 和用户记录（字段名 + 各记录的值列表）
+- <name>.<generation>.npy: 嵌入向量矩阵（已归一化的 float32）
+此外，快照之后的修改记录在同名的预写日志 <name>.<段号>.wal 中（见 wal 模块）。
+
+恢复时以 mmap（写时复制）方式打开 .npy，只在访问时读入内存。
+先写入新一代的 .npy，再原子地替换 .json，最后删除旧一代的 .npy，
+因此任何时刻 .json 引用的矩阵文件都是完整的。
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from .wal import WAL_SUFFIX, WriteAheadLog, list_segments, read_records
+
+SNAPSHOT_FORMAT_VERSION = 1
+
+
+class SnapshotData(NamedTuple):
+    """快照的内容"""
+
+    next_id: int
+    records: List[Dict[str, Any]]  # 用户记录的字段值（不含 embedding）
+    ids: np.ndarray  # 嵌入向量对应的用户 ID (N,)
+    matrix: np.ndarray  # 已归一化的嵌入向量矩阵 (N, dim)
+    wal_segment: int = 0  # 恢复时从该段开始重放预写日志
+
+
+class SnapshotStore:
+    """
+    内存数据库快照的存储目录。
+
+    快照按键（会话的 IP 地址）保存，文件名为键的摘要，键本身记录在 .json 中。
+    """
+
+    def __init__(self, root: str):
+        """
+        初始化快照存储。
+
+        Args:
+            root: 快照目录
+        """
+        self.root = Path(root)
+        self._lock = threading.Lock()  # 串行化同一目录的文件操作
+
+    @staticmethod
+    def _name(key: str) -> str:
+        """返回键对应的文件名（不含扩展名）"""
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+    def _write_atomic(self, path: Path, writer):
+        """通过临时文件写入后重命名"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                writer(f)
+                # 快照写入后会删除旧的预写日志，因此必须确保快照已落盘
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def save(self, key: str, data: SnapshotData):
+        """
+        写入快照（替换该键已有的快照）。
+
+        Args:
+            key: 快照键
+            data: 快照内容
+        """
+        with self._lock:
+            self._save(key, data)
+
+    def _save(self, key: str, data: SnapshotData):
+        """写入快照（调用方需持有锁）"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        name = self._name(key)
+        manifest_path = self.root / f"{name}.json"
+        old_matrix = None
+        if manifest_path.exists():
+            try:
+                old_matrix = json.loads(manifest_path.read_text("utf-8")).get("matrix")
+            except (OSError, ValueError):
+                pass
+        generation = os.urandom(4).hex()
+        matrix_name = f"{name}.{generation}.npy"
+
+        ids = np.ascontiguousarray(data.ids, dtype=np.int64)
+        matrix = np.ascontiguousarray(data.matrix, dtype=np.float32)
+        self._write_atomic(self.root / matrix_name, lambda f: np.save(f, matrix))
+
+        fields = list(data.records[0].keys()) if data.records else []
+        manifest = {
+            "version": SNAPSHOT_FORMAT_VERSION,
+            "key": key,
+            "next_id": data.next_id,
+            "wal_segment": data.wal_segment,
+            "matrix": matrix_name,
+            "ids": ids.tolist(),
+            "fields": fields,
+            "records": [[record[field] for field in fields] for record in data.records],
+        }
+        payload = json.dumps(manifest, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self._write_atomic(manifest_path, lambda f: f.write(payload))
+        # 确保重命名本身落盘
+        dir_fd = os.open(self.root, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+        if old_matrix and old_matrix != matrix_name:
+            (self.root / old_matrix).unlink(missing_ok=True)
+        # 快照已包含的预写日志段不再需要（未使用日志时删除全部段）
+        for segment, path in list_segments(self.root, name):
+            if data.wal_segment == 0 or segment < data.wal_segment:
+                path.unlink(missing_ok=True)
+
+    def load(self, manifest_path: Path) -> Tuple[str, SnapshotData]:
+        """
+        读取一个快照。
+
+        Args:
+            manifest_path: 快照的 .json 文件
+
+        Returns:
+            (快照键, 快照内容)，矩阵为写时复制的 mmap
+
+        Raises:
+            ValueError: 快照格式不受支持或已损坏
+        """
+        manifest = json.loads(manifest_path.read_text("utf-8"))
+        if manifest.get("version") != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot version: {manifest.get('version')}")
+        ids = np.asarray(manifest["ids"], dtype=np.int64)
+        matrix = np.load(self.root / manifest["matrix"], mmap_mode="c")
+        if matrix.ndim != 2 or len(matrix) != len(ids):
+            raise ValueError(f"Corrupted snapshot matrix: {manifest['matrix']}")
+        fields = manifest["fields"]
+        records = [dict(zip(fields, values)) for values in manifest["records"]]
+        return manifest["key"], SnapshotData(
+            manifest["next_id"], records, ids, matrix, manifest.get("wal_segment", 0)
+        )
+
+    def load_key(self, key: str) -> Optional[SnapshotData]:
+        """
+        读取键对应的快照。
+
+        Returns:
+            快照内容（没有快照时为 None）
+
+        Raises:
+            ValueError: 快照格式不受支持或已损坏
+        """
+        manifest_path = self.root / f"{self._name(key)}.json"
+        if not manifest_path.exists():
+            return None
+        return self.load(manifest_path)[1]
+
+    def load_all(self) -> Iterator[Tuple[str, SnapshotData]]:
+        """读取目录中的所有快照（跳过并记录无法读取的快照）"""
+        if not self.root.is_dir():
+            return
+        for manifest_path in sorted(self.root.glob("*.json")):
+            try:
+                yield self.load(manifest_path)
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"无法读取快照 {manifest_path.name}: {e}")
+
+    def open_wal(self, key: str, commit_delay: float = 0.0) -> WriteAheadLog:
+        """
+        打开键对应的预写日志（新记录写入比现有段更新的段）。
+
+        Args:
+            key: 快照键
+            commit_delay: 组提交前等待更多记录的时间（秒）
+        """
+        name = self._name(key)
+        segments = list_segments(self.root, name)
+        segment = segments[-1][0] + 1 if segments else 1
+        return WriteAheadLog(self.root, name, segment=segment, commit_delay=commit_delay)
+
+    def read_wal(self, key: str, from_segment: int = 0) -> Iterator[Tuple[Dict[str, Any], Optional[bytes]]]:
+        """
+        按顺序读取键对应的预写日志中段号不小于 from_segment 的记录。
+
+        Yields:
+            (操作内容, 嵌入向量字节或 None)
+        """
+        for segment, path in list_segments(self.root, self._name(key)):
+            if segment >= from_segment:
+                yield from read_records(path)
+
+    def remove(self, key: str):
+        """删除键对应的快照"""
+        name = self._name(key)
+        with self._lock:
+            for path in self.root.glob(f"{name}.*"):
+                path.unlink(missing_ok=True)
+
+    def prune(self, keep: Optional[set] = None) -> int:
+        """
+        删除不在 keep 中的快照和预写日志，以及未被引用的矩阵和临时文件。
+
+        Args:
+            keep: 要保留的快照键
+
+        Returns:
+            删除的快照数
+        """
+        if not self.root.is_dir():
+            return 0
+        keep_names = {self._name(key) for key in keep or ()}
+        referenced = set()
+        removed = 0
+        with self._lock:
+            for manifest_path in self.root.glob("*.json"):
+                if manifest_path.stem not in keep_names:
+                    manifest_path.unlink(missing_ok=True)
+                    removed += 1
+                    continue
+                try:
+                    referenced.add(json.loads(manifest_path.read_text("utf-8"))["matrix"])
+                except (OSError, ValueError, KeyError):
+                    pass
+            for path in self.root.iterdir():
+                if path.suffix in (".npy", ".tmp") and path.name not in referenced:
+                    path.unlink(missing_ok=True)
+                elif path.suffix == WAL_SUFFIX and path.name.split(".")[0] not in keep_names:
+                    path.unlink(missing_ok=True)
+        return removed
@@ -0,0 +1,641 @@
+"""
+基于 Tortoise ORM 的持久化数据库管理器模块。
+
+此模块提供与 MemorySqlManager 相同接口的持久化管理器，
+用户数据保存在 Tortoise 连接的数据库（默认 SQLite）中，
+人脸嵌入向量以 float32 字节串保存，启动时载入内存向量索引用于相似度搜索。
+多个工作进程共享同一数据库时，通过嵌入向量的变更记录表在每次搜索前同步各进程的索引。
+"""
+
+import asyncio
+from datetime import datetime, timezone
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+from tortoise.exceptions import IntegrityError
+from tortoise.transactions import in_transaction
+
+from ..models.embedding_change import EmbeddingChangeModel
+from ..models.user import UserModel
+from .blob_store import BlobStore
+from .embedding_codec import decode_embedding, encode_embedding, is_legacy_embedding
+from .memory_managers import TEXT_SEARCH_FIELDS
+from .vector_index import VectorIndex, to_search_results
+
+# 返回给服务层的字段（与 UserRecord 的字段一致，不包含嵌入向量）
+USER_COLUMNS = (
+    'id',
+    'username',
+    'email',
+    'full_name',
+    'hashed_password',
+    'is_active',
+    'is_admin',
+    'head_pic',
+    'created_at',
+    'updated_at',
+)
+
+# 不允许通过更新修改的字段
+READONLY_COLUMNS = {'id', 'created_at', 'updated_at'}
+
+# 批量操作时每条 SQL 语句包含的最大 ID 数（SQLite 对语句中的参数数量有限制）
+BULK_CHUNK_SIZE = 500
+
+# 嵌入向量变更记录的保留条数（落后更多的进程重新载入整个向量索引）
+CHANGE_LOG_RETENTION = 10000
+# 每写入多少条变更记录清理一次旧记录
+CHANGE_LOG_PRUNE_INTERVAL = 1000
+
+
+def _chunks(items: List, size: int = BULK_CHUNK_SIZE) -> Iterator[List]:
+    """按固定大小分割列表"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class TortoiseSqlManager:
+    """
+    基于 Tortoise ORM 的 SQL 数据库管理器。
+
+    与 MemorySqlManager 提供相同的用户操作和人脸搜索接口，
+    所有会话共享同一个实例。调用前需已完成 Tortoise.init()。
+    """
+
+    def __init__(self, blob_store: Optional[BlobStore] = None):
+        """
+        初始化持久化 SQL 管理器
+
+        Args:
+            blob_store: 保存头像的存储（提供时维护数据库中头像的引用计数）
+        """
+        self._vector_index = VectorIndex()  # 人脸嵌入向量索引
+        self._revision = 0  # 已反映到向量索引的最后一条变更记录 ID
+        self._refresh_lock = asyncio.Lock()
+        self._blob_store = blob_store
+        self._initialized = False
+        self._init_lock = asyncio.Lock()
+
+    async def initialize(self):
+        """载入向量索引和头像引用，并创建默认管理员"""
+        if self._initialized:
+            return
+        async with self._init_lock:
+            if self._initialized:
+                return
+            logger.info("初始化持久化 SQL 管理器")
+            legacy_ids = await self._load_vector_index()
+            if legacy_ids:
+                # 将旧版本以 JSON 列表保存的嵌入向量改写为 float32 字节
+                async with in_transaction():
+                    for user_id in legacy_ids:
+                        await UserModel.filter(id=user_id).update(
+                            embedding=encode_embedding(self._vector_index.get(user_id))
+                        )
+                logger.info(f"转换旧格式的人脸嵌入向量: {len(legacy_ids)} 条")
+            if self._blob_store is not None:
+                head_pics = await UserModel.filter(head_pic__isnull=False).values_list(
+                    'head_pic', flat=True
+                )
+                for digest in head_pics:
+                    self._blob_store.incref(digest)
+            logger.info(f"载入人脸嵌入向量: {len(self._vector_index)} 条")
+            await self._create_default_admin()
+            self._initialized = True
+
+    async def _load_vector_index(self) -> List[int]:
+        """
+        从数据库重新载入整个向量索引。
+
+        Returns:
+            以旧版本 JSON 格式保存嵌入向量的用户ID列表
+        """
+        # 先读取变更记录的位置，之后发生的变更在下次同步时再次读取
+        revision = await self._latest_revision()
+        rows = await UserModel.filter(embedding__isnull=False).values_list('id', 'embedding')
+        vector_index = VectorIndex()
+        legacy_ids = []
+        for user_id, embedding in rows:
+            vector_index.upsert(user_id, decode_embedding(embedding))
+            if is_legacy_embedding(embedding):
+                legacy_ids.append(user_id)
+        self._vector_index = vector_index
+        self._revision = revision
+        return legacy_ids
+
+    @staticmethod
+    async def _latest_revision() -> int:
+        """最后一条变更记录的 ID（没有记录时为 0）"""
+        latest = await EmbeddingChangeModel.all().order_by('-id').first().values_list('id', flat=True)
+        return latest or 0
+
+    async def _record_changes(self, user_ids: Iterable[int]):
+        """
+        记录嵌入向量发生变更的用户（应与用户的修改在同一事务中调用）。
+
+        其他工作进程在下次搜索前读取这些记录并同步自己的向量索引。
+        """
+        changes = [EmbeddingChangeModel(user_id=user_id) for user_id in user_ids]
+        if not changes:
+            return
+        await EmbeddingChangeModel.bulk_create(changes, batch_size=BULK_CHUNK_SIZE)
+        latest = await self._latest_revision()
+        if latest // CHANGE_LOG_PRUNE_INTERVAL != (latest - len(changes)) // CHANGE_LOG_PRUNE_INTERVAL:
+            await EmbeddingChangeModel.filter(id__lte=latest - CHANGE_LOG_RETENTION).delete()
+
+    async def _refresh_vector_index(self):
+        """读取其他工作进程的变更记录，从数据库重新读取相应用户的嵌入向量"""
+        async with self._refresh_lock:
+            changes = await (EmbeddingChangeModel.filter(id__gt=self._revision)
+                             .order_by('id').values_list('id', 'user_id'))
+            if not changes:
+                return
+            if changes[0][0] != self._revision + 1:
+                # 需要的变更记录已被清理
+                logger.info("嵌入向量的变更记录已被清理，重新载入向量索引")
+                await self._load_vector_index()
+                return
+            user_ids = list(dict.fromkeys(user_id for _, user_id in changes))
+            embeddings = {}
+            for chunk in _chunks(user_ids):
+                embeddings.update(await UserModel.filter(id__in=chunk).values_list('id', 'embedding'))
+            for user_id in user_ids:
+                embedding = embeddings.get(user_id)
+                self._sync_vector_index(user_id, None if embedding is None else decode_embedding(embedding))
+            self._revision = changes[-1][0]
+
+    async def _create_default_admin(self):
+        """创建默认管理员用户"""
+        from ..utils.pass_utils import hash_password_async
+        from ..core import _CONFIG_
+
+        existing_admin = await self.get_user_by_username(_CONFIG_.ADMIN_USERNAME)
+        if not existing_admin:
+            try:
+                admin_user = await self.create_user(
+                    username=_CONFIG_.ADMIN_USERNAME,
+                    email=_CONFIG_.ADMIN_EMAIL,
+                    full_name=_CONFIG_.ADMIN_FULL_NAME,
+                    hashed_password=await hash_password_async(_CONFIG_.ADMIN_PASSWORD),
+                    is_active=True,
+                    is_admin=True
+                )
+            except ValueError:
+                # 多个工作进程同时启动时，由其他进程创建
+                logger.info("默认管理员用户已由其他进程创建")
+                return
+            logger.info(f"创建默认管理员用户: {admin_user['username']} (ID: {admin_user['id']})")
+
+    @staticmethod
+    def _normalize_email(email: Optional[str]) -> Optional[str]:
+        """规范化邮箱（邮箱不区分大小写）"""
+        return email.strip().lower() if email is not None else None
+
+    async def _check_unique(self, user_id: Optional[int], username: Optional[str] = None,
+                            email: Optional[str] = None):
+        """
+        检查用户名和邮箱是否被其他用户占用。
+
+        Raises:
+            ValueError: 用户名或邮箱已被其他用户使用
+        """
+        if username is not None:
+            query = UserModel.filter(username=username)
+            if user_id is not None:
+                query = query.exclude(id=user_id)
+            if await query.exists():
+                raise ValueError("Username already taken")
+        if email is not None:
+            query = UserModel.filter(email_key=self._normalize_email(email))
+            if user_id is not None:
+                query = query.exclude(id=user_id)
+            if await query.exists():
+                raise ValueError("Email already registered")
+
+    def _to_db_filters(self, filters: Dict) -> Dict:
+        """将服务层的过滤条件转换为数据库字段"""
+        filters = dict(filters)
+        if 'email' in filters:
+            filters['email_key'] = self._normalize_email(filters.pop('email'))
+        return filters
+
+    def _retain_head_pic(self, digest: Optional[str]):
+        """为头像增加一个引用"""
+        if self._blob_store is not None and digest is not None:
+            self._blob_store.incref(digest)
+
+    def _release_head_pic(self, digest: Optional[str]):
+        """释放头像的一个引用"""
+        if self._blob_store is not None and digest is not None:
+            self._blob_store.release(digest)
+
+    def _sync_vector_index(self, user_id: int, embedding):
+        """将用户的嵌入向量同步到向量索引"""
+        if embedding is None:
+            self._vector_index.remove(user_id)
+        else:
+            self._vector_index.upsert(user_id, embedding)
+
+    async def _apply_update(self, user_id: int, update_data: Dict, old_head_pic: Optional[str]):
+        """
+        对单个用户应用更新并维护向量索引和头像引用（调用前需已完成唯一性检查）。
+
+        Args:
+            user_id: 用户ID
+            update_data: 要更新的字段
+            old_head_pic: 更新前的头像引用
+        """
+        fields = {key: value for key, value in update_data.items() if key not in READONLY_COLUMNS}
+        if 'email' in fields:
+            fields['email_key'] = self._normalize_email(fields['email'])
+        if 'embedding' in fields:
+            fields['embedding'] = encode_embedding(fields['embedding'])
+        head_pic_changed = 'head_pic' in fields and fields['head_pic'] != old_head_pic
+        fields['updated_at'] = datetime.now(timezone.utc)
+
+        if head_pic_changed:
+            # 先持有新头像再释放旧头像
+            self._retain_head_pic(fields['head_pic'])
+        try:
+            async with in_transaction():
+                await UserModel.filter(id=user_id).update(**fields)
+                if 'embedding' in fields:
+                    await self._record_changes([user_id])
+        except IntegrityError as e:
+            if head_pic_changed:
+                self._release_head_pic(fields['head_pic'])
+            raise ValueError("Username or email would become duplicated") from e
+        if head_pic_changed:
+            self._release_head_pic(old_head_pic)
+        if 'embedding' in update_data:
+            self._sync_vector_index(user_id, update_data['embedding'])
+
+    async def create_user(self, username: str, email: str, full_name: str = None,
+                          hashed_password: str = None, is_active: bool = True,
+                          is_admin: bool = False, head_pic: str = None,
+                          embedding: Optional[np.ndarray] = None) -> Dict:
+        """创建新用户"""
+        await self._check_unique(None, username=username, email=email)
+        try:
+            async with in_transaction():
+                user = await UserModel.create(
+                    username=username,
+                    email=email,
+                    email_key=self._normalize_email(email),
+                    full_name=full_name,
+                    hashed_password=hashed_password,
+                    is_active=is_active,
+                    is_admin=is_admin,
+                    head_pic=head_pic,
+                    embedding=encode_embedding(embedding),
+                )
+                if embedding is not None:
+                    await self._record_changes([user.id])
+        except IntegrityError as e:
+            # 并发创建时唯一性检查之后仍可能冲突
+            await self._check_unique(None, username=username, email=email)
+            raise ValueError("Username or email already exists") from e
+
+        self._retain_head_pic(head_pic)
+        self._sync_vector_index(user.id, embedding)
+        logger.info(f"创建用户: {username} (ID: {user.id})")
+        return {column: getattr(user, column) for column in USER_COLUMNS}
+
+    async def bulk_create_users(self, users: List[Dict]) -> List[Optional[Dict]]:
+        """
+        批量创建用户（在一个事务中按块执行多行 INSERT）。
+
+        Args:
+            users: 每个用户的字段（与 create_user 的参数相同）
+
+        Returns:
+            与 users 顺序相同的列表，用户名或邮箱已被占用（包括同一批中重复）的用户为 None
+        """
+        usernames = [fields['username'] for fields in users]
+        email_keys = [self._normalize_email(fields.get('email')) for fields in users]
+        taken_usernames, taken_emails = set(), set()
+        for chunk in _chunks(usernames):
+            taken_usernames.update(await UserModel.filter(username__in=chunk).values_list('username', flat=True))
+        for chunk in _chunks([key for key in email_keys if key is not None]):
+            taken_emails.update(await UserModel.filter(email_key__in=chunk).values_list('email_key', flat=True))
+
+        accepted = []  # [(users 中的位置, UserModel), ...]
+        for position, (fields, email_key) in enumerate(zip(users, email_keys)):
+            if fields['username'] in taken_usernames or email_key in taken_emails:
+                continue
+            taken_usernames.add(fields['username'])
+            taken_emails.add(email_key)
+            accepted.append((position, UserModel(
+                username=fields['username'],
+                email=fields.get('email'),
+                email_key=email_key,
+                full_name=fields.get('full_name'),
+                hashed_password=fields.get('hashed_password'),
+                is_active=fields.get('is_active', True),
+                is_admin=fields.get('is_admin', False),
+                head_pic=fields.get('head_pic'),
+                embedding=encode_embedding(fields.get('embedding')),
+            )))
+
+        created: List[Optional[Dict]] = [None] * len(users)
+        try:
+            async with in_transaction():
+                await UserModel.bulk_create([user for _, user in accepted], batch_size=BULK_CHUNK_SIZE)
+                # 多行 INSERT 不返回自增 ID，按用户名读回
+                rows = {}
+                for chunk in _chunks([user.username for _, user in accepted]):
+                    for row in await UserModel.filter(username__in=chunk).values(*USER_COLUMNS):
+                        rows[row['username']] = row
+                await self._record_changes(
+                    rows[user.username]['id'] for position, user in accepted
+                    if users[position].get('embedding') is not None
+                )
+        except IntegrityError:
+            # 检查之后有并发创建的用户，逐个创建以确定冲突的用户
+            for position, _ in accepted:
+                try:
+                    created[position] = await self.create_user(**users[position])
+                except ValueError:
+                    pass
+            return created
+
+        for position, user in accepted:
+            row = created[position] = rows[user.username]
+            self._retain_head_pic(row['head_pic'])
+            self._sync_vector_index(row['id'], users[position].get('embedding'))
+        logger.info(f"批量创建用户: {len(accepted)}/{len(users)}")
+        return created
+
+    async def _get_one(self, **filters) -> Optional[Dict]:
+        """按条件获取单个用户"""
+        return await UserModel.filter(**filters).first().values(*USER_COLUMNS)
+
+    async def get_user_by_id(self, user_id: int) -> Optional[Dict]:
+        """根据ID获取用户"""
+        return await self._get_one(id=user_id)
+
+    async def get_user_by_username(self, username: str) -> Optional[Dict]:
+        """根据用户名获取用户"""
+        return await self._get_one(username=username)
+
+    async def get_user_by_email(self, email: str) -> Optional[Dict]:
+        """根据邮箱获取用户（不区分大小写）"""
+        if email is None:
+            return None
+        return await self._get_one(email_key=self._normalize_email(email))
+
+    async def references_head_pic(self, digest: str) -> bool:
+        """是否有用户的头像为该图片"""
+        return await UserModel.filter(head_pic=digest).exists()
+
+    async def get_user(self, *args, **kwargs) -> Optional[Dict]:
+        """通用用户查询方法"""
+        if 'id' in kwargs:
+            return await self.get_user_by_id(kwargs['id'])
+        elif 'username' in kwargs:
+            return await self.get_user_by_username(kwargs['username'])
+        elif 'email' in kwargs:
+            return await self.get_user_by_email(kwargs['email'])
+        return None
+
+    async def get_or_none(self, *args, **kwargs) -> Optional[Dict]:
+        """获取用户或返回None"""
+        return await self.get_user(*args, **kwargs)
+
+    async def filter(self, **kwargs):
+        """过滤用户（与 MemorySqlManager.filter 相同的 update/delete 接口）"""
+        class FilterResult:
+            def __init__(self, manager, filters):
+                self.manager = manager
+                self.filters = manager._to_db_filters(filters)
+
+            async def update(self, **update_data):
+                """更新匹配的用户"""
+                rows = await UserModel.filter(**self.filters).values_list('id', 'head_pic')
+                if len(rows) > 1 and ('username' in update_data or 'email' in update_data):
+                    raise ValueError("Username or email would become duplicated")
+                for user_id, _ in rows:
+                    await self.manager._check_unique(
+                        user_id, update_data.get('username'), update_data.get('email')
+                    )
+                async with in_transaction():
+                    for user_id, head_pic in rows:
+                        await self.manager._apply_update(user_id, update_data, head_pic)
+                return len(rows)
+
+            async def delete(self):
+                """删除匹配的用户"""
+                rows = await UserModel.filter(**self.filters).values_list('id', flat=True)
+                for user_id in rows:
+                    await self.manager.delete_user(user_id)
+                return len(rows)
+
+        return FilterResult(self, kwargs)
+
+    async def update_user(self, user_id: int, **update_data) -> bool:
+        """更新用户信息"""
+        current = await UserModel.filter(id=user_id).first().values('head_pic')
+        if current is None:
+            return False
+        await self._check_unique(user_id, update_data.get('username'), update_data.get('email'))
+        await self._apply_update(user_id, update_data, current['head_pic'])
+        return True
+
+    async def delete_user(self, user_id: int) -> bool:
+        """删除用户"""
+        current = await UserModel.filter(id=user_id).first().values('head_pic')
+        if current is None:
+            return False
+        async with in_transaction():
+            await UserModel.filter(id=user_id).delete()
+            await self._record_changes([user_id])
+        self._release_head_pic(current['head_pic'])
+        self._vector_index.remove(user_id)
+        return True
+
+    async def _head_pics(self, user_ids: List[int]) -> Dict[int, Optional[str]]:
+        """返回存在的用户的头像引用 {user_id: head_pic}"""
+        rows = {}
+        for chunk in _chunks(user_ids):
+            rows.update(await UserModel.filter(id__in=chunk).values_list('id', 'head_pic'))
+        return rows
+
+    async def bulk_update(self, user_ids: Iterable[int], **update_data) -> Dict[int, bool]:
+        """
+        对多个用户应用相同的更新（参数与 MemorySqlManager.bulk_update 相同）。
+
+        所有用户使用同一个时间戳，在一个事务中按块执行 UPDATE ... WHERE id IN (...)。
+
+        Returns:
+            {用户ID: 是否已更新}（不存在的用户为 False）
+        """
+        if update_data.get('embedding') is not None:
+            raise ValueError("Bulk updates can only clear face embeddings")
+        ids = list(dict.fromkeys(user_ids))
+        head_pics = await self._head_pics(ids)
+        outcomes = {user_id: user_id in head_pics for user_id in ids}
+        found = [user_id for user_id in ids if user_id in head_pics]
+        if len(found) > 1 and ('username' in update_data or 'email' in update_data):
+            raise ValueError("Username or email would become duplicated")
+        if len(found) == 1:
+            await self._check_unique(found[0], update_data.get('username'), update_data.get('email'))
+        if not found:
+            return outcomes
+
+        fields = {key: value for key, value in update_data.items() if key not in READONLY_COLUMNS}
+        if 'email' in fields:
+            fields['email_key'] = self._normalize_email(fields['email'])
+        fields['updated_at'] = datetime.now(timezone.utc)
+        changed = []
+        if 'head_pic' in fields:
+            # 先持有新头像再释放旧头像
+            changed = [user_id for user_id in found if head_pics[user_id] != fields['head_pic']]
+            for _ in changed:
+                self._retain_head_pic(fields['head_pic'])
+        try:
+            async with in_transaction():
+                for chunk in _chunks(found):
+                    await UserModel.filter(id__in=chunk).update(**fields)
+                if 'embedding' in fields:
+                    await self._record_changes(found)
+        except IntegrityError as e:
+            for _ in changed:
+                self._release_head_pic(fields['head_pic'])
+            raise ValueError("Username or email would become duplicated") from e
+        for user_id in changed:
+            self._release_head_pic(head_pics[user_id])
+        if 'embedding' in update_data:
+            for user_id in found:
+                self._vector_index.remove(user_id)
+        return outcomes
+
+    async def bulk_delete(self, user_ids: Iterable[int]) -> Dict[int, bool]:
+        """
+        删除多个用户（在一个事务中按块执行 DELETE ... WHERE id IN (...)）。
+
+        Returns:
+            {用户ID: 是否已删除}（不存在的用户为 False）
+        """
+        ids = list(dict.fromkeys(user_ids))
+        head_pics = await self._head_pics(ids)
+        found = [user_id for user_id in ids if user_id in head_pics]
+        async with in_transaction():
+            for chunk in _chunks(found):
+                await UserModel.filter(id__in=chunk).delete()
+            await self._record_changes(found)
+        for user_id in found:
+            self._release_head_pic(head_pics[user_id])
+            self._vector_index.remove(user_id)
+        return {user_id: user_id in head_pics for user_id in ids}
+
+    async def list_users(self) -> List[Dict]:
+        """列出所有用户"""
+        return await UserModel.all().order_by('id').values(*USER_COLUMNS)
+
+    async def iter_user_chunks(
+        self, chunk_size: int = 1000
+    ) -> AsyncIterator[List[Tuple[Dict, Optional[np.ndarray]]]]:
+        """
+        按块遍历所有用户及其嵌入向量（用于导出，按 ID 分页读取）。
+
+        Args:
+            chunk_size: 每块的用户数
+
+        Yields:
+            [(用户记录, 嵌入向量或 None), ...]
+        """
+        last_id = 0
+        while True:
+            rows = await (UserModel.filter(id__gt=last_id).order_by('id')
+                          .limit(chunk_size).values(*USER_COLUMNS, 'embedding'))
+            if not rows:
+                return
+            last_id = rows[-1]['id']
+            yield [(row, decode_embedding(row.pop('embedding'))) for row in rows]
+
+    async def count_users(self, is_active: Optional[bool] = None,
+                          is_admin: Optional[bool] = None,
+                          has_face: Optional[bool] = None) -> int:
+        """统计用户数量（可按属性过滤，不构造用户列表）"""
+        _, count = await self.query_users(
+            is_active=is_active, is_admin=is_admin, has_face=has_face, limit=0
+        )
+        return count
+
+    async def query_users(self, is_active: Optional[bool] = None,
+                          is_admin: Optional[bool] = None,
+                          has_face: Optional[bool] = None,
+                          contains: Optional[Dict[str, str]] = None,
+                          predicate: Optional[Callable[[Dict], bool]] = None,
+                          order_by: str = 'id', descending: bool = False,
+                          offset: int = 0, limit: Optional[int] = None) -> Tuple[List[Dict], int]:
+        """
+        按条件查询用户，支持排序、分页和计数（参数与 MemorySqlManager.query_users 相同）。
+
+        属性条件和子串条件转换为 SQL 条件，由数据库索引处理。
+
+        Returns:
+            (当前页的用户列表, 满足条件的总数)
+        """
+        query = UserModel.all()
+        if is_active is not None:
+            query = query.filter(is_active=is_active)
+        if is_admin is not None:
+            query = query.filter(is_admin=is_admin)
+        if has_face is not None:
+            query = query.filter(head_pic__isnull=not has_face)
+        for field, value in (contains or {}).items():
+            if field not in TEXT_SEARCH_FIELDS:
+                raise KeyError(field)
+            query = query.filter(**{f"{field}__icontains": value})
+        query = query.order_by(f"-{order_by}" if descending else order_by)
+
+        if predicate is None:
+            count = await query.count()
+            if limit == 0 or offset >= count:
+                return [], count
+            page_query = query.offset(offset)
+            if limit is not None:
+                page_query = page_query.limit(limit)
+            return await page_query.values(*USER_COLUMNS), count
+
+        # 有逐行过滤时需要遍历全部候选来计数
+        end = None if limit is None else offset + limit
+        page = []
+        count = 0
+        for user in await query.values(*USER_COLUMNS):
+            if not predicate(user):
+                continue
+            if count >= offset and (end is None or count < end):
+                page.append(user)
+            count += 1
+        return page, count
+
+    async def search_face_embeddings(self, query_vector: np.ndarray,
+                                     limit: int = 1, threshold: float = 0.3) -> List[Dict]:
+        """在用户嵌入向量中搜索相似的人脸特征"""
+        await self._refresh_vector_index()
+        matches = self._vector_index.search(query_vector, limit=limit, threshold=threshold)[0]
+        return to_search_results(matches, limit)
+
+    async def search_face_embeddings_batch(self, query_vectors,
+                                           limit: int = 1, threshold: float = 0.3) -> List[List[Dict]]:
+        """批量搜索相似的人脸特征（格式与 search_face_embeddings 相同）"""
+        if len(query_vectors) == 0:
+            return []
+        await self._refresh_vector_index()
+        matches = self._vector_index.search(query_vectors, limit=limit, threshold=threshold)
+        return [to_search_results(m, limit) for m in matches]
+
+    async def upsert_face_embedding(self, user_id: int, feature_vector: np.ndarray) -> Dict:
+        """插入或更新用户的人脸嵌入向量"""
+        if not await self.update_user(user_id, embedding=feature_vector):
+            raise ValueError(f"User with id {user_id} not found")
+        return {"insertedIds": [user_id]}
+
+    async def delete_face_embedding(self, user_id: int) -> Dict:
+        """删除用户的人脸嵌入向量"""
+        if await self.update_user(user_id, embedding=None, head_pic=None):
+            return {"deleted_count": 1}
+        return {"deleted_count": 0}
@@ -0,0 +1,115 @@
+"""
+紧凑的用户记录模块。
+
+此模块提供使用 __slots__ 的用户记录类，代替每个用户一个 dict 的存储方式。
+记录对外保持类似 dict 的访问接口（user['username']、user.get(...) 等），
+人脸嵌入向量不保存在记录中，而是从所属管理器的向量索引中按需读取。
+"""
+
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, Optional
+
+from .vector_index import VectorIndex
+
+# 记录中直接保存的字段（顺序即 keys() 的顺序）
+USER_FIELDS = (
+    'id',
+    'username',
+    'email',
+    'full_name',
+    'hashed_password',
+    'is_active',
+    'is_admin',
+    'head_pic',
+    'created_at',
+    'updated_at',
+)
+
+# 不保存在记录中、从向量索引读取的字段
+VIRTUAL_FIELDS = ('embedding',)
+
+
+class UserRecord(Mapping):
+    """
+    使用 __slots__ 的用户记录。
+
+    支持 user[key]、user.get(key)、keys()/items()、dict(user) 等只读的 dict 访问方式，
+    以及 user[key] = value 和 update() 修改已知字段。
+    'embedding' 为只读字段，返回向量索引中保存的（已归一化的）向量。
+    """
+
+    __slots__ = USER_FIELDS + ('_vectors',)
+
+    def __init__(self, vectors: Optional[VectorIndex] = None, **values: Any):
+        """
+        初始化用户记录。
+
+        Args:
+            vectors: 保存该用户嵌入向量的向量索引
+            **values: 字段值（未给出的字段为 None）
+        """
+        self._vectors = vectors
+        for field in USER_FIELDS:
+            setattr(self, field, values.pop(field, None))
+        if values:
+            raise KeyError(f"Unknown user field(s): {', '.join(values)}")
+
+    def __getitem__(self, key: str) -> Any:
+        if key in USER_FIELDS:
+            return getattr(self, key)
+        if key == 'embedding':
+            if self._vectors is None:
+                return None
+            return self._vectors.get(self.id)
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any):
+        if key not in USER_FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(USER_FIELDS + VIRTUAL_FIELDS)
+
+    def __len__(self) -> int:
+        return len(USER_FIELDS) + len(VIRTUAL_FIELDS)
+
+    def __contains__(self, key: object) -> bool:
+        return key in USER_FIELDS or key in VIRTUAL_FIELDS
+
+    def __eq__(self, other: object) -> bool:
+        # 只比较记录中的字段，避免读取并比较嵌入向量
+        if not isinstance(other, UserRecord):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in USER_FIELDS)
+
+    def update(self, values: Dict[str, Any]):
+        """批量修改字段（不支持 'embedding'）"""
+        unknown = [key for key in values if key not in USER_FIELDS]
+        if unknown:
+            raise KeyError(f"Unknown user field(s): {', '.join(unknown)}")
+        for key, value in values.items():
+            setattr(self, key, value)
+
+    def copy(self, vectors: Optional[VectorIndex] = None) -> "UserRecord":
+        """
+        复制记录。
+
+        Args:
+            vectors: 副本所属的向量索引
+
+        Returns:
+            字段值相同的新记录
+        """
+        clone = UserRecord.__new__(UserRecord)
+        clone._vectors = vectors
+        for field in USER_FIELDS:
+            setattr(clone, field, getattr(self, field))
+        return clone
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为普通 dict（包含 embedding）"""
+        return dict(self.items())
+
+    def __repr__(self) -> str:
+        return f"UserRecord(id={self.id!r}, username={self.username!r})"
@@ -0,0 +1,233 @@
+"""
+内存向量索引模块。
+
+此模块提供一个简单的余弦相似度向量索引，
+将所有已归一化的嵌入向量保存在一个连续的 float32 矩阵中，
+使单次或批量查询都只需一次矩阵乘法。
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .embedding_codec import as_embedding
+
+# ID 到行号映射中每个条目的近似字节数（dict 条目和两个 int 对象）
+_ROW_ENTRY_BYTES = 120
+
+
+class VectorIndex:
+    """
+    基于连续矩阵的余弦相似度索引。
+
+    每个 ID 占用矩阵中的一行，删除时用最后一行填补空位，
+    因此矩阵的前 len(self) 行始终是有效数据。
+    """
+
+    def __init__(self, dim: Optional[int] = None, initial_capacity: int = 64):
+        """
+        初始化向量索引。
+
+        Args:
+            dim: 向量维度（为 None 时在首次插入时确定）
+            initial_capacity: 初始预留的行数
+        """
+        self.dim = dim
+        self._capacity = initial_capacity
+        self._matrix: Optional[np.ndarray] = None
+        self._ids = np.zeros(initial_capacity, dtype=np.int64)
+        self._rows: Dict[int, int] = {}  # {item_id: row}
+        if dim is not None:
+            self._matrix = np.zeros((initial_capacity, dim), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, item_id: int) -> bool:
+        return item_id in self._rows
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        """按行归一化（零向量保持为零）"""
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _ensure_capacity(self, size: int):
+        """确保矩阵至少有 size 行"""
+        if size <= self._capacity:
+            return
+        new_capacity = max(size, self._capacity * 2)
+        matrix = np.zeros((new_capacity, self.dim), dtype=np.float32)
+        matrix[: len(self._rows)] = self._matrix[: len(self._rows)]
+        ids = np.zeros(new_capacity, dtype=np.int64)
+        ids[: len(self._rows)] = self._ids[: len(self._rows)]
+        self._matrix, self._ids, self._capacity = matrix, ids, new_capacity
+
+    @property
+    def nbytes(self) -> int:
+        """索引占用的字节数（已分配的矩阵和 ID 数组，以及 ID 到行号映射的近似值）"""
+        matrix_bytes = self._matrix.nbytes if self._matrix is not None else 0
+        return matrix_bytes + self._ids.nbytes + len(self._rows) * _ROW_ENTRY_BYTES
+
+    def copy(self) -> "VectorIndex":
+        """返回独立的副本（只复制有效行）"""
+        size = len(self._rows)
+        clone = VectorIndex(self.dim, initial_capacity=max(size, 1))
+        clone._ids[:size] = self._ids[:size]
+        if self._matrix is not None:
+            clone._matrix[:size] = self._matrix[:size]
+        clone._rows = dict(self._rows)
+        return clone
+
+    def to_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        导出索引内容。
+
+        Returns:
+            (ID 数组, 已归一化的向量矩阵) 的副本，只含有效行
+        """
+        size = len(self._rows)
+        if self._matrix is None:
+            return np.zeros(0, dtype=np.int64), np.zeros((0, self.dim or 0), dtype=np.float32)
+        return self._ids[:size].copy(), self._matrix[:size].copy()
+
+    @classmethod
+    def from_arrays(cls, ids: np.ndarray, matrix: np.ndarray) -> "VectorIndex":
+        """
+        由 to_arrays() 导出的数据构建索引。
+
+        直接使用传入的矩阵而不复制（可以是写时复制的 mmap），插入新行需要扩容时才复制。
+
+        Args:
+            ids: ID 数组 (N,)
+            matrix: 已归一化的向量矩阵 (N, dim)
+        """
+        if len(ids) == 0:
+            dim = matrix.shape[1] if matrix.ndim == 2 and matrix.shape[1] else None
+            return cls(dim)
+        index = cls(initial_capacity=len(ids))
+        index.dim = matrix.shape[1]
+        index._matrix = matrix
+        index._ids = np.array(ids, dtype=np.int64)
+        index._rows = {int(item_id): row for row, item_id in enumerate(index._ids)}
+        return index
+
+    def upsert(self, item_id: int, vector) -> None:
+        """
+        插入或更新一个向量。
+
+        Args:
+            item_id: 向量对应的 ID（用户 ID）
+            vector: 向量数据（numpy 数组、float32 字节串或列表）
+        """
+        vec = as_embedding(vector).reshape(1, -1)
+        if self.dim is None:
+            self.dim = vec.shape[1]
+            self._matrix = np.zeros((self._capacity, self.dim), dtype=np.float32)
+        elif vec.shape[1] != self.dim:
+            raise ValueError(f"Vector dimension {vec.shape[1]} does not match index dimension {self.dim}")
+
+        row = self._rows.get(item_id)
+        if row is None:
+            row = len(self._rows)
+            self._ensure_capacity(row + 1)
+            self._rows[item_id] = row
+            self._ids[row] = item_id
+        self._matrix[row] = self._normalize(vec)[0]
+
+    def get(self, item_id: int) -> Optional[np.ndarray]:
+        """
+        获取 ID 对应的向量。
+
+        Returns:
+            归一化后的向量副本，不存在时返回 None
+        """
+        row = self._rows.get(item_id)
+        if row is None:
+            return None
+        return self._matrix[row].copy()
+
+    def remove(self, item_id: int) -> bool:
+        """
+        删除一个向量。
+
+        Returns:
+            bool: 是否存在并被删除
+        """
+        row = self._rows.pop(item_id, None)
+        if row is None:
+            return False
+        last = len(self._rows)
+        if row != last:
+            # 用最后一行填补被删除的位置
+            moved_id = int(self._ids[last])
+            self._matrix[row] = self._matrix[last]
+            self._ids[row] = moved_id
+            self._rows[moved_id] = row
+        return True
+
+    def clear(self):
+        """清空索引"""
+        self._rows.clear()
+
+    def search(
+        self, queries, limit: int = 1, threshold: float = 0.0
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        批量搜索最相似的向量。
+
+        Args:
+            queries: 查询向量（单个向量或 (N, dim) 矩阵）
+            limit: 每个查询返回的最大结果数
+            threshold: 余弦相似度阈值
+
+        Returns:
+            每个查询对应一个 [(item_id, similarity), ...] 列表，按相似度降序排列
+        """
+        q = np.asarray(queries, dtype=np.float32)
+        if q.ndim == 1:
+            q = q.reshape(1, -1)
+        size = len(self._rows)
+        if size == 0 or limit <= 0:
+            return [[] for _ in range(q.shape[0])]
+
+        similarities = self._normalize(q) @ self._matrix[:size].T
+        k = min(limit, size)
+        results = []
+        for sims in similarities:
+            if k < size:
+                top = np.argpartition(-sims, k - 1)[:k]
+            else:
+                top = np.arange(size)
+            top = top[np.argsort(-sims[top])]
+            results.append([
+                (int(self._ids[row]), float(sims[row]))
+                for row in top
+                if sims[row] >= threshold
+            ])
+        return results
+
+
+def to_search_results(matches: List[Tuple[int, float]], limit: int) -> List[List[Dict]]:
+    """
+    将向量索引的结果转换为 Milvus 风格的搜索结果。
+
+    Args:
+        matches: search() 返回的单个查询的 [(item_id, similarity), ...]
+        limit: 最大结果数
+
+    Returns:
+        [[{'entity': {'user_id': ...}, 'distance': ..., 'id': ...}, ...]]
+    """
+    results = [
+        {
+            'entity': {
+                'user_id': item_id
+            },
+            'distance': 1 - similarity,  # 转换为距离
+            'id': item_id
+        }
+        for item_id, similarity in matches[:limit]
+    ]
+    return [results] if results else [[]]
@@ -0,0 +1,237 @@
+"""
+预写日志（WAL）模块。
+
+此模块为内存数据库的修改提供仅追加的日志，弥补两次快照之间的修改在进程崩溃时丢失的问题。
+
+日志按段（segment）保存为 <name>.<段号>.wal，每条记录的格式为：
+    头部 (JSON 长度, 嵌入向量长度, CRC32) + JSON + float32 嵌入向量字节
+写入快照时开始新的段，快照记录恢复时需要重放的起始段号，
+快照写入完成后即可删除之前的段（压缩）。
+
+修改先追加到内存缓冲区，sync() 等待缓冲区写入并 fsync。
+多个并发修改共用一次 fsync（组提交），突发的批量注册也只需少量 fsync。
+"""
+
+import asyncio
+import json
+import os
+import struct
+import threading
+import zlib
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple
+
+from loguru import logger
+
+# 记录头部：JSON 长度、嵌入向量长度、CRC32（覆盖 JSON 和嵌入向量）
+_HEADER = struct.Struct("<III")
+
+WAL_SUFFIX = ".wal"
+
+
+def encode_record(record: Dict[str, Any], embedding: Optional[bytes] = None) -> bytes:
+    """
+    编码一条日志记录。
+
+    Args:
+        record: 可 JSON 序列化的操作内容
+        embedding: 附带的 float32 嵌入向量字节
+
+    Returns:
+        编码后的字节串
+    """
+    payload = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    embedding = embedding or b""
+    crc = zlib.crc32(embedding, zlib.crc32(payload))
+    return _HEADER.pack(len(payload), len(embedding), crc) + payload + embedding
+
+
+def read_records(path: Path) -> Iterator[Tuple[Dict[str, Any], Optional[bytes]]]:
+    """
+    读取一个段中的所有记录。
+
+    遇到不完整或校验失败的记录（写入中途崩溃）时停止，之后的内容被忽略。
+
+    Args:
+        path: 段文件
+
+    Yields:
+        (操作内容, 嵌入向量字节或 None)
+    """
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                if header:
+                    logger.warning(f"预写日志末尾不完整，已忽略: {path.name}")
+                return
+            payload_size, embedding_size, crc = _HEADER.unpack(header)
+            payload = f.read(payload_size)
+            embedding = f.read(embedding_size)
+            if (len(payload) < payload_size or len(embedding) < embedding_size
+                    or zlib.crc32(embedding, zlib.crc32(payload)) != crc):
+                logger.warning(f"预写日志记录损坏，已忽略之后的内容: {path.name}")
+                return
+            yield json.loads(payload), embedding or None
+
+
+def list_segments(directory: Path, name: str) -> List[Tuple[int, Path]]:
+    """返回日志的所有段 [(段号, 路径), ...]（按段号升序）"""
+    segments = []
+    for path in directory.glob(f"{name}.*{WAL_SUFFIX}"):
+        try:
+            segments.append((int(path.name[len(name) + 1: -len(WAL_SUFFIX)]), path))
+        except ValueError:
+            continue
+    return sorted(segments)
+
+
+class WriteAheadLog:
+    """
+    按段保存的预写日志（组提交）。
+
+    append() 只写入缓冲区并返回日志序号，sync() 等待该序号之前的记录全部落盘。
+    需要在同一个事件循环中使用。
+    """
+
+    def __init__(self, directory: Path, name: str, segment: int = 1, commit_delay: float = 0.0):
+        """
+        初始化预写日志。
+
+        Args:
+            directory: 日志目录
+            name: 日志名（段文件名的前缀）
+            segment: 当前段号
+            commit_delay: 组提交前等待更多记录的时间（秒）
+        """
+        self.directory = Path(directory)
+        self.name = name
+        self.commit_delay = commit_delay
+        self._segment = segment
+        self._buffer: List[Tuple[int, bytes]] = []  # [(段号, 记录), ...]
+        self._appended = 0  # 最后追加的记录序号
+        self._durable = 0  # 已落盘的记录序号
+        self._flushing: Optional[asyncio.Future] = None
+        self._files: Dict[int, IO[bytes]] = {}  # {段号: 打开的文件}
+        self._lock = threading.Lock()  # 保护文件操作（写入在线程中进行）
+
+    @property
+    def segment(self) -> int:
+        """当前段号"""
+        return self._segment
+
+    def path(self, segment: int) -> Path:
+        """返回段文件的路径"""
+        return self.directory / f"{self.name}.{segment:08d}{WAL_SUFFIX}"
+
+    def append(self, record: Dict[str, Any], embedding: Optional[bytes] = None) -> int:
+        """
+        追加一条记录（不等待落盘）。
+
+        Returns:
+            记录序号（传给 sync() 等待落盘）
+        """
+        self._buffer.append((self._segment, encode_record(record, embedding)))
+        self._appended += 1
+        return self._appended
+
+    async def sync(self, lsn: Optional[int] = None):
+        """
+        等待记录落盘。
+
+        正在进行的写入完成后，期间追加的记录由下一次写入一起提交。
+
+        Args:
+            lsn: 要等待的记录序号（默认为目前追加的所有记录）
+        """
+        target = self._appended if lsn is None else lsn
+        while self._durable < target:
+            if self._flushing is None:
+                self._flushing = asyncio.ensure_future(self._flush())
+            await asyncio.shield(self._flushing)
+
+    async def _flush(self):
+        """将缓冲区写入文件并 fsync"""
+        try:
+            if self.commit_delay > 0:
+                await asyncio.sleep(self.commit_delay)
+            batch, self._buffer = self._buffer, []
+            target = self._appended
+            if batch:
+                try:
+                    await asyncio.to_thread(self._write, batch)
+                except BaseException:
+                    # 写入失败时放回缓冲区，下次 sync() 重试
+                    self._buffer[:0] = batch
+                    raise
+            self._durable = target
+        finally:
+            self._flushing = None
+
+    def _write(self, batch: List[Tuple[int, bytes]]):
+        """
+        写入一批记录（在线程中执行）。
+
+        失败时将本次写入的段截断回写入前的长度，放回缓冲区的记录重试时不会重复写入。
+        """
+        with self._lock:
+            offsets: Dict[int, int] = {}  # {段号: 写入前的文件长度}
+            try:
+                for segment, data in batch:
+                    f = self._files.get(segment)
+                    if f is None:
+                        self.directory.mkdir(parents=True, exist_ok=True)
+                        f = self._files[segment] = open(self.path(segment), "ab")
+                    if segment not in offsets:
+                        offsets[segment] = f.tell()
+                    f.write(data)
+                for segment in offsets:
+                    f = self._files[segment]
+                    f.flush()
+                    os.fsync(f.fileno())
+            except BaseException:
+                for segment, offset in offsets.items():
+                    self._truncate(segment, offset)
+                raise
+
+    def _truncate(self, segment: int, offset: int):
+        """关闭段文件（丢弃未写出的缓冲）并截断到 offset，下次写入时重新打开"""
+        f = self._files.pop(segment, None)
+        if f is not None:
+            try:
+                f.close()
+            except OSError:
+                pass
+        try:
+            os.truncate(self.path(segment), offset)
+        except OSError as e:
+            # 残留的记录在重放时会被重复应用一次
+            logger.error(f"预写日志截断失败: {self.path(segment).name}: {e}")
+
+    def rotate(self) -> int:
+        """
+        开始新的段（写入快照时调用）。
+
+        之后追加的记录写入新段，快照应从返回的段号开始重放。
+
+        Returns:
+            新的段号
+        """
+        self._segment += 1
+        return self._segment
+
+    def discard_before(self, segment: int):
+        """删除段号小于 segment 的段（快照写入完成后调用）"""
+        with self._lock:
+            for old in [s for s in self._files if s < segment]:
+                self._files.pop(old).close()
+            for old, path in list_segments(self.directory, self.name):
+                if old < segment:
+                    path.unlink(missing_ok=True)
+
+    def close(self):
+        """关闭打开的文件"""
+        with self._lock:
+            for f in self._files.values():
+                f.close()
+            self._files.clear()
@@ -1,17 +1,43 @@
+import threading
+
 from ..core import _CONFIG_
 from .FaceRecModel import get_model, has_model, list_models, register_model
 from .OnnxModel import load_onnx_model
 
-_MODEL_ = get_model(
-    _CONFIG_.MODEL_LOADER,
-    weight=_CONFIG_.MODEL_PATH,
-    device=_CONFIG_.MODEL_DEVICE,
-    train=False,
-)
+# 設定のモデル（初回使用時に読み込む）
+_default_model = None
+_default_model_lock = threading.Lock()
+
+
+def get_default_model():
+    """
+    設定（MODEL_LOADER、MODEL_PATH、MODEL_DEVICE）のモデルを取得（初回呼び出し時に読み込む）。
+
+    インポート時には読み込まないため、推論を行わないモジュールはモデルファイル無しで使用できます。
+    """
+    global _default_model
+    if _default_model is None:
+        with _default_model_lock:
+            if _default_model is None:
+                _default_model = get_model(
+                    _CONFIG_.MODEL_LOADER,
+                    weight=_CONFIG_.MODEL_PATH,
+                    device=_CONFIG_.MODEL_DEVICE,
+                    train=False,
+                )
+    return _default_model
+
+
+def __getattr__(name):
+    # 従来の _MODEL_ 属性は参照時に読み込む
+    if name == "_MODEL_":
+        return get_default_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 __ALL__ = [
     "_MODEL_",
+    "get_default_model",
     "has_model",
     "get_model",
     "register_model",
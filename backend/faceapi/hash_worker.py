@@ -0,0 +1,75 @@
+"""
+パスワードのハッシュ化・検証を実行するプロセスプールのワーカー側の処理。
+
+ワーカーは forkserver（または spawn）で起動し、このモジュールだけをインポートします。
+faceapi.core や faceapi.utils はインポート時に設定・顔認識モデル・セッションストアを読み込むため、
+このモジュールはそれらに依存せず passlib だけを使用します。
+"""
+
+import multiprocessing
+import os
+import threading
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+# 既存のハッシュを検証するために常に受け付けるスキーム（ログイン時に設定のスキームで再ハッシュ）
+LEGACY_SCHEMES = ("sha256_crypt", "pbkdf2_sha256")
+
+# ワーカープロセスで使用するパスワードハッシュコンテキスト（init_worker で作成）
+_context: Optional[CryptContext] = None
+
+
+def build_context(scheme: str, rounds: int) -> CryptContext:
+    """
+    設定のスキームとラウンド数でパスワードハッシュコンテキストを作成。
+
+    設定のスキーム以外のハッシュ、およびラウンド数が設定値より少ないハッシュは
+    更新が必要（needs_update）とみなされます。
+
+    引数:
+        scheme: 新しいハッシュに使用するスキーム
+        rounds: ラウンド数（0 でスキームのデフォルト）
+    """
+    schemes = [scheme] + [legacy for legacy in LEGACY_SCHEMES if legacy != scheme]
+    settings = {}
+    if rounds > 0:
+        settings[f"{scheme}__default_rounds"] = rounds
+        settings[f"{scheme}__min_rounds"] = rounds
+    return CryptContext(schemes=schemes, deprecated="auto", **settings)
+
+
+def init_worker(scheme: str, rounds: int):
+    """
+    ワーカープロセスを初期化する（プロセスプールの初期化関数）。
+
+    親プロセスが異常終了した場合、ワーカーはタスクキューの終了を検知できずに残るため、
+    親プロセスの終了を監視して終了します。forkserver では親プロセスIDは forkserver のもので、
+    forkserver もワーカーが終了するまで残るため、アプリケーションのプロセスとの間のパイプで検知します。
+    """
+    global _context
+    _context = build_context(scheme, rounds)
+    parent = multiprocessing.parent_process()
+
+    def watch():
+        parent.join()
+        os._exit(0)
+
+    threading.Thread(target=watch, daemon=True).start()
+
+
+def hash_password(password: str) -> str:
+    """平文パスワードをハッシュ化"""
+    return _context.hash(password)
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """平文パスワードとハッシュ化されたパスワードを検証"""
+    return _context.verify(plain_password, hashed_password)
+
+
+def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """パスワードを検証し、ハッシュが古い場合は再ハッシュ"""
+    return _context.verify_and_update(plain_password, hashed_password)
@@ -5,28 +5,98 @@
 """
 
 import asyncio
-from contextlib import asynccontextmanager
+import math
+from contextlib import asynccontextmanager, suppress
 import uvicorn
 from pathlib import Path
 from loguru import logger
 from workers import WorkerEntrypoint
 
-from faceapi.core import _CONFIG_
+from faceapi.core import (
+    _ADMISSION_,
+    _BLOB_STORE_,
+    _CONFIG_,
+    _IMPORT_ADMISSION_,
+    _SESSION_MANAGER_,
+    _SESSION_STORE_,
+    _SNAPSHOT_STORE_,
+)
+from faceapi.core.admission import AdmissionMiddleware
+from faceapi.db import database_lifespan, get_persistent_sql_client
+from faceapi.face_rec import get_default_model
 from faceapi.routes import admin, face, user, session
-from fastapi import FastAPI
-from fastapi.responses import FileResponse
+from faceapi.utils import AuthContext, HashQueueFull, get_admin_context, shutdown_hash_executor
+from faceapi.utils.session_utils import verified_tokens
+from fastapi import Depends, FastAPI, Request
+from fastapi.responses import FileResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import APIRouter
 
+# 流入制御の対象となる顔認識パイプラインのパス（POST / PUT のみ）
+ADMISSION_PATHS = (
+    f"{_CONFIG_.API_V1_STR}/face/",
+    f"{_CONFIG_.API_V1_STR}/admin/face/",
+)
+
+# 一括インポートのパス（長時間処理枠を保持するため、顔認識パイプラインとは別に制限する）
+IMPORT_ADMISSION_PATHS = (
+    f"{_CONFIG_.API_V1_STR}/admin/users/import",
+    f"{_CONFIG_.API_V1_STR}/admin/gallery/import",
+)
+
+# 共有セッションストア使用時、他のワーカーが書き込み中の可能性がある新しい顔画像は削除しない（秒）
+SHARED_BLOB_SWEEP_MIN_AGE = 3600
+
 
 @asynccontextmanager
-async def lifespan(_: FastAPI):
+async def lifespan(app: FastAPI):
     """起動およびシャットダウンイベントのライフスパンイベントハンドラ"""
-    # 起動イベント
-    # await asyncio.gather(db_init())
-    yield
-    # シャットダウンイベント（もしあれば）
+    # 永続化データベースを使用する場合は接続を初期化（終了時に切断）
+    async with database_lifespan(app):
+        # 起動イベント
+        # 顔認識モデルは初回使用時に読み込まれるため、モデルファイルの問題を起動時に検出できるよう先に読み込む
+        get_default_model()
+        if not _CONFIG_.USE_MEMORY_DB:
+            # 共有の SQL 管理器を初期化し、データベース内の顔画像の参照を読み込む
+            await get_persistent_sql_client(_BLOB_STORE_)
+        else:
+            # 前回のスナップショットからセッションを復元し、顔画像の参照を読み込む
+            await _SESSION_MANAGER_.restore_snapshots()
+        # 前回の実行で残った参照されていない顔画像を削除
+        if _SESSION_STORE_ is None:
+            _BLOB_STORE_.sweep()
+        else:
+            # 他のワーカーのセッションが参照する顔画像は残す
+            _BLOB_STORE_.sweep(
+                keep=_SESSION_STORE_.referenced_digests(),
+                min_age=SHARED_BLOB_SWEEP_MIN_AGE,
+            )
+
+        # 期限切れセッションを定期的に回収（アイドル時もメモリと顔画像を解放）
+        sweeper_task = None
+        if _CONFIG_.SESSION_SWEEP_INTERVAL_SECONDS > 0:
+            sweeper_task = asyncio.create_task(
+                _SESSION_MANAGER_.run_sweeper_loop(_CONFIG_.SESSION_SWEEP_INTERVAL_SECONDS)
+            )
+
+        snapshot_task = None
+        persists_sessions = _SNAPSHOT_STORE_ is not None or _SESSION_STORE_ is not None
+        if persists_sessions and _CONFIG_.SNAPSHOT_INTERVAL_SECONDS > 0:
+            snapshot_task = asyncio.create_task(
+                _SESSION_MANAGER_.run_snapshot_loop(_CONFIG_.SNAPSHOT_INTERVAL_SECONDS)
+            )
+        try:
+            yield
+        finally:
+            # シャットダウンイベント：定期保存と回収を停止し、最新の状態を保存
+            for task in (snapshot_task, sweeper_task):
+                if task is not None:
+                    task.cancel()
+                    with suppress(asyncio.CancelledError):
+                        await task
+            await _SESSION_MANAGER_.save_snapshots()
+            shutdown_hash_executor()
 
 
 app = FastAPI(
@@ -36,6 +106,25 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+
+@app.exception_handler(HashQueueFull)
+async def hash_queue_full_handler(request: Request, exc: HashQueueFull):
+    """パスワードのハッシュ化・検証の待ち行列が満杯の場合は 503 を返す"""
+    return JSONResponse(
+        {"detail": "Server is busy"},
+        status_code=503,
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+    )
+
+
+# 顔認識パイプラインの流入制御ミドルウェアを追加
+# （後から追加したミドルウェアが外側になるため、拒否のレスポンスにもCORSヘッダーが付く）
+if _CONFIG_.ADMISSION_CONTROL_ENABLED:
+    app.add_middleware(AdmissionMiddleware, controller=_ADMISSION_, paths=ADMISSION_PATHS)
+    app.add_middleware(
+        AdmissionMiddleware, controller=_IMPORT_ADMISSION_, paths=IMPORT_ADMISSION_PATHS
+    )
+
 # CORSミドルウェアを追加r
 app.add_middleware(
     CORSMiddleware,
@@ -62,6 +151,21 @@ async def health_check():
     """ヘルスチェックエンドポイント"""
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def metrics(context: AuthContext = Depends(get_admin_context)):
+    """流入制御・セッション・トークンキャッシュの使用状況を返すメトリクスエンドポイント（管理者のみ）"""
+    return {
+        "admission": _ADMISSION_.metrics(),
+        "import_admission": _IMPORT_ADMISSION_.metrics(),
+        "sessions": _SESSION_MANAGER_.get_memory_summary(),
+        "session_sweeper": _SESSION_MANAGER_.get_sweep_summary(),
+        "token_cache": {
+            "size": len(verified_tokens),
+            "hits": verified_tokens.hits,
+            "misses": verified_tokens.misses,
+        },
+    }
+
 # 静的ファイルをサービスする
 STATIC_ROOT = Path(_CONFIG_.STATIC_ROOT)
 if STATIC_ROOT.is_dir():
@@ -5,6 +5,7 @@
 ユーザーアカウント情報と関連するデータ構造が含まれます。
 """
 
+from .embedding_change import EmbeddingChangeModel
 from .user import UserModel
 
-__ALL__ = ["UserModel"]
+__ALL__ = ["EmbeddingChangeModel", "UserModel"]
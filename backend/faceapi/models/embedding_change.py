@@ -0,0 +1,30 @@
+"""
+顔特徴ベクトルの変更履歴モデルモジュール。
+
+このモジュールは複数のワーカープロセスがそれぞれ保持する
+ベクトルインデックスを同期するための変更履歴モデルを定義します。
+"""
+
+from tortoise import fields
+from tortoise.models import Model
+
+
+class EmbeddingChangeModel(Model):
+    """
+    顔特徴ベクトルの変更履歴のデータベースモデル。
+
+    ユーザーの埋め込みベクトルが作成・更新・削除されるたびに1行追加されます。
+    各ワーカーは最後に反映した id より新しい行を読み、
+    該当ユーザーのベクトルをデータベースから再読み込みします。
+    """
+
+    id = fields.IntField(pk=True)
+    user_id = fields.IntField(description="変更されたユーザーのID")
+
+    class Meta:
+        """テーブル設定を定義するメタクラス。"""
+
+        table = "embedding_changes"
+
+    def __str__(self):
+        return f"{self.id}: {self.user_id}"
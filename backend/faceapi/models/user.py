@@ -20,15 +20,17 @@ class UserModel(Model):
 
     id = fields.IntField(pk=True)
     username = fields.CharField(max_length=100, unique=True)
-    email = fields.CharField(max_length=200, unique=True)
+    email = fields.CharField(max_length=200)
+    # 大文字小文字を区別しない一意性のための正規化済みメールアドレス
+    email_key = fields.CharField(max_length=200, unique=True)
     full_name = fields.CharField(max_length=200, null=True)
     hashed_password = fields.CharField(max_length=200)
-    is_active = fields.BooleanField(default=True)
+    is_active = fields.BooleanField(default=True, db_index=True)
     created_at = fields.DatetimeField(auto_now_add=True)
     updated_at = fields.DatetimeField(auto_now=True)
-    head_pic = fields.TextField(null=True)
-    is_admin = fields.BooleanField(default=False)
-    embedding = fields.JSONField(null=True, description="人脸特征向量嵌入数据")
+    head_pic = fields.CharField(max_length=64, null=True, description="顔画像の参照（ダイジェスト）")
+    is_admin = fields.BooleanField(default=False, db_index=True)
+    embedding = fields.BinaryField(null=True, description="人脸特征向量嵌入数据（float32 バイト列）")
 
     class Meta:
         """テーブル設定を定義するメタクラス。"""
@@ -9,13 +9,14 @@ import logging
 from traceback import print_exc
 from typing import Optional
 
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from fastapi import APIRouter, Depends, File, HTTPException, Request, UploadFile
+from fastapi.responses import StreamingResponse
 from tortoise.transactions import atomic
 
-from ..models import UserModel
 from ..schemas import (
     BatchOperationRequest,
     BatchOperationResult,
+    BulkImportResult,
     DataResponse,
     ListResponse,
     User,
@@ -27,14 +28,22 @@ from ..services import (
     batch_deactivate_users_service,
     batch_reset_face_data_service,
     batch_reset_password_service,
+    bulk_import_users_service,
     create_user_as_admin_service,
+    export_gallery_service,
     get_user_service,
+    import_gallery_service,
     list_users_service,
     update_face_embedding_service,
     update_user_as_admin_service,
     validate_user_update_uniqueness,
 )
-from ..utils import get_current_admin_user, get_current_session
+from ..utils import (
+    AuthContext,
+    UploadedImage,
+    get_admin_context,
+    get_upload_image_with_bytes,
+)
 
 router = APIRouter(
     prefix="/admin",
@@ -46,7 +55,6 @@ logger = logging.getLogger(__name__)
 @router.get(
     "/users",
     response_model=ListResponse[User],
-    dependencies=[Depends(get_current_admin_user)],
 )
 async def list_all_users(
     skip: int = 0,
@@ -57,13 +65,13 @@ async def list_all_users(
     is_active: Optional[bool] = None,
     is_admin: Optional[bool] = None,
     set_face: Optional[bool] = None,
-    current_ip: str = Depends(get_current_session)
+    context: AuthContext = Depends(get_admin_context)
 ):
     """ページネーションとオプションフィルターで全ユーザーをリスト表示する管理者エンドポイント"""
     try:
         limit = min(100, max(limit, 1))
         users, count = await list_users_service(
-            current_ip,
+            context,
             skip,
             limit,
             username,
@@ -93,15 +101,14 @@ async def list_all_users(
 @router.get(
     "/users/{user_id}",
     response_model=DataResponse[User],
-    dependencies=[Depends(get_current_admin_user)],
 )
 async def get_user_by_id(
     user_id: int,
-    current_ip: str = Depends(get_current_session)
+    context: AuthContext = Depends(get_admin_context)
 ):
     """IDで特定のユーザーを取得する管理者エンドポイント"""
     try:
-        user = await get_user_service(current_ip, id=user_id)
+        user = await get_user_service(context, id=user_id)
         if not user:
             raise HTTPException(status_code=404, detail="ユーザーが見つかりません")
 
@@ -135,23 +142,22 @@ async def get_user_by_id(
 @router.post(
     "/users",
     response_model=DataResponse[User],
-    dependencies=[Depends(get_current_admin_user)],
 )
 async def create_user_as_admin(
     user_create: UserCreateAsAdmin,
-    current_ip: str = Depends(get_current_session)
+    context: AuthContext = Depends(get_admin_context)
 ):
     """新しいユーザーを作成する管理者エンドポイント"""
     try:
         # ユーザーが既に存在するか確認
-        existing_user = await get_user_service(current_ip, username=user_create.username)
+        existing_user = await get_user_service(context, username=user_create.username)
         if existing_user:
             raise HTTPException(
                 status_code=400,
                 detail="ユーザー名は既に使用されています",
             )
 
-        existing_email = await get_user_service(current_ip, email=user_create.email)
+        existing_email = await get_user_service(context, email=user_create.email)
         if existing_email:
             raise HTTPException(
                 status_code=400,
@@ -159,7 +165,7 @@ async def create_user_as_admin(
             )
 
         # サービス経由でユーザーを作成
-        created_user = await create_user_as_admin_service(user_create, current_ip)
+        created_user = await create_user_as_admin_service(user_create, context)
 
         # レスポンス形式に変換
         user_response = User(
@@ -192,33 +198,31 @@ async def create_user_as_admin(
 @router.put(
     "/users/{user_id}",
     response_model=DataResponse[User],
-    dependencies=[Depends(get_current_admin_user)],
 )
 async def update_user_as_admin(
     user_id: int,
     user_update: UserUpdateAsAdmin,
-    current_admin: UserModel = Depends(get_current_admin_user),
-    current_ip: str = Depends(get_current_session)
+    context: AuthContext = Depends(get_admin_context)
 ):
     """IDで特定のユーザーを更新する管理者エンドポイント"""
     try:
         # ユーザーを取得して存在を確認
-        user = await get_user_service(current_ip, id=user_id)
+        user = await get_user_service(context, id=user_id)
         if not user:
             raise HTTPException(status_code=404, detail="ユーザーが見つかりません")
 
-        if user_id == current_admin['id']:
+        if user_id == context.user_id:
             # 現在のユーザーが管理者であっても、自分自身のアクティブ/非アクティブ変更は許可されません
             if user_update.is_active is not None:
                 raise HTTPException(status_code=400, detail="自分のステータスは変更できません")
 
         # ユーザー名とメールアドレスの一意性を検証
-        validation_error = await validate_user_update_uniqueness(user_id, user_update, current_ip)
+        validation_error = await validate_user_update_uniqueness(user_id, user_update, context)
         if validation_error:
             raise HTTPException(status_code=400, detail=validation_error)
 
         # サービス経由でユーザーを更新
-        updated_user = await update_user_as_admin_service(user_id, user_update, current_ip)
+        updated_user = await update_user_as_admin_service(user_id, user_update, context)
 
         user_response = User(
             id=updated_user['id'],
@@ -251,13 +255,11 @@ async def update_user_as_admin(
 @router.post(
     "/batch/{operation}",
     response_model=DataResponse[BatchOperationResult],
-    dependencies=[Depends(get_current_admin_user)],
 )
 async def batch_operation(
     operation: str,
     batch_request: BatchOperationRequest,
-    current_admin: UserModel = Depends(get_current_admin_user),
-    current_ip: str = Depends(get_current_session)
+    context: AuthContext = Depends(get_admin_context)
 ):
     """
     複数のユーザーに対してバッチ操作を実行する管理者エンドポイント。
@@ -271,7 +273,7 @@ async def batch_operation(
     引数:
         operation: 実行する操作
         batch_request: user_idsとオプション値を含むリクエスト
-        current_admin: 現在の管理者ユーザー（依存関係）
+        context: 管理者の認証コンテキスト（依存関係）
 
     戻り値:
         成功/失敗統計を含むBatchOperationResult
@@ -289,7 +291,7 @@ async def batch_operation(
         raise HTTPException(status_code=400, detail="user_idsリストは空にできません")
 
     # 自己操作制限を確認
-    if current_admin['id'] in batch_request.user_ids:
+    if context.user_id in batch_request.user_ids:
         raise HTTPException(
             status_code=400, detail="バッチ操作に自分のアカウントを含めることはできません"
         )
@@ -310,14 +312,14 @@ async def batch_operation(
                     detail="パスワードリセット操作には値が必要です",
                 )
             result = await batch_reset_password_service(
-                batch_request.user_ids, batch_request.value, current_ip
+                batch_request.user_ids, batch_request.value, context
             )
         elif operation == "active":
-            result = await batch_activate_users_service(batch_request.user_ids, current_ip)
+            result = await batch_activate_users_service(batch_request.user_ids, context)
         elif operation == "inactive":
-            result = await batch_deactivate_users_service(batch_request.user_ids, current_ip)
+            result = await batch_deactivate_users_service(batch_request.user_ids, context)
         elif operation == "reset-face":
-            result = await batch_reset_face_data_service(batch_request.user_ids, current_ip)
+            result = await batch_reset_face_data_service(batch_request.user_ids, context)
         else:
             # 上記の検証により発生すべきではないが、完全性のために追加
             raise HTTPException(status_code=500, detail="サポートされていない操作です")
@@ -337,16 +339,81 @@ async def batch_operation(
         ) from e
 
 
+@router.post("/users/import")
+async def import_users(
+    manifest: UploadFile = File(...),
+    images: Optional[UploadFile] = File(None),
+    context: AuthContext = Depends(get_admin_context)
+):
+    """
+    マニフェストと顔画像アーカイブからユーザーを一括登録する管理者エンドポイント。
+
+    マニフェストは CSV（ヘッダー行付き）または JSONL で、各行に username、email、
+    password と任意の full_name、is_admin、is_active、image（アーカイブ内の画像のパス）を指定します。
+    進捗は NDJSON でストリーミングされ、バッチごとに処理件数を、
+    最後に行ごとのエラーを含む結果（finished が true）を返します。
+
+    引数:
+        manifest: ユーザーのマニフェストファイル（.csv / .jsonl）
+        images: 顔画像の ZIP アーカイブ（省略可）
+
+    戻り値:
+        BulkImportResult を1行ずつ含む NDJSON ストリーム
+    """
+    progress = await bulk_import_users_service(
+        manifest.file, manifest.filename, images.file if images else None, context
+    )
+
+    async def stream():
+        async for result in progress:
+            yield result.model_dump_json() + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@router.get("/gallery/export")
+async def export_gallery(context: AuthContext = Depends(get_admin_context)):
+    """
+    セッションのすべてのユーザーと顔埋め込みをバンドルとしてダウンロードする管理者エンドポイント。
+
+    ユーザー記録は NDJSON、埋め込みは float32 のバイナリとしてチャンクごとに書き出され、
+    ギャラリーの大きさに関わらず一定のメモリでストリーミングされます。
+    """
+    stream = await export_gallery_service(context)
+    return StreamingResponse(
+        stream,
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": 'attachment; filename="gallery.fgb"'},
+    )
+
+
+@router.post(
+    "/gallery/import",
+    response_model=DataResponse[BulkImportResult],
+)
+async def import_gallery(request: Request, context: AuthContext = Depends(get_admin_context)):
+    """
+    エクスポートされたバンドル（リクエストボディ）をセッションにインポートする管理者エンドポイント。
+
+    ボディはチャンクごとに読み込まれ、ユーザーと顔埋め込みが一括登録されます。
+    ユーザーIDは新しく割り当てられ、顔画像はこのインスタンスに存在する場合のみ引き継がれます。
+    """
+    result = await import_gallery_service(request.stream(), context)
+    return DataResponse[BulkImportResult](
+        success=True,
+        message=f"{result.created_count} 件のユーザーをインポートしました",
+        code=200,
+        data=result,
+    )
+
+
 # 管理者として任意のユーザーの顔を更新
 @atomic()
-@router.put(
-    "/face/{user_id}",
-    dependencies=[Depends(get_current_admin_user)],
-)
+@router.put("/face/{user_id}")
 async def update_face_embedding_as_admin(
     user_id: int,
-    image: UploadFile = File(...),
-    current_ip: str = Depends(get_current_session)
+    upload: UploadedImage = Depends(get_upload_image_with_bytes),
+    context: AuthContext = Depends(get_admin_context)
 ):
     """
     指定されたユーザーの顔埋め込みを管理者として更新。
@@ -355,13 +422,15 @@ async def update_face_embedding_as_admin(
 
     引数:
         user_id (int): 顔埋め込みを更新するユーザーのID
-        image (UploadFile): ユーザーの顔を含むアップロードされた画像
+        upload (UploadedImage): ユーザーの顔を含むアップロード画像（デコード済みの画像と元のバイト列）
 
     戻り値:
         埋め込みが更新されたことを示す成功メッセージ
     """
     try:
-        result = await update_face_embedding_service(user_id, image, current_ip)
+        result = await update_face_embedding_service(
+            user_id, upload.image, context, image_data=upload.data
+        )
         return result
     except HTTPException:
         raise
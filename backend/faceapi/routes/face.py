@@ -5,14 +5,55 @@
 検証機能のAPIエンドポイントを定義します。
 """
 
+import asyncio
+import json
 import logging
 from traceback import print_exc
+from typing import List, Optional, Tuple
 
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+import numpy as np
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Path,
+    Request,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import FileResponse, Response
+from pydantic import TypeAdapter, ValidationError
 from tortoise.transactions import atomic
 
-from ..services.face import update_face_embedding_service, verify_face_service
-from ..utils import get_current_user, get_current_session
+from ..core import _ADMISSION_, _CONFIG_
+from ..core.admission import AdmissionRejected
+from ..schemas import (
+    DataResponse,
+    FaceRecognitionRequest,
+    FaceRecognitionResponse,
+    ListResponse,
+)
+from ..services.face import (
+    get_head_pic_service,
+    recognize_batch_service,
+    recognize_faces_service,
+    update_face_embedding_service,
+    verify_face_service,
+    verify_frame_service,
+)
+from ..utils import (
+    AuthContext,
+    UploadedImage,
+    decode_session_token,
+    get_session_context,
+    get_upload_image,
+    get_upload_image_with_bytes,
+    get_user_context,
+    load_session_context,
+    read_limited_body,
+)
 
 router = APIRouter(
     prefix="/face",
@@ -20,23 +61,51 @@ router = APIRouter(
 )
 logger = logging.getLogger(__name__)
 
+# WebSocket 接続後、最初のメッセージでセッショントークンを受け取るまでの待ち時間（秒）
+WS_AUTH_TIMEOUT = 5.0
+
+_batch_requests_adapter = TypeAdapter(List[FaceRecognitionRequest])
+
+
+async def get_batch_requests(request: Request) -> List[FaceRecognitionRequest]:
+    """
+    バッチ認識のリクエストボディを読み込んで検証する依存関数。
+
+    ボディは FACE_BATCH_MAX_BYTES を上限にストリーミングで読み込み、
+    上限を超えた時点で（JSON を解析する前に）拒否します。
+
+    例外:
+        HTTPException: ボディが上限を超えた場合 (413)
+        RequestValidationError: ボディが画像リクエストのリストでない場合 (422)
+    """
+    body = await read_limited_body(request, _CONFIG_.FACE_BATCH_MAX_BYTES)
+    try:
+        return _batch_requests_adapter.validate_json(body)
+    except ValidationError as e:
+        # 巨大な Base64 文字列をエラーレスポンスに含めない
+        errors = e.errors(include_url=False, include_input=False)
+        for error in errors:
+            error["loc"] = ("body", *error["loc"])
+        raise RequestValidationError(errors) from e
+
 
 @router.post("/verify")
 async def verify_face(
-    image: UploadFile = File(...),
-    current_ip: str = Depends(get_current_session)
+    image: np.ndarray = Depends(get_upload_image),
+    context: AuthContext = Depends(get_session_context)
 ):
     """
     アップロードされた画像から顔を検証し、拒否結果またはOAuth2トークンを返します。
+    multipart/form-data の "image" フィールド、または image/jpeg の生ボディを受け付けます。
 
     引数:
-        image: 顔を含むアップロードされた画像ファイル
+        image: 顔を含むアップロード画像（デコード済み）
 
     戻り値:
         顔が認識された場合は拒否メッセージまたはOAuth2トークン
     """
     try:
-        result = await verify_face_service(image, current_ip)
+        result = await verify_face_service(image, context)
         return result
     except HTTPException:
         raise
@@ -46,29 +115,99 @@ async def verify_face(
         raise e
 
 
+@router.post("/recognize", response_model=DataResponse[FaceRecognitionResponse])
+async def recognize_faces(
+    image: np.ndarray = Depends(get_upload_image),
+    largest_only: bool = False,
+    context: AuthContext = Depends(get_session_context)
+):
+    """
+    画像内のすべての顔を認識し、顔ごとの結果をバウンディングボックス付きで返します。
+
+    引数:
+        image: 顔を含むアップロード画像（デコード済み）
+        largest_only: 最大の顔のみを認識する高速モード
+
+    戻り値:
+        顔ごとの認識結果を含むFaceRecognitionResponse
+    """
+    try:
+        response = await recognize_faces_service(image, context, largest_only)
+        return DataResponse[FaceRecognitionResponse](
+            success=True,
+            message="顔認識が完了しました",
+            code=200,
+            data=response,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        print_exc()
+        logger.error("顔認識エラー: %s", str(e))
+        raise e
+
+
+@router.post("/recognize/batch", response_model=ListResponse[FaceRecognitionResponse])
+async def recognize_faces_batch(
+    requests: List[FaceRecognitionRequest] = Depends(get_batch_requests),
+    context: AuthContext = Depends(get_session_context)
+):
+    """
+    複数のBase64エンコード画像をまとめて認識します。
+    リクエストボディは FACE_BATCH_MAX_BYTES まで、各画像はデコード後 MAX_UPLOAD_SIZE までです。
+
+    引数:
+        requests: 認識する画像のリスト
+
+    戻り値:
+        入力と同じ順序の画像ごとのFaceRecognitionResponseのリスト
+    """
+    if not requests:
+        raise HTTPException(status_code=400, detail="画像リストは空にできません")
+    if len(requests) > _CONFIG_.FACE_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"1回のリクエストで認識できる画像は最大 {_CONFIG_.FACE_BATCH_MAX_SIZE} 枚です",
+        )
+
+    try:
+        responses = await recognize_batch_service(requests, context)
+        return ListResponse[FaceRecognitionResponse](
+            success=True,
+            message="バッチ認識が完了しました",
+            code=200,
+            data=responses,
+            total=len(responses),
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        print_exc()
+        logger.error("バッチ認識エラー: %s", str(e))
+        raise e
+
+
 @atomic()
-@router.put("/me", dependencies=[Depends(get_current_user)])
+@router.put("/me")
 async def update_face_embedding(
-    image: UploadFile = File(...), 
-    current_user: str = Depends(get_current_user),
-    current_ip: str = Depends(get_current_session)
+    upload: UploadedImage = Depends(get_upload_image_with_bytes),
+    context: AuthContext = Depends(get_user_context),
 ):
     """
     現在認証されているユーザーの顔埋め込みを更新します。
     ユーザーAPIと同様にOAuth2認証が必要です。
 
     引数:
-        image: 新しい顔を含むアップロードされた画像ファイル
-        current_user: 現在認証されているユーザー（JWTトークンから）
+        upload: 新しい顔を含むアップロード画像（デコード済みの画像と元のバイト列）
+        context: 現在認証されているユーザーの認証コンテキスト（JWTトークンから）
 
     戻り値:
-        埋め込みが更新されたことを示す成功メッセージ
+        埋め込みが更新されたことを示す成功メッセージと顔画像の参照
     """
     try:
-        # トークンからユーザーIDを取得
-        user_id = int(current_user)
-
-        result = await update_face_embedding_service(user_id, image, current_ip)
+        result = await update_face_embedding_service(
+            context.user_id, upload.image, context, image_data=upload.data
+        )
         return result
     except HTTPException:
         raise
@@ -76,3 +215,194 @@ async def update_face_embedding(
         print_exc()
         logger.error("顔埋め込み更新エラー: %s", str(e))
         raise e
+
+
+@router.get("/pic/{digest}")
+async def get_head_pic(
+    request: Request,
+    digest: str = Path(..., pattern=r"^[0-9a-f]{64}$"),
+    thumbnail: bool = False,
+    context: AuthContext = Depends(get_user_context),
+):
+    """
+    顔画像をバイナリで返します。
+
+    本人の顔画像、または管理者がセッション内のユーザーの顔画像を取得する場合のみ返します
+    （セッショントークンとアクセストークンが必要）。
+
+    顔画像は内容のダイジェストで参照されるため内容が変わることはなく、
+    ETag と長期間の Cache-Control を付けて返します。
+    If-None-Match が一致する場合は 304 を返します。
+
+    引数:
+        digest: 顔画像の参照（ユーザー情報の head_pic）
+        thumbnail: サムネイルを返すかどうか
+        context: 認証コンテキスト（ユーザーを含む）
+
+    戻り値:
+        画像ファイルのレスポンス
+    """
+    path, media_type = await get_head_pic_service(digest, context, thumbnail)
+    etag = f'"{digest}-thumb"' if thumbnail else f'"{digest}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={_CONFIG_.HEAD_PIC_CACHE_MAX_AGE}, immutable",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag in candidates or "*" in candidates:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+
+class LatestFrameSlot:
+    """
+    最新フレームのみを保持するスロット。
+
+    処理が受信に追いつかない場合、未処理の古いフレームは
+    新しいフレームで上書きされ、破棄数としてカウントされます。
+    """
+
+    def __init__(self):
+        self._frame: Optional[bytes] = None
+        self._event = asyncio.Event()
+        self.seq = 0
+        self.dropped = 0
+
+    def put(self, frame: bytes):
+        """フレームを格納（未処理のフレームは破棄）"""
+        if self._frame is not None:
+            self.dropped += 1
+        self._frame = frame
+        self.seq += 1
+        self._event.set()
+
+    async def take(self) -> Tuple[int, bytes]:
+        """次の最新フレームを待って取り出す"""
+        await self._event.wait()
+        self._event.clear()
+        frame, self._frame = self._frame, None
+        return self.seq, frame
+
+
+async def _receive_session_ip(websocket: WebSocket) -> Optional[str]:
+    """最初のテキストメッセージからセッショントークンを受け取り、IPアドレスを返す（無効な場合は None）"""
+    try:
+        message = await asyncio.wait_for(websocket.receive(), WS_AUTH_TIMEOUT)
+    except asyncio.TimeoutError:
+        return None
+    token = message.get("text")
+    if not token:
+        return None
+    if token.lstrip().startswith("{"):
+        try:
+            token = json.loads(token).get("session_token")
+        except (ValueError, AttributeError):
+            return None
+    if not isinstance(token, str):
+        return None
+    try:
+        return decode_session_token(token)
+    except HTTPException:
+        return None
+
+
+@router.websocket("/ws")
+async def verify_face_stream(websocket: WebSocket):
+    """
+    カメラ映像のフレームを連続して受け付ける顔検証WebSocketエンドポイント。
+
+    セッショントークンは接続時に一度だけ検証されます。Session-Token ヘッダー、
+    またはヘッダーを設定できないクライアント（ブラウザ）では接続後の最初の
+    テキストメッセージ（トークン文字列または {"session_token": ...}）で渡します。
+    トークンがアクセスログに残らないよう、クエリパラメータでは受け付けません。
+    クライアントはエンコード済み画像（JPEGなど）をバイナリメッセージで送信し、
+    サーバーは常に最新のフレームのみを処理して /face/verify と同じ形式の
+    結果を frame_seq と dropped_frames を付けて返します。
+    各フレームの処理には HTTP の顔認識リクエストと同じ流入制御が適用され、
+    拒否されたフレームには code（429 / 503）と retry_after を返し、
+    その秒数だけ次のフレームの処理を待ちます。
+    """
+    token = websocket.headers.get("Session-Token")
+    if token is not None:
+        try:
+            current_ip = decode_session_token(token)
+        except HTTPException:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+        await websocket.accept()
+    else:
+        await websocket.accept()
+        current_ip = await _receive_session_ip(websocket)
+        if current_ip is None:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+    slot = LatestFrameSlot()
+    client_address = _ADMISSION_.client_address(websocket.scope)
+
+    async def receive_frames():
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            frame = message.get("bytes")
+            if not frame:
+                continue
+            if len(frame) > _CONFIG_.MAX_UPLOAD_SIZE:
+                await websocket.close(code=status.WS_1009_MESSAGE_TOO_BIG)
+                return
+            slot.put(frame)
+
+    receiver = asyncio.create_task(receive_frames())
+    try:
+        while True:
+            take = asyncio.ensure_future(slot.take())
+            done, _ = await asyncio.wait(
+                {receiver, take}, return_when=asyncio.FIRST_COMPLETED
+            )
+            if take not in done:
+                # 受信側が終了した（切断など）
+                take.cancel()
+                break
+
+            seq, frame = take.result()
+            retry_after = 0.0
+            try:
+                if _CONFIG_.ADMISSION_CONTROL_ENABLED:
+                    await _ADMISSION_.acquire(client_address)
+                try:
+                    # セッションの削除や期限切れを検出するため、フレームごとに解決する
+                    context = await load_session_context(current_ip)
+                    result = await verify_frame_service(frame, context)
+                finally:
+                    if _CONFIG_.ADMISSION_CONTROL_ENABLED:
+                        _ADMISSION_.release()
+            except AdmissionRejected as e:
+                retry_after = e.retry_after
+                result = {
+                    "recognized": False, "message": e.detail,
+                    "code": e.status_code, "retry_after": retry_after,
+                }
+            except HTTPException as e:
+                result = {"recognized": False, "message": e.detail, "code": e.status_code}
+                if e.status_code == 401:
+                    await websocket.send_json(result)
+                    await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+                    break
+
+            result["frame_seq"] = seq
+            result["dropped_frames"] = slot.dropped
+            await websocket.send_json(result)
+            if retry_after:
+                # 待機中に届いたフレームは最新のもの以外破棄される
+                await asyncio.sleep(retry_after)
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print_exc()
+        logger.error("顔ストリーム検証エラー: %s", str(e))
+    finally:
+        receiver.cancel()
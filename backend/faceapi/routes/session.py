@@ -175,10 +175,12 @@ async def get_session_summary():
         return ErrorResponse(code=400, detail="セッション管理機能が有効になっていません")
 
     try:
-        summary = _SESSION_MANAGER_.get_sessions_summary()
+        summary = await _SESSION_MANAGER_.get_sessions_summary()
         summary["config"] = {
             "session_expire_seconds": _CONFIG_.SESSION_ID_EXPIRE_SECONDS,
             "enable_session_management": _CONFIG_.ENABLE_SESSION_MANAGEMENT,
+            "session_memory_budget": _CONFIG_.SESSION_MEMORY_BUDGET,
+            "session_sweep_interval_seconds": _CONFIG_.SESSION_SWEEP_INTERVAL_SECONDS,
         }
         return summary
     except Exception as e:
@@ -195,8 +197,12 @@ async def cleanup_expired_sessions():
         return ErrorResponse(code=400, detail="セッション管理機能が有効になっていません")
 
     try:
-        await _SESSION_MANAGER_._cleanup_expired_sessions()
-        return {"success": True, "message": "期限切れセッションのクリーンアップが完了しました"}
+        result = await _SESSION_MANAGER_.sweep_expired_sessions()
+        return {
+            "success": True,
+            "message": "期限切れセッションのクリーンアップが完了しました",
+            "data": result,
+        }
     except Exception as e:
         logger.error(f"期限切れセッションのクリーンアップに失敗しました: {str(e)}")
         return ErrorResponse(code=500, detail=f"期限切れセッションのクリーンアップに失敗しました: {str(e)}")
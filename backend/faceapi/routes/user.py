@@ -16,7 +16,7 @@ from ..services.user import (
     get_current_user_profile_service,
     update_user_profile_service,
 )
-from ..utils import create_access_token, get_current_user, get_current_session
+from ..utils import AuthContext, create_access_token, get_session_context, get_user_context
 
 router = APIRouter(
     prefix="/user",
@@ -27,11 +27,11 @@ router = APIRouter(
 @router.post("/login", response_model=DataResponse[dict])
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    current_ip: str = Depends(get_current_session),
+    context: AuthContext = Depends(get_session_context),
 ):
     """認証成功時にJWTトークンを返すログインエンドポイント"""
     try:
-        user = await authenticate_user(form_data.username, form_data.password, current_ip)
+        user = await authenticate_user(form_data.username, form_data.password, context)
 
         if not user:
             raise HTTPException(
@@ -65,11 +65,11 @@ async def login(
 
 
 @router.post("/signup", response_model=DataResponse[User])
-async def create_user(user: UserCreate, current_ip: str = Depends(get_current_session)):
+async def create_user(user: UserCreate, context: AuthContext = Depends(get_session_context)):
     """新しいユーザーアカウントを作成"""
     try:
         # サービス経由でユーザーを作成
-        created_user = await create_user_service(user, current_ip)
+        created_user = await create_user_service(user, context)
 
         # レスポンス形式に変換
         user_response = User(
@@ -100,14 +100,11 @@ async def create_user(user: UserCreate, current_ip: str = Depends(get_current_se
 
 @router.get("/me", response_model=DataResponse[User])
 async def get_current_user_profile(
-    current_user: str = Depends(get_current_user),
-    current_ip: str = Depends(get_current_session),
+    context: AuthContext = Depends(get_user_context),
 ):
     """認証トークンに基づいて現在のユーザーのプロフィールを取得"""
     try:
-        user_id = int(current_user)
-
-        user = await get_current_user_profile_service(user_id, current_ip)
+        user = await get_current_user_profile_service(context)
 
         return DataResponse[User](
             success=True, message="プロフィールが正常に取得されました", code=200, data=user
@@ -123,15 +120,12 @@ async def get_current_user_profile(
 @router.put("/me", response_model=DataResponse[User])
 async def update_current_user_profile(
     user_update: UserUpdate,
-    current_user: str = Depends(get_current_user),
-    current_ip: str = Depends(get_current_session),
+    context: AuthContext = Depends(get_user_context),
 ):
     """認証トークンに基づいて現在のユーザーのプロフィールを更新"""
     try:
-        user_id = int(current_user)
-
         # サービス経由でユーザーを更新
-        updated_user_obj = await update_user_profile_service(user_id, user_update, current_ip)
+        updated_user_obj = await update_user_profile_service(user_update, context)
 
         updated_user = User(
             id=updated_user_obj['id'],
@@ -162,15 +156,12 @@ async def update_current_user_profile(
 
 @router.delete("/me", response_model=DataResponse[bool])
 async def delete_current_user_account(
-    current_user: str = Depends(get_current_user),
-    current_ip: str = Depends(get_current_session),
+    context: AuthContext = Depends(get_user_context),
 ):
     """認証トークンに基づいて現在のユーザーのアカウントを削除"""
     try:
-        user_id = int(current_user)
-
         # サービス経由でユーザーアカウントを削除
-        success = await delete_user_account_service(user_id, current_ip)
+        success = await delete_user_account_service(context)
 
         return DataResponse[bool](
             success=True,
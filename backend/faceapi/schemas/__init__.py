@@ -13,11 +13,14 @@ from .response import DataResponse, ListResponse
 from .user import (
     BatchOperationRequest,
     BatchOperationResult,
+    BulkImportResult,
+    BulkImportRowError,
     User,
     UserBase,
     UserCreate,
     UserCreateAsAdmin,
     UserCreatePydantic,
+    UserImportRow,
     UserPydantic,
     UserUpdate,
     UserUpdateAsAdmin,
@@ -38,6 +41,9 @@ __all__ = [
     "UserUpdatePydantic",
     "BatchOperationRequest",
     "BatchOperationResult",
+    "BulkImportRowError",
+    "BulkImportResult",
+    "UserImportRow",
     "User",
     "FaceRegisterRequest",
     "FaceRecognitionResult",
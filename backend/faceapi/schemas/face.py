@@ -33,6 +33,7 @@ class FaceRecognitionResult(BaseModel):
         confidence: Confidence score of the recognition
         recognized: Whether a face was successfully recognized
         message: Additional information about the recognition
+        bbox: Bounding box of the face as [x, y, w, h] (optional)
     """
 
     user_id: Optional[int] = None
@@ -40,6 +41,7 @@ class FaceRecognitionResult(BaseModel):
     confidence: Optional[float] = None
     recognized: bool = False
     message: str = ""
+    bbox: Optional[List[int]] = None
 
 
 class FaceRecognitionRequest(BaseModel):
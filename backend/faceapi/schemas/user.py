@@ -88,7 +88,7 @@ class UserInDB(UserBase):
         is_active: Active status of the user account
         created_at: Timestamp when the user was created
         updated_at: Timestamp when the user was last updated
-        head_pic: Path or URL to the user's profile picture (optional)
+        head_pic: Reference to the user's face picture, served by GET /face/pic/{head_pic} (optional)
         is_admin: Admin status of the user
     """
 
@@ -115,7 +115,7 @@ class UserPydantic(BaseModel):
         is_active: Active status of the user account
         created_at: Timestamp when the user was created
         updated_at: Timestamp when the user was last updated
-        head_pic: Path or URL to the user's profile picture (optional)
+        head_pic: Reference to the user's face picture, served by GET /face/pic/{head_pic} (optional)
     """
 
     id: int
@@ -212,6 +212,55 @@ class BatchOperationResult(BaseModel):
     operation: str
 
 
+class UserImportRow(UserCreateAsAdmin):
+    """
+    Schema for one row of a bulk import manifest.
+
+    Attributes:
+        is_active: Flag indicating if the account is active (default is True)
+        image: Path of the user's face image inside the image archive (optional)
+    """
+
+    is_active: Optional[bool] = True
+    image: Optional[str] = None
+
+
+class BulkImportRowError(BaseModel):
+    """
+    Schema for a manifest row that could not be imported.
+
+    Attributes:
+        row: 1-based row number in the manifest (excluding the CSV header)
+        username: Username of the row, if it could be read
+        error: Reason the row was rejected
+    """
+
+    row: int
+    username: Optional[str] = None
+    error: str
+
+
+class BulkImportResult(BaseModel):
+    """
+    Schema for bulk import progress and results.
+
+    Attributes:
+        processed_count: Number of manifest rows processed so far
+        created_count: Number of users created
+        face_count: Number of created users enrolled with a face
+        failed_count: Number of rows that were rejected
+        errors: Per-row error report
+        finished: Whether the whole manifest has been processed
+    """
+
+    processed_count: int = 0
+    created_count: int = 0
+    face_count: int = 0
+    failed_count: int = 0
+    errors: List[BulkImportRowError] = []
+    finished: bool = False
+
+
 class User(UserInDB):
     """
     Schema representing a complete user object.
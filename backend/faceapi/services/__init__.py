@@ -17,7 +17,15 @@ from .admin import (
     update_user_as_admin_service,
     validate_user_update_uniqueness,
 )
-from .face import update_face_embedding_service, verify_face_service
+from .bulk_import import bulk_import_users_service
+from .gallery import export_gallery_service, import_gallery_service
+from .face import (
+    get_head_pic_service,
+    recognize_batch_service,
+    recognize_faces_service,
+    update_face_embedding_service,
+    verify_face_service,
+)
 from .user import (
     create_user_service,
     delete_user_account_service,
@@ -33,7 +41,10 @@ __ALL__ = [
     "activate_user_service",
     "validate_user_update_uniqueness",
     "update_face_embedding_service",
+    "get_head_pic_service",
     "verify_face_service",
+    "recognize_batch_service",
+    "recognize_faces_service",
     "update_user_profile_service",
     "create_user_service",
     "delete_user_account_service",
@@ -43,4 +54,7 @@ __ALL__ = [
     "batch_activate_users_service",
     "batch_deactivate_users_service",
     "batch_reset_face_data_service",
+    "bulk_import_users_service",
+    "export_gallery_service",
+    "import_gallery_service",
 ]
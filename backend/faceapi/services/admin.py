@@ -7,13 +7,14 @@ including user management functionalities.
 
 from typing import List, Optional
 
-from ..core import _SESSION_MANAGER_
+from loguru import logger
+
 from ..schemas import BatchOperationResult, User, UserCreateAsAdmin, UserUpdateAsAdmin
-from ..utils import hash_password
+from ..utils import AuthContext, hash_password_async
 
 
 async def list_users_service(
-    current_ip: str,
+    context: AuthContext,
     skip: int = 0,
     limit: int = 100,
     username: Optional[str] = None,
@@ -27,7 +28,7 @@ async def list_users_service(
     Service function to list all users with pagination.
 
     Args:
-        current_ip: 当前会话的IP地址
+        context: 当前请求的认证上下文
         skip: Number of records to skip for pagination
         limit: Maximum number of records to return
         username: Optional filter for username (case-insensitive partial match)
@@ -41,43 +42,23 @@ async def list_users_service(
         A tuple containing the list of users and the total count
     """
 
-    # 通过会话管理器获取SQL实例
-    sql_instance = await _SESSION_MANAGER_.get_sql_instance(current_ip)
-    if not sql_instance:
-        raise HTTPException(status_code=401, detail="無効なセッションです")
-    
-    # Build the query with filters if any filter is provided
-    users_list = await sql_instance.list_users()
-    # 应用过滤条件
-    filtered_users = []
-    for user in users_list:
-        # 应用各种过滤条件
-        if username is not None and username.lower() not in user['username'].lower():
-            continue
-        if email is not None and email.lower() not in user['email'].lower():
-            continue
-        if full_name is not None and full_name.lower() not in user['full_name'].lower():
-            continue
-        if is_active is not None and user['is_active'] != is_active:
-            continue
-        if is_admin is not None and user['is_admin'] != is_admin:
-            continue
-        if set_face is not None:
-            has_face = user['head_pic'] is not None
-            if set_face and not has_face:
-                continue
-            if not set_face and has_face:
-                continue
-        filtered_users.append(user)
-    
-    # 获取总数
-    count = len(filtered_users)
-    
-    # 应用分页
-    paginated_users = filtered_users[skip:skip+limit]
-
-
-
+    # 认证上下文中已解析的SQL实例
+    sql_instance = context.sql_instance
+
+    # 部分一致のフィルターは n-gram 索引、属性フィルターとページネーションはストアで処理
+    contains = {
+        field: value
+        for field, value in (("username", username), ("email", email), ("full_name", full_name))
+        if value
+    }
+    paginated_users, count = await sql_instance.query_users(
+        is_active=is_active,
+        is_admin=is_admin,
+        has_face=set_face,
+        contains=contains or None,
+        offset=skip,
+        limit=limit,
+    )
 
     users = []
     for user_obj in paginated_users:
@@ -98,24 +79,22 @@ async def list_users_service(
     return users, count
 
 
-async def create_user_as_admin_service(user_create: UserCreateAsAdmin, current_ip: str):
+async def create_user_as_admin_service(user_create: UserCreateAsAdmin, context: AuthContext):
     """
     Service function to create a new user as admin.
 
     Args:
         user_create: User creation request object containing user details
-        current_ip: 当前会话的IP地址
+        context: 当前请求的认证上下文
 
     Returns:
         Created user object
     """
-    # 通过会话管理器获取SQL实例
-    sql_instance = await _SESSION_MANAGER_.get_sql_instance(current_ip)
-    if not sql_instance:
-        raise HTTPException(status_code=401, detail="無効なセッションです")
+    # 认证上下文中已解析的SQL实例
+    sql_instance = context.sql_instance
     
     # Hash the password
-    hashed_password = hash_password(user_create.password)
+    hashed_password = await hash_password_async(user_create.password)
 
     # Create the user in the database
     created_user = await sql_instance.create_user(
@@ -130,22 +109,20 @@ async def create_user_as_admin_service(user_create: UserCreateAsAdmin, current_i
     return created_user
 
 
-async def update_user_as_admin_service(user_id: int, user_update: UserUpdateAsAdmin, current_ip: str):
+async def update_user_as_admin_service(user_id: int, user_update: UserUpdateAsAdmin, context: AuthContext):
     """
     Service function to update a specific user by ID.
 
     Args:
         user_id: The ID of the user to update
         user_update: User update request object containing fields to update
-        current_ip: 当前会话的IP地址
+        context: 当前请求的认证上下文
 
     Returns:
         Updated user object
     """
-    # 通过会话管理器获取SQL实例
-    sql_instance = await _SESSION_MANAGER_.get_sql_instance(current_ip)
-    if not sql_instance:
-        raise HTTPException(status_code=401, detail="無効なセッションです")
+    # 认证上下文中已解析的SQL实例
+    sql_instance = context.sql_instance
     
     # Prepare update data
     update_data = {}
@@ -156,7 +133,7 @@ async def update_user_as_admin_service(user_id: int, user_update: UserUpdateAsAd
     if user_update.full_name is not None:
         update_data["full_name"] = user_update.full_name
     if user_update.password:
-        update_data["hashed_password"] = hash_password(user_update.password)
+        update_data["hashed_password"] = await hash_password_async(user_update.password)
     if user_update.is_active is not None:
         update_data["is_active"] = user_update.is_active
     if user_update.is_admin is not None:
@@ -171,64 +148,58 @@ async def update_user_as_admin_service(user_id: int, user_update: UserUpdateAsAd
     return updated_user
 
 
-async def deactivate_user_service(user_id: int, current_ip: str):
+async def deactivate_user_service(user_id: int, context: AuthContext):
     """
     Service function to deactivate a specific user by ID.
 
     Args:
         user_id: The ID of the user to deactivate
-        current_ip: 当前会话的IP地址
+        context: 当前请求的认证上下文
 
     Returns:
         Boolean indicating success
     """
-    # 通过会话管理器获取SQL实例
-    sql_instance = await _SESSION_MANAGER_.get_sql_instance(current_ip)
-    if not sql_instance:
-        raise HTTPException(status_code=401, detail="無効なセッションです")
+    # 认证上下文中已解析的SQL实例
+    sql_instance = context.sql_instance
     
     # Perform soft delete by deactivating the user
     result = await sql_instance.update_user(user_id, is_active=False)
     return result
 
 
-async def activate_user_service(user_id: int, current_ip: str):
+async def activate_user_service(user_id: int, context: AuthContext):
     """
     Service function to activate a specific user by ID.
 
     Args:
         user_id: The ID of the user to activate
-        current_ip: 当前会话的IP地址
+        context: 当前请求的认证上下文
 
     Returns:
         Boolean indicating success
     """
-    # 通过会话管理器获取SQL实例
-    sql_instance = await _SESSION_MANAGER_.get_sql_instance(current_ip)
-    if not sql_instance:
-        raise HTTPException(status_code=401, detail="無効なセッションです")
+    # 认证上下文中已解析的SQL实例
+    sql_instance = context.sql_instance
     
     # Activate the user
     result = await sql_instance.update_user(user_id, is_active=True)
     return result
 
 
-async def validate_user_update_uniqueness(user_id: int, user_update: UserUpdateAsAdmin, current_ip: str):
+async def validate_user_update_uniqueness(user_id: int, user_update: UserUpdateAsAdmin, context: AuthContext):
     """
     Validate that updated username/email don't conflict with other users.
 
     Args:
         user_id: The ID of the user being updated
         user_update: User update request object containing fields to update
-        current_ip: 当前会话的IP地址
+        context: 当前请求的认证上下文
 
     Returns:
         Error message if validation fails, None otherwise
     """
-    # 通过会话管理器获取SQL实例
-    sql_instance = await _SESSION_MANAGER_.get_sql_instance(current_ip)
-    if not sql_instance:
-        raise HTTPException(status_code=401, detail="無効なセッションです")
+    # 认证上下文中已解析的SQL实例
+    sql_instance = context.sql_instance
     
     if user_update.username:
         existing_user_with_username = await sql_instance.get_user_by_username(user_update.username)
@@ -243,162 +214,101 @@ async def validate_user_update_uniqueness(user_id: int, user_update: UserUpdateA
     return None
 
 
-async def batch_reset_password_service(
-    user_ids: List[int], new_password: str, current_ip: str
+async def _batch_update_service(
+    user_ids: List[int], context: AuthContext, operation: str, **update_data
 ) -> BatchOperationResult:
     """
-    Service function to reset passwords for multiple users.
+    Apply the same update to multiple users with a single bulk call.
 
     Args:
-        user_ids: List of user IDs to reset passwords for
-        new_password: New password to set for all users
-        current_ip: 当前会话的IP地址
+        user_ids: List of user IDs to update
+        context: 当前请求的认证上下文
+        operation: Operation name reported in the result
+        **update_data: Fields to update
 
     Returns:
         BatchOperationResult containing success/failure statistics
     """
-    success_count = 0
-    failed_users = []
+    # 认证上下文中已解析的SQL实例
+    sql_instance = context.sql_instance
 
-    # 通过会话管理器获取SQL实例
-    sql_instance = await _SESSION_MANAGER_.get_sql_instance(current_ip)
-    if not sql_instance:
-        raise HTTPException(status_code=401, detail="無効なセッションです")
-    
-    hashed_password = hash_password(new_password)
-
-    for user_id in user_ids:
-        try:
-            result = await sql_instance.update_user(user_id, hashed_password=hashed_password)
-            if result:
-                success_count += 1
-            else:
-                failed_users.append(user_id)
-        except Exception:
-            failed_users.append(user_id)
+    try:
+        outcomes = await sql_instance.bulk_update(user_ids, **update_data)
+    except ValueError as e:
+        logger.warning(f"Batch {operation} rejected for {len(user_ids)} users: {e}")
+        outcomes = {}
+    failed_users = [user_id for user_id in user_ids if not outcomes.get(user_id)]
 
     return BatchOperationResult(
-        success_count=success_count,
+        success_count=len(user_ids) - len(failed_users),
         failed_count=len(failed_users),
         total_count=len(user_ids),
         failed_users=failed_users,
-        operation="reset-password",
+        operation=operation,
     )
 
 
-async def batch_activate_users_service(user_ids: List[int], current_ip: str) -> BatchOperationResult:
+async def batch_reset_password_service(
+    user_ids: List[int], new_password: str, context: AuthContext
+) -> BatchOperationResult:
     """
-    Service function to activate multiple users.
+    Service function to reset passwords for multiple users.
 
     Args:
-        user_ids: List of user IDs to activate
-        current_ip: 当前会话的IP地址
+        user_ids: List of user IDs to reset passwords for
+        new_password: New password to set for all users
+        context: 当前请求的认证上下文
 
     Returns:
         BatchOperationResult containing success/failure statistics
     """
-    success_count = 0
-    failed_users = []
-
-    # 通过会话管理器获取SQL实例
-    sql_instance = await _SESSION_MANAGER_.get_sql_instance(current_ip)
-    if not sql_instance:
-        raise HTTPException(status_code=401, detail="無効なセッションです")
-    
-    for user_id in user_ids:
-        try:
-            result = await sql_instance.update_user(user_id, is_active=True)
-            if result:
-                success_count += 1
-            else:
-                failed_users.append(user_id)
-        except Exception:
-            failed_users.append(user_id)
-
-    return BatchOperationResult(
-        success_count=success_count,
-        failed_count=len(failed_users),
-        total_count=len(user_ids),
-        failed_users=failed_users,
-        operation="active",
+    hashed_password = await hash_password_async(new_password)
+    return await _batch_update_service(
+        user_ids, context, "reset-password", hashed_password=hashed_password
     )
 
 
-async def batch_deactivate_users_service(user_ids: List[int], current_ip: str) -> BatchOperationResult:
+async def batch_activate_users_service(user_ids: List[int], context: AuthContext) -> BatchOperationResult:
     """
-    Service function to deactivate multiple users.
+    Service function to activate multiple users.
 
     Args:
-        user_ids: List of user IDs to deactivate
-        current_ip: 当前会话的IP地址
+        user_ids: List of user IDs to activate
+        context: 当前请求的认证上下文
 
     Returns:
         BatchOperationResult containing success/failure statistics
     """
-    success_count = 0
-    failed_users = []
-
-    # 通过会话管理器获取SQL实例
-    sql_instance = await _SESSION_MANAGER_.get_sql_instance(current_ip)
-    if not sql_instance:
-        raise HTTPException(status_code=401, detail="無効なセッションです")
-    
-    for user_id in user_ids:
-        try:
-            result = await sql_instance.update_user(user_id, is_active=False)
-            if result:
-                success_count += 1
-            else:
-                failed_users.append(user_id)
-        except Exception:
-            failed_users.append(user_id)
-
-    return BatchOperationResult(
-        success_count=success_count,
-        failed_count=len(failed_users),
-        total_count=len(user_ids),
-        failed_users=failed_users,
-        operation="inactive",
-    )
+    return await _batch_update_service(user_ids, context, "active", is_active=True)
 
 
-async def batch_reset_face_data_service(user_ids: List[int], current_ip: str) -> BatchOperationResult:
+async def batch_deactivate_users_service(user_ids: List[int], context: AuthContext) -> BatchOperationResult:
     """
-    Service function to reset face data for multiple users.
+    Service function to deactivate multiple users.
 
     Args:
-        user_ids: List of user IDs to reset face data for
-        current_ip: 当前会话的IP地址
+        user_ids: List of user IDs to deactivate
+        context: 当前请求的认证上下文
 
     Returns:
         BatchOperationResult containing success/failure statistics
     """
-    success_count = 0
-    failed_users = []
-    
-    # 通过会话管理器获取SQL实例
-    sql_instance = await _SESSION_MANAGER_.get_sql_instance(current_ip)
-    if not sql_instance:
-        raise HTTPException(status_code=401, detail="無効なセッションです")
+    return await _batch_update_service(user_ids, context, "inactive", is_active=False)
 
-    for user_id in user_ids:
-        try:
-            result = await sql_instance.update_user(user_id, head_pic=None, embedding=None)
 
-            if result:
-                success_count += 1
-            else:
-                failed_users.append(user_id)
+async def batch_reset_face_data_service(user_ids: List[int], context: AuthContext) -> BatchOperationResult:
+    """
+    Service function to reset face data for multiple users.
 
-            await sql_instance.delete_face_embedding(user_id)
+    Clearing the embedding also removes the user from the vector index.
 
-        except Exception:
-            failed_users.append(user_id)
+    Args:
+        user_ids: List of user IDs to reset face data for
+        context: 当前请求的认证上下文
 
-    return BatchOperationResult(
-        success_count=success_count,
-        failed_count=len(failed_users),
-        total_count=len(user_ids),
-        failed_users=failed_users,
-        operation="reset-face",
+    Returns:
+        BatchOperationResult containing success/failure statistics
+    """
+    return await _batch_update_service(
+        user_ids, context, "reset-face", head_pic=None, embedding=None
     )
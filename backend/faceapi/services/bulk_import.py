@@ -0,0 +1,368 @@
+"""
+顔認識システムの一括インポートサービスモジュール。
+
+このモジュールはユーザーのマニフェスト（CSV または JSONL）と顔画像の ZIP アーカイブを
+ストリーミングで読み込み、ユーザーと顔埋め込みを一括で登録するビジネスロジックを含みます。
+
+マニフェストは IMPORT_BATCH_SIZE 行ごとに処理されます:
+- パスワードのハッシュ化はログインと共有のプロセスプール（pass_utils）で並列に実行
+- 画像の読み込み・デコード・顔検出・保存はスレッドプールで並列に実行
+- 顔特徴の推論と重複顔の検索はバッチごとに1回
+- ユーザーと埋め込みは bulk_create_users で一括登録
+"""
+
+import asyncio
+import csv
+import io
+import json
+import zipfile
+import zlib
+from itertools import islice
+from pathlib import PurePosixPath
+from typing import IO, Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from loguru import logger
+from pydantic import ValidationError
+
+from ..core import _BLOB_STORE_, _CONFIG_
+from ..db.vector_index import VectorIndex
+from ..schemas import BulkImportResult, BulkImportRowError, UserImportRow
+from ..utils import (
+    AuthContext,
+    HashQueueFull,
+    crop_face,
+    detect_face_boxes,
+    hash_password_async,
+    inference_batch,
+)
+from ..utils.pass_utils import hash_worker_count
+
+# マニフェストの拡張子と形式の対応
+MANIFEST_FORMATS = {
+    ".csv": "csv",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+}
+
+ManifestRows = Iterator[Tuple[int, Optional[Dict[str, Any]]]]
+
+
+def detect_manifest_format(filename: Optional[str]) -> str:
+    """
+    ファイル名の拡張子からマニフェストの形式を判定。
+
+    引数:
+        filename: マニフェストのファイル名
+
+    戻り値:
+        "csv" または "jsonl"
+
+    例外:
+        ValueError: 対応していない拡張子の場合
+    """
+    suffix = PurePosixPath(filename or "").suffix.lower()
+    if suffix not in MANIFEST_FORMATS:
+        raise ValueError(f"Unsupported manifest format: {suffix or filename}")
+    return MANIFEST_FORMATS[suffix]
+
+
+def iter_manifest(stream: IO[bytes], manifest_format: str) -> ManifestRows:
+    """
+    マニフェストを1行ずつ読み込むジェネレータ（ファイル全体をメモリに読み込まない）。
+
+    引数:
+        stream: マニフェストのバイナリストリーム
+        manifest_format: "csv" または "jsonl"
+
+    戻り値:
+        (行番号, 行の内容) のイテレータ。JSON オブジェクトとして解析できない行の内容は None
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        if manifest_format == "csv":
+            for row_number, row in enumerate(csv.DictReader(text), start=1):
+                # 空のセルは未指定として扱う
+                yield row_number, {
+                    key.strip(): value for key, value in row.items()
+                    if key and value not in (None, "")
+                }
+            return
+        for row_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield row_number, row if isinstance(row, dict) else None
+    finally:
+        # 元のストリームは呼び出し側が閉じる
+        text.detach()
+
+
+def open_image_archive(stream: IO[bytes]) -> zipfile.ZipFile:
+    """
+    顔画像の ZIP アーカイブを開く（中央ディレクトリのみを読み込む）。
+
+    例外:
+        ValueError: ZIP アーカイブとして読み込めない場合
+    """
+    try:
+        return zipfile.ZipFile(stream)
+    except zipfile.BadZipFile as e:
+        raise ValueError("Invalid image archive") from e
+
+
+def _load_face(archive: zipfile.ZipFile, name: str) -> Tuple[Optional[np.ndarray], Optional[str], Optional[str]]:
+    """
+    アーカイブから1枚の画像を読み込み、顔を検出して画像ストアに保存（スレッドプールで実行）。
+
+    引数:
+        archive: 顔画像の ZIP アーカイブ
+        name: アーカイブ内の画像のパス
+
+    戻り値:
+        (顔画像, 顔画像の参照, エラーメッセージ)。
+        成功時は参照を1つ保持しているため、呼び出し側で release() する必要があります
+    """
+    try:
+        info = archive.getinfo(name)
+    except KeyError:
+        return None, None, "Image not found in archive"
+    # 展開後のサイズを展開する前に確認する（展開は宣言されたサイズまでで打ち切られる）
+    if info.file_size > _CONFIG_.MAX_UPLOAD_SIZE:
+        return None, None, "Image is too large"
+    try:
+        data = archive.read(info)
+    except (zipfile.BadZipFile, zlib.error, NotImplementedError):
+        return None, None, "Invalid image file"
+    # pylint: disable=no-member
+    img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    # pylint: enable=no-member
+    if img is None:
+        return None, None, "Invalid image file"
+
+    boxes = detect_face_boxes(img)
+    if not boxes:
+        return None, None, "No face detected in the image"
+    if len(boxes) > 1 and _CONFIG_.ALLOW_FACE_DEDUPICATION:
+        return None, None, "Multiple faces detected"
+
+    # 元画像を保持しないよう顔領域のみをコピー
+    face = np.ascontiguousarray(crop_face(img, boxes[0]))
+    return face, _BLOB_STORE_.put(data, img), None
+
+
+def _validation_message(error: ValidationError) -> str:
+    """検証エラーの最初の項目を1行のメッセージにする"""
+    detail = error.errors()[0]
+    field = ".".join(str(part) for part in detail.get("loc", ()))
+    return f"{field}: {detail['msg']}" if field else detail["msg"]
+
+
+class BulkImporter:
+    """
+    マニフェストをバッチ単位で処理し、ユーザーと顔埋め込みを一括登録するインポーター。
+
+    マニフェスト全体で重複するユーザー名とメールアドレスを検出し、
+    行ごとのエラーを BulkImportResult に記録します。
+    """
+
+    def __init__(self, sql_instance, archive: Optional[zipfile.ZipFile] = None,
+                 batch_size: Optional[int] = None, hash_workers: Optional[int] = None):
+        """
+        引数:
+            sql_instance: 登録先の SQL 管理器
+            archive: 顔画像の ZIP アーカイブ（無い場合は画像を指定した行がエラーになる）
+            batch_size: 1回に処理する行数（デフォルト: IMPORT_BATCH_SIZE）
+            hash_workers: 同時にハッシュ化するパスワード数（デフォルト: IMPORT_HASH_WORKERS）
+        """
+        self.sql_instance = sql_instance
+        self.archive = archive
+        self.batch_size = max(batch_size or _CONFIG_.IMPORT_BATCH_SIZE, 1)
+        self.hash_workers = hash_workers or _CONFIG_.IMPORT_HASH_WORKERS or hash_worker_count()
+        # 共有のプロセスプールの待ち行列をインポートで占有しないよう、投入数を制限する
+        self._hash_limit = asyncio.Semaphore(self.hash_workers)
+        self.result = BulkImportResult()
+        self._usernames = set()
+        self._emails = set()
+
+    def _reject(self, row_number: int, username: Optional[str], error: str):
+        """行をエラーとして記録"""
+        self.result.errors.append(
+            BulkImportRowError(row=row_number, username=username, error=error)
+        )
+        self.result.failed_count += 1
+
+    def _validate(self, batch: List[Tuple[int, Optional[Dict[str, Any]]]]) -> List[Tuple[int, UserImportRow]]:
+        """行を検証し、登録対象の行を返す"""
+        accepted = []
+        for row_number, row in batch:
+            if row is None:
+                self._reject(row_number, None, "Invalid JSON object")
+                continue
+            try:
+                user = UserImportRow(**row)
+            except ValidationError as e:
+                username = row.get("username")
+                self._reject(row_number, username if isinstance(username, str) else None,
+                             _validation_message(e))
+                continue
+            email_key = user.email.strip().lower()
+            if user.username in self._usernames or email_key in self._emails:
+                self._reject(row_number, user.username, "Duplicate username or email in manifest")
+                continue
+            if user.image and self.archive is None:
+                self._reject(row_number, user.username, "No image archive was provided")
+                continue
+            self._usernames.add(user.username)
+            self._emails.add(email_key)
+            accepted.append((row_number, user))
+        return accepted
+
+    async def _hash_password(self, password: str) -> str:
+        """共有のプロセスプールでパスワードをハッシュ化（待ち行列が満杯の場合は空くまで再試行）"""
+        async with self._hash_limit:
+            while True:
+                try:
+                    return await hash_password_async(password)
+                except HashQueueFull as e:
+                    await asyncio.sleep(e.retry_after)
+
+    async def _import_batch(self, batch: List[Tuple[int, Optional[Dict[str, Any]]]]):
+        """1バッチ分の行を登録"""
+        rows = self._validate(batch)
+
+        # ハッシュ化（プロセスプール）と画像処理（スレッドプール）を並行して実行
+        hashes, loaded = await asyncio.gather(
+            asyncio.gather(*(self._hash_password(user.password) for _, user in rows)),
+            asyncio.gather(*(
+                run_in_threadpool(_load_face, self.archive, user.image)
+                for _, user in rows if user.image
+            )),
+        )
+        faces = iter(loaded)
+
+        records, owners, head_pics = [], [], []
+        face_rows, face_images = [], []
+        for (row_number, user), hashed_password in zip(rows, hashes):
+            face, head_pic = None, None
+            if user.image:
+                face, head_pic, error = next(faces)
+                if error:
+                    self._reject(row_number, user.username, error)
+                    continue
+                head_pics.append(head_pic)
+                face_rows.append(len(records))
+                face_images.append(face)
+            owners.append((row_number, user.username))
+            records.append({
+                "username": user.username,
+                "email": user.email,
+                "full_name": user.full_name,
+                "hashed_password": hashed_password,
+                "is_active": user.is_active,
+                "is_admin": bool(user.is_admin),
+                "head_pic": head_pic,
+                "embedding": None,
+            })
+
+        try:
+            if face_images:
+                # バッチ内のすべての顔をまとめて推論
+                features = await run_in_threadpool(inference_batch, face_images)
+                rejected = {}
+                if not _CONFIG_.ALLOW_FACE_DEDUPICATION:
+                    # 登録済みの顔、およびバッチ内で先に現れた顔との重複を検出
+                    duplicates = await self.sql_instance.search_face_embeddings_batch(
+                        features, limit=1, threshold=_CONFIG_.MODEL_THRESHOLD
+                    )
+                    batch_index = VectorIndex()
+                    for position, feature, matches in zip(face_rows, features, duplicates):
+                        if matches[0]:
+                            rejected[position] = "Face already exists in the database"
+                        elif batch_index.search(feature, limit=1, threshold=_CONFIG_.MODEL_THRESHOLD)[0]:
+                            rejected[position] = "Duplicate face in manifest"
+                        else:
+                            batch_index.upsert(position, feature)
+                for position, feature in zip(face_rows, features):
+                    records[position]["embedding"] = feature
+                for position, error in rejected.items():
+                    self._reject(*owners[position], error)
+                records = [record for i, record in enumerate(records) if i not in rejected]
+                owners = [owner for i, owner in enumerate(owners) if i not in rejected]
+
+            created = await self.sql_instance.bulk_create_users(records) if records else []
+        finally:
+            # put() で取得した参照を解放（作成されたユーザーが参照を保持している）
+            for head_pic in head_pics:
+                _BLOB_STORE_.release(head_pic)
+
+        for owner, record, user in zip(owners, records, created):
+            if user is None:
+                self._reject(*owner, "Username or email already exists")
+                continue
+            self.result.created_count += 1
+            if record["embedding"] is not None:
+                self.result.face_count += 1
+        self.result.processed_count += len(batch)
+
+    async def run(self, rows: ManifestRows) -> AsyncIterator[BulkImportResult]:
+        """
+        マニフェストをすべて処理する。
+
+        引数:
+            rows: iter_manifest() が返す行のイテレータ
+
+        戻り値:
+            バッチごとの進捗（errors を含まない）と、最後に行ごとのエラーを含む結果の非同期イテレータ
+        """
+        while True:
+            # マニフェストの読み込み（アップロードされた一時ファイル）はスレッドで行う
+            batch = await run_in_threadpool(lambda: list(islice(rows, self.batch_size)))
+            if not batch:
+                break
+            await self._import_batch(batch)
+            logger.info(
+                f"一括インポート: {self.result.processed_count} 行処理済み "
+                f"(作成 {self.result.created_count}, 失敗 {self.result.failed_count})"
+            )
+            yield self.result.model_copy(update={"errors": []})
+        self.result.errors.sort(key=lambda error: error.row)
+        self.result.finished = True
+        yield self.result
+
+
+async def bulk_import_users_service(
+    manifest: IO[bytes], manifest_filename: Optional[str],
+    images: Optional[IO[bytes]], context: AuthContext,
+) -> AsyncIterator[BulkImportResult]:
+    """
+    マニフェストと顔画像アーカイブからユーザーを一括登録するサービス関数。
+
+    セッションと入力形式の検証はこの関数の呼び出し時に行い、
+    登録処理は返されたイテレータを消費しながら進みます。
+
+    引数:
+        manifest: マニフェスト（CSV または JSONL）のバイナリストリーム
+        manifest_filename: マニフェストのファイル名（形式の判定に使用）
+        images: 顔画像の ZIP アーカイブのバイナリストリーム（省略可）
+        context: 当前请求的认证上下文
+
+    戻り値:
+        BulkImporter.run() の進捗と結果の非同期イテレータ
+    """
+    sql_instance = context.sql_instance
+
+    try:
+        manifest_format = detect_manifest_format(manifest_filename)
+        archive = open_image_archive(images) if images is not None else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+    importer = BulkImporter(sql_instance, archive)
+    return importer.run(iter_manifest(manifest, manifest_format))
@@ -6,7 +6,7 @@
 """
 
 from typing import Any, Dict, List, Optional, Union
-from ..core import _CONFIG_
+from ..core import _BLOB_STORE_, _CONFIG_
 from ..db import (
     is_using_memory_manager,
     is_using_memory_sql
@@ -49,7 +49,7 @@ class DictToObjectWrapper:
         return self._data.get(key, default)
     
     def to_dict(self):
-        return self._data.copy()
+        return dict(self._data)
     
     async def save(self):
         """保存更改到数据库"""
@@ -154,8 +154,9 @@ def get_compatible_sql_client():
         from ..db.memory_managers import get_memory_sql_client
         return get_memory_sql_client()
     else:
-        # 对于真实数据库，返回实际的 SQL 客户端
-        raise NotImplementedError("Real SQL client not implemented")
+        # 对于真实数据库，返回共享的持久化 SQL 客户端
+        from ..db import get_persistent_sql_client
+        return get_persistent_sql_client(_BLOB_STORE_)
 
 
 def get_compatible_user_model():
@@ -5,89 +5,149 @@
 顔認識操作のビジネスロジックを含みます。
 """
 
+import asyncio
 import time
-from typing import Any, Dict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
 
 import cv2
 import numpy as np
-from fastapi import HTTPException, UploadFile
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
 from loguru import logger
 
-from ..core import _CONFIG_, _SESSION_MANAGER_
-from ..face_rec import _MODEL_ as model
-from ..utils import create_access_token, detect_face, image_to_base64
+from ..core import _BLOB_STORE_, _CONFIG_
+from ..schemas import (
+    FaceRecognitionRequest,
+    FaceRecognitionResponse,
+    FaceRecognitionResult,
+)
+from ..utils import (
+    AuthContext,
+    base64_to_image,
+    create_access_token,
+    crop_face,
+    detect_face,
+    detect_face_boxes,
+    largest_face_box,
+)
+
+from ..utils import inference, inference_batch
+from ..utils.frame_utils import FrameSimilarityFilter, dhash
+
+def _unrecognized_result(message: str, code: int) -> Dict[str, Any]:
+    """認識失敗時のレスポンス辞書を作成"""
+    return {
+        "recognized": False,
+        "message": message,
+        "data": {
+            "token": None,
+            "token_type": "Bearer",
+        },
+        "code": code,
+    }
 
-from ..utils import inference
 
-async def verify_face_service(image: UploadFile, current_ip: str) -> Dict[str, Any]:
+def extract_query_feature(img: np.ndarray) -> Optional[np.ndarray]:
     """
-    アップロードされた画像から顔を検証するサービス関数。
+    画像から照合に使用する顔特徴を抽出する（CPU処理のみ）。
 
     引数:
-        image: 顔を含むアップロードされた画像ファイル
-        current_ip: 当前会话的IP地址
+        img: デコード済みの画像（numpy配列）
 
     戻り値:
-        認识結果と成功時のトークンを含む辞書
+        最大の顔の特徴ベクトル、顔が無い場合はNone
     """
-    # 画像ファイルを読み込み
-    contents = await image.read()
+    # 画像内の顔を検出し、最大の顔のみを推論する
+    box = largest_face_box(detect_face_boxes(img))
 
-    # numpy配列に変換
-    nparr = np.frombuffer(contents, np.uint8)
-    # pylint: disable=no-member
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    # pylint: enable=no-member
+    if box is None:
+        return None
 
-    if img is None:
-        raise HTTPException(status_code=400, detail="Invalid image file")
+    # 顔から特徴を抽出
+    return inference(crop_face(img, box))[0]
 
-    # 画像内の顔を検出
-    detected_faces = detect_face(img)
 
-    if not detected_faces:
-        return {
-            "recognized": False,
-            "message": "No face detected in the image",
-            "data": {
-                "token": None,
-                "token_type": "Bearer",
-            },
-            "code": 400,
-        }
+def extract_query_feature_cached(
+    img: np.ndarray, frame_filter: Optional[FrameSimilarityFilter]
+) -> Tuple[Optional[np.ndarray], bool]:
+    """
+    直前とほぼ同一のフレームであれば前回の特徴を再利用して顔特徴を抽出。
 
-    # 顔から特徴を抽出
-    features = [
-        inference(face_img)[0]
-        for face_img in detected_faces
-    ]
+    引数:
+        img: デコード済みの画像（numpy配列）
+        frame_filter: セッションのフレーム類似度フィルター（Noneの場合は常に抽出）
+
+    戻り値:
+        (顔の特徴ベクトル（顔が無い場合はNone）, 前回の特徴を再利用したかどうか)
+    """
+    if frame_filter is None:
+        return extract_query_feature(img), False
+
+    frame_hash = dhash(img)
+    cached = frame_filter.lookup(frame_hash)
+    if cached is not FrameSimilarityFilter.MISS:
+        return cached, True
+
+    feature = extract_query_feature(img)
+    frame_filter.store(frame_hash, feature)
+    return feature, False
+
+
+def _get_frame_filter(context: AuthContext) -> Optional[FrameSimilarityFilter]:
+    """セッションに紐づくフレーム類似度フィルターを取得（無効な場合はNone）"""
+    if not _CONFIG_.FRAME_DEDUP_ENABLED:
+        return None
+    session_info = context.session
+    if session_info.frame_filter is None:
+        session_info.frame_filter = FrameSimilarityFilter(
+            max_distance=_CONFIG_.FRAME_DEDUP_MAX_DISTANCE,
+            ttl=_CONFIG_.FRAME_DEDUP_TTL,
+        )
+    return session_info.frame_filter
 
-    # 通过会话管理器获取SQL实例
-    sql_client = await _SESSION_MANAGER_.get_sql_instance(current_ip)
-    if not sql_client:
-        raise HTTPException(status_code=401, detail="Invalid session")
+
+async def _find_best_match(
+    feature: np.ndarray, context: AuthContext
+) -> Optional[Dict[str, Any]]:
+    """特徴ベクトルに最も近いユーザーを検索（閾値内に無い場合はNone）"""
+    # 认证上下文中已解析的SQL实例
+    sql_client = context.sql_instance
 
     # 在用户嵌入向量中搜索相似的顔
     search_results = await sql_client.search_face_embeddings(
-        query_vector=features[0].tolist(),
+        query_vector=feature,
         limit=1,
         threshold=_CONFIG_.MODEL_THRESHOLD
     )
     if not any(search_results):
-        # 一致する顔が見つからない
-        return {
-            "recognized": False,
-            "message": "Face not recognized in the database",
-            "data": {
-                "token": None,
-                "token_type": "Bearer",
-            },
-            "code": 401,
-        }
+        return None
 
     # 最良の一致を取得
     # best_match = search_results[0][0]
-    best_match = list(filter(lambda l: len(l) > 0, search_results))[0][0]
+    return list(filter(lambda l: len(l) > 0, search_results))[0][0]
+
+
+async def match_face_feature_service(
+    feature: Optional[np.ndarray], context: AuthContext
+) -> Dict[str, Any]:
+    """
+    抽出済みの顔特徴をセッションのユーザーと照合するサービス関数。
+
+    引数:
+        feature: extract_query_featureで抽出した特徴ベクトル（顔が無い場合はNone）
+        context: 当前请求的认证上下文
+
+    戻り値:
+        認识結果と成功時のトークンを含む辞書
+    """
+    if feature is None:
+        return _unrecognized_result("No face detected in the image", 400)
+
+    best_match = await _find_best_match(feature, context)
+    if best_match is None:
+        # 一致する顔が見つからない
+        return _unrecognized_result("Face not recognized in the database", 401)
 
     # 顔が認識され、ユーザー情報を取得しトークンを作成
     user_id = best_match["entity"]["user_id"]
@@ -110,39 +170,289 @@ async def verify_face_service(image: UploadFile, current_ip: str) -> Dict[str, A
     }
 
 
-async def update_face_embedding_service(
-    user_id: int, image: UploadFile, current_ip: str
-) -> Dict[str, Any]:
+async def verify_face_service(img: np.ndarray, context: AuthContext) -> Dict[str, Any]:
     """
-    ユーザーの顔埋め込みを更新するサービス関数。
+    アップロードされた画像から顔を検証するサービス関数。
 
     引数:
-        user_id: 顔埋め込みを更新するユーザーのID
-        image: 新しい顔を含むアップロードされた画像ファイル
-        current_ip: 当前会话的IP地址
+        img: 顔を含むデコード済みの画像（numpy配列）
+        context: 当前请求的认证上下文
 
     戻り値:
-        成功メッセージと埋め込みIDを含む辞書
+        認识結果と成功時のトークンを含む辞書
     """
-    # 画像ファイルを読み込み
-    contents = await image.read()
+    feature = extract_query_feature(img)
+    return await match_face_feature_service(feature, context)
+
 
-    # numpy配列に変換
-    nparr = np.frombuffer(contents, np.uint8)
+def _decode_and_extract(
+    frame: bytes, frame_filter: Optional[FrameSimilarityFilter]
+) -> Tuple[np.ndarray, Optional[np.ndarray], bool]:
+    """フレームをデコードして顔特徴を抽出（スレッドプールで実行）"""
     # pylint: disable=no-member
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    img = cv2.imdecode(np.frombuffer(frame, np.uint8), cv2.IMREAD_COLOR)
     # pylint: enable=no-member
-
     if img is None:
         raise HTTPException(status_code=400, detail="Invalid image file")
+    return (img, *extract_query_feature_cached(img, frame_filter))
+
+
+async def verify_frame_service(frame: bytes, context: AuthContext) -> Dict[str, Any]:
+    """
+    ストリーミングされた1フレームから顔を検証するサービス関数。
+
+    デコード・検出・推論はスレッドプールで実行されるため、
+    その間もイベントループは後続フレームを受信し続けられます。
+    直前とほぼ同一のフレームでは検出と推論を省略しますが、
+    トークンは必ずそのフレームから抽出した特徴で発行します
+    （類似度は背景の影響が大きく、別人のフレームでも一致する場合があるため）。
+
+    引数:
+        frame: エンコードされた画像フレーム（JPEGなど）
+        context: 当前请求的认证上下文
+
+    戻り値:
+        verify_face_serviceと同じ形式の認識結果辞書
+    """
+    frame_filter = _get_frame_filter(context)
+    img, feature, cached = await run_in_threadpool(_decode_and_extract, frame, frame_filter)
+    if cached and feature is not None and await _find_best_match(feature, context) is not None:
+        # 再利用した特徴ではトークンを発行せず、このフレームから抽出し直す
+        feature = await run_in_threadpool(extract_query_feature, img)
+    return await match_face_feature_service(feature, context)
+
+
+def _decode_and_detect_request(
+    request: FaceRecognitionRequest,
+) -> Tuple[Optional[str], Optional[np.ndarray], float]:
+    """
+    バッチ認識用に1枚の画像をデコードして最大の顔を検出（スレッドプールで実行）。
+
+    戻り値:
+        (デコードできない場合のエラーメッセージ（成功時はNone）,
+         最大の顔画像（無い場合はNone）, 処理時間（秒）)
+    """
+    start = time.perf_counter()
+    image_data = request.image_data
+    if image_data.startswith("data:"):
+        # data URL のプレフィックスを除去
+        image_data = image_data.split(",", 1)[-1]
+    # デコード後のサイズをデコードする前に確認する
+    if len(image_data) * 3 // 4 - image_data[-2:].count("=") > _CONFIG_.MAX_UPLOAD_SIZE:
+        return "Image data is too large", None, time.perf_counter() - start
+    try:
+        img = base64_to_image(image_data)
+    except (ValueError, cv2.error):  # pylint: disable=no-member
+        img = None
+    if img is None:
+        return "Invalid image data", None, time.perf_counter() - start
+    box = largest_face_box(detect_face_boxes(img))
+    face = crop_face(img, box) if box is not None else None
+    return None, face, time.perf_counter() - start
+
+
+async def recognize_batch_service(
+    requests: List[FaceRecognitionRequest], context: AuthContext
+) -> List[FaceRecognitionResponse]:
+    """
+    複数の画像をまとめて認識するサービス関数。
+
+    画像のデコードと顔検出はスレッドプールで並列に行い、
+    各画像の最大の顔について推論と検索をそれぞれ1回のバッチで実行します。
+
+    引数:
+        requests: Base64エンコードされた画像のリクエストのリスト
+        context: 当前请求的认证上下文
+
+    戻り値:
+        画像ごとのFaceRecognitionResponseのリスト（入力と同じ順序）。
+        processing_timeはその画像のデコード・検出時間に
+        バッチ推論・検索時間の按分を加えたものです。
+    """
+    # 认证上下文中已解析的SQL实例
+    sql_client = context.sql_instance
+
+    # デコードと検出を並列に実行
+    prepared = await asyncio.gather(
+        *(run_in_threadpool(_decode_and_detect_request, request) for request in requests)
+    )
+
+    # 各画像の最大の顔をまとめて推論・検索
+    batch_start = time.perf_counter()
+    face_owners = [i for i, (_, face, _) in enumerate(prepared) if face is not None]
+    features = await run_in_threadpool(
+        inference_batch, [prepared[i][1] for i in face_owners]
+    )
+    search_results = await sql_client.search_face_embeddings_batch(
+        features, limit=1, threshold=_CONFIG_.MODEL_THRESHOLD
+    )
+    matches = dict(zip(face_owners, search_results))
+    batch_share = (time.perf_counter() - batch_start) / max(len(face_owners), 1)
+
+    responses = []
+    for i, (error, face, elapsed) in enumerate(prepared):
+        if face is not None:
+            elapsed += batch_share
+        if error is not None:
+            result = FaceRecognitionResult(message=error)
+        elif face is None:
+            result = FaceRecognitionResult(message="No face detected in the image")
+        elif not matches[i][0]:
+            result = FaceRecognitionResult(message="Face not recognized in the database")
+        else:
+            best_match = matches[i][0][0]
+            user_id = best_match["entity"]["user_id"]
+            user = await sql_client.get_user_by_id(user_id)
+            result = FaceRecognitionResult(
+                user_id=user_id,
+                username=user["username"] if user else None,
+                confidence=1 - best_match["distance"],  # 距離を類似度に変換
+                recognized=True,
+                message=f"Face recognized as user(id={user_id})",
+            )
+        responses.append(
+            FaceRecognitionResponse(results=[result], processing_time=elapsed)
+        )
+
+    return responses
+
+
+async def recognize_faces_service(
+    img: np.ndarray, context: AuthContext, largest_only: bool = False
+) -> FaceRecognitionResponse:
+    """
+    画像内のすべての顔を1回で認識するサービス関数。
+
+    検出されたすべての顔を1回のバッチ推論と1回のバッチ検索で照合し、
+    顔ごとにバウンディングボックス付きの結果を返します。
+    largest_only が指定された場合は最大の顔のみを推論します。
+
+    引数:
+        img: デコード済みの画像（numpy配列）
+        context: 当前请求的认证上下文
+        largest_only: 最大の顔のみを認識するかどうか
+
+    戻り値:
+        顔ごとの認識結果を含むFaceRecognitionResponse
+    """
+    start = time.perf_counter()
+
+    # 认证上下文中已解析的SQL实例
+    sql_client = context.sql_instance
+
+    boxes = detect_face_boxes(img)
+    if largest_only and boxes:
+        boxes = [largest_face_box(boxes)]
+
+    if not boxes:
+        return FaceRecognitionResponse(
+            results=[FaceRecognitionResult(message="No face detected in the image")],
+            processing_time=time.perf_counter() - start,
+        )
+
+    # すべての顔をまとめて推論・検索
+    features = inference_batch([crop_face(img, box) for box in boxes])
+    search_results = await sql_client.search_face_embeddings_batch(
+        features, limit=1, threshold=_CONFIG_.MODEL_THRESHOLD
+    )
+
+    results = []
+    for box, matches in zip(boxes, search_results):
+        if not matches[0]:
+            results.append(FaceRecognitionResult(
+                message="Face not recognized in the database",
+                bbox=list(box),
+            ))
+            continue
+        best_match = matches[0][0]
+        user_id = best_match["entity"]["user_id"]
+        user = await sql_client.get_user_by_id(user_id)
+        results.append(FaceRecognitionResult(
+            user_id=user_id,
+            username=user["username"] if user else None,
+            confidence=1 - best_match["distance"],  # 距離を類似度に変換
+            recognized=True,
+            message=f"Face recognized as user(id={user_id})",
+            bbox=list(box),
+        ))
+
+    return FaceRecognitionResponse(
+        results=results, processing_time=time.perf_counter() - start
+    )
+
+
+def _store_head_pic(img: np.ndarray, image_data: Optional[bytes]) -> str:
+    """
+    顔画像を画像ストアに保存する（CPU・ファイル処理のみ）。
+
+    引数:
+        img: デコード済みの画像
+        image_data: アップロードされた元のバイト列（無い場合は JPEG に再エンコード）
+
+    戻り値:
+        画像の参照（ダイジェスト）
+    """
+    if not image_data:
+        # pylint: disable=no-member
+        _, buffer = cv2.imencode(".jpg", img)
+        # pylint: enable=no-member
+        image_data = buffer.tobytes()
+    return _BLOB_STORE_.put(image_data, img)
+
+
+async def get_head_pic_service(
+    digest: str, context: AuthContext, thumbnail: bool = False
+) -> Tuple[Path, str]:
+    """
+    参照（ダイジェスト）から顔画像ファイルを取得するサービス関数。
 
-    # 通过会话管理器获取SQL实例
-    sql_client = await _SESSION_MANAGER_.get_sql_instance(current_ip)
-    if not sql_client:
-        raise HTTPException(status_code=401, detail="Invalid session")
+    顔画像を取得できるのは本人（自分の head_pic）と、
+    セッション内のユーザーの顔画像に対する管理者のみです。
+
+    引数:
+        digest: 顔画像の参照
+        context: 当前请求的认证上下文（包含用户）
+        thumbnail: サムネイルを取得するかどうか
+
+    戻り値:
+        ファイルパスとメディアタイプ
+
+    例外:
+        HTTPException: 取得する権限が無い、または画像が存在しない場合（404）
+    """
+    allowed = context.user.get('head_pic') == digest or (
+        context.is_admin and await context.sql_instance.references_head_pic(digest)
+    )
+    # 他人の顔画像の存在を推測できないよう、権限が無い場合も 404 を返す
+    path = _BLOB_STORE_.locate(digest, thumbnail) if allowed else None
+    if path is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return path, _BLOB_STORE_.media_type(digest, thumbnail)
+
+
+async def update_face_embedding_service(
+    user_id: int, img: np.ndarray, context: AuthContext, image_data: Optional[bytes] = None
+) -> Dict[str, Any]:
+    """
+    ユーザーの顔埋め込みを更新するサービス関数。
+
+    引数:
+        user_id: 顔埋め込みを更新するユーザーのID
+        img: 新しい顔を含むデコード済みの画像（numpy配列）
+        context: 当前请求的认证上下文
+        image_data: アップロードされた元の画像バイト列（顔画像として保存される）
+
+    戻り値:
+        成功メッセージ、埋め込みID、顔画像の参照を含む辞書
+    """
+    # 认证上下文中已解析的SQL实例
+    sql_client = context.sql_instance
     
-    # 获取用户对象
-    user_dict = await sql_client.get_user_by_id(user_id)
+    # 获取用户对象（更新自己的顔时使用认证时已获取的用户）
+    if user_id == context.user_id:
+        user_dict = context.user
+    else:
+        user_dict = await sql_client.get_user_by_id(user_id)
     if not user_dict:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -169,7 +479,7 @@ async def update_face_embedding_service(
 
     # 在用户嵌入向量中搜索相似的顔
     search_results = await sql_client.search_face_embeddings(
-        query_vector=features[0].tolist(),
+        query_vector=features[0],
         limit=1,
         threshold=_CONFIG_.MODEL_THRESHOLD
     )
@@ -183,7 +493,7 @@ async def update_face_embedding_service(
     # 更新用户的人脸嵌入向量
     insert_result = await sql_client.upsert_face_embedding(
         user_id=user_id,
-        feature_vector=features[0].tolist()
+        feature_vector=features[0]
     )
 
     # Milvusクライアントからの応答の可能性のあるバリエーションを処理
@@ -207,13 +517,18 @@ async def update_face_embedding_service(
             insert_result.inserted_ids[0] if insert_result.inserted_ids else None
         )
 
-    # 直接使用SQL客户端更新用户头像（更稳定的方式）
-    head_pic_data = image_to_base64(img)
-    await sql_client.update_user(user_id, head_pic=head_pic_data)
+    # 顔画像は画像ストアに保存し、ユーザーには参照のみを持たせる
+    head_pic = await run_in_threadpool(_store_head_pic, img, image_data)
+    try:
+        await sql_client.update_user(user_id, head_pic=head_pic)
+    finally:
+        # put() で取得した参照を解放（ユーザーが参照を保持している）
+        _BLOB_STORE_.release(head_pic)
     logger.debug("ユーザーのhead_picがSQLクライアント経由で更新されました")
 
     return {
         "success": True,
         "message": f"Face embedding updated successfully for user ID {user_id}",
         "new_embedding_id": inserted_id,
+        "head_pic": head_pic,
     }
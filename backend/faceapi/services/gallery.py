@@ -0,0 +1,134 @@
+"""
+顔認識システムのギャラリー移行サービスモジュール。
+
+このモジュールはセッションのユーザーと顔埋め込みをストリーミングでエクスポートし、
+同じ形式のバンドルをインポートするビジネスロジックを含みます。
+バンドルの形式は db.gallery を参照してください。
+"""
+
+from typing import Any, AsyncIterator, Dict
+
+from fastapi import HTTPException
+from loguru import logger
+
+from ..core import _BLOB_STORE_, _CONFIG_
+from ..db.gallery import encode_chunk, encode_end, encode_header, read_gallery
+from ..schemas import BulkImportResult, BulkImportRowError
+from ..utils import AuthContext
+
+
+async def export_gallery_service(context: AuthContext) -> AsyncIterator[bytes]:
+    """
+    セッションのユーザーと顔埋め込みをバンドルとしてエクスポートするサービス関数。
+
+    データは返されたイテレータを消費しながら GALLERY_CHUNK_SIZE 人ずつ読み込まれます。
+
+    引数:
+        context: 当前请求的认证上下文
+
+    戻り値:
+        バンドルのバイト列を順に返す非同期イテレータ
+    """
+    sql_instance = context.sql_instance
+    dim = _CONFIG_.MODEL_EMB_DIM
+
+    async def stream() -> AsyncIterator[bytes]:
+        yield encode_header(dim)
+        async for chunk in sql_instance.iter_user_chunks(_CONFIG_.GALLERY_CHUNK_SIZE):
+            yield encode_chunk(chunk, dim)
+        yield encode_end()
+
+    return stream()
+
+
+def _to_create_fields(record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    バンドルのユーザー記録を bulk_create_users の引数に変換。
+
+    顔画像はこのインスタンスの画像ストアに存在する場合のみ引き継ぎます。
+
+    例外:
+        ValueError: 必須の項目が無い場合
+    """
+    for field in ("username", "email", "hashed_password"):
+        if not isinstance(record.get(field), str) or not record[field]:
+            raise ValueError(f"Missing {field}")
+    head_pic = record.get("head_pic")
+    if not isinstance(head_pic, str) or _BLOB_STORE_.locate(head_pic) is None:
+        head_pic = None
+    return {
+        "username": record["username"],
+        "email": record["email"],
+        "full_name": record.get("full_name"),
+        "hashed_password": record["hashed_password"],
+        "is_active": bool(record.get("is_active", True)),
+        "is_admin": bool(record.get("is_admin", False)),
+        "head_pic": head_pic,
+    }
+
+
+async def import_gallery_service(
+    chunks: AsyncIterator[bytes], context: AuthContext
+) -> BulkImportResult:
+    """
+    エクスポートされたバンドルをセッションにインポートするサービス関数。
+
+    バンドルは1チャンクずつ読み込み、bulk_create_users で一括登録します。
+    ユーザーIDは新しく割り当てられ、ユーザー名またはメールアドレスが
+    既に使用されているユーザーは行ごとのエラーとして記録されます。
+    途中でバンドルの破損や切断が検出された場合は、
+    それまでに作成したユーザーを削除してから失敗します。
+
+    引数:
+        chunks: バンドルのバイト列の非同期イテレータ（リクエストボディなど）
+        context: 当前请求的认证上下文
+
+    戻り値:
+        作成数と行ごとのエラーを含む BulkImportResult
+    """
+    sql_instance = context.sql_instance
+    result = BulkImportResult()
+    created_ids = []  # 失敗時に削除するユーザーID
+    try:
+        async for chunk in read_gallery(chunks, _CONFIG_.MODEL_EMB_DIM):
+            records, owners, embeddings = [], [], []
+            for offset, (record, embedding) in enumerate(chunk, start=result.processed_count + 1):
+                username = record.get("username") if isinstance(record.get("username"), str) else None
+                try:
+                    fields = _to_create_fields(record)
+                except ValueError as e:
+                    result.errors.append(BulkImportRowError(row=offset, username=username, error=str(e)))
+                    continue
+                fields["embedding"] = embedding
+                records.append(fields)
+                owners.append((offset, username))
+                embeddings.append(embedding is not None)
+
+            created = await sql_instance.bulk_create_users(records) if records else []
+            for (row, username), has_embedding, user in zip(owners, embeddings, created):
+                if user is None:
+                    result.errors.append(BulkImportRowError(
+                        row=row, username=username, error="Username or email already exists"
+                    ))
+                    continue
+                created_ids.append(user["id"])
+                result.created_count += 1
+                result.face_count += has_embedding
+            result.processed_count += len(chunk)
+    except BaseException as e:
+        # クライアントの切断などを含め、登録済みのチャンクを取り消す
+        if created_ids:
+            await sql_instance.bulk_delete(created_ids)
+            logger.warning(f"ギャラリーのインポートを取り消し: {len(created_ids)} 件のユーザーを削除")
+        if isinstance(e, ValueError):
+            raise HTTPException(
+                status_code=400, detail=f"{e} (no users were imported)"
+            ) from e
+        raise
+
+    result.failed_count = len(result.errors)
+    result.finished = True
+    logger.info(
+        f"ギャラリーをインポート: {result.processed_count} 件中 {result.created_count} 件を作成"
+    )
+    return result
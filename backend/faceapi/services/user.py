@@ -6,28 +6,26 @@
 """
 
 from fastapi import HTTPException
+from loguru import logger
 
-from ..core import _SESSION_MANAGER_
 from ..schemas import User, UserCreate, UserUpdate
-from ..utils import hash_password, verify_password
+from ..utils import AuthContext, hash_password_async, verify_and_update_password_async
 
 
-async def authenticate_user(username: str, password: str, current_ip: str):
+async def authenticate_user(username: str, password: str, context: AuthContext):
     """
     ユーザー名/メールアドレスとパスワードでユーザーを認証。
 
     引数:
         username: ユーザーのユーザー名またはメールアドレス
         password: 検証する平文パスワード
-        current_ip: 当前会话的IP地址
+        context: 当前请求的认证上下文
 
     戻り値:
         成功した場合は認証されたユーザーオブジェクト、それ以外はNone
     """
-    # 通过会话管理器获取SQL实例
-    sql_instance = await _SESSION_MANAGER_.get_sql_instance(current_ip)
-    if not sql_instance:
-        raise HTTPException(status_code=401, detail="無効なセッションです")
+    # 认证上下文中已解析的SQL实例
+    sql_instance = context.sql_instance
     
     # 使用SQL实例查询用户
     user = await sql_instance.get_user_by_username(username) or await sql_instance.get_user_by_email(username)
@@ -39,31 +37,35 @@ async def authenticate_user(username: str, password: str, current_ip: str):
     if not user.get('is_active', False):
         return None
 
-    # パスワードを検証
-    if not verify_password(
+    # パスワードを検証（プロセスプールで実行し、イベントループを止めない）
+    valid, new_hash = await verify_and_update_password_async(
         plain_password=password,
         hashed_password=user.get('hashed_password'),
-    ):
+    )
+    if not valid:
         return None
 
+    # ハッシュのスキームまたはラウンド数が古い場合は、設定のスキームで再ハッシュしたものに置き換える
+    if new_hash is not None:
+        await sql_instance.update_user(user['id'], hashed_password=new_hash)
+        logger.info(f"ユーザー {user['id']} のパスワードハッシュを更新しました")
+
     return user
 
 
-async def create_user_service(user: UserCreate, current_ip: str):
+async def create_user_service(user: UserCreate, context: AuthContext):
     """
     新しいユーザーを作成するサービス関数。
 
     引数:
         user: ユーザー詳細を含むユーザー作成リクエストオブジェクト
-        current_ip: 当前会话的IP地址
+        context: 当前请求的认证上下文
 
     戻り値:
         作成されたユーザーオブジェクト
     """
-    # 通过会话管理器获取SQL实例
-    sql_instance = await _SESSION_MANAGER_.get_sql_instance(current_ip)
-    if not sql_instance:
-        raise HTTPException(status_code=401, detail="無効なセッションです")
+    # 认证上下文中已解析的SQL实例
+    sql_instance = context.sql_instance
     
     # ユーザーが既に存在するか确认
     existing_user = await sql_instance.get_user_by_username(user.username)
@@ -75,7 +77,7 @@ async def create_user_service(user: UserCreate, current_ip: str):
         raise HTTPException(status_code=400, detail="メールアドレスは既に登録されています")
 
     # pass_utilsモジュールを使用してパスワードをハッシュ化
-    hashed_password = hash_password(user.password)
+    hashed_password = await hash_password_async(user.password)
 
     # データベースにユーザーを作成
     created_user = await sql_instance.create_user(
@@ -89,26 +91,18 @@ async def create_user_service(user: UserCreate, current_ip: str):
     return created_user
 
 
-async def get_current_user_profile_service(user_id: int, current_ip: str):
+async def get_current_user_profile_service(context: AuthContext):
     """
     現在のユーザーのプロフィールを取得するサービス関数。
 
     引数:
-        user_id: プロフィールを取得するユーザーのID
-        current_ip: 当前会话的IP地址
+        context: 当前请求的认证上下文（包含已验证的用户）
 
     戻り値:
-        見つかった場合はユーザープロフィールオブジェクト
+        ユーザープロフィールオブジェクト
     """
-    # 通过会话管理器获取SQL实例
-    sql_instance = await _SESSION_MANAGER_.get_sql_instance(current_ip)
-    if not sql_instance:
-        raise HTTPException(status_code=401, detail="無効なセッションです")
-    
-    user_obj = await sql_instance.get_user_by_id(user_id)
-
-    if not user_obj:
-        raise HTTPException(status_code=404, detail="ユーザーが見つかりません")
+    # 认证时已获取用户
+    user_obj = context.user
 
     user = User(
         id=user_obj['id'],
@@ -125,28 +119,20 @@ async def get_current_user_profile_service(user_id: int, current_ip: str):
     return user
 
 
-async def update_user_profile_service(user_id: int, user_update: UserUpdate, current_ip: str):
+async def update_user_profile_service(user_update: UserUpdate, context: AuthContext):
     """
     現在のユーザーのプロフィールを更新するサービス関数。
 
     引数:
-        user_id: 更新するユーザーのID
         user_update: 更新するフィールドを含むユーザー更新リクエストオブジェクト
-        current_ip: 当前会话的IP地址
+        context: 当前请求的认证上下文（包含已验证的用户）
 
     戻り値:
         更新されたユーザーオブジェクト
     """
-    # 通过会话管理器获取SQL实例
-    sql_instance = await _SESSION_MANAGER_.get_sql_instance(current_ip)
-    if not sql_instance:
-        raise HTTPException(status_code=401, detail="無効なセッションです")
-    
-    # 存在を確認するために現在のユーザーを取得
-    current_user_obj = await sql_instance.get_user_by_id(user_id)
-
-    if not current_user_obj:
-        raise HTTPException(status_code=404, detail="User not found")
+    # 认证上下文中已解析的SQL实例（用户的存在已在认证时确认）
+    sql_instance = context.sql_instance
+    user_id = context.user_id
 
     # 他のユーザーのためにユーザー名またはメールアドレスが既に存在するか確認
     if user_update.username:
@@ -168,7 +154,7 @@ async def update_user_profile_service(user_id: int, user_update: UserUpdate, cur
     if user_update.full_name is not None:
         update_data["full_name"] = user_update.full_name
     if user_update.password:
-        update_data["hashed_password"] = hash_password(user_update.password)
+        update_data["hashed_password"] = await hash_password_async(user_update.password)
 
     # ユーザーを更新
     await sql_instance.update_user(user_id, **update_data)
@@ -179,49 +165,35 @@ async def update_user_profile_service(user_id: int, user_update: UserUpdate, cur
     return updated_user_obj
 
 
-async def delete_user_account_service(user_id: int, current_ip: str):
+async def delete_user_account_service(context: AuthContext):
     """
     現在のユーザーのアカウントを削除（非アクティブ化）するサービス関数。
 
     引数:
-        user_id: 非アクティブ化するユーザーのID
-        current_ip: 当前会话的IP地址
+        context: 当前请求的认证上下文（包含已验证的用户）
 
     戻り値:
         成功を示すブール値
     """
-    # 通过会话管理器获取SQL实例
-    sql_instance = await _SESSION_MANAGER_.get_sql_instance(current_ip)
-    if not sql_instance:
-        raise HTTPException(status_code=401, detail="無効なセッションです")
-    
-    # 存在を確認するためにユーザーを取得
-    user = await sql_instance.get_user_by_id(user_id)
-
-    if not user:
-        raise HTTPException(status_code=404, detail="ユーザーが見つかりません")
-
-    # 完全削除ではなくユーザーを非アクティブ化
-    result = await sql_instance.update_user(user_id, is_active=False)
+    # 完全削除ではなくユーザーを非アクティブ化（用户的存在已在认证时确认）
+    result = await context.sql_instance.update_user(context.user_id, is_active=False)
 
     return result
 
 
-async def get_user_service(current_ip: str, *args, **kwargs):
+async def get_user_service(context: AuthContext, *args, **kwargs):
     """
     IDで特定のユーザーを取得するサービス関数。
 
     引数:
-        current_ip: 当前会话的IP地址
+        context: 当前请求的认证上下文
         *args, **kwargs: 查询参数
 
     戻り値:
         見つかった場合はユーザーオブジェクト、それ以外はNone
     """
-    # 通过会话管理器获取SQL实例
-    sql_instance = await _SESSION_MANAGER_.get_sql_instance(current_ip)
-    if not sql_instance:
-        raise HTTPException(status_code=401, detail="無効なセッションです")
+    # 认证上下文中已解析的SQL实例
+    sql_instance = context.sql_instance
     
     user = await sql_instance.get_user(*args, **kwargs)
     return user
@@ -4,33 +4,85 @@
 from .face_utils import (
     FaceDetector,
     base64_to_image,
+    crop_face,
     detect_face,
+    detect_face_boxes,
     image_to_base64,
     inference,
+    inference_batch,
+    largest_face_box,
 )
-from .jwt_utils import (
-    create_access_token,
+from .auth_context import (
+    AuthContext,
+    get_active_user_context,
+    get_admin_context,
     get_current_active_user,
     get_current_admin_user,
-    get_current_user,
+    get_session_context,
+    get_user_context,
+    load_session_context,
+)
+from .jwt_utils import create_access_token, get_current_user
+from .pass_utils import (
+    HashQueueFull,
+    hash_password,
+    hash_password_async,
+    shutdown_hash_executor,
+    verify_and_update_password,
+    verify_and_update_password_async,
+    verify_password,
+    verify_password_async,
+)
+from .session_utils import (
+    create_session_token,
+    decode_session_token,
+    get_client_ip,
+    get_current_session,
+)
+from .token_cache import VerifiedTokenCache
+from .upload_utils import (
+    UploadedImage,
+    get_upload_image,
+    get_upload_image_with_bytes,
+    read_limited_body,
 )
-from .pass_utils import hash_password, verify_password
-from .session_utils import get_current_session, create_session_token, get_client_ip
 
 __ALL__ = [
     "create_access_token",
     "get_current_user",
     "get_current_active_user",
     "get_current_admin_user",
+    "AuthContext",
+    "get_session_context",
+    "get_user_context",
+    "get_active_user_context",
+    "get_admin_context",
+    "load_session_context",
     "generate_jwt",
     "hash_password",
+    "hash_password_async",
     "verify_password",
+    "verify_password_async",
+    "verify_and_update_password",
+    "verify_and_update_password_async",
+    "shutdown_hash_executor",
+    "HashQueueFull",
     "FaceDetector",
     "detect_face",
+    "detect_face_boxes",
+    "largest_face_box",
+    "crop_face",
     "inference",
+    "inference_batch",
     "image_to_base64",
     "base64_to_image",
     "get_current_session",
     "create_session_token",
     "get_client_ip",
+    "decode_session_token",
+    "VerifiedTokenCache",
+    "get_upload_image",
+    "get_upload_image_with_bytes",
+    "read_limited_body",
+    "UploadedImage",
 ]
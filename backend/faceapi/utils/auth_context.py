@@ -0,0 +1,175 @@
+"""
+リクエスト単位の認証コンテキストモジュール。
+
+セッション（とそのSQL実例）、ユーザー、ロールをリクエストごとに一度だけ解決し、
+ルートからサービスへ AuthContext として渡します。
+FastAPI は同じリクエスト内の依存関係の結果をキャッシュするため、
+複数の依存関係が get_session_context を使用しても解決は一度だけです。
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import jwt
+from fastapi import Depends, HTTPException, Request, status
+
+from ..core import _CONFIG_, _SESSION_MANAGER_
+from ..core.session import SessionInfo
+from ..db import SqlManager
+from .jwt_utils import oauth2_scheme
+from .session_utils import decode_session_token, verified_tokens
+
+
+@dataclass
+class AuthContext:
+    """
+    リクエスト単位の認証コンテキスト。
+
+    属性:
+        ip_address: セッションのIPアドレス
+        session: 検証済みのセッション
+        user: 認証されたユーザー（アクセストークンが不要なエンドポイントではNone）
+    """
+
+    ip_address: str
+    session: SessionInfo
+    user: Optional[Dict[str, Any]] = None
+
+    @property
+    def sql_instance(self) -> SqlManager:
+        """セッションのSQL実例"""
+        return self.session.sql_instance
+
+    @property
+    def user_id(self) -> Optional[int]:
+        """認証されたユーザーのID"""
+        return self.user['id'] if self.user is not None else None
+
+    @property
+    def is_admin(self) -> bool:
+        """認証されたユーザーが管理者かどうか"""
+        return self.user is not None and bool(self.user['is_admin'])
+
+
+async def load_session_context(ip_address: str) -> AuthContext:
+    """
+    IPアドレスのセッションを解決して認証コンテキストを作成。
+
+    引数:
+        ip_address: セッショントークンから取得したIPアドレス
+
+    戻り値:
+        ユーザーを含まない認証コンテキスト
+
+    例外:
+        HTTPException: セッションが存在しない場合（401）
+    """
+    session_info = await _SESSION_MANAGER_.get_session_by_ip(ip_address)
+    if session_info is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="無効なセッションです")
+    return AuthContext(ip_address=ip_address, session=session_info)
+
+
+async def get_session_context(request: Request) -> AuthContext:
+    """
+    Session-Token ヘッダーを検証し、セッションの認証コンテキストを取得。
+
+    引数:
+        request: FastAPIリクエストオブジェクト
+
+    戻り値:
+        ユーザーを含まない認証コンテキスト
+
+    例外:
+        HTTPException: トークンが無効、またはセッションが存在しない場合
+    """
+    return await load_session_context(decode_session_token(request.headers.get("Session-Token")))
+
+
+async def get_user_context(
+    token: str = Depends(oauth2_scheme),
+    context: AuthContext = Depends(get_session_context),
+) -> AuthContext:
+    """
+    アクセストークンを検証し、セッションのユーザーを認証コンテキストに設定。
+
+    引数:
+        token: AuthorizationヘッダーからのJWTトークン
+        context: セッションの認証コンテキスト
+
+    戻り値:
+        ユーザーを含む認証コンテキスト
+
+    例外:
+        HTTPException: トークンが無効な場合（401）、ユーザーが存在しない場合（404）
+    """
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        payload = verified_tokens.decode(
+            "access", token, _CONFIG_.JWT_SECRET_KEY, _CONFIG_.JWT_ALGORITHM
+        )
+        user_id = int(payload["sub"])
+    except (jwt.PyJWTError, KeyError, TypeError, ValueError):
+        raise credentials_exception
+
+    user = await context.sql_instance.get_user_by_id(user_id)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    context.user = user
+    return context
+
+
+async def get_active_user_context(context: AuthContext = Depends(get_user_context)) -> AuthContext:
+    """
+    アクティブなユーザーの認証コンテキストを取得。
+
+    例外:
+        HTTPException: ユーザーが非アクティブの場合（400）
+    """
+    if not context.user.get('is_active'):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="User is inactive"
+        )
+    return context
+
+
+async def get_admin_context(context: AuthContext = Depends(get_user_context)) -> AuthContext:
+    """
+    管理者の認証コンテキストを取得（管理者専用エンドポイントで使用）。
+
+    例外:
+        HTTPException: ユーザーが管理者でない場合（403）
+    """
+    if not context.is_admin:
+        raise HTTPException(status_code=403, detail="Not an admin")
+    return context
+
+
+async def get_current_active_user(context: AuthContext = Depends(get_active_user_context)):
+    """
+    現在のアクティブユーザーを取得。
+
+    戻り値:
+        現在のアクティブユーザー
+
+    例外:
+        HTTPException: ユーザーが非アクティブの場合
+    """
+    return context.user
+
+
+async def get_current_admin_user(context: AuthContext = Depends(get_admin_context)):
+    """
+    現在の管理者ユーザーを取得し、管理者であることを確認。
+
+    戻り値:
+        現在の管理者ユーザー
+
+    例外:
+        HTTPException: ユーザーが管理者でない場合
+    """
+    return context.user
@@ -3,9 +3,8 @@ from pathlib import PosixPath
 
 import cv2
 import numpy as np
-from functools import partial
 
-from ..face_rec import _MODEL_
+from ..face_rec import get_default_model
 from ..core import _CONFIG_
 
 
@@ -42,20 +41,62 @@ class FaceDetector:
         return [image_array[y : y + h, x : x + w] for (x, y, w, h) in faces]
 
 
-def detect_face(image):
+def detect_face_boxes(image):
     """
-    OpenCV Haarカスケードを使用して画像内の顔を検出。
+    OpenCV Haarカスケードを使用して画像内の顔の位置を検出。
 
     引数:
-        image: ファイルパス（文字列）または画像を表すnumpy配列のいずれか
+        image: 画像を表すnumpy配列
 
     戻り値:
-        検出された顔を表すnumpy配列のリスト、または顔が見つからない場合は空リスト
+        検出された顔の (x, y, w, h) タプルのリスト、顔が見つからない場合は空リスト
     """
     face_cascade = cv2.CascadeClassifier(
         cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
     )
 
+    gray_image = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    faces = face_cascade.detectMultiScale(
+        gray_image,
+        scaleFactor=1.1,
+        minNeighbors=5,
+        minSize=(30, 30),
+    )
+
+    return [tuple(int(v) for v in face) for face in faces]
+
+
+def largest_face_box(boxes):
+    """
+    検出された顔の中から面積が最大のものを選択。
+
+    引数:
+        boxes: (x, y, w, h) タプルのリスト
+
+    戻り値:
+        面積が最大の (x, y, w, h) タプル、リストが空の場合はNone
+    """
+    if not boxes:
+        return None
+    return max(boxes, key=lambda box: box[2] * box[3])
+
+
+def crop_face(image, box):
+    """(x, y, w, h) で指定された顔領域を切り取る"""
+    x, y, w, h = box
+    return image[y : y + h, x : x + w]
+
+
+def detect_face(image):
+    """
+    OpenCV Haarカスケードを使用して画像内の顔を検出。
+
+    引数:
+        image: ファイルパス（文字列）または画像を表すnumpy配列のいずれか
+
+    戻り値:
+        検出された顔を表すnumpy配列のリスト、または顔が見つからない場合は空リスト
+    """
     # 異なる入力タイプを処理
     if isinstance(image, str):
         # 画像がファイルパスの場合
@@ -69,16 +110,8 @@ def detect_face(image):
     if image is None:
         return []
 
-    gray_image = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
-    faces = face_cascade.detectMultiScale(
-        gray_image,
-        scaleFactor=1.1,
-        minNeighbors=5,
-        minSize=(30, 30),
-    )
-
     # 切り取られた顔画像を返す
-    return [image[y : y + h, x : x + w] for (x, y, w, h) in faces]
+    return [crop_face(image, box) for box in detect_face_boxes(image)]
 
 
 def image_to_base64(image):
@@ -182,9 +215,57 @@ def inference_onnx(session, img, to_array=True):
     feat = result[0]
 
     if to_array:
-        feat = np.array(feat)
+        # float32 のままビューとして扱い、不要なコピーを避ける
+        feat = np.asarray(feat, dtype=np.float32)
 
     return feat.reshape(-1, _CONFIG_.MODEL_EMB_DIM)
 
 
-inference = partial(inference_onnx, _MODEL_)
\ No newline at end of file
+def inference_onnx_batch(session, images):
+    """
+    ONNXモデルを使用して複数の顔画像をまとめて推論する
+
+    モデルのバッチ次元が固定の場合は、その大きさごとに分割して推論します
+    （最後の端数は0で埋めて推論し、結果から取り除きます）。
+
+    引数:
+        session: ONNXセッションオブジェクト
+        images: 顔画像（numpy配列）のリスト
+
+    戻り値:
+        特徴ベクトルの行列 (N, MODEL_EMB_DIM)
+    """
+    if len(images) == 0:
+        return np.zeros((0, _CONFIG_.MODEL_EMB_DIM), dtype=np.float32)
+
+    input_meta = session.get_inputs()[0]
+    input_name = input_meta.name
+    output_name = session.get_outputs()[0].name
+
+    # バッチ次元が動的でない場合はその大きさで分割
+    batch_dim = input_meta.shape[0] if input_meta.shape else None
+    batch_size = batch_dim if isinstance(batch_dim, int) and batch_dim > 0 else len(images)
+
+    input_tensor = np.concatenate([preprocess_image(img) for img in images], axis=0)
+    remainder = len(images) % batch_size
+    if remainder:
+        padding = np.zeros(
+            (batch_size - remainder, *input_tensor.shape[1:]), dtype=input_tensor.dtype
+        )
+        input_tensor = np.concatenate([input_tensor, padding], axis=0)
+    feats = [
+        session.run([output_name], {input_name: input_tensor[i : i + batch_size]})[0]
+        for i in range(0, len(input_tensor), batch_size)
+    ]
+
+    return np.concatenate(feats, axis=0).reshape(-1, _CONFIG_.MODEL_EMB_DIM)[: len(images)]
+
+
+def inference(img, to_array=True):
+    """設定のモデルで推論を行う（inference_onnx を参照）"""
+    return inference_onnx(get_default_model(), img, to_array)
+
+
+def inference_batch(images):
+    """設定のモデルで複数の顔画像をまとめて推論する（inference_onnx_batch を参照）"""
+    return inference_onnx_batch(get_default_model(), images)
\ No newline at end of file
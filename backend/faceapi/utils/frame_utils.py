@@ -0,0 +1,94 @@
+"""
+フレーム類似度判定ユーティリティモジュール。
+
+縮小したグレースケール画像から差分ハッシュ（dHash）を計算し、
+連続するフレームがほぼ同一かどうかを判定します。
+ライブカメラからのほぼ同じフレームに対して、検出と推論を省略するために使用します。
+"""
+
+import threading
+import time
+from typing import Any, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# 前回結果が存在しないことを表す番兵
+_MISS = object()
+
+
+def dhash(image: np.ndarray, hash_size: int = 8) -> int:
+    """
+    画像の差分ハッシュ（dHash）を計算。
+
+    引数:
+        image: BGR画像（numpy配列）
+        hash_size: ハッシュの一辺のサイズ（ビット数は hash_size ** 2）
+
+    戻り値:
+        整数としてのハッシュ値
+    """
+    # pylint: disable=no-member
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    resized = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    # pylint: enable=no-member
+    diff = resized[:, 1:] > resized[:, :-1]
+    return int.from_bytes(np.packbits(diff).tobytes(), "big")
+
+
+def hamming_distance(hash1: int, hash2: int) -> int:
+    """2つのハッシュ値のハミング距離を計算"""
+    return (hash1 ^ hash2).bit_count()
+
+
+class FrameSimilarityFilter:
+    """
+    直前のフレームとの類似度で処理結果を再利用するフィルター。
+
+    直前フレームのハッシュと結果を保持し、新しいフレームのハッシュとの
+    距離が max_distance 以下かつ ttl 秒以内であれば前回の結果を返します。
+    同じセッションのフレームはスレッドプールで並行して処理されるため、操作はロックで保護します。
+    """
+
+    MISS = _MISS
+
+    def __init__(self, max_distance: int, ttl: float):
+        self.max_distance = max_distance
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # (ハッシュ, 結果, 保存時刻)
+        self._last: Optional[Tuple[int, Any, float]] = None
+
+    def lookup(self, frame_hash: int) -> Any:
+        """
+        前回の結果を検索。
+
+        引数:
+            frame_hash: 現在のフレームのハッシュ値
+
+        戻り値:
+            再利用可能な前回の結果、無い場合は FrameSimilarityFilter.MISS
+        """
+        with self._lock:
+            last = self._last
+            if (
+                last is not None
+                and time.monotonic() - last[2] <= self.ttl
+                and hamming_distance(frame_hash, last[0]) <= self.max_distance
+            ):
+                self.hits += 1
+                return last[1]
+            self.misses += 1
+            return _MISS
+
+    def store(self, frame_hash: int, result: Any):
+        """現在のフレームのハッシュと結果を保存"""
+        with self._lock:
+            self._last = (frame_hash, result, time.monotonic())
+
+    def clear(self):
+        """保持している結果を破棄"""
+        with self._lock:
+            self._last = None
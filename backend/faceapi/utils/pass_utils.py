@@ -1,18 +1,115 @@
 """
 パスワードを安全に暗号化および比較するためのパスワードユーティリティモジュール。
+
+ハッシュのスキームとコスト（ラウンド数）は設定（PASSWORD_HASH_ALGORITHM、PASSWORD_HASH_ROUNDS）
+から決まります。ハッシュ化は意図的に重い処理のため、非同期ハンドラからは *_async 版を使用し、
+上限付きのプロセスプールで実行してイベントループを止めないようにします
+（passlib のバックエンドの多くはGILを保持したまま計算するため、スレッドでは効果がありません）。
+空きを待つタスクが PASSWORD_HASH_MAX_QUEUE に達している場合は、待たずに HashQueueFull を送出します
+（HTTP では 503 として返されます）。
 """
 
-from typing import Union
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from .. import hash_worker
+from ..core import _CONFIG_
+from ..hash_worker import build_context
+
+# 設定のスキームを使用するようにパスワードハッシュコンテキストを設定
+pwd_context = build_context(_CONFIG_.PASSWORD_HASH_ALGORITHM, _CONFIG_.PASSWORD_HASH_ROUNDS)
+
+# 待ち行列が満杯の場合に再試行を促すまでの時間（秒）
+HASH_QUEUE_RETRY_AFTER = 1.0
+
+
+class HashQueueFull(Exception):
+    """パスワードのハッシュ化・検証の待ち行列が満杯"""
+
+    def __init__(self, retry_after: float = HASH_QUEUE_RETRY_AFTER):
+        super().__init__("Password hashing queue is full")
+        self.retry_after = retry_after
+
 
-from passlib.context import CryptContext
+# ハッシュ化・検証を実行するプロセスプール（初回使用時に作成、プロセス数が同時に実行する数の上限）
+_hash_executor: Optional[ProcessPoolExecutor] = None
+# プロセスプールに投入できるタスク数（実行中 + 待機中）の上限
+_hash_slots: Optional[threading.BoundedSemaphore] = None
 
-# sha256_cryptを使用するようにパスワードハッシュコンテキストを設定
-pwd_context = CryptContext(schemes=["sha256_crypt"], deprecated="auto")
+
+def _get_mp_context():
+    """
+    ワーカープロセスの起動方法を返す。
+
+    アプリケーションのプロセスは ONNX Runtime や sqlite のスレッドを実行しているため fork せず、
+    forkserver（使用できない環境では spawn）で起動します。
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        # passlib のインポートを forkserver で一度だけ行う
+        context.set_forkserver_preload([hash_worker.__name__])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def hash_worker_count() -> int:
+    """ハッシュ化用のプロセスプールのプロセス数"""
+    return _CONFIG_.PASSWORD_HASH_WORKERS or min(4, os.cpu_count() or 1)
+
+
+def _get_hash_executor() -> Tuple[ProcessPoolExecutor, threading.BoundedSemaphore]:
+    """ハッシュ化用のプロセスプールと投入枠を取得（初回使用時に作成）"""
+    global _hash_executor, _hash_slots
+    if _hash_executor is None:
+        max_workers = hash_worker_count()
+        _hash_executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=_get_mp_context(),
+            initializer=hash_worker.init_worker,
+            initargs=(_CONFIG_.PASSWORD_HASH_ALGORITHM, _CONFIG_.PASSWORD_HASH_ROUNDS),
+        )
+        _hash_slots = threading.BoundedSemaphore(max_workers + _CONFIG_.PASSWORD_HASH_MAX_QUEUE)
+    return _hash_executor, _hash_slots
+
+
+def shutdown_hash_executor():
+    """ハッシュ化用のプロセスプールを終了（アプリケーションのシャットダウン時に呼び出す）"""
+    global _hash_executor, _hash_slots
+    if _hash_executor is not None:
+        _hash_executor.shutdown(cancel_futures=True)
+        _hash_executor = None
+        _hash_slots = None
+
+
+async def _run_in_hash_executor(func, *args):
+    """
+    func をプロセスプールで実行（イベントループを止めない）。
+
+    投入枠はタスクの完了時に解放するため、呼び出し元がキャンセルされても
+    プロセスプールの待ち行列は上限を超えません。
+
+    例外:
+        HashQueueFull: 実行中と待機中のタスクが上限に達している場合
+    """
+    executor, slots = _get_hash_executor()
+    if not slots.acquire(blocking=False):
+        raise HashQueueFull()
+    try:
+        future = executor.submit(func, *args)
+    except BaseException:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    return await asyncio.wrap_future(future)
 
 
 def hash_password(password: str) -> str:
     """
-    平文パスワードをsha256_cryptを使用してハッシュ化。
+    平文パスワードを設定のスキームを使用してハッシュ化。
 
     引数:
         password: ハッシュ化する平文パスワード
@@ -37,6 +134,43 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """
+    パスワードを検証し、ハッシュが古い場合は設定のスキームで再ハッシュ。
+
+    引数:
+        plain_password: 検証する平文パスワード
+        hashed_password: 比較対象のハッシュ化されたパスワード
+
+    戻り値:
+        (パスワードが一致するか, 新しいハッシュ（更新が不要な場合はNone）)
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+async def hash_password_async(password: str) -> str:
+    """hash_password をプロセスプールで実行（イベントループを止めない）"""
+    return await _run_in_hash_executor(hash_worker.hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password をプロセスプールで実行（イベントループを止めない）"""
+    return await _run_in_hash_executor(
+        hash_worker.verify_password, plain_password, hashed_password
+    )
+
+
+async def verify_and_update_password_async(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """verify_and_update_password をプロセスプールで実行（イベントループを止めない）"""
+    return await _run_in_hash_executor(
+        hash_worker.verify_and_update_password, plain_password, hashed_password
+    )
+
+
 def is_valid_password(password: str, min_length: int = 8) -> bool:
     """
     パスワードが基本的な検証要件を満たしているか確認。
@@ -70,7 +204,7 @@ if __name__ == "__main__":
     print(f"ハッシュ化されたパスワード: {hashed}")
 
     # パスワードを検証
-    is_correct = verify_password(password, hashed)
+    is_correct = verify_password(EXAMPLE_PASSWORD, hashed)
     print(f"パスワード検証結果: {is_correct}")
 
     # 間違ったパスワードで試す
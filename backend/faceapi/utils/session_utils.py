@@ -7,12 +7,12 @@
 
 from datetime import datetime
 from typing import Optional
-from loguru import logger
 
 import jwt
 from fastapi import Depends, HTTPException, status, Request
 
 from ..core import _CONFIG_
+from .token_cache import VerifiedTokenCache
 
 missing_session_token_exception = HTTPException(
     status_code=status.HTTP_401_UNAUTHORIZED,
@@ -26,6 +26,9 @@ credentials_exception = HTTPException(
     headers={"WWW-Authenticate": "Session-Token"},
 )
 
+# 会话令牌和访问令牌共用的已验证令牌缓存
+verified_tokens = VerifiedTokenCache(maxsize=_CONFIG_.TOKEN_CACHE_SIZE)
+
 def get_client_ip(request: Request) -> str:
     """
     从请求中获取客户端真实 IP 地址。
@@ -82,36 +85,33 @@ def create_session_token(ip_address: str, now: float, expires_at: float) -> str:
     return encoded_jwt
 
 
-async def get_current_session(request: Request) -> str:
+def decode_session_token(session_token: Optional[str]) -> str:
     """
-    从请求头获取并验证会话令牌，返回对应的IP地址。
-    
+    验证会话令牌，返回对应的IP地址。
+
     参数:
-        request: FastAPI请求对象
-        
+        session_token: 会话令牌（可带 "Bearer " 前缀）
+
     返回:
         验证通过的IP地址字符串
-        
+
     异常:
         HTTPException: 令牌无效、过期或缺失时抛出
     """
-    # 从请求头获取Session-Token
-    session_token = request.headers.get("Session-Token")
-    
     if not session_token:
         raise missing_session_token_exception
 
     # remove bearer on start
     if session_token.startswith("Bearer "):
         session_token = session_token.removeprefix("Bearer ")
-    logger.info(f"セッショントークン: {session_token}")
-    
+
     try:
-        # 使用会话密钥解码JWT令牌
-        payload = jwt.decode(
-            session_token, 
-            _CONFIG_.SESSION_SECRET_KEY, 
-            algorithms=[_CONFIG_.JWT_ALGORITHM]
+        # 使用会话密钥解码JWT令牌（同一令牌只验证一次）
+        payload = verified_tokens.decode(
+            "session",
+            session_token,
+            _CONFIG_.SESSION_SECRET_KEY,
+            _CONFIG_.JWT_ALGORITHM,
         )
         
         # 获取IP地址
@@ -132,3 +132,20 @@ async def get_current_session(request: Request) -> str:
         raise credentials_exception
     
     return ip_address
+
+
+async def get_current_session(request: Request) -> str:
+    """
+    从请求头获取并验证会话令牌，返回对应的IP地址。
+    
+    参数:
+        request: FastAPI请求对象
+        
+    返回:
+        验证通过的IP地址字符串
+        
+    异常:
+        HTTPException: 令牌无效、过期或缺失时抛出
+    """
+    # 从请求头获取Session-Token
+    return decode_session_token(request.headers.get("Session-Token"))
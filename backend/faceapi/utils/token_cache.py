@@ -0,0 +1,74 @@
+"""
+検証済みトークンのキャッシュモジュール。
+
+JWTのデコードと署名検証の結果（クレーム）をトークンのダイジェストをキーとして保持し、
+同じトークンを使う後続のリクエストでは検証を省略します。
+セッショントークンとアクセストークンで同じキャッシュを共有し、名前空間で区別します。
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+import jwt
+
+
+class VerifiedTokenCache:
+    """
+    検証済みトークン → クレームの有界キャッシュ。
+
+    エントリはクレームの exp まで有効で、容量を超えると最も長く使われていない
+    エントリから削除します。検証に失敗したトークンと exp の無いトークンは保持しません。
+    トークン自体は保持せず、SHA-256 ダイジェストのみをキーとして使用します。
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        # {(名前空間, ダイジェスト): (クレーム, 有効期限)}
+        self._entries: "OrderedDict[Tuple[str, bytes], Tuple[Dict[str, Any], float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def decode(self, namespace: str, token: str, secret: str, algorithm: str) -> Dict[str, Any]:
+        """
+        トークンを検証してクレームを返す（キャッシュにあれば検証を省略）。
+
+        引数:
+            namespace: トークンの種類（"session"、"access" など）
+            token: JWTトークン
+            secret: 署名の検証に使用するシークレットキー
+            algorithm: 署名アルゴリズム
+
+        戻り値:
+            検証済みのクレーム（呼び出し側で変更しないこと）
+
+        例外:
+            jwt.PyJWTError: トークンが無効または期限切れの場合
+        """
+        key = (namespace, hashlib.sha256(token.encode()).digest())
+        entry = self._entries.get(key)
+        if entry is not None:
+            claims, expires_at = entry
+            if time.time() < expires_at:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return claims
+            del self._entries[key]
+            raise jwt.ExpiredSignatureError("Signature has expired")
+
+        self.misses += 1
+        claims = jwt.decode(token, secret, algorithms=[algorithm])
+        expires_at = claims.get("exp")
+        if isinstance(expires_at, (int, float)) and self.maxsize > 0:
+            self._entries[key] = (claims, float(expires_at))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return claims
+
+    def clear(self):
+        """すべてのエントリを削除"""
+        self._entries.clear()
@@ -0,0 +1,282 @@
+"""
+アップロード画像のストリーミング取り込みユーティリティモジュール。
+
+multipart/form-data の "image" フィールド、または image/jpeg などの
+生のリクエストボディをチャンク単位で読み込み、再利用可能な
+bytearray プールに格納してからデコードします。
+サイズ上限を超えるボディは（Content-Length が無い場合も）読み込みの途中で拒否されます。
+"""
+
+from contextlib import aclosing
+from typing import AsyncIterator, List, NamedTuple
+
+import cv2
+import numpy as np
+from fastapi import HTTPException, Request, status
+from starlette.datastructures import UploadFile
+from starlette.formparsers import MultiPartException, MultiPartParser
+
+from ..core import _CONFIG_
+
+# multipart を経由せずに直接受け付けるコンテンツタイプ
+RAW_IMAGE_CONTENT_TYPES = {"image/jpeg", "image/jpg", "image/png"}
+
+# multipart の境界やヘッダーのために許容する追加バイト数
+MULTIPART_OVERHEAD = 16 * 1024
+
+# プールに戻すバッファの初期サイズ
+INITIAL_BUFFER_SIZE = 1024 * 1024
+
+upload_too_large_exception = HTTPException(
+    status_code=413,
+    detail="Uploaded image is too large",
+)
+
+
+class UploadedImage(NamedTuple):
+    """デコード済みの画像とアップロードされた元のバイト列"""
+
+    image: np.ndarray
+    data: bytes
+
+
+class UploadBufferPool:
+    """
+    アップロード読み込み用の bytearray プール。
+
+    リクエストごとに大きなバッファを確保・解放する代わりに、
+    使い終わったバッファを保持して次のリクエストで再利用します。
+    """
+
+    def __init__(self, max_buffers: int, initial_size: int, max_size: int):
+        self._free: List[bytearray] = []
+        self._max_buffers = max_buffers
+        self._initial_size = initial_size
+        self._max_size = max_size
+
+    def acquire(self) -> bytearray:
+        """プールからバッファを取り出す（空の場合は新規作成）"""
+        if self._free:
+            return self._free.pop()
+        return bytearray(self._initial_size)
+
+    def release(self, buffer: bytearray):
+        """バッファをプールに戻す"""
+        if len(self._free) >= self._max_buffers:
+            return
+        if len(buffer) > self._max_size:
+            # 上限を超えて拡張されたバッファは縮めてから保持
+            del buffer[self._max_size:]
+        self._free.append(buffer)
+
+    @property
+    def free_count(self) -> int:
+        """プール内の未使用バッファ数"""
+        return len(self._free)
+
+
+_BUFFER_POOL_ = UploadBufferPool(
+    max_buffers=_CONFIG_.UPLOAD_BUFFER_POOL_SIZE,
+    initial_size=min(INITIAL_BUFFER_SIZE, _CONFIG_.MAX_UPLOAD_SIZE),
+    max_size=_CONFIG_.MAX_UPLOAD_SIZE,
+)
+
+
+async def _iter_upload_file(upload: UploadFile, chunk_size: int) -> AsyncIterator[bytes]:
+    """UploadFile をチャンク単位で読み込むジェネレータ"""
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def _limit_stream(chunks: AsyncIterator[bytes], limit: int) -> AsyncIterator[bytes]:
+    """チャンクをそのまま返し、合計サイズが limit を超えた時点で拒否するジェネレータ"""
+    size = 0
+    async for chunk in chunks:
+        size += len(chunk)
+        if size > limit:
+            raise upload_too_large_exception
+        yield chunk
+
+
+async def read_into_buffer(
+    buffer: bytearray, chunks: AsyncIterator[bytes], limit: int
+) -> int:
+    """
+    チャンクのストリームをバッファに書き込む。
+
+    引数:
+        buffer: 書き込み先のバッファ（必要に応じて拡張される）
+        chunks: バイトチャンクの非同期イテレータ
+        limit: 許容する最大バイト数
+
+    戻り値:
+        書き込まれたバイト数
+
+    例外:
+        HTTPException: 合計サイズが上限を超えた場合 (413)
+    """
+    size = 0
+    async for chunk in chunks:
+        end = size + len(chunk)
+        if end > limit:
+            raise upload_too_large_exception
+        if end > len(buffer):
+            # 倍々で拡張して再確保の回数を抑える
+            grow_to = min(max(end, len(buffer) * 2), limit)
+            buffer.extend(bytes(grow_to - len(buffer)))
+        buffer[size:end] = chunk
+        size = end
+    return size
+
+
+async def read_limited_body(request: Request, limit: int) -> bytearray:
+    """
+    リクエストボディ全体を上限付きで読み込む。
+
+    引数:
+        request: FastAPIリクエストオブジェクト
+        limit: 許容する最大バイト数
+
+    戻り値:
+        リクエストボディ
+
+    例外:
+        HTTPException: Content-Length または受信したバイト数が上限を超えた場合 (413)
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > limit:
+        raise upload_too_large_exception
+    buffer = bytearray(min(INITIAL_BUFFER_SIZE, limit))
+    size = await read_into_buffer(buffer, request.stream(), limit)
+    del buffer[size:]
+    return buffer
+
+
+def decode_image_buffer(buffer: bytearray, size: int):
+    """
+    バッファの先頭 size バイトを画像としてデコード。
+
+    引数:
+        buffer: 画像データを含むバッファ
+        size: 有効なバイト数
+
+    戻り値:
+        デコードされた画像（numpy配列）、失敗した場合はNone
+    """
+    if size == 0:
+        return None
+    # frombuffer はコピーせずにバッファを参照する
+    # pylint: disable=no-member
+    return cv2.imdecode(np.frombuffer(buffer, np.uint8, count=size), cv2.IMREAD_COLOR)
+    # pylint: enable=no-member
+
+
+async def _read_upload_image(request: Request, keep_bytes: bool) -> UploadedImage:
+    """
+    リクエストからアップロード画像を読み込みデコードする。
+
+    引数:
+        request: FastAPIリクエストオブジェクト
+        keep_bytes: 元のバイト列をコピーして返すかどうか
+
+    戻り値:
+        デコードされた画像と元のバイト列（keep_bytes が False の場合は空）
+
+    例外:
+        HTTPException: サイズ超過、未対応の形式、または無効な画像の場合
+    """
+    limit = _CONFIG_.MAX_UPLOAD_SIZE
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    is_raw = content_type in RAW_IMAGE_CONTENT_TYPES
+
+    # Content-Length が分かる場合は読み込み前に拒否
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit():
+        allowed = limit if is_raw else limit + MULTIPART_OVERHEAD
+        if int(content_length) > allowed:
+            raise upload_too_large_exception
+
+    buffer = _BUFFER_POOL_.acquire()
+    try:
+        if is_raw:
+            size = await read_into_buffer(buffer, request.stream(), limit)
+        elif content_type == "multipart/form-data":
+            # ファイルが一時ファイルに書き出される前に、受信したバイト数で上限を確認する
+            try:
+                async with aclosing(
+                    _limit_stream(request.stream(), limit + MULTIPART_OVERHEAD)
+                ) as stream:
+                    form = await MultiPartParser(request.headers, stream, max_files=1).parse()
+            except MultiPartException as e:
+                raise HTTPException(status_code=400, detail=e.message) from e
+            try:
+                upload = form.get("image")
+                if not isinstance(upload, UploadFile):
+                    raise HTTPException(
+                        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                        detail="Missing image file",
+                    )
+                if upload.size is not None and upload.size > limit:
+                    raise upload_too_large_exception
+                size = await read_into_buffer(
+                    buffer, _iter_upload_file(upload, _CONFIG_.UPLOAD_CHUNK_SIZE), limit
+                )
+            finally:
+                await form.close()
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail="Unsupported image content type",
+            )
+
+        img = decode_image_buffer(buffer, size)
+        # バッファはプールに戻すため、必要な場合のみコピーを残す
+        data = bytes(buffer[:size]) if keep_bytes and img is not None else b""
+    finally:
+        _BUFFER_POOL_.release(buffer)
+
+    if img is None:
+        raise HTTPException(status_code=400, detail="Invalid image file")
+
+    return UploadedImage(img, data)
+
+
+async def get_upload_image(request: Request) -> np.ndarray:
+    """
+    リクエストからアップロード画像を読み込みデコードする依存関数。
+
+    multipart/form-data の場合は "image" フィールドを、
+    image/jpeg などの場合はリクエストボディ全体を画像として扱います。
+
+    引数:
+        request: FastAPIリクエストオブジェクト
+
+    戻り値:
+        デコードされた画像（numpy配列）
+
+    例外:
+        HTTPException: サイズ超過、未対応の形式、または無効な画像の場合
+    """
+    upload = await _read_upload_image(request, keep_bytes=False)
+    return upload.image
+
+
+async def get_upload_image_with_bytes(request: Request) -> UploadedImage:
+    """
+    アップロード画像をデコードし、元のバイト列も併せて返す依存関数。
+
+    顔画像の登録など、アップロードされたファイルをそのまま保存する場合に使用します。
+
+    引数:
+        request: FastAPIリクエストオブジェクト
+
+    戻り値:
+        デコードされた画像と元のバイト列
+
+    例外:
+        HTTPException: サイズ超過、未対応の形式、または無効な画像の場合
+    """
+    return await _read_upload_image(request, keep_bytes=True)
@@ -0,0 +1,141 @@
+"""
+流入制御のテスト：トークンバケット、処理枠と待ち行列、接続元アドレス、ミドルウェア。
+"""
+
+import asyncio
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from faceapi.core.admission import (
+    AdmissionController,
+    AdmissionMiddleware,
+    AdmissionRejected,
+    TokenBucketLimiter,
+)
+
+
+def _controller(**kwargs) -> AdmissionController:
+    options = dict(rate_per_ip=0, burst_per_ip=1, max_in_flight=2, max_queue=1, queue_timeout=0.05)
+    options.update(kwargs)
+    return AdmissionController(**options)
+
+
+def test_token_bucket_refills():
+    limiter = TokenBucketLimiter(rate=2, burst=3)
+    assert [limiter.acquire("a", now=0.0) for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire("a", now=0.0) == pytest.approx(0.5)
+    # 他のIPアドレスは影響を受けない
+    assert limiter.acquire("b", now=0.0) == 0
+    assert limiter.acquire("a", now=1.0) == 0
+
+
+def test_token_bucket_is_bounded():
+    limiter = TokenBucketLimiter(rate=1, burst=1, max_keys=2)
+    for key in ("a", "b", "c"):
+        limiter.acquire(key, now=0.0)
+    assert len(limiter) == 2
+    # 削除されたIPアドレスは満杯のバケットから再開する
+    assert limiter.acquire("a", now=0.0) == 0
+    assert limiter.acquire("c", now=0.0) > 0
+
+
+async def test_rate_limit_rejects_with_429():
+    controller = _controller(rate_per_ip=1, burst_per_ip=1)
+    await controller.acquire("10.0.0.1")
+    controller.release()
+    with pytest.raises(AdmissionRejected) as excinfo:
+        await controller.acquire("10.0.0.1")
+    assert excinfo.value.status_code == 429 and excinfo.value.retry_after > 0
+    assert controller.metrics()["rate_limited"] == 1
+
+
+async def test_queue_sheds_and_times_out():
+    controller = _controller()
+    await controller.acquire("a")
+    await controller.acquire("b")
+    waiter = asyncio.ensure_future(controller.acquire("c"))
+    await asyncio.sleep(0)
+    assert controller.waiting == 1
+
+    # 待ち行列が満杯
+    with pytest.raises(AdmissionRejected) as excinfo:
+        await controller.acquire("d")
+    assert excinfo.value.status_code == 503
+
+    # 待ち時間を超えた
+    with pytest.raises(AdmissionRejected):
+        await waiter
+    metrics = controller.metrics()
+    assert (metrics["shed"], metrics["timed_out"], metrics["waiting"]) == (1, 1, 0)
+
+
+async def test_waiting_request_gets_released_slot():
+    controller = _controller(queue_timeout=1.0)
+    await controller.acquire("a")
+    await controller.acquire("b")
+    waiter = asyncio.ensure_future(controller.acquire("c"))
+    await asyncio.sleep(0)
+    controller.release()
+    await waiter
+    assert (controller.in_flight, controller.waiting, controller.admitted) == (2, 0, 3)
+
+
+@pytest.mark.parametrize("client, headers, expected", [
+    ("203.0.113.5", {"x-forwarded-for": "1.2.3.4"}, "203.0.113.5"),
+    ("10.0.0.254", {"x-forwarded-for": "1.2.3.4, 198.51.100.7"}, "198.51.100.7"),
+    ("10.0.0.254", {"x-real-ip": "198.51.100.8"}, "198.51.100.8"),
+    ("10.0.0.254", {}, "10.0.0.254"),
+])
+def test_client_address_trusts_only_known_proxies(client, headers, expected):
+    controller = _controller(trusted_proxies=["10.0.0.254"])
+    scope = {
+        "type": "http",
+        "client": (client, 1234),
+        "headers": [(name.encode(), value.encode()) for name, value in headers.items()],
+    }
+    assert controller.client_address(scope) == expected
+
+
+def test_middleware_rejects_with_retry_after():
+    controller = _controller(rate_per_ip=1, burst_per_ip=1)
+
+    async def endpoint(request):
+        return PlainTextResponse("ok")
+
+    app = Starlette(routes=[
+        Route("/face/verify", endpoint, methods=["GET", "POST"]),
+        Route("/other", endpoint, methods=["POST"]),
+    ])
+    app.add_middleware(AdmissionMiddleware, controller=controller, paths=["/face"])
+    client = TestClient(app)
+
+    assert client.post("/face/verify").status_code == 200
+    response = client.post("/face/verify")
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    # 対象外のメソッドとパス
+    assert client.get("/face/verify").status_code == 200
+    assert client.post("/other").status_code == 200
+    assert controller.in_flight == 0
+
+
+async def test_separate_controllers_do_not_share_slots():
+    face = _controller(max_in_flight=1, max_queue=1)
+    imports = _controller(max_in_flight=1, max_queue=0)
+
+    # 一括インポートが処理枠を保持していても、顔認識の処理枠は空いている
+    await imports.acquire("admin")
+    await face.acquire("a")
+    face.release()
+
+    # 待ち行列の無い制御は、処理枠が埋まっていれば待たずに拒否する
+    with pytest.raises(AdmissionRejected) as excinfo:
+        await imports.acquire("admin")
+    assert excinfo.value.status_code == 503
+    imports.release()
+    await imports.acquire("admin")
+    assert (imports.shed, face.in_flight) == (1, 0)
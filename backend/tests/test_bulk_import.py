@@ -0,0 +1,71 @@
+"""
+一括インポートのテスト：アーカイブ内の画像サイズの確認と共有プロセスプールでのハッシュ化。
+"""
+
+import importlib
+import io
+import zipfile
+
+from faceapi.core import _CONFIG_
+from faceapi.utils import HashQueueFull
+
+bulk_import = importlib.import_module("faceapi.services.bulk_import")
+
+
+def _archive(members: dict) -> zipfile.ZipFile:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return zipfile.ZipFile(buffer)
+
+
+def test_oversized_member_is_not_extracted(monkeypatch):
+    monkeypatch.setattr(_CONFIG_, "MAX_UPLOAD_SIZE", 1024)
+    archive = _archive({"bomb.jpg": b"\0" * (1024 * 1024), "small.jpg": b"not an image"})
+    monkeypatch.setattr(archive, "read", lambda *args: (_ for _ in ()).throw(AssertionError("extracted")))
+    assert bulk_import._load_face(archive, "bomb.jpg") == (None, None, "Image is too large")
+    assert bulk_import._load_face(archive, "missing.jpg") == (None, None, "Image not found in archive")
+
+
+def test_corrupted_member_is_a_row_error(monkeypatch):
+    archive = _archive({"face.jpg": b"x" * 4096})
+    # 宣言されたサイズと内容が一致しない（CRC エラー）
+    archive.getinfo("face.jpg").CRC ^= 1
+    assert bulk_import._load_face(archive, "face.jpg") == (None, None, "Invalid image file")
+
+
+class _MemoryUsers:
+    def __init__(self):
+        self.records = []
+
+    async def bulk_create_users(self, records):
+        self.records.extend(records)
+        return list(records)
+
+
+async def test_passwords_are_hashed_in_shared_pool_with_retry(monkeypatch):
+    calls = []
+
+    async def hash_password_async(password):
+        calls.append(password)
+        if len(calls) == 1:
+            raise HashQueueFull(retry_after=0)
+        return f"hashed:{password}"
+
+    monkeypatch.setattr(bulk_import, "hash_password_async", hash_password_async)
+    sql_instance = _MemoryUsers()
+    importer = bulk_import.BulkImporter(sql_instance, batch_size=2, hash_workers=1)
+    rows = iter([
+        (1, {"username": "alice", "email": "alice@example.com", "password": "Secret123"}),
+        (2, {"username": "bob", "email": "bob@example.com", "password": "Secret456"}),
+        (3, {"username": "carol", "email": "carol@example.com", "password": "Secret789"}),
+    ])
+    results = [result async for result in importer.run(rows)]
+
+    assert results[-1].finished and results[-1].created_count == 3
+    assert [record["hashed_password"] for record in sql_instance.records] == [
+        "hashed:Secret123", "hashed:Secret456", "hashed:Secret789"
+    ]
+    # 待ち行列が満杯の場合は失敗せずに再試行する
+    assert calls[:2] == ["Secret123", "Secret123"]
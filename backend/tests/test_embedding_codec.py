@@ -0,0 +1,56 @@
+"""
+嵌入向量编解码的测试。
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+from faceapi.db.embedding_codec import (
+    EMBEDDING_DTYPE,
+    as_embedding,
+    decode_embedding,
+    encode_embedding,
+    is_legacy_embedding,
+)
+
+
+@pytest.fixture
+def embedding():
+    vector = np.random.default_rng(0).standard_normal(64).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_bytes_round_trip(embedding):
+    data = encode_embedding(embedding)
+    assert len(data) == embedding.size * EMBEDDING_DTYPE.itemsize
+    assert not is_legacy_embedding(data)
+    decoded = decode_embedding(data)
+    np.testing.assert_array_equal(decoded, embedding)
+    # 字节串输入时为零拷贝的只读视图
+    assert not decoded.flags.writeable
+
+
+@pytest.mark.parametrize("wrap", [lambda v: v.tolist(), lambda v: json.dumps(v.tolist()),
+                                  lambda v: json.dumps(v.tolist()).encode()])
+def test_legacy_json_is_decoded(embedding, wrap):
+    legacy = wrap(embedding)
+    assert is_legacy_embedding(legacy)
+    np.testing.assert_array_equal(decode_embedding(legacy), embedding)
+
+
+def test_as_embedding_normalizes_shape_and_dtype(embedding):
+    assert as_embedding(None) is None
+    assert encode_embedding(None) is None
+    # 已是 float32 数组时返回视图
+    assert np.shares_memory(as_embedding(embedding.reshape(1, -1)), embedding)
+    converted = as_embedding(embedding.astype(np.float64).reshape(8, 8))
+    assert converted.dtype == EMBEDDING_DTYPE and converted.shape == (64,)
+
+
+def test_invalid_input_is_rejected():
+    with pytest.raises(ValueError):
+        as_embedding(b"\x00" * 7)
+    with pytest.raises(TypeError):
+        as_embedding(object())
@@ -0,0 +1,68 @@
+"""
+バッチ認識のリクエストボディとサイズ上限のテスト。
+"""
+
+import base64
+import importlib
+import json
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from faceapi.core import _CONFIG_
+from faceapi.schemas import FaceRecognitionRequest
+
+# faceapi.routes / faceapi.services はモジュールと同名のルーター・関数を公開するため、モジュールを直接取得する
+face_routes = importlib.import_module("faceapi.routes.face")
+face_services = importlib.import_module("faceapi.services.face")
+
+
+def _client(monkeypatch, max_bytes: int) -> TestClient:
+    monkeypatch.setattr(_CONFIG_, "FACE_BATCH_MAX_BYTES", max_bytes)
+    app = FastAPI()
+
+    @app.post("/batch")
+    async def batch(requests=Depends(face_routes.get_batch_requests)):
+        return [len(request.image_data) for request in requests]
+
+    return TestClient(app)
+
+
+def test_batch_body_is_parsed(monkeypatch):
+    client = _client(monkeypatch, 1024)
+    response = client.post("/batch", json=[{"image_data": "abcd"}, {"image_data": "ef"}])
+    assert response.status_code == 200
+    assert response.json() == [4, 2]
+
+
+def test_batch_body_over_limit_is_rejected(monkeypatch):
+    client = _client(monkeypatch, 64)
+    body = json.dumps([{"image_data": "a" * 100}])
+    assert client.post("/batch", content=body).status_code == 413
+
+    # Content-Length が無い（チャンク転送の）場合も読み込みの途中で拒否する
+    chunks = (body[i:i + 16].encode() for i in range(0, len(body), 16))
+    assert client.post("/batch", content=chunks).status_code == 413
+
+
+def test_invalid_batch_body_does_not_echo_input(monkeypatch):
+    client = _client(monkeypatch, 1024)
+    response = client.post("/batch", json=[{"image_format": "x" * 100}])
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", 0, "image_data"]
+    assert "x" * 100 not in response.text
+    assert client.post("/batch", content=b"not json").status_code == 422
+
+
+def test_oversized_image_is_not_decoded(monkeypatch):
+    monkeypatch.setattr(_CONFIG_, "MAX_UPLOAD_SIZE", 30)
+    decoded = []
+    monkeypatch.setattr(face_services, "base64_to_image", lambda data: decoded.append(data))
+
+    image_data = base64.b64encode(b"x" * 31).decode()
+    error, face, _ = face_services._decode_and_detect_request(FaceRecognitionRequest(image_data=image_data))
+    assert (error, face, decoded) == ("Image data is too large", None, [])
+
+    image_data = base64.b64encode(b"x" * 30).decode()
+    error, _, _ = face_services._decode_and_detect_request(FaceRecognitionRequest(image_data=image_data))
+    assert error == "Invalid image data" and len(decoded) == 1
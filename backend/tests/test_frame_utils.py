@@ -0,0 +1,54 @@
+"""
+フレーム類似度フィルターのテスト。
+"""
+
+import threading
+
+import numpy as np
+
+from faceapi.utils.frame_utils import FrameSimilarityFilter, dhash, hamming_distance
+
+
+def test_dhash_of_similar_frames():
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, (120, 160, 3), dtype=np.uint8)
+    noisy = np.clip(frame.astype(np.int16) + rng.integers(-2, 3, frame.shape), 0, 255).astype(np.uint8)
+    assert hamming_distance(dhash(frame), dhash(frame)) == 0
+    assert hamming_distance(dhash(frame), dhash(noisy)) <= 4
+    assert hamming_distance(dhash(frame), dhash(255 - frame)) > 4
+
+
+def test_lookup_within_distance_and_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("faceapi.utils.frame_utils.time.monotonic", lambda: now[0])
+    frame_filter = FrameSimilarityFilter(max_distance=1, ttl=2.0)
+    assert frame_filter.lookup(0b1010) is FrameSimilarityFilter.MISS
+
+    frame_filter.store(0b1010, "feature")
+    assert frame_filter.lookup(0b1011) == "feature"
+    assert frame_filter.lookup(0b0101) is FrameSimilarityFilter.MISS
+    now[0] += 3
+    assert frame_filter.lookup(0b1010) is FrameSimilarityFilter.MISS
+    assert (frame_filter.hits, frame_filter.misses) == (1, 3)
+
+    frame_filter.store(0b1010, None)
+    assert frame_filter.lookup(0b1010) is None
+    frame_filter.clear()
+    assert frame_filter.lookup(0b1010) is FrameSimilarityFilter.MISS
+
+
+def test_concurrent_lookup_and_store():
+    frame_filter = FrameSimilarityFilter(max_distance=0, ttl=60.0)
+
+    def worker(value: int):
+        for _ in range(2000):
+            if frame_filter.lookup(value) is FrameSimilarityFilter.MISS:
+                frame_filter.store(value, value)
+
+    threads = [threading.Thread(target=worker, args=(value,)) for value in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # 統計はロックの下で更新されるため、取りこぼしが無い
+    assert frame_filter.hits + frame_filter.misses == 8000
@@ -0,0 +1,95 @@
+"""
+人脸库导出格式的测试：编码后按任意字节块读回，以及对异常输入的拒绝。
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+from faceapi.db.gallery import encode_chunk, encode_end, encode_header, read_gallery
+
+EMB_DIM = 4
+
+
+def _users(count: int, rng):
+    return [
+        (
+            {
+                "id": i, "username": f"user{i}", "email": f"user{i}@example.com",
+                "full_name": f"ユーザー{i}", "hashed_password": "x", "is_active": True,
+                "is_admin": False, "head_pic": None, "created_at": 1700000000.0 + i,
+                "updated_at": None,
+            },
+            rng.standard_normal(EMB_DIM).astype(np.float32) if i % 2 else None,
+        )
+        for i in range(count)
+    ]
+
+
+def _bundle(chunks) -> bytes:
+    return encode_header(EMB_DIM) + b"".join(encode_chunk(chunk, EMB_DIM) for chunk in chunks) + encode_end()
+
+
+async def _stream(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def _read(data: bytes, size: int = 7, **kwargs):
+    return [chunk async for chunk in read_gallery(_stream(data, size), **kwargs)]
+
+
+@pytest.mark.parametrize("size", [1, 7, 4096])
+async def test_round_trip(size):
+    users = _users(10, np.random.default_rng(0))
+    chunks = await _read(_bundle([users[:4], users[4:]]), size)
+    assert [len(chunk) for chunk in chunks] == [4, 6]
+    for (record, embedding), (user, expected) in zip(sum(chunks, []), users):
+        assert record["username"] == user["username"]
+        assert record["full_name"] == user["full_name"]
+        assert isinstance(record["created_at"], str)
+        if expected is None:
+            assert embedding is None
+        else:
+            np.testing.assert_array_equal(embedding, expected)
+
+
+async def test_truncated_bundle_is_rejected():
+    data = _bundle([_users(6, np.random.default_rng(0))])
+    with pytest.raises(ValueError):
+        await _read(data[:-len(encode_end())])
+    with pytest.raises(ValueError):
+        await _read(data[:-len(encode_end()) - 3])
+
+
+async def test_dimension_mismatch_is_rejected():
+    data = _bundle([_users(2, np.random.default_rng(0))])
+    assert len(await _read(data, expected_dim=EMB_DIM)) == 1
+    with pytest.raises(ValueError, match="does not match"):
+        await _read(data, expected_dim=EMB_DIM * 2)
+    with pytest.raises(ValueError):
+        encode_chunk([(_users(1, np.random.default_rng(0))[0][0], np.zeros(EMB_DIM + 1))], EMB_DIM)
+
+
+@pytest.mark.parametrize("header", [
+    {"format": "other", "version": 1, "dim": EMB_DIM},
+    {"format": "faceapi-gallery", "version": 2, "dim": EMB_DIM},
+    {"format": "faceapi-gallery", "version": 1, "dim": 0},
+    {"format": "faceapi-gallery", "version": 1, "dim": EMB_DIM, "dtype": "<f8"},
+])
+async def test_unsupported_header_is_rejected(header):
+    data = json.dumps(header).encode() + b"\n" + encode_end()
+    with pytest.raises(ValueError):
+        await _read(data)
+
+
+async def test_inconsistent_chunk_is_rejected():
+    users = _users(4, np.random.default_rng(0))
+    chunk = encode_chunk(users, EMB_DIM)
+    _, rest = chunk.split(b"\n", 1)
+    forged = json.dumps({"users": 4, "embeddings": 1}).encode() + b"\n" + rest
+    with pytest.raises(ValueError, match="mismatch"):
+        await _read(encode_header(EMB_DIM) + forged + encode_end())
+    with pytest.raises(ValueError):
+        await _read(encode_header(EMB_DIM) + b"x" * (2 * 1024 * 1024))
@@ -0,0 +1,293 @@
+"""
+MemorySqlManager 的索引一致性测试。
+
+每次修改之后，用户名、邮箱、位图、N-gram 和向量索引都应与对用户表的全量扫描一致。
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+from faceapi.db.memory_managers import (
+    TEXT_SEARCH_FIELDS,
+    MemorySqlManager,
+    estimate_user_bytes,
+)
+from faceapi.db.ngram_index import NgramIndex
+
+EMB_DIM = 8
+
+
+class RecordingJournal:
+    """收集修改记录的日志（接口与 SessionJournal 相同），用于重放"""
+
+    def __init__(self):
+        self.records = []
+        self._pending = []
+
+    async def begin(self, manager):
+        self._pending = []
+
+    def append(self, record, embedding=None):
+        self._pending.append((record, embedding))
+
+    async def commit(self):
+        self.records.extend(self._pending)
+        self._pending = []
+
+    def rollback(self):
+        self._pending = []
+
+
+def assert_consistent(manager: MemorySqlManager, embeddings: dict):
+    """将各索引与全量扫描的结果比较"""
+    users = manager.users
+    assert manager._username_index == {user.username: user_id for user_id, user in users.items()}
+    assert manager._email_index == {
+        user.email.lower(): user_id for user_id, user in users.items() if user.email is not None
+    }
+
+    attr = manager._attr_index
+    assert attr.ids().tolist() == sorted(users)
+    for name, value_of in (
+        ("is_active", lambda user: user.is_active),
+        ("is_admin", lambda user: user.is_admin),
+        ("has_face", lambda user: user.head_pic is not None),
+    ):
+        for value in (True, False):
+            expected = sorted(user_id for user_id, user in users.items() if bool(value_of(user)) == value)
+            assert attr.ids(**{name: value}).tolist() == expected, (name, value)
+
+    for field in TEXT_SEARCH_FIELDS:
+        index = manager._text_index[field]
+        rebuilt = NgramIndex(index.n)
+        for user_id, user in users.items():
+            rebuilt.add(user_id, user[field])
+        assert index._texts == rebuilt._texts, field
+        assert index._postings == rebuilt._postings, field
+        for text in list(rebuilt._texts.values())[:20]:
+            for query in (text[:2], text[1:5], text[-4:]):
+                expected = {user_id for user_id, user in users.items()
+                            if user[field] is not None and query in user[field].lower()}
+                assert index.search(query) == expected, (field, query)
+
+    assert sorted(manager._vector_index._rows) == sorted(embeddings)
+    for user_id, embedding in embeddings.items():
+        stored = manager._vector_index.get(user_id)
+        assert np.allclose(stored / np.linalg.norm(stored), embedding / np.linalg.norm(embedding))
+
+    assert manager._record_bytes == sum(estimate_user_bytes(user) for user in users.values())
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
+
+
+@pytest.fixture
+def manager():
+    manager = MemorySqlManager()
+    manager.attach_journal(RecordingJournal())
+    return manager
+
+
+def _vector(rng):
+    return rng.standard_normal(EMB_DIM).astype(np.float32)
+
+
+async def test_create_and_duplicate_checks(manager, rng):
+    embeddings = {}
+    for i in range(20):
+        embedding = _vector(rng) if i % 3 else None
+        user = await manager.create_user(
+            username=f"user{i}", email=f"User{i}@Example.com", full_name=f"Full Name {i}",
+            hashed_password="x", is_admin=i % 5 == 0, head_pic=f"pic{i}" if i % 2 else None,
+            embedding=embedding,
+        )
+        if embedding is not None:
+            embeddings[user.id] = embedding
+    assert_consistent(manager, embeddings)
+
+    with pytest.raises(ValueError):
+        await manager.create_user(username="user1", email="new@example.com", hashed_password="x")
+    with pytest.raises(ValueError):
+        await manager.create_user(username="new", email="USER1@example.com", hashed_password="x")
+    assert_consistent(manager, embeddings)
+
+
+async def test_bulk_create_rejects_duplicates_within_batch(manager, rng):
+    created = await manager.bulk_create_users([
+        {"username": "a", "email": "a@x.com", "embedding": _vector(rng)},
+        {"username": "b", "email": "A@X.com"},
+        {"username": "a", "email": "c@x.com"},
+        {"username": "d", "email": None, "full_name": "Dee"},
+    ])
+    assert [user is not None for user in created] == [True, False, False, True]
+    assert_consistent(manager, {created[0].id: manager._vector_index.get(created[0].id)})
+
+
+async def test_update_and_rename(manager, rng):
+    first = await manager.create_user(username="alice", email="alice@x.com", full_name="Alice A")
+    second = await manager.create_user(username="bob", email="bob@x.com", embedding=_vector(rng))
+    embeddings = {second.id: manager._vector_index.get(second.id)}
+
+    assert await manager.update_user(first.id, username="alicia", email="Alicia@X.com",
+                                     full_name="Alicia B", is_active=False, head_pic="p")
+    assert await manager.update_user(first.id, username="alicia")  # 改为自己的用户名
+    embeddings[first.id] = _vector(rng)
+    assert await manager.update_user(first.id, embedding=embeddings[first.id])
+    assert await manager.update_user(second.id, embedding=None)
+    del embeddings[second.id]
+    assert_consistent(manager, embeddings)
+
+    # 旧的用户名和邮箱可以被其他用户使用
+    await manager.create_user(username="alice", email="alice@x.com")
+    with pytest.raises(ValueError):
+        await manager.update_user(second.id, username="alicia")
+    with pytest.raises(ValueError):
+        await manager.update_user(second.id, email="ALICIA@x.com")
+    assert_consistent(manager, embeddings)
+
+    result = await manager.filter(username="bob")
+    assert await result.update(full_name="Robert", is_admin=True) == 1
+    assert not await manager.update_user(999, full_name="nobody")
+    assert_consistent(manager, embeddings)
+
+
+async def test_bulk_update(manager, rng):
+    created = await manager.bulk_create_users([
+        {"username": f"u{i}", "email": f"u{i}@x.com", "head_pic": f"p{i}", "embedding": _vector(rng)}
+        for i in range(30)
+    ])
+    ids = [user.id for user in created]
+    embeddings = {user_id: manager._vector_index.get(user_id) for user_id in ids}
+
+    # 只涉及位图字段
+    outcomes = await manager.bulk_update(ids[:10] + [999], is_active=False, is_admin=True)
+    assert outcomes[999] is False and all(outcomes[user_id] for user_id in ids[:10])
+    assert_consistent(manager, embeddings)
+
+    # 清除人脸（头像和嵌入向量）
+    await manager.bulk_update(ids[5:15], head_pic=None, embedding=None)
+    for user_id in ids[5:15]:
+        del embeddings[user_id]
+    assert_consistent(manager, embeddings)
+
+    # 涉及文本字段
+    await manager.bulk_update(ids[20:], full_name="Same Name")
+    await manager.bulk_update([ids[0]], username="renamed", email="renamed@x.com")
+    assert_consistent(manager, embeddings)
+
+    with pytest.raises(ValueError):
+        await manager.bulk_update(ids[:2], username="clash")
+    with pytest.raises(ValueError):
+        await manager.bulk_update(ids[:2], embedding=_vector(rng))
+    assert_consistent(manager, embeddings)
+
+
+async def test_delete(manager, rng):
+    created = await manager.bulk_create_users([
+        {"username": f"u{i}", "email": f"u{i}@x.com", "embedding": _vector(rng) if i % 2 else None}
+        for i in range(20)
+    ])
+    ids = [user.id for user in created]
+    embeddings = {user_id: manager._vector_index.get(user_id) for user_id in ids if user_id in manager._vector_index}
+
+    assert await manager.delete_user(ids[1])
+    assert not await manager.delete_user(ids[1])
+    outcomes = await manager.bulk_delete(ids[2:8] + [999])
+    assert outcomes[999] is False
+    result = await manager.filter(username="u10")
+    assert await result.delete() == 1
+    for user_id in [ids[1], *ids[2:8], ids[10]]:
+        embeddings.pop(user_id, None)
+    assert_consistent(manager, embeddings)
+
+    # 删除后可以重新使用用户名和邮箱
+    await manager.create_user(username="u1", email="U1@x.com")
+    assert_consistent(manager, embeddings)
+
+
+async def test_random_operations_replay_snapshot_and_clone(manager):
+    random_state = random.Random(1)
+    rng = np.random.default_rng(1)
+    embeddings = {}
+    names = [f"name{i}" for i in range(40)]
+    for _ in range(400):
+        op = random_state.random()
+        ids = list(manager.users)
+        try:
+            if op < 0.35 or not ids:
+                embedding = _vector(rng) if random_state.random() < 0.5 else None
+                user = await manager.create_user(
+                    username=random_state.choice(names), email=f"{random_state.choice(names)}@X.com",
+                    full_name=random_state.choice([None, "Mary Ann", "John Doe"]),
+                    head_pic=random_state.choice([None, "a", "b"]), embedding=embedding,
+                )
+                if embedding is not None:
+                    embeddings[user.id] = embedding
+            elif op < 0.6:
+                user_id = random_state.choice(ids)
+                update = random_state.choice([
+                    {"username": random_state.choice(names)},
+                    {"email": f"{random_state.choice(names)}@x.com"},
+                    {"full_name": random_state.choice([None, "Zed"]), "is_active": False},
+                    {"head_pic": random_state.choice([None, "c"]), "is_admin": True},
+                    {"embedding": None},
+                    {"embedding": _vector(rng)},
+                ])
+                await manager.update_user(user_id, **update)
+                if "embedding" in update:
+                    if update["embedding"] is None:
+                        embeddings.pop(user_id, None)
+                    else:
+                        embeddings[user_id] = update["embedding"]
+            elif op < 0.75:
+                chosen = random_state.sample(ids, min(len(ids), 5))
+                update = random_state.choice([
+                    {"is_active": True}, {"full_name": "Bulk"}, {"head_pic": None, "embedding": None},
+                ])
+                await manager.bulk_update(chosen, **update)
+                if "embedding" in update:
+                    for user_id in chosen:
+                        embeddings.pop(user_id, None)
+            elif op < 0.9:
+                user_id = random_state.choice(ids)
+                await manager.delete_user(user_id)
+                embeddings.pop(user_id, None)
+            else:
+                chosen = random_state.sample(ids, min(len(ids), 3))
+                await manager.bulk_delete(chosen)
+                for user_id in chosen:
+                    embeddings.pop(user_id, None)
+        except ValueError:
+            pass
+    assert_consistent(manager, embeddings)
+
+    replica = MemorySqlManager()
+    replica.replay(manager._journal.records)
+    assert {user_id: dict(user) for user_id, user in replica.users.items()} == \
+        {user_id: dict(user) for user_id, user in manager.users.items()}
+    assert_consistent(replica, embeddings)
+
+    assert_consistent(MemorySqlManager.from_snapshot(manager.snapshot()), embeddings)
+    clone = manager.clone()
+    assert_consistent(clone, embeddings)
+    # 副本的修改不影响原管理器
+    await clone.bulk_delete(list(clone.users)[:3])
+    assert_consistent(manager, embeddings)
+
+
+async def test_replay_skips_duplicate_create(manager, rng):
+    embedding = _vector(rng)
+    first = await manager.create_user(username="a", email="a@x.com", head_pic="pic", embedding=embedding)
+    await manager.create_user(username="b", email="b@x.com")
+
+    # 写入失败后重试的 create 记录在日志中出现两次
+    records = manager._journal.records
+    replica = MemorySqlManager()
+    assert replica.replay([records[0], records[0], records[1]]) == 3
+    assert sorted(replica.users) == sorted(manager.users)
+    assert replica.next_id == manager.next_id
+    assert_consistent(replica, {first.id: embedding})
@@ -0,0 +1,74 @@
+"""
+NgramIndex 的测试：查询结果应与对所有文本的子串扫描一致。
+"""
+
+import random
+import string
+
+from faceapi.db.ngram_index import NgramIndex
+
+
+def scan(texts: dict, query: str) -> set:
+    return {item_id for item_id, text in texts.items() if text is not None and query.lower() in text.lower()}
+
+
+def test_search_matches_scan():
+    rng = random.Random(0)
+    texts = {
+        item_id: "".join(rng.choices("abcAB", k=rng.randint(0, 12)))
+        for item_id in range(1, 300)
+    }
+    index = NgramIndex()
+    for item_id, text in texts.items():
+        index.add(item_id, text)
+
+    for _ in range(200):
+        query = "".join(rng.choices("abAB", k=rng.randint(1, 6)))
+        assert index.search(query) == scan(texts, query), query
+
+
+def test_grams_present_but_not_contiguous():
+    index = NgramIndex()
+    index.add(1, "abcxbcd")
+    index.add(2, "abcd")
+    # abc 和 bcd 都出现在 1 中，但 abcd 只出现在 2 中
+    assert index.search("abcd") == {2}
+    assert index.search("ABC") == {1, 2}
+
+
+def test_short_query_scans_candidates():
+    index = NgramIndex()
+    index.add(1, "alice")
+    index.add(2, "bob")
+    index.add(3, "carol")
+    assert index.search("o") == {2, 3}
+    assert index.search("o", candidates=[1, 2]) == {2}
+    # 不在索引中的候选被忽略
+    assert index.search("o", candidates=[2, 99]) == {2}
+
+
+def test_replace_and_remove():
+    index = NgramIndex()
+    index.add(1, "alice")
+    index.add(1, "bob")
+    assert index.search("ali") == set()
+    assert index.search("bob") == {1}
+    index.add(1, None)
+    assert len(index) == 0
+    assert index.search("bob") == set()
+    assert index.remove(1) is False
+    # 移除最后一个 ID 时删除空的倒排表
+    assert index._postings == {}
+
+
+def test_copy_is_independent():
+    index = NgramIndex()
+    for item_id, name in enumerate(string.ascii_lowercase, start=1):
+        index.add(item_id, name * 4)
+    clone = index.copy()
+    index.remove(1)
+    index.add(2, "zzzz")
+    assert clone.search("aaa") == {1}
+    assert clone.search("bbb") == {2}
+    assert index.search("aaa") == set()
+    assert index.search("zzz") == {2, 26}
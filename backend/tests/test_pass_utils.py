@@ -0,0 +1,72 @@
+"""
+パスワードユーティリティのテスト。
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from faceapi.hash_worker import build_context
+from faceapi.utils import pass_utils
+from faceapi.utils.pass_utils import HashQueueFull, is_valid_password
+
+
+def test_hash_and_verify():
+    context = build_context("sha256_crypt", 1000)
+    hashed = context.hash("Secret123")
+    assert hashed.startswith("$5$rounds=1000$")
+    assert context.verify("Secret123", hashed)
+    assert not context.verify("secret123", hashed)
+
+
+def test_legacy_and_weak_hashes_are_rehashed():
+    legacy = build_context("pbkdf2_sha256", 1000).hash("Secret123")
+    weak = build_context("sha256_crypt", 1000).hash("Secret123")
+    context = build_context("sha256_crypt", 2000)
+
+    # 設定以外のスキームやラウンド数が少ないハッシュも検証でき、設定のスキームで再ハッシュされる
+    for hashed in (legacy, weak):
+        valid, new_hash = context.verify_and_update("Secret123", hashed)
+        assert valid and new_hash.startswith("$5$rounds=2000$")
+        assert context.verify_and_update("Secret123", new_hash) == (True, None)
+    assert context.verify_and_update("Wrong123", legacy) == (False, None)
+
+
+async def test_async_versions_run_in_process_pool():
+    try:
+        hashed = await pass_utils.hash_password_async("Secret123")
+        assert await pass_utils.verify_password_async("Secret123", hashed)
+        assert await pass_utils.verify_and_update_password_async("Secret123", hashed) == (True, None)
+        assert not await pass_utils.verify_password_async("Wrong123", hashed)
+    finally:
+        pass_utils.shutdown_hash_executor()
+
+
+async def test_full_queue_fails_fast(monkeypatch):
+    try:
+        executor, _ = pass_utils._get_hash_executor()
+        slots = threading.BoundedSemaphore(1)
+        monkeypatch.setattr(pass_utils, "_get_hash_executor", lambda: (executor, slots))
+        hashed = pass_utils.hash_password("Secret123")
+
+        first = asyncio.create_task(pass_utils.verify_password_async("Secret123", hashed))
+        await asyncio.sleep(0)
+        with pytest.raises(HashQueueFull) as excinfo:
+            await pass_utils.verify_password_async("Secret123", hashed)
+        assert excinfo.value.retry_after > 0
+
+        # 投入枠はタスクの完了時に解放される
+        assert await first
+        assert await pass_utils.verify_password_async("Secret123", hashed)
+    finally:
+        pass_utils.shutdown_hash_executor()
+
+
+def test_is_valid_password():
+    assert is_valid_password("Secret123")
+    assert not is_valid_password("Sec123")
+    assert not is_valid_password("secret123")
+    assert not is_valid_password("SECRET123")
+    assert not is_valid_password("SecretPass")
+    assert is_valid_password("Sec123", min_length=6)
@@ -0,0 +1,106 @@
+"""
+SessionManager 的内存预算测试：超出预算的会话转存到快照并在下次访问时恢复，
+快照只在会话过期或被删除时删除。
+"""
+
+import asyncio
+
+import pytest
+
+from faceapi.core import session as session_module
+from faceapi.core.session import SessionManager
+from faceapi.db.memory_managers import MemorySqlManager
+from faceapi.db.snapshot import SnapshotStore
+
+pytestmark = pytest.mark.skipif(not session_module.CACHE_AVAILABLE, reason="cachetools is not installed")
+
+
+async def _new_manager(**_):
+    return MemorySqlManager()
+
+
+@pytest.fixture(params=[True, False], ids=["wal", "no-wal"])
+def sessions(request, tmp_path, monkeypatch):
+    config = session_module._CONFIG_
+    monkeypatch.setattr(config, "SESSION_MEMORY_BUDGET", 400 * 1024)
+    monkeypatch.setattr(config, "SESSION_ID_EXPIRE_SECONDS", 60)
+    monkeypatch.setattr(config, "ENABLE_WAL", request.param)
+    monkeypatch.setattr(session_module, "_SNAPSHOT_STORE_", SnapshotStore(str(tmp_path)))
+    monkeypatch.setattr(session_module, "_SESSION_STORE_", None)
+    monkeypatch.setattr(session_module, "create_sql_manager", _new_manager)
+    return SessionManager()
+
+
+async def _fill(sessions: SessionManager, ip_address: str, count: int):
+    sql_instance = await sessions.get_sql_instance(ip_address)
+    await sql_instance.bulk_create_users([
+        {"username": f"{ip_address}-{i}", "email": f"{i}@{ip_address}", "hashed_password": "x" * 77}
+        for i in range(count)
+    ])
+    # 下一次访问时计入内存占用
+    return await sessions.get_sql_instance(ip_address)
+
+
+async def test_evicted_session_is_restored(sessions):
+    assert await sessions.create_session("10.0.0.1")
+    first = await _fill(sessions, "10.0.0.1", 150)
+    await first.update_user(2, full_name="Alice")
+    assert await sessions.create_session("10.0.0.2")
+    await _fill(sessions, "10.0.0.2", 150)
+
+    memory = sessions.get_memory_summary()
+    assert memory["evictions"] == 1 and memory["spilled_sessions"] == 1
+    # 被驱逐的会话仍然存在
+    assert await sessions.create_session("10.0.0.1") is None
+    assert await sessions.get_active_session_count() == 2
+
+    restored = await sessions.get_sql_instance("10.0.0.1")
+    assert restored is not None and restored is not first
+    assert len(restored.users) == len(first.users)
+    assert restored.users[2].full_name == "Alice"
+    # 恢复的会话可以继续修改，之后再次被驱逐和恢复
+    await restored.update_user(3, full_name="Bob")
+    await sessions.get_sql_instance("10.0.0.2")
+    again = await sessions.get_sql_instance("10.0.0.1")
+    assert again.users[3].full_name == "Bob"
+    assert sessions.get_memory_summary()["restored_sessions"] >= 2
+
+
+async def test_spilled_session_keeps_lifetime(sessions):
+    created = await sessions.create_session("10.0.0.1")
+    await _fill(sessions, "10.0.0.1", 150)
+    assert await sessions.create_session("10.0.0.2")
+    await _fill(sessions, "10.0.0.2", 150)
+
+    restored = await sessions.get_session_by_ip("10.0.0.1")
+    assert (restored.created_at, restored.expires_at) == (created.created_at, created.expires_at)
+
+
+async def test_expired_or_deleted_spilled_session_is_removed(sessions, monkeypatch):
+    store = session_module._SNAPSHOT_STORE_
+    for ip_address in ("10.0.0.1", "10.0.0.2", "10.0.0.3"):
+        assert await sessions.create_session(ip_address)
+        await _fill(sessions, ip_address, 150)
+    assert sessions.get_memory_summary()["spilled_sessions"] == 2
+    await sessions._wait_for_spills()
+    assert store.load_key("10.0.0.1") is not None
+
+    assert await sessions.delete_session("10.0.0.1")
+    assert store.load_key("10.0.0.1") is None
+    assert await sessions.get_sql_instance("10.0.0.1") is None
+
+    # 过期后由清理任务删除快照（缓存中的会话使用创建缓存时的计时器，不受影响）
+    expires_at = sessions._spilled["10.0.0.2"][1]
+    monkeypatch.setattr(session_module.time, "time", lambda: expires_at + 1)
+    result = await sessions.sweep_expired_sessions()
+    assert result["expired_sessions"] == 1
+    assert store.load_key("10.0.0.2") is None
+    assert sessions.get_memory_summary()["spilled_sessions"] == 0
+
+
+async def test_session_larger_than_budget_is_discarded(sessions):
+    assert await sessions.create_session("10.0.0.1")
+    assert await _fill(sessions, "10.0.0.1", 600) is None
+    await asyncio.sleep(0)
+    assert sessions.get_memory_summary()["spilled_sessions"] == 0
+    assert session_module._SNAPSHOT_STORE_.load_key("10.0.0.1") is None
@@ -0,0 +1,138 @@
+"""
+共享会话存储的测试：会话表的操作，以及多个副本（模拟多个工作进程）通过日志保持一致。
+"""
+
+import time
+
+import pytest
+
+from faceapi.db.memory_managers import MemorySqlManager
+from faceapi.db.session_store import (
+    SessionJournal,
+    SessionRow,
+    SharedSessionStore,
+    pack_snapshot,
+    unpack_snapshot,
+)
+
+IP = "10.0.0.1"
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "sessions.sqlite3")
+
+
+@pytest.fixture
+def stores(path):
+    """两个连接同一文件的存储（各自的连接和专用线程，相当于两个工作进程）"""
+    stores = [SharedSessionStore(path), SharedSessionStore(path)]
+    yield stores
+    for store in stores:
+        store.close()
+
+
+def _replica(store: SharedSessionStore, ip_address: str = IP) -> MemorySqlManager:
+    """由存储中的快照和日志构建副本"""
+    session, snapshot, log = store.load(ip_address)
+    manager = MemorySqlManager.from_snapshot(snapshot) if snapshot is not None else MemorySqlManager()
+    manager.replay((record, embedding) for _, record, embedding in log)
+    seq = log[-1][0] if log else session.snapshot_seq
+    manager.attach_journal(SessionJournal(store, session, seq))
+    return manager
+
+
+def _usernames(manager: MemorySqlManager):
+    return sorted(user.username for user in manager.users.values())
+
+
+def test_session_lifecycle(path):
+    store = SharedSessionStore(path)
+    now = time.time()
+    assert store.create(IP, now, now + 60)
+    assert not store.create(IP, now + 1, now + 61)  # 已有未过期的会话
+    assert store.get(IP) == SessionRow(IP, now, now + 60, 0)
+    assert store.count_active(now) == 1
+
+    assert not store.delete(IP, created_at=now - 1)  # 不删除其他时间创建的会话
+    assert store.delete(IP, created_at=now)
+    assert store.get(IP) is None and not store.delete(IP)
+
+    # 过期的会话可以被替换，也会被 delete_expired() 删除
+    assert store.create(IP, now - 10, now - 5)
+    assert store.create(IP, now, now + 60)
+    assert store.create("10.0.0.2", now - 10, now - 5)
+    assert store.delete_expired(now) == 1
+    assert store.count_active(now) == 1
+    store.close()
+
+
+async def test_replicas_apply_each_others_changes(stores):
+    now = time.time()
+    assert stores[0].create(IP, now, now + 60, pack_snapshot(MemorySqlManager().snapshot()))
+    first, second = _replica(stores[0]), _replica(stores[1])
+
+    await first.create_user(username="alice", email="alice@x.com", hashed_password="x")
+    # 修改前先应用其他副本的修改，因此唯一性检查覆盖所有副本
+    with pytest.raises(ValueError):
+        await second.create_user(username="alice", email="other@x.com", hashed_password="x")
+    await second.create_user(username="bob", email="bob@x.com", hashed_password="x")
+    assert await first.journal.refresh(first)
+    assert _usernames(first) == _usernames(second) == ["alice", "bob"]
+    assert first.next_id == second.next_id
+
+    await second.update_user(1, full_name="Alice")
+    assert await first.journal.refresh(first)
+    assert first.users[1].full_name == "Alice"
+    assert _usernames(_replica(stores[0])) == ["alice", "bob"]
+
+
+async def test_snapshot_compaction(stores):
+    now = time.time()
+    stores[0].create(IP, now, now + 60, pack_snapshot(MemorySqlManager().snapshot()))
+    writer, reader = _replica(stores[0]), _replica(stores[1])
+    for i in range(5):
+        await writer.create_user(username=f"u{i}", email=f"u{i}@x.com", hashed_password="x")
+
+    seq = writer.journal.seq
+    assert stores[0].save_snapshot(IP, now, seq, pack_snapshot(writer.snapshot()))
+    assert not stores[0].save_snapshot(IP, now, seq, pack_snapshot(writer.snapshot()))
+    session, snapshot, log = stores[1].load(IP)
+    assert session.snapshot_seq == seq and log == []
+    assert len(snapshot.records) == len(writer.users)
+
+    # 上一代日志仍然保留，落后的副本可以追上
+    assert await reader.journal.refresh(reader)
+    assert _usernames(reader) == _usernames(writer)
+
+    # 落后两代时缺少日志，副本需要重新构建
+    stale = _replica(stores[1])
+    await writer.create_user(username="late", email="late@x.com", hashed_password="x")
+    stores[0].save_snapshot(IP, now, writer.journal.seq, pack_snapshot(writer.snapshot()))
+    await writer.create_user(username="later", email="later@x.com", hashed_password="x")
+    stores[0].save_snapshot(IP, now, writer.journal.seq, pack_snapshot(writer.snapshot()))
+    await writer.create_user(username="latest", email="latest@x.com", hashed_password="x")
+    assert not await stale.journal.refresh(stale)
+    assert _usernames(_replica(stores[1])) == _usernames(writer)
+
+
+async def test_write_to_deleted_session_fails(stores):
+    now = time.time()
+    stores[0].create(IP, now, now + 60, pack_snapshot(MemorySqlManager().snapshot()))
+    replica = _replica(stores[1])
+    assert stores[0].delete(IP)
+    with pytest.raises(LookupError):
+        await replica.create_user(username="ghost", email="ghost@x.com", hashed_password="x")
+    assert replica.journal.stale
+    # io_lock 已释放，回滚排在专用线程中之后的操作之前
+    assert not stores[1].io_lock.locked()
+    assert await stores[1].run(stores[1].create, IP, now + 1, now + 61)
+
+
+def test_pack_snapshot_round_trip():
+    manager = MemorySqlManager()
+    data = manager.snapshot()
+    restored = unpack_snapshot(*pack_snapshot(data))
+    assert restored.next_id == data.next_id
+    assert restored.records == data.records
+    assert restored.ids.tolist() == data.ids.tolist()
@@ -0,0 +1,111 @@
+"""
+SnapshotStore 的测试：快照的写入、恢复、预写日志段的压缩和清理。
+"""
+
+import numpy as np
+import pytest
+
+from faceapi.db.memory_managers import MemorySqlManager
+from faceapi.db.snapshot import SnapshotStore
+
+EMB_DIM = 8
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SnapshotStore(str(tmp_path / "snapshots"))
+
+
+async def _populate(manager: MemorySqlManager, count: int, offset: int = 0):
+    rng = np.random.default_rng(offset)
+    for i in range(offset, offset + count):
+        await manager.create_user(
+            username=f"user{i}", email=f"user{i}@example.com", full_name=f"User {i}",
+            hashed_password="x", head_pic=f"pic{i}" if i % 2 else None,
+            embedding=rng.standard_normal(EMB_DIM).astype(np.float32) if i % 3 else None,
+        )
+
+
+def _assert_same(restored: MemorySqlManager, source: MemorySqlManager):
+    assert restored.next_id == source.next_id
+    assert restored.users.keys() == source.users.keys()
+    for user_id, user in source.users.items():
+        assert restored.users[user_id] == user
+        expected = user["embedding"]
+        if expected is None:
+            assert restored.users[user_id]["embedding"] is None
+        else:
+            np.testing.assert_allclose(restored.users[user_id]["embedding"], expected)
+
+
+async def test_save_and_load(store):
+    source = MemorySqlManager()
+    await _populate(source, 20)
+    store.save("10.0.0.1", source.snapshot())
+
+    assert store.load_key("10.0.0.2") is None
+    restored = MemorySqlManager.from_snapshot(store.load_key("10.0.0.1"))
+    _assert_same(restored, source)
+    assert [key for key, _ in store.load_all()] == ["10.0.0.1"]
+
+    # 恢复后的管理器可以继续修改（矩阵为写时复制的 mmap）
+    await _populate(restored, 5, offset=100)
+    assert len(restored.users) == 25
+    assert store.load_key("10.0.0.1").next_id == source.next_id
+
+
+async def test_replacing_snapshot_removes_old_matrix(store):
+    manager = MemorySqlManager()
+    await _populate(manager, 5)
+    store.save("key", manager.snapshot())
+    await _populate(manager, 5, offset=5)
+    store.save("key", manager.snapshot())
+    assert len(list(store.root.glob("*.npy"))) == 1
+    assert len(MemorySqlManager.from_snapshot(store.load_key("key")).users) == 10
+
+
+async def test_wal_replay_after_snapshot(store):
+    source = MemorySqlManager()
+    source.attach_wal(store.open_wal("key"))
+    await _populate(source, 10)
+    store.save("key", source.snapshot())
+    await _populate(source, 10, offset=10)
+    await source.update_user(1, full_name="Renamed")
+    await source.delete_user(2)
+    source.wal.close()
+
+    data = store.load_key("key")
+    restored = MemorySqlManager.from_snapshot(data)
+    assert restored.replay(store.read_wal("key", data.wal_segment)) == 12
+    _assert_same(restored, source)
+
+    # 写入新快照后删除其已包含的日志段
+    store.save("key", restored.snapshot())
+    assert list(store.read_wal("key")) == []
+
+
+async def test_corrupted_snapshot_is_skipped(store):
+    manager = MemorySqlManager()
+    await _populate(manager, 3)
+    store.save("good", manager.snapshot())
+    store.save("bad", manager.snapshot())
+    bad = store.root / f"{store._name('bad')}.json"
+    bad.write_text('{"version": 999}', "utf-8")
+
+    assert [key for key, _ in store.load_all()] == ["good"]
+    with pytest.raises(ValueError):
+        store.load_key("bad")
+
+
+async def test_remove_and_prune(store):
+    manager = MemorySqlManager()
+    await _populate(manager, 3)
+    for key in ("a", "b", "c"):
+        store.save(key, manager.snapshot())
+    (store.root / "orphan.tmp").write_bytes(b"")
+
+    store.remove("a")
+    assert store.load_key("a") is None
+    assert store.prune({"b"}) == 1
+    assert [key for key, _ in store.load_all()] == ["b"]
+    assert sorted(path.suffix for path in store.root.iterdir()) == [".json", ".npy"]
@@ -0,0 +1,75 @@
+"""
+検証済みトークンキャッシュのテスト。
+"""
+
+import time
+
+import jwt
+import pytest
+
+from faceapi.utils.token_cache import VerifiedTokenCache
+
+SECRET = "0" * 64
+
+
+def _token(exp_offset: float = 300, **claims) -> str:
+    claims.setdefault("ip", "127.0.0.1")
+    if exp_offset is not None:
+        claims["exp"] = int(time.time() + exp_offset)
+    return jwt.encode(claims, SECRET, algorithm="HS256")
+
+
+def test_hit_skips_verification(monkeypatch):
+    cache = VerifiedTokenCache(maxsize=10)
+    token = _token()
+    claims = cache.decode("session", token, SECRET, "HS256")
+    monkeypatch.setattr(jwt, "decode", lambda *args, **kwargs: pytest.fail("decoded again"))
+    assert cache.decode("session", token, SECRET, "HS256") is claims
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_namespaces_are_separate():
+    cache = VerifiedTokenCache(maxsize=10)
+    token = _token()
+    cache.decode("session", token, SECRET, "HS256")
+    with pytest.raises(jwt.InvalidSignatureError):
+        cache.decode("access", token, "1" * 64, "HS256")
+    assert len(cache) == 1
+
+
+def test_invalid_and_non_expiring_tokens_are_not_cached():
+    cache = VerifiedTokenCache(maxsize=10)
+    with pytest.raises(jwt.InvalidSignatureError):
+        cache.decode("session", _token(), "1" * 64, "HS256")
+    with pytest.raises(jwt.ExpiredSignatureError):
+        cache.decode("session", _token(exp_offset=-10), SECRET, "HS256")
+    cache.decode("session", _token(exp_offset=None), SECRET, "HS256")
+    assert len(cache) == 0
+    # 容量 0 の場合は検証のみ行う
+    assert VerifiedTokenCache(maxsize=0).decode("session", _token(), SECRET, "HS256")["ip"] == "127.0.0.1"
+
+
+def test_cached_entry_expires(monkeypatch):
+    cache = VerifiedTokenCache(maxsize=10)
+    token = _token(exp_offset=60)
+    cache.decode("session", token, SECRET, "HS256")
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 120)
+    with pytest.raises(jwt.ExpiredSignatureError):
+        cache.decode("session", token, SECRET, "HS256")
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = VerifiedTokenCache(maxsize=2)
+    tokens = [_token(n=i) for i in range(3)]
+    cache.decode("session", tokens[0], SECRET, "HS256")
+    cache.decode("session", tokens[1], SECRET, "HS256")
+    cache.decode("session", tokens[0], SECRET, "HS256")
+    cache.decode("session", tokens[2], SECRET, "HS256")
+    assert len(cache) == 2
+    misses = cache.misses
+    cache.decode("session", tokens[0], SECRET, "HS256")
+    assert cache.misses == misses
+    cache.decode("session", tokens[1], SECRET, "HS256")
+    assert cache.misses == misses + 1
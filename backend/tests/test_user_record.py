@@ -0,0 +1,92 @@
+"""
+UserRecord 和 VectorIndex 的测试。
+"""
+
+import numpy as np
+import pytest
+
+from faceapi.db.user_record import USER_FIELDS, UserRecord
+from faceapi.db.vector_index import VectorIndex
+
+
+def test_record_behaves_like_dict():
+    record = UserRecord(id=1, username="alice", email="alice@example.com", is_active=True)
+    assert record["username"] == "alice"
+    assert record.get("full_name") is None
+    assert record.get("missing", "default") == "default"
+    assert list(record) == list(USER_FIELDS) + ["embedding"]
+    assert "embedding" in record and "missing" not in record
+    assert record.to_dict()["embedding"] is None
+
+    record["full_name"] = "Alice"
+    record.update({"is_active": False})
+    assert (record.full_name, record.is_active) == ("Alice", False)
+
+
+def test_unknown_fields_are_rejected():
+    with pytest.raises(KeyError):
+        UserRecord(id=1, nickname="al")
+    record = UserRecord(id=1)
+    with pytest.raises(KeyError):
+        record["embedding"] = [0.0]
+    with pytest.raises(KeyError):
+        record.update({"nickname": "al"})
+    assert not hasattr(record, "__dict__")
+
+
+def test_embedding_is_read_from_vector_index():
+    vectors = VectorIndex()
+    record = UserRecord(vectors, id=7, username="bob")
+    assert record["embedding"] is None
+    vectors.upsert(7, np.array([3.0, 4.0], dtype=np.float32))
+    np.testing.assert_allclose(record["embedding"], [0.6, 0.8])
+
+    clone = record.copy(VectorIndex())
+    assert clone == record
+    assert clone["embedding"] is None
+
+
+def test_vector_index_search_and_remove():
+    rng = np.random.default_rng(0)
+    matrix = rng.standard_normal((50, 16), dtype=np.float32)
+    index = VectorIndex(initial_capacity=4)
+    for item_id, vector in enumerate(matrix, start=1):
+        index.upsert(item_id, vector)
+    assert len(index) == 50
+
+    results = index.search(matrix[[9, 19]], limit=3)
+    assert [matches[0][0] for matches in results] == [10, 20]
+    assert results[0][0][1] == pytest.approx(1.0)
+    assert all(a[1] >= b[1] for a, b in zip(results[0], results[0][1:]))
+
+    # 删除时用最后一行填补空位，其余 ID 的向量不变
+    assert index.remove(10) is True
+    assert index.remove(10) is False
+    assert 10 not in index and len(index) == 49
+    np.testing.assert_allclose(index.get(50), matrix[49] / np.linalg.norm(matrix[49]), rtol=1e-6)
+    assert index.search(matrix[9], limit=1)[0][0][0] != 10
+
+
+def test_vector_index_threshold_and_dimension():
+    index = VectorIndex()
+    assert index.search(np.ones(3), limit=5) == [[]]
+    index.upsert(1, [1.0, 0.0, 0.0])
+    index.upsert(2, [0.0, 1.0, 0.0])
+    assert index.search([1.0, 0.1, 0.0], limit=5, threshold=0.5) == [[(1, pytest.approx(0.995, abs=1e-3))]]
+    with pytest.raises(ValueError):
+        index.upsert(3, [1.0, 0.0])
+
+
+def test_vector_index_arrays_round_trip():
+    index = VectorIndex()
+    for item_id in (3, 1, 2):
+        index.upsert(item_id, [float(item_id), 1.0])
+    ids, matrix = index.to_arrays()
+    restored = VectorIndex.from_arrays(ids, matrix)
+    for item_id in (1, 2, 3):
+        np.testing.assert_array_equal(restored.get(item_id), index.get(item_id))
+    # 从导出的数据恢复后仍可插入新行，副本互不影响
+    restored.upsert(4, [0.0, 1.0])
+    clone = restored.copy()
+    clone.remove(1)
+    assert 4 in restored and 1 in restored and 1 not in clone
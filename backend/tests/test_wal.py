@@ -0,0 +1,116 @@
+"""
+预写日志的测试：记录编解码、组提交、段的轮换和崩溃后的截断。
+"""
+
+import asyncio
+
+import pytest
+
+from faceapi.db import wal as wal_module
+from faceapi.db.wal import WriteAheadLog, encode_record, list_segments, read_records
+
+
+@pytest.fixture
+def wal(tmp_path):
+    wal = WriteAheadLog(tmp_path, "log")
+    yield wal
+    wal.close()
+
+
+async def test_records_round_trip(wal):
+    wal.append({"op": "create", "id": 1, "name": "名前"}, b"\x00\x00\x80\x3f")
+    wal.append({"op": "delete", "id": 1})
+    await wal.sync()
+    assert list(read_records(wal.path(1))) == [
+        ({"op": "create", "id": 1, "name": "名前"}, b"\x00\x00\x80\x3f"),
+        ({"op": "delete", "id": 1}, None),
+    ]
+
+
+async def test_concurrent_writers_share_fsync(wal, monkeypatch):
+    writes = []
+    write = wal._write
+    monkeypatch.setattr(wal, "_write", lambda batch: (writes.append(len(batch)), write(batch)))
+
+    async def writer(i: int):
+        await wal.sync(wal.append({"id": i}))
+
+    await asyncio.gather(*(writer(i) for i in range(50)))
+    assert sum(writes) == 50
+    assert len(writes) < 50
+    assert [record["id"] for record, _ in read_records(wal.path(1))] == list(range(50))
+
+
+async def test_rotate_and_discard(wal, tmp_path):
+    wal.append({"id": 1})
+    await wal.sync()
+    assert wal.rotate() == 2
+    wal.append({"id": 2})
+    await wal.sync()
+    assert [segment for segment, _ in list_segments(tmp_path, "log")] == [1, 2]
+
+    wal.discard_before(2)
+    assert [segment for segment, _ in list_segments(tmp_path, "log")] == [2]
+    assert [record for record, _ in read_records(wal.path(2))] == [{"id": 2}]
+
+
+async def test_torn_and_corrupted_tail_is_ignored(wal):
+    for i in range(3):
+        wal.append({"id": i})
+    await wal.sync()
+    wal.close()
+    path = wal.path(1)
+
+    # 写入中途崩溃：最后一条记录不完整
+    path.write_bytes(path.read_bytes() + encode_record({"id": 3})[:-2])
+    assert [record["id"] for record, _ in read_records(path)] == [0, 1, 2]
+
+    # 校验失败的记录及其之后的内容被忽略
+    data = bytearray(path.read_bytes())
+    data[len(encode_record({"id": 0})) + 13] ^= 0xFF
+    path.write_bytes(bytes(data))
+    assert [record["id"] for record, _ in read_records(path)] == [0]
+
+
+async def test_failed_write_is_retried(wal, monkeypatch):
+    write = wal._write
+    calls = []
+
+    def flaky(batch):
+        calls.append(len(batch))
+        if len(calls) == 1:
+            raise OSError("disk full")
+        write(batch)
+
+    monkeypatch.setattr(wal, "_write", flaky)
+    lsn = wal.append({"id": 1})
+    with pytest.raises(OSError):
+        await wal.sync(lsn)
+    await wal.sync(lsn)
+    assert calls == [1, 1]
+    assert [record for record, _ in read_records(wal.path(1))] == [{"id": 1}]
+
+
+async def test_failed_fsync_truncates_partial_batch(wal, monkeypatch):
+    wal.append({"id": 0})
+    await wal.sync()
+
+    fsync = wal_module.os.fsync
+    calls = []
+
+    def flaky(fd):
+        calls.append(fd)
+        if len(calls) == 1:
+            raise OSError("I/O error")
+        fsync(fd)
+
+    # 记录已写入文件但 fsync 失败：截断回写入前的长度，重试时不重复写入
+    monkeypatch.setattr(wal_module.os, "fsync", flaky)
+    wal.append({"id": 1})
+    wal.append({"id": 2})
+    with pytest.raises(OSError):
+        await wal.sync()
+    assert [record["id"] for record, _ in read_records(wal.path(1))] == [0]
+
+    await wal.sync()
+    assert [record["id"] for record, _ in read_records(wal.path(1))] == [0, 1, 2]
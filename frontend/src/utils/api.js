@@ -1,4 +1,5 @@
 import axios from 'axios';
+import { reactive } from 'vue';
 import { ElMessage, ElNotification } from 'element-plus';
 
 // 创建axios实例
@@ -292,4 +293,38 @@ export const hasValidSession = () => {
   return sessionToken !== '';
 };
 
+// 已加载的头像图片（blob URL），图片引用是内容摘要，内容不会改变，因此可以一直缓存
+const headPicUrls = reactive({});
+const headPicRequests = new Set();
+
+// 获取头像图片的URL（head_pic 为图片引用）
+// 头像需要会话令牌和访问令牌，因此带认证头加载后返回 blob URL（加载完成前返回 undefined）
+// token: 使用指定的访问令牌（如人脸验证返回的令牌），省略时使用当前登录用户的令牌
+export const headPicUrl = (headPic, thumbnail = false, token = undefined) => {
+  if (!headPic) {
+    return undefined;
+  }
+  const key = thumbnail ? `${headPic}-thumb` : headPic;
+  const accessToken = token || localStorage.getItem('user_token');
+  if (!(key in headPicUrls) && accessToken && !headPicRequests.has(key)) {
+    headPicRequests.add(key);
+    apiClient
+      .get(`/api/v1/face/pic/${headPic}`, {
+        params: thumbnail ? { thumbnail: true } : undefined,
+        headers: { Authorization: `Bearer ${accessToken}` },
+        responseType: 'blob',
+      })
+      .then((response) => {
+        headPicUrls[key] = URL.createObjectURL(response.data);
+      })
+      .catch(() => {
+        // 无权查看或图片不存在
+      })
+      .finally(() => {
+        headPicRequests.delete(key);
+      });
+  }
+  return headPicUrls[key];
+};
+
 export default apiClient;
\ No newline at end of file